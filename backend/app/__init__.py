@@ -1,20 +1,55 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from app.models import Patient
-from app.routes.patients import patients_db
-from app.routes import patients, measurements, alerts, guidelines, ingestion, system
+from app.routes.patients import patients_db, recommendation_refresher
+from app.services.clinical_parameters import resume_versions
+from app.services.guideline_corpus import get_guideline_corpus
+from app.services.pagination import NEXT_CURSOR_HEADER
+from app.services.whatsapp_service import whatsapp_client
+from app.routes import (
+    patients, measurements, measurement_batches, trends, alerts, population_alerts, notifications, guidelines,
+    ingestion, system, export
+)
 
 # Load environment variables
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Index the guideline documents (or load the persisted index) before the first request
+    get_guideline_corpus()
+    # Alert states stored by earlier runs were computed with parameter versions of
+    # that run: continue numbering after them so none is mistaken for current
+    resume_versions(patients_db.latest_parameters_version())
+    # Parameters and rules updated before this start stay in force
+    guidelines.restore_parameters()
+    # So do the cohort and patient overrides stored in the patient repository
+    guidelines.restore_overrides()
+    # Open the ingestion logs and index the records stored before this start
+    ingestion.open_logs()
+    await ingestion.start_retention()
+    await alerts.notification_workers.start()
+    await recommendation_refresher.start()
+    await ingestion.vitals_pipeline.start()
+    yield
+    await ingestion.vitals_pipeline.stop()
+    await recommendation_refresher.stop()
+    await alerts.notification_workers.stop()
+    await ingestion.stop_retention()
+    ingestion.close_logs()
+    # Close pooled outbound connections on shutdown
+    await whatsapp_client.aclose()
+
 app = FastAPI(
     title="Nexo+ API",
     description="Backend API for Nexo+ cardiac care platform",
     version="1.0.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
-    openapi_url="/api/openapi.json"
+    openapi_url="/api/openapi.json",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -24,21 +59,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Include routers
 app.include_router(patients.router)
 app.include_router(measurements.router)
+app.include_router(measurement_batches.router)
+app.include_router(trends.router)
 app.include_router(alerts.router)
+app.include_router(population_alerts.router)
+app.include_router(notifications.router)
 app.include_router(guidelines.router)
 app.include_router(ingestion.router)
 app.include_router(system.router)
+app.include_router(export.router)
 
 # Temporary endpoint for demo purposes - REMOVE AFTER DEMO
 @app.post("/debug/patients", status_code=201, tags=["Debug"], include_in_schema=False)
 async def add_debug_patient(patient: Patient):
-    """Adds or updates a patient in the in-memory DB for debugging/demo."""
-    patients_db[patient.id] = patient
+    """Adds or updates a patient in the patient repository for debugging/demo."""
+    patients_db.save(patient)
     return {"message": f"Patient {patient.id} added/updated for debug."}
 
 # Main entry point
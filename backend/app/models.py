@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import Any, List, Dict, Optional, Union, Literal
 from datetime import datetime, timezone
 import uuid
 
@@ -14,6 +14,29 @@ class Measurement(BaseModel):
     frecuencia_cardiaca: float = Field(..., description="Heart rate in beats per minute (bpm)")
     saturacion_oxigeno: Optional[float] = Field(None, description="Blood oxygen saturation in percentage (%)")
     sintomas: Optional[List[str]] = Field(default=None, description="List of symptoms reported by patient")
+    source_ingestion_id: Optional[str] = Field(None, description="Text ingestion the measurement was extracted from, if any")
+
+class MeasurementBatchRow(Measurement):
+    """
+    Model representing one row of a bulk measurement upload.
+    """
+    patient_id: str = Field(..., description="Identifier of the patient the measurement belongs to")
+
+class MeasurementBatchError(BaseModel):
+    """
+    Model describing a bulk upload row that was rejected.
+    """
+    row: int = Field(..., description="Zero-based position of the row in the upload (CSV header excluded)")
+    patient_id: Optional[str] = Field(None, description="Patient identifier of the row, if it could be read")
+    detail: str = Field(..., description="Reason the row was rejected")
+
+class MeasurementBatchResult(BaseModel):
+    """
+    Model summarizing the outcome of a bulk measurement upload.
+    """
+    accepted: int = Field(..., description="Number of measurements stored")
+    rejected: int = Field(..., description="Number of rows rejected")
+    errors: List[MeasurementBatchError] = Field(default_factory=list, description="Per-row errors")
 
 class Patient(BaseModel):
     """
@@ -26,6 +49,32 @@ class Patient(BaseModel):
     measurements: List[Measurement] = Field(default_factory=list, description="Patient's measurement history")
     intervention_history: List[Dict[str, str]] = Field(default_factory=list, description="Intervention history")
 
+    # Storage state attached by the patient repository; not part of the API
+    _measurement_version: Optional[int] = PrivateAttr(default=None)
+    _alert_state: Optional["AlertState"] = PrivateAttr(default=None)
+
+    @property
+    def measurement_version(self) -> Optional[int]:
+        """
+        Counter incremented by the repository on every measurement write (None if not loaded from storage).
+        """
+        return self._measurement_version
+
+    @property
+    def alert_state(self) -> Optional["AlertState"]:
+        """
+        Alert set cached by the repository for this patient, if any.
+        """
+        return self._alert_state
+
+    def attach_storage_state(self, measurement_version: int, alert_state: Optional["AlertState"]) -> "Patient":
+        """
+        Records the storage state read alongside the patient and returns the patient.
+        """
+        self._measurement_version = measurement_version
+        self._alert_state = alert_state
+        return self
+
 class Alert(BaseModel):
     """
     Model representing a clinical alert generated based on patient parameters.
@@ -33,6 +82,77 @@ class Alert(BaseModel):
     mensaje: str = Field(..., description="Alert descriptive message")
     nivel: str = Field(..., description="Alert level (green, yellow, red)")
 
+class AlertState(BaseModel):
+    """
+    Model for a patient's alert set, computed once per measurement write.
+    """
+    alerts: List[Alert] = Field(default_factory=list, description="Alerts for the latest measurements")
+    measurement_version: int = Field(..., description="Patient measurement version the alerts were computed from")
+    parameters_version: int = Field(..., description="Clinical parameters version the alerts were computed with")
+
+class AdherenceRecommendations(BaseModel):
+    """
+    Model for a patient's precomputed adherence recommendations.
+    """
+    recommendations: Dict[str, str] = Field(..., description="Recommendations per category")
+    measurement_version: int = Field(..., description="Patient measurement version the recommendations were generated from")
+    profile_version: str = Field(..., description="Digest of the profile fields the recommendations were generated from")
+    generated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), description="Generation time")
+
+class PatientAlerts(BaseModel):
+    """
+    Model for one patient's entry in the population alert sweep.
+    """
+    patient_id: str = Field(..., description="Patient identifier")
+    alerts: List[Alert] = Field(default_factory=list, description="Alerts for the patient's latest measurements")
+
+class NotificationJob(BaseModel):
+    """
+    Model for a patient notification waiting in (or delivered from) the outbox.
+    """
+    id: int = Field(..., description="Job identifier")
+    patient_id: str = Field(..., description="Patient identifier")
+    destination: str = Field(..., description="Phone number the notification is sent to")
+    alerts: List[Alert] = Field(default_factory=list, description="Alerts that triggered the notification")
+    message: Optional[str] = Field(None, description="Generated message, kept for retries")
+    status: str = Field("pending", description="pending, in_flight, sent or failed")
+    attempts: int = Field(0, description="Delivery attempts made")
+    next_attempt_at: float = Field(..., description="Earliest time (epoch seconds) of the next attempt")
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), description="Enqueue time")
+    last_error: Optional[str] = Field(None, description="Error of the last failed attempt")
+
+class NotificationStats(BaseModel):
+    """
+    Model for the state of the notification outbox and its workers.
+    """
+    jobs: Dict[str, int] = Field(default_factory=dict, description="Number of jobs per status")
+    circuit: str = Field(..., description="Circuit breaker state (closed, open, half_open)")
+    workers: int = Field(..., description="Running workers")
+    decisions: Dict[str, int] = Field(default_factory=dict, description="Notification policy decisions: sent and suppressed totals and counts per reason")
+    message_cache: Dict[str, int] = Field(default_factory=dict, description="Alert message cache hits, misses, evictions, expirations and size")
+    coalesced: Dict[str, int] = Field(default_factory=dict, description="AI and WhatsApp calls started, and callers that joined one already in flight")
+
+class VitalAggregate(BaseModel):
+    """
+    Model for one vital sign's statistics over a trend window.
+    """
+    min: float = Field(..., description="Lowest value in the window")
+    max: float = Field(..., description="Highest value in the window")
+    mean: float = Field(..., description="Average value in the window")
+    last: float = Field(..., description="Value of the most recent reading")
+
+class TrendWindow(BaseModel):
+    """
+    Model for a patient's vital sign aggregates over a sliding time window ending at the most recent reading.
+    """
+    days: int = Field(..., description="Window length in days")
+    end: datetime = Field(..., description="Timestamp (UTC) of the most recent reading")
+    count: int = Field(..., description="Number of readings in the window")
+    peso: VitalAggregate
+    presion_sistolica: VitalAggregate
+    presion_diastolica: VitalAggregate
+    frecuencia_cardiaca: VitalAggregate
+
 class GuidelineParameters(BaseModel):
     """
     Model for defining clinical parameters used in alert evaluation.
@@ -42,6 +162,33 @@ class GuidelineParameters(BaseModel):
     fc_min: Optional[float] = Field(50, description="Minimum recommended heart rate")
     fc_max: Optional[float] = Field(120, description="Maximum recommended heart rate")
     peso_delta: Optional[float] = Field(2, description="Weight increase (kg) indicating alert")
+    peso_tendencia_delta: Optional[float] = Field(2, description="Weight gain (kg) within a trend window indicating alert")
+
+class AlertRule(BaseModel):
+    """
+    Model for a declarative alert rule.
+
+    A rule either compares a metric of the patient's readings with a threshold or
+    matches reported symptoms, and produces an alert with the given level and
+    message. Rules are evaluated in order.
+    """
+    id: str = Field(..., description="Unique rule identifier")
+    nivel: str = Field(..., pattern="^(green|yellow|red)$", description="Alert level (green, yellow, red)")
+    mensaje: str = Field(..., description="Message template; {value} is the compared value and {days} the trend window length")
+    metric: Optional[str] = Field(None, description=(
+        "Compared value: a vital field of the latest reading (e.g. 'presion_sistolica'), "
+        "'delta.<field>' (latest minus previous reading) or 'trend.<field>.<min|max|mean|last|gain>' "
+        "over a trend window, where gain is last minus min"
+    ))
+    op: Optional[Literal["<", "<=", ">", ">="]] = Field(None, description="Comparison operator")
+    threshold: Optional[Union[float, str]] = Field(None, description="Number or name of a GuidelineParameters field")
+    symptoms: Optional[List[str]] = Field(None, description="Symptoms (case-insensitive); the rule fires when any of them is reported")
+    window: Union[int, Literal["any", "longest"]] = Field("longest", description=(
+        "Trend window for trend metrics: a window length in days, 'longest', or 'any' "
+        "(the shortest window where the condition holds)"
+    ))
+    min_count: int = Field(2, ge=1, description="Minimum number of readings in the trend window")
+    unless: Optional[str] = Field(None, description="Id of an earlier rule; this rule is skipped when that one fired")
 
 # =============================================================================
 # DATA INGESTION MODELS (Migrated from main.py)
@@ -63,10 +210,43 @@ class VisionIngestion(BaseModel):
     id: Optional[str] = Field(default_factory=lambda: str(uuid.uuid4()), description="Unique ingestion identifier")
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), description="Ingestion date and time")
     image_url: Optional[str] = Field(None, description="Image URL or reference")
+    image_blob: Optional[str] = Field(None, description="Reference (sha256:<digest>) of an uploaded image in the blob store")
+    image_content_type: Optional[str] = Field(None, description="Detected type of the uploaded image")
+    image_size: Optional[int] = Field(None, description="Size of the uploaded image in bytes")
     caption: Optional[str] = Field(None, description="Visual description or interpretation of the image")
     additional_text: Optional[str] = Field(None, description="Additional text obtained via vision LLM")
     metadata: Optional[Dict[str, str]] = Field(default=None, description="Additional visual ingestion metadata")
 
+class VitalsExtraction(BaseModel):
+    """
+    Model for the vitals extracted from a text ingestion, linking it to the
+    measurement recorded from it.
+    """
+    ingestion_id: str = Field(..., description="Text ingestion the vitals were read from")
+    patient_id: str = Field(..., description="Patient the ingestion belongs to (from its metadata)")
+    status: Literal["recorded", "incomplete", "no_vitals", "unknown_patient"] = Field(..., description=(
+        "'recorded': appended to the patient's measurements; 'incomplete': vitals or symptoms found, but not "
+        "all the measurement requires and no previous measurement to complete them; 'no_vitals': nothing "
+        "found; 'unknown_patient': the patient does not exist"
+    ))
+    values: Dict[str, float] = Field(default_factory=dict, description="Measurement fields found in the text")
+    sintomas: List[str] = Field(default_factory=list, description="Symptoms found in the text")
+    missing: List[str] = Field(default_factory=list, description="Required measurement fields not found (nor carried forward)")
+    carried_forward: List[str] = Field(default_factory=list, description=(
+        "Required measurement fields not in the text, copied from the patient's previous measurement"
+    ))
+    measurement_timestamp: Optional[datetime] = Field(None, description="Timestamp of the recorded measurement")
+    processed_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), description="Extraction time")
+
+class IngestionSearchHit(BaseModel):
+    """
+    Model for an ingestion record matching a search.
+    """
+    kind: str = Field(..., description="Ingestion kind ('text' or 'vision')")
+    offset: int = Field(..., description="Offset of the record in its ingestion log")
+    text: Optional[TextIngestion] = Field(None, description="Text ingestion (kind 'text')")
+    vision: Optional[VisionIngestion] = Field(None, description="Visual ingestion (kind 'vision')")
+
 # =============================================================================
 # GUIDELINE PARAMETER UPDATE MODEL (Migrated from main.py)
 # =============================================================================
@@ -80,4 +260,45 @@ class GuidelineParameterUpdate(BaseModel):
     fc_min: Optional[float] = Field(None, description="New minimum value for heart rate")
     fc_max: Optional[float] = Field(None, description="New maximum value for heart rate")
     peso_delta: Optional[float] = Field(None, description="New threshold for weight increase")
+    peso_tendencia_delta: Optional[float] = Field(None, description="New threshold for weight gain within a trend window")
+    rules: Optional[List[AlertRule]] = Field(None, description="New alert rule set, replacing the current one")
     updated_by: str = Field(..., description="Identifier of user making the update")
+
+class ParameterAuditEntry(BaseModel):
+    """
+    Model for an entry of the clinical parameter audit log.
+    """
+    id: int = Field(..., description="Sequence number of the entry")
+    timestamp: datetime = Field(..., description="Date and time of the update")
+    updated_by: str = Field(..., description="Identifier of user who made the update")
+    previous_values: Dict[str, Any] = Field(..., description="Parameters and alert rules in force before the update")
+    new_values: Dict[str, Any] = Field(..., description="Values set by the update")
+
+class ParametersAsOf(BaseModel):
+    """
+    Model for the global clinical parameters and alert rules in force at a point in time.
+    """
+    at: datetime = Field(..., description="Point in time")
+    entry_id: Optional[int] = Field(None, description="Last audit entry applied (None before the first logged update)")
+    parameters: GuidelineParameters = Field(..., description="Parameters in force")
+    rules: List[AlertRule] = Field(..., description="Alert rules in force")
+
+class ParameterOverrides(BaseModel):
+    """
+    Model for clinical parameters overridden for a cohort or a patient; unset
+    fields are inherited from the layer below (patient, then cohort, then global).
+    """
+    pa_min: Optional[float] = Field(None, description="Minimum recommended systolic blood pressure")
+    pa_max: Optional[float] = Field(None, description="Maximum recommended systolic blood pressure")
+    fc_min: Optional[float] = Field(None, description="Minimum recommended heart rate")
+    fc_max: Optional[float] = Field(None, description="Maximum recommended heart rate")
+    peso_delta: Optional[float] = Field(None, description="Weight increase (kg) indicating alert")
+    peso_tendencia_delta: Optional[float] = Field(None, description="Weight gain (kg) within a trend window indicating alert")
+
+class PatientParameters(BaseModel):
+    """
+    Model for a patient's cohort membership and own parameter overrides.
+    """
+    cohort: Optional[str] = Field(None, description="Cohort whose overrides apply to the patient")
+    overrides: ParameterOverrides = Field(default_factory=ParameterOverrides, description="Patient-specific overrides")
+    resolved: Optional[GuidelineParameters] = Field(None, description="Parameters in effect for the patient (read-only)")
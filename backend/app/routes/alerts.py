@@ -5,113 +5,192 @@ import requests
 import os
 from zoneinfo import ZoneInfo
 
-from app.models import Patient, Alert
-from app.routes.patients import patients_db
-from app.services.clinical_parameters import clinical_params
+from app.models import Patient, Alert, AlertState, NotificationJob, TrendWindow
+from app.routes.patients import patients_db, recommendation_refresher
+from app.services.clinical_parameters import resolve_parameters
 from app.services.ai_service import ai_service
+from app.services.alert_rules import alert_plan
+from app.services.notification_policy import notification_policy
+from app.services.notification_outbox import create_notification_outbox
+from app.services.notification_worker import NotificationWorkerPool, PermanentDeliveryError
 
 router = APIRouter(prefix="/patients/{patient_id}/alerts", tags=["Alerts"])
 
-def check_alerts(patient: Patient) -> List[Alert]:
+def check_alerts(patient: Patient, trends: Optional[List[TrendWindow]] = None) -> List[Alert]:
     """
     Evaluates patient measurements to generate alerts based on clinical parameters.
 
+    The installed alert rules are compiled (once per set of clinical parameters)
+    into a flat plan, which is evaluated here against the patient's readings
+    with the parameters in effect for the patient (global, cohort or patient
+    overrides).
+
     Args:
         patient: Patient object with measurements
+        trends: Sliding window aggregates of the patient's vitals (shortest window first);
+            trend rules are skipped when not given
 
     Returns:
         List[Alert]: List of Alert objects
     """
-    alerts = []
-    if not patient.measurements:
-        return alerts
-    
-    latest = patient.measurements[-1]
-    
-    # Weight change comparison
-    if len(patient.measurements) > 1:
-        # Use the previous measurement as baseline for weight change
-        previous = patient.measurements[-2] 
-        delta_peso = latest.peso - previous.peso
-        # Alert if weight gain exceeds threshold compared to *previous* measurement
-        if delta_peso > clinical_params.peso_delta:
-            alerts.append(Alert(
-                mensaje=f"Recent weight increase of {delta_peso:.1f} kg detected (compared to last measurement). Check for fluid retention.",
-                nivel="yellow"
-            ))
-    
-    # Blood pressure check
-    if latest.presion_sistolica < clinical_params.pa_min:
-        alerts.append(Alert(
-            mensaje=f"Low systolic pressure: {latest.presion_sistolica} mmHg.",
-            nivel="red"
-        ))
-    elif latest.presion_sistolica > clinical_params.pa_max:
-        alerts.append(Alert(
-            mensaje=f"Elevated systolic pressure: {latest.presion_sistolica} mmHg.",
-            nivel="red"
-        ))
-    
-    # Heart rate check
-    if latest.frecuencia_cardiaca > clinical_params.fc_max:
-        alerts.append(Alert(
-            mensaje=f"Elevated heart rate: {latest.frecuencia_cardiaca} bpm.",
-            nivel="red"
-        ))
-    elif latest.frecuencia_cardiaca < clinical_params.fc_min:
-        alerts.append(Alert(
-            mensaje=f"Low heart rate: {latest.frecuencia_cardiaca} bpm.",
-            nivel="red"
+    return alert_plan(patient.id).evaluate(patient, trends)
+
+def get_current_alerts(patient: Patient) -> List[Alert]:
+    """
+    Returns the patient's alerts, reusing the alert state stored when its latest
+    measurement was written.
+
+    The stored state is reused while both its measurement version and the
+    version of the clinical parameters in effect for the patient are current;
+    otherwise the alerts are computed with check_alerts, including the trend
+    rules over the patient's sliding windows, and stored again for later reads.
+
+    Args:
+        patient: Patient object as returned by the repository
+
+    Returns:
+        List[Alert]: List of Alert objects
+    """
+    state = patient.alert_state
+    version = resolve_parameters(patient.id).version
+    if (
+        state is not None
+        and state.measurement_version == patient.measurement_version
+        and state.parameters_version == version
+    ):
+        return state.alerts
+
+    # Patients not loaded from storage carry no version to tag the result with,
+    # and have no stored trend windows
+    stored = patient.measurement_version is not None
+    alerts = check_alerts(patient, patients_db.get_trends(patient.id) if stored else None)
+    if stored:
+        patients_db.set_alert_state(patient.id, AlertState(
+            alerts=alerts,
+            measurement_version=patient.measurement_version,
+            parameters_version=version
         ))
-    
-    # Critical symptom evaluation
-    if latest.sintomas:
-        sintomas_norm = [s.lower() for s in latest.sintomas]
-        if "dolor torácico" in sintomas_norm or "chest pain" in sintomas_norm:
-            alerts.append(Alert(
-                mensaje="Chest pain detected. Evaluate possible ischemia.",
-                nivel="red"
-            ))
-        if "disnea" in sintomas_norm or "shortness of breath" in sintomas_norm:
-            alerts.append(Alert(
-                mensaje="Dyspnea reported. Check for possible congestion signs.",
-                nivel="yellow"
-            ))
-    
     return alerts
 
-async def notify_via_whatsapp(patient: Patient, alerts: List[Alert]):
+def refresh_alert_state(patient_id: str) -> Optional[List[Alert]]:
     """
-    Sends a critical alert notification using the AI service and WhatsApp.
-    
-    Uses LiteLLM to generate a personalized message based on patient data and alerts,
-    then sends it via WhatsApp Cloud API.
+    Computes and stores a patient's alert state after its measurements change.
+
+    Args:
+        patient_id: Patient identifier
+
+    Returns:
+        Optional[List[Alert]]: Current alerts, or None if the patient does not exist
+    """
+    patient = patients_db.get(patient_id)
+    if not patient:
+        return None
+    return get_current_alerts(patient)
+
+def notify_if_needed(patient: Patient, alerts: List[Alert]) -> Optional[NotificationJob]:
+    """
+    Queues a notification for critical alerts unless the notification policy
+    suppresses it.
+
+    The policy indexes the last notified alert signature per patient, so
+    re-reading an unchanged state is a duplicate that does no outbound work, and
+    new states are held back during the cooldown unless they escalate.
 
     Args:
         patient: Patient object
+        alerts: Current alerts of the patient
+
+    Returns:
+        Optional[NotificationJob]: Enqueued job, or None if nothing was sent
+    """
+    if not patient.telefono or not any(a.nivel == "red" for a in alerts):
+        return None
+    latest = patient.measurements[-1] if patient.measurements else None
+    if not notification_policy.decide(patient.id, alerts, latest).notify:
+        return None
+    return enqueue_notification(patient, alerts)
+
+def enqueue_notification(patient: Patient, alerts: List[Alert]) -> NotificationJob:
+    """
+    Records a WhatsApp notification job for the patient's alerts in the outbox.
+
+    The job is delivered in the background by the notification workers, so the
+    request that triggered it does not wait for the AI service or WhatsApp.
+
+    Args:
+        patient: Patient object (with a phone number)
         alerts: List of Alert objects that triggered the notification
+
+    Returns:
+        NotificationJob: Enqueued job
     """
-    if not patient.telefono:
-        print("Patient has no registered phone number.")
-        return
-    
-    # Generate personalized message using AI
-    message = await ai_service.generate_alert_message(patient, alerts)
-    
-    # Send message via WhatsApp
-    success = await ai_service.send_whatsapp_message(patient.telefono, message)
-    
-    if success:
-        print(f"AI-generated WhatsApp notification sent to {patient.telefono}")
-    else:
-        print(f"Failed to send AI-generated WhatsApp notification")
+    job = notification_outbox.enqueue(patient.id, patient.telefono, alerts)
+    notification_workers.wake()
+    return job
+
+async def deliver_notification(job: NotificationJob) -> bool:
+    """
+    Sends a notification job: an AI-generated message via WhatsApp.
+
+    Uses LiteLLM to generate a personalized message based on patient data and alerts
+    (once per job; retries resend the stored message), then sends it via WhatsApp
+    Cloud API.
+
+    Args:
+        job: Claimed outbox job
+
+    Returns:
+        bool: True if WhatsApp accepted the message
+
+    Raises:
+        PermanentDeliveryError: If the patient no longer exists
+    """
+    patient = patients_db.get(job.patient_id)
+    if not patient:
+        raise PermanentDeliveryError("Patient not found")
+
+    message = job.message
+    if message is None:
+        message = await ai_service.generate_alert_message(patient, job.alerts)
+        notification_outbox.set_message(job.id, message)
+
+    return await ai_service.send_whatsapp_message(job.destination, message)
+
+def record_delivery(job: NotificationJob, sent: bool) -> None:
+    """
+    Records the outcome of a finished notification job in the patient's intervention history.
+
+    Args:
+        job: Finished job
+        sent: Whether the notification was delivered
+    """
+    entry = {
+        # Use timezone-aware UTC timestamp
+        "timestamp": datetime.now(ZoneInfo("UTC")).isoformat(),
+        "action": "AI-generated WhatsApp notification sent" if sent else "WhatsApp notification failed",
+        "alerts": "; ".join([a.mensaje for a in job.alerts]),
+        "attempts": str(job.attempts),
+    }
+    if not sent and job.last_error:
+        entry["error"] = job.last_error
+    patients_db.add_intervention(job.patient_id, entry)
+    if not sent:
+        # Let the next read of the (still critical) state notify again
+        notification_policy.forget(job.patient_id)
+
+# Notification outbox (in-memory or SQLite, see NOTIFICATION_OUTBOX_BACKEND) and the
+# workers draining it, started with the application
+notification_outbox = create_notification_outbox()
+notification_workers = NotificationWorkerPool(notification_outbox, deliver_notification, record_delivery)
 
 @router.get("", response_model=List[Alert], description="Get clinical alerts generated from patient measurements")
 async def get_alerts(patient_id: str):
     """
     Returns alerts generated by a patient's measurements.
-    If critical alerts (red level) exist, an AI-generated WhatsApp notification is sent
-    and the action is recorded in the intervention history.
+    If critical alerts (red level) exist, an AI-generated WhatsApp notification is
+    queued in the outbox, unless the same state was already notified or the
+    patient is within the notification cooldown; the outcome is recorded in the intervention history once
+    it has been delivered (or given up on).
 
     Args:
         patient_id: Patient identifier
@@ -126,17 +205,9 @@ async def get_alerts(patient_id: str):
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    alerts = check_alerts(patient)
+    alerts = get_current_alerts(patient)
     
-    if any(a.nivel == "red" for a in alerts) and patient.telefono:
-        await notify_via_whatsapp(patient, alerts)
-        # Update intervention history *after* successful notification attempt
-        patient.intervention_history.append({
-            # Use timezone-aware UTC timestamp
-            "timestamp": datetime.now(ZoneInfo("UTC")).isoformat(),
-            "action": "AI-generated WhatsApp notification sent",
-            "alerts": "; ".join([a.mensaje for a in alerts])
-        })
+    notify_if_needed(patient, alerts)
     
     return alerts
 
@@ -144,7 +215,12 @@ async def get_alerts(patient_id: str):
             description="Get AI-generated adherence recommendations for a patient")
 async def get_adherence_recommendations(patient_id: str):
     """
-    Generates personalized adherence recommendations for a patient using AI.
+    Returns personalized adherence recommendations for a patient.
+
+    Recommendations are generated ahead of reads (after measurement and profile
+    writes, and nightly) and served from the store while they match the
+    patient's current measurements and profile; otherwise they are generated
+    with AI here and stored.
     
     Args:
         patient_id: Patient identifier
@@ -159,5 +235,9 @@ async def get_adherence_recommendations(patient_id: str):
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
+    recommendations = recommendation_refresher.get_fresh(patient)
+    if recommendations is not None:
+        return recommendations
     recommendations = await ai_service.generate_adherence_recommendations(patient)
+    recommendation_refresher.record(patient, recommendations)
     return recommendations
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import datetime
+
+from app.routes.patients import patients_db
+from app.services.export import iter_ndjson_export
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+@router.get("/patients.ndjson", response_class=StreamingResponse,
+            description="Stream all patients, measurements and interventions as NDJSON")
+async def export_patients(
+    since: Optional[datetime] = Query(None, description="Only export measurements and interventions at or after this time")
+):
+    """
+    Streams the patient store as newline-delimited JSON for the analytics warehouse.
+
+    Each line carries a "type" of "patient", "measurement" or "intervention";
+    measurement and intervention rows also carry the "patient_id". Rows are
+    produced page by page while the response is being sent, so memory use stays
+    flat regardless of how many patients are exported.
+
+    Args:
+        since: Lower timestamp bound for incremental exports
+
+    Returns:
+        StreamingResponse: NDJSON stream
+    """
+    return StreamingResponse(
+        iter_ndjson_export(patients_db, since=since),
+        media_type="application/x-ndjson"
+    )
@@ -1,17 +1,30 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
-from typing import List, Dict, Optional
-from datetime import datetime
+import json
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List, Dict, Optional
+from datetime import datetime, timezone
 
-from app.models import Patient, GuidelineParameters, GuidelineParameterUpdate 
+from app.models import (
+    Patient, GuidelineParameters, GuidelineParameterUpdate, AlertRule, ParameterOverrides, PatientParameters,
+    ParameterAuditEntry, ParametersAsOf
+)
 from app.routes.patients import patients_db
 from app.services.ai_service import ai_service
-from app.services.clinical_parameters import clinical_params
+from app.services.clinical_parameters import (
+    clinical_params, mark_parameters_changed, resolve_parameters, list_cohorts, get_cohort_overrides,
+    set_cohort_overrides, delete_cohort, get_patient_cohort, get_patient_overrides, set_patient_cohort,
+    set_patient_overrides
+)
+from app.services.alert_rules import compile_rules, current_rules, install_rules
+from app.services.guideline_corpus import get_guideline_corpus
+from app.services.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
+from app.services.parameter_audit import create_parameter_audit_log
 
 router = APIRouter(tags=["Guidelines"])
 
 def retrieve_clinical_guidelines(source: str) -> str:
     """
-    Retrieves (simulates) clinical guidelines from a specified source (AHA or GES).
+    Retrieves the clinical guidelines of a source (AHA or GES) from the guideline corpus.
 
     Args:
         source: Guidelines source ('AHA' or 'GES')
@@ -19,26 +32,10 @@ def retrieve_clinical_guidelines(source: str) -> str:
     Returns:
         str: Text with clinical recommendations
     """
-    if source.lower() == "aha":
-        return (
-            "AHA: Post-AMI Recommendations:\n"
-            "• BP <130/80 mmHg (minimum <140/90).\n"
-            "• Beta-blockers: HR 50-70 bpm, prolonged use based on condition.\n"
-            "• LDL <70 mg/dL; consider additional therapies if 55–69 mg/dL.\n"
-            "• HbA1c ~7% in diabetics.\n"
-            "• Echocardiogram 6–12 weeks; consider ICD if LVEF ≤35%.\n"
-            "• Intensive initial follow-up."
-        )
-    elif source.lower() == "ges":
-        return (
-            "GES (Chile): Post-AMI/HF Recommendations:\n"
-            "• First check-up in 7–14 days; initial monthly check-ups, spaced after stabilization.\n"
-            "• Early cardiac rehabilitation (minimum 15 sessions in 2 months).\n"
-            "• Focus on adherence, low-sodium diet, and moderate activity.\n"
-            "• Education in self-care and symptom awareness."
-        )
-    else:
+    text = get_guideline_corpus().full_text(source)
+    if text is None:
         return "Unrecognized source. Use 'AHA' or 'GES'."
+    return text
 
 def generate_followup_schedule(patient_id: str) -> Dict[str, str]:
     """
@@ -53,13 +50,13 @@ def generate_followup_schedule(patient_id: str) -> Dict[str, str]:
     Raises:
         HTTPException: If patient is not found
     """
-    from app.routes.alerts import check_alerts
+    from app.routes.alerts import get_current_alerts
     
     patient = patients_db.get(patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    alerts = check_alerts(patient)
+    alerts = get_current_alerts(patient)
     
     if any(a.nivel == "red" for a in alerts):
         schedule = "Urgent check-up in 7 days; intensive follow-up."
@@ -68,7 +65,50 @@ def generate_followup_schedule(patient_id: str) -> Dict[str, str]:
     
     return {"followup_schedule": schedule}
 
-parameters_audit_log: List[Dict[str, str]] = []
+# Persistent log of global parameter and alert rule updates
+parameters_audit_log = create_parameter_audit_log()
+
+def restore_parameters() -> bool:
+    """
+    Loads the global clinical parameters and alert rules in force according to
+    the audit log, so updates made before a restart stay in force after it
+    (and the parameters as of any time match what was applied).
+
+    Returns:
+        bool: False if the log is empty and the defaults stay in force
+    """
+    state = parameters_audit_log.state_at(datetime.now(timezone.utc))
+    if state is None:
+        return False
+    values = dict(state.values)
+    rules = values.pop("rules", None)
+    params = clinical_params.model_copy(update={
+        key: value for key, value in values.items() if key in GuidelineParameters.model_fields
+    })
+    installed = current_rules() if rules is None else [AlertRule(**rule) for rule in rules]
+    try:
+        compile_rules(installed, params)
+    except ValueError as e:
+        print(f"Warning: Logged alert rules are invalid, keeping the defaults: {e}")
+        return False
+    for key in GuidelineParameters.model_fields:
+        setattr(clinical_params, key, getattr(params, key))
+    install_rules(installed)
+    # Invalidates alert states computed with other values (and recompiles the rules)
+    mark_parameters_changed()
+    return True
+
+def restore_overrides() -> None:
+    """
+    Loads the cohort and patient parameter overrides stored in the patient
+    repository, so they stay in force after a restart.
+    """
+    settings = patients_db.parameter_overrides()
+    for cohort, overrides in settings.cohorts.items():
+        set_cohort_overrides(cohort, overrides)
+    for patient_id, (cohort, overrides) in settings.patients.items():
+        set_patient_cohort(patient_id, cohort if cohort in settings.cohorts else None)
+        set_patient_overrides(patient_id, overrides)
 
 @router.get("/guidelines/clinical", response_model=Dict[str, str], 
          description="Get clinical guidelines according to the indicated source (AHA or GES)")
@@ -109,6 +149,58 @@ async def interpret_guidelines(
         "interpretation": interpretation
     }
 
+async def interpretation_events(request: Request, source: str, query: str) -> AsyncIterator[str]:
+    """
+    Formats a streamed guideline interpretation as server-sent events.
+
+    Each fragment is sent as a data event ({"token": ...}) and a final 'done'
+    event marks the end. The stream stops, and the generation upstream with it,
+    as soon as the client disconnects.
+
+    Args:
+        request: Incoming request, polled for disconnection
+        source: Source of guidelines ('AHA' or 'GES')
+        query: User's question about the guidelines
+
+    Yields:
+        str: Encoded SSE events
+    """
+    tokens = ai_service.stream_clinical_guidelines(source, query)
+    try:
+        async for token in tokens:
+            if await request.is_disconnected():
+                return
+            yield f"data: {json.dumps({'token': token}, ensure_ascii=False)}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    finally:
+        await tokens.aclose()
+
+@router.get("/guidelines/interpret/stream", response_class=StreamingResponse,
+         description="Stream an AI interpretation of clinical guidelines as server-sent events")
+async def stream_interpret_guidelines(
+    request: Request,
+    source: str = Query(..., description="Guidelines source (AHA or GES)"),
+    query: str = Query(..., description="Question about the guidelines")
+):
+    """
+    Streams the AI interpretation of clinical guidelines as it is generated, so
+    the first words arrive after the model's first-token latency instead of the
+    whole completion.
+
+    Args:
+        request: Incoming request
+        source: Source of guidelines ('AHA' or 'GES')
+        query: User's question about the guidelines
+
+    Returns:
+        StreamingResponse: text/event-stream of interpretation fragments
+    """
+    return StreamingResponse(
+        interpretation_events(request, source, query),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/guidelines/followup/{patient_id}", response_model=Dict[str, str], 
          description="Get post-discharge follow-up plan based on patient's clinical status")
 async def get_followup_plan(patient_id: str):
@@ -141,23 +233,42 @@ async def get_parameters():
          description="Update clinical parameters used for alert generation")
 async def update_parameters(params_update: GuidelineParameterUpdate):
     """
-    Updates clinical parameters and logs the change.
+    Updates clinical parameters and/or the alert rules, and logs the change.
+
+    The rules (current or new) are compiled against the updated parameters
+    before anything is applied, so an invalid rule or a rule referring to a
+    missing parameter leaves both unchanged.
 
     Args:
         params_update: Parameter update data using GuidelineParameterUpdate model
 
     Returns:
         GuidelineParameters: Updated clinical parameters
+
+    Raises:
+        HTTPException: If the resulting alert rules are invalid
     """
     audit_entry = {
-        "timestamp": datetime.utcnow().isoformat(),
         "updated_by": params_update.updated_by,
-        "previous_values": clinical_params.dict(),
+        # The full state, so the parameters in force at any time can be rebuilt from the log
+        "previous_values": {
+            **clinical_params.model_dump(),
+            "rules": [rule.model_dump(exclude_none=True) for rule in current_rules()]
+        },
         "new_values": {}
     }
     
-    update_dict = params_update.dict(exclude_unset=True, exclude={"updated_by"})
-    
+    update_dict = params_update.model_dump(exclude_unset=True, exclude={"updated_by", "rules"})
+    rules = params_update.rules
+
+    candidate = clinical_params.model_copy(update={
+        key: value for key, value in update_dict.items() if hasattr(clinical_params, key) and value is not None
+    })
+    try:
+        compile_rules(rules if rules is not None else current_rules(), candidate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     for key, value in update_dict.items():
         if hasattr(clinical_params, key) and value is not None: 
             setattr(clinical_params, key, value)
@@ -165,18 +276,202 @@ async def update_parameters(params_update: GuidelineParameterUpdate):
         else:
             print(f"Warning: Attempted to update non-existent parameter '{key}'") 
 
+    if rules is not None:
+        install_rules(rules)
+        audit_entry["new_values"]["rules"] = [rule.model_dump(exclude_none=True) for rule in rules]
+
     if audit_entry["new_values"]:
-        parameters_audit_log.append(audit_entry)
+        # Invalidates alert states computed with the previous values (and recompiles the rules)
+        mark_parameters_changed()
+        parameters_audit_log.append(**audit_entry)
     
     return clinical_params
 
-@router.get("/parameters/audit", response_model=List[Dict[str, str]], 
+@router.get("/parameters/rules", response_model=List[AlertRule],
+         description="Get the alert rules evaluated for every patient")
+async def get_alert_rules():
+    """
+    Returns the installed alert rules, in evaluation order.
+
+    Returns:
+        List[AlertRule]: Alert rules
+    """
+    return current_rules()
+
+@router.get("/parameters/cohorts", response_model=Dict[str, ParameterOverrides],
+         description="Get the parameter overrides of every cohort")
+async def get_cohorts():
+    """
+    Returns the parameter overrides of every cohort.
+
+    Returns:
+        Dict[str, ParameterOverrides]: Overrides by cohort name
+    """
+    return list_cohorts()
+
+@router.put("/parameters/cohorts/{cohort}", response_model=ParameterOverrides,
+         description="Create a cohort or replace its parameter overrides")
+async def update_cohort(cohort: str, overrides: ParameterOverrides):
+    """
+    Creates a cohort or replaces its parameter overrides.
+
+    Only the alert states of the cohort's members are invalidated.
+
+    Args:
+        cohort: Cohort name
+        overrides: Parameters that replace the global values for the cohort
+
+    Returns:
+        ParameterOverrides: The cohort's overrides
+    """
+    values = overrides.model_dump(exclude_none=True)
+    set_cohort_overrides(cohort, values)
+    patients_db.save_cohort(cohort, values)
+    return get_cohort_overrides(cohort)
+
+@router.delete("/parameters/cohorts/{cohort}", description="Delete a cohort")
+async def remove_cohort(cohort: str):
+    """
+    Deletes a cohort; its members fall back to the global parameters.
+
+    Args:
+        cohort: Cohort name
+
+    Returns:
+        dict: Success message
+
+    Raises:
+        HTTPException: If the cohort is not found
+    """
+    if not delete_cohort(cohort):
+        raise HTTPException(status_code=404, detail="Cohort not found")
+    patients_db.delete_cohort(cohort)
+    return {"message": "Cohort deleted successfully"}
+
+def _patient_parameters(patient_id: str) -> PatientParameters:
+    return PatientParameters(
+        cohort=get_patient_cohort(patient_id),
+        overrides=ParameterOverrides(**get_patient_overrides(patient_id)),
+        resolved=resolve_parameters(patient_id).params
+    )
+
+@router.get("/patients/{patient_id}/parameters", response_model=PatientParameters,
+         description="Get the clinical parameters in effect for a patient")
+async def get_patient_parameters(patient_id: str):
+    """
+    Returns a patient's cohort, own overrides and the resulting parameters.
+
+    Args:
+        patient_id: Patient identifier
+
+    Returns:
+        PatientParameters: Patient parameter settings
+
+    Raises:
+        HTTPException: If patient is not found
+    """
+    if not patients_db.get(patient_id):
+        raise HTTPException(status_code=404, detail="Patient not found")
+    return _patient_parameters(patient_id)
+
+@router.put("/patients/{patient_id}/parameters", response_model=PatientParameters,
+         description="Set a patient's cohort and parameter overrides")
+async def update_patient_parameters(patient_id: str, settings: PatientParameters):
+    """
+    Sets a patient's cohort and own parameter overrides (replacing previous ones).
+
+    Only the patient's alert state is invalidated.
+
+    Args:
+        patient_id: Patient identifier
+        settings: Cohort and overrides (resolved is ignored)
+
+    Returns:
+        PatientParameters: Patient parameter settings
+
+    Raises:
+        HTTPException: If patient or cohort is not found
+    """
+    if not patients_db.get(patient_id):
+        raise HTTPException(status_code=404, detail="Patient not found")
+    try:
+        set_patient_cohort(patient_id, settings.cohort)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    overrides = settings.overrides.model_dump(exclude_none=True)
+    set_patient_overrides(patient_id, overrides)
+    patients_db.save_patient_parameters(patient_id, settings.cohort, overrides)
+    return _patient_parameters(patient_id)
+
+@router.get("/parameters/audit", response_model=List[ParameterAuditEntry],
          description="Get audit log of parameter updates")
-async def get_parameters_audit():
+async def get_parameters_audit(
+    response: Response,
+    from_: Optional[datetime] = Query(None, alias="from", description="Only updates made at or after this time"),
+    to: Optional[datetime] = Query(None, description="Only updates made before this time"),
+    updated_by: Optional[str] = Query(None, description="Only updates made by this user"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of entries to return"),
+    cursor: Optional[str] = Query(None, description=f"Cursor from the {NEXT_CURSOR_HEADER} header of the previous page")
+):
     """
-    Returns the audit log of clinical parameter updates.
+    Returns the audit log of clinical parameter updates, oldest first.
+
+    When more entries follow, the cursor of the next page is returned in the
+    X-Next-Cursor response header.
+
+    Args:
+        response: Outgoing response (used to set the next-page cursor header)
+        from_: Inclusive lower time bound
+        to: Exclusive upper time bound
+        updated_by: Author filter
+        limit: Maximum number of entries to return
+        cursor: Cursor of the page to return
+
+    Returns:
+        List[ParameterAuditEntry]: Page of audit log entries
+
+    Raises:
+        HTTPException: If the cursor is invalid
+    """
+    after = None
+    if cursor:
+        try:
+            (after,) = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if not isinstance(after, int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Fetch one extra entry to know whether another page follows
+    entries = parameters_audit_log.entries(start=from_, end=to, updated_by=updated_by, after=after, limit=limit + 1)
+    if len(entries) > limit:
+        entries = entries[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(entries[-1].id)
+    return entries
+
+@router.get("/parameters/as-of", response_model=ParametersAsOf,
+         description="Get the global clinical parameters and alert rules in force at a point in time")
+async def get_parameters_as_of(at: datetime = Query(..., description="Point in time")):
+    """
+    Rebuilds the global clinical parameters and alert rules in force at a time
+    from the audit log (latest snapshot before it plus the updates after it),
+    e.g. to re-evaluate the alerts of past measurements.
+
+    Args:
+        at: Point in time
 
     Returns:
-        List[Dict[str, str]]: List of audit log entries
+        ParametersAsOf: Parameters and rules in force
     """
-    return parameters_audit_log
+    state = parameters_audit_log.state_at(at)
+    if state is None:
+        # Never updated: the current values were always in force
+        return ParametersAsOf(at=at, parameters=clinical_params, rules=current_rules())
+    values = dict(state.values)
+    rules = values.pop("rules", None)
+    return ParametersAsOf(
+        at=at,
+        entry_id=state.entry_id,
+        parameters=GuidelineParameters(**values),
+        rules=current_rules() if rules is None else rules
+    )
@@ -1,21 +1,151 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
-from typing import List, Dict, Optional
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse
+from pydantic import ValidationError
+from typing import List, Dict, Optional, Set
 from datetime import datetime
+import asyncio
+import json
 import uuid
 
-from app.models import TextIngestion, VisionIngestion
+from app.models import IngestionSearchHit, TextIngestion, VisionIngestion, VitalsExtraction
+from app.routes.alerts import refresh_alert_state
+from app.routes.patients import patients_db, recommendation_refresher
+from app.services.blob_store import BlobStore, BlobTooLarge
+from app.services.extraction_store import create_extraction_store
+from app.services.ingestion_index import IngestionIndex
+from app.services.multipart_upload import MultipartError, receive_upload
+from app.services.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
+from app.services.segment_log import INGESTION_RETENTION_INTERVAL_SECONDS, LogRecord, SegmentLog, create_ingestion_log
+from app.services.vitals_pipeline import VitalsPipeline
 
 router = APIRouter(prefix="/ingestion", tags=["Data Ingestion"])
 
-# In-memory storage for ingestion data
-ingested_text_data: List[TextIngestion] = []
-ingested_vision_data: List[VisionIngestion] = []
+# Append-only segment logs on disk for ingestion data (see INGESTION_LOG_DIR),
+# opened on startup by open_logs so importing the app touches no files
+text_log: Optional[SegmentLog] = None
+vision_log: Optional[SegmentLog] = None
+# Content-addressed store of uploaded images (see BLOB_STORE_DIR)
+blob_store = BlobStore()
+# Full-text index over the ingestion logs, caught up with them on startup
+search_index = IngestionIndex()
+# Periodic retention run, started by start_retention
+_retention_task: Optional[asyncio.Task] = None
+
+def _measurements_recorded(patient_ids: Set[str]) -> None:
+    # Same follow-up as a measurement posted through the API
+    for patient_id in patient_ids:
+        refresh_alert_state(patient_id)
+        recommendation_refresher.schedule(patient_id)
+
+def open_logs() -> None:
+    """
+    Opens the ingestion logs (recovering from an interrupted append) and
+    indexes the records stored before this start.
+    """
+    global text_log, vision_log
+    if text_log is None:
+        text_log = create_ingestion_log("text")
+    if vision_log is None:
+        vision_log = create_ingestion_log("vision")
+    for kind, log in (("text", text_log), ("vision", vision_log)):
+        search_index.forget_before(kind, log.first_offset)
+    search_index.catch_up({"text": text_log, "vision": vision_log})
+
+def _index(kind: str, log: SegmentLog, record: LogRecord, data: dict) -> None:
+    search_index.add(kind, record.offset, record.timestamp, data)
+    # An append that rolled the log over may have deleted old segments
+    search_index.forget_before(kind, log.first_offset)
+
+def enforce_retention() -> None:
+    """
+    Deletes the segments outside the retention policy and drops their records
+    from the search index. Rollovers do this too, but a log that stops growing
+    would otherwise keep expired segments until its next append fills one.
+    """
+    for kind, log in (("text", text_log), ("vision", vision_log)):
+        log.enforce_retention()
+        search_index.forget_before(kind, log.first_offset)
+
+async def _run_retention() -> None:
+    while True:
+        await asyncio.sleep(INGESTION_RETENTION_INTERVAL_SECONDS)
+        try:
+            enforce_retention()
+        except Exception as e:
+            print(f"Error enforcing the ingestion log retention: {e}")
+
+async def start_retention() -> None:
+    """
+    Starts enforcing the retention every INGESTION_RETENTION_INTERVAL_SECONDS.
+    """
+    global _retention_task
+    if _retention_task is None:
+        _retention_task = asyncio.create_task(_run_retention())
+
+async def stop_retention() -> None:
+    """
+    Stops the periodic retention.
+    """
+    global _retention_task
+    if _retention_task is None:
+        return
+    _retention_task.cancel()
+    await asyncio.gather(_retention_task, return_exceptions=True)
+    _retention_task = None
+
+def close_logs() -> None:
+    """
+    Closes the ingestion logs.
+    """
+    global text_log, vision_log
+    for log in (text_log, vision_log):
+        if log is not None:
+            log.close()
+    text_log = vision_log = None
+
+# Background extraction of vitals typed into text ingestions
+vitals_pipeline = VitalsPipeline(patients_db, create_extraction_store(), _measurements_recorded)
+
+# Page size when the client does not send a limit
+DEFAULT_PAGE_SIZE = 100
+
+def _start_offset(cursor: Optional[str], offset: Optional[int]) -> int:
+    if cursor:
+        try:
+            parts = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if len(parts) != 1 or not isinstance(parts[0], int) or parts[0] < 0:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return parts[0]
+    return offset or 0
+
+def _read_page(
+    log: SegmentLog,
+    cursor: Optional[str],
+    offset: Optional[int],
+    limit: int,
+    from_: Optional[datetime],
+    to: Optional[datetime],
+) -> Response:
+    page = log.read(_start_offset(cursor, offset), limit, start=from_, end=to)
+    headers = {}
+    if page.next_offset is not None:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(page.next_offset)
+    # Records hold the serialized models, so the page is sent without re-encoding
+    content = b"[" + b",".join(record.payload for record in page.records) + b"]"
+    return Response(content=content, media_type="application/json", headers=headers)
 
 @router.post("/text", response_model=TextIngestion, description="Ingest text data")
 async def ingest_text(text_data: TextIngestion):
     """
     Ingests text data into the system.
 
+    Messages with a patient_id in their metadata are also queued for vitals
+    extraction: readings typed in the text ("presión 150/95, pulso 88, peso
+    81.2") are added to the patient's measurements in the background.
+
     Args:
         text_data: Text data to ingest
 
@@ -27,44 +157,269 @@ async def ingest_text(text_data: TextIngestion):
         text_data.id = str(uuid.uuid4())
     if not text_data.timestamp:
            text_data.timestamp = datetime.utcnow()
-    ingested_text_data.append(text_data)
+    record = text_log.append(text_data.model_dump_json().encode())
+    _index("text", text_log, record, text_data.model_dump(mode="json"))
+    vitals_pipeline.submit(text_data)
     return text_data
 
-@router.post("/vision", response_model=VisionIngestion, description="Ingest visual data")
-async def ingest_vision(vision_data: VisionIngestion):
+@router.get("/text/{ingestion_id}/vitals", response_model=VitalsExtraction,
+            description="Get the vitals extracted from a text ingestion and the measurement recorded from them")
+async def get_text_vitals(ingestion_id: str):
+    """
+    Returns the outcome of the vitals extraction of a text ingestion.
+
+    Args:
+        ingestion_id: Text ingestion identifier
+
+    Returns:
+        VitalsExtraction: Extracted values, status and recorded measurement timestamp
+
+    Raises:
+        HTTPException: If the ingestion was not (or not yet) processed
+    """
+    extraction = vitals_pipeline.store.get(ingestion_id)
+    if extraction is None:
+        raise HTTPException(status_code=404, detail="No vitals extraction for this ingestion")
+    return extraction
+
+VISION_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "application/json": {"schema": {"$ref": "#/components/schemas/VisionIngestion"}},
+        "multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {
+                "file": {"type": "string", "format": "binary", "description": "Image"},
+                "caption": {"type": "string"},
+                "additional_text": {"type": "string"},
+                "metadata": {"type": "string", "description": "JSON object of string values"},
+            },
+        }},
+    },
+}
+
+def _upload_fields(fields: Dict[str, str]) -> Dict[str, object]:
+    """
+    Parses and validates the text fields of a vision upload, before its image is committed to the blob store.
+    """
+    data: Dict[str, object] = dict(fields)
+    if "metadata" in data:
+        try:
+            data["metadata"] = json.loads(data["metadata"])
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Field 'metadata' must be a JSON object")
+    try:
+        VisionIngestion.model_validate(data)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    return data
+
+async def _vision_from_upload(request: Request) -> VisionIngestion:
+    """
+    Builds a VisionIngestion from a multipart upload, streaming its "file" field into the blob store.
+    """
+    try:
+        upload = await receive_upload(
+            request.headers["content-type"], request.stream(), blob_store, check_fields=_upload_fields
+        )
+    except BlobTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except MultipartError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    data = _upload_fields(upload.fields)
+    if upload.blob is not None:
+        digest = upload.blob.reference.split(":", 1)[1]
+        data.setdefault("image_url", request.url_for("download_blob", reference=digest).path)
+        data.update(
+            image_blob=upload.blob.reference,
+            image_content_type=upload.blob.content_type,
+            image_size=upload.blob.size,
+        )
+    try:
+        return VisionIngestion.model_validate(data)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+@router.post("/vision", response_model=VisionIngestion, description="Ingest visual data (JSON, or a multipart image upload)",
+             openapi_extra={"requestBody": VISION_REQUEST_BODY})
+async def ingest_vision(request: Request):
     """
     Ingests visual data into the system.
 
+    Accepts a VisionIngestion as JSON, or a multipart/form-data upload with the
+    image in the "file" field and the other VisionIngestion fields as form
+    fields. The image is streamed to the content-addressed blob store while it
+    is received (hashed on the way, stored once per distinct content), and the
+    record references it by digest, with image_url pointing at its download.
+
     Args:
-        vision_data: Visual data to ingest
+        request: Incoming request
 
     Returns:
         VisionIngestion: Ingested visual data
+
+    Raises:
+        HTTPException: If the upload is malformed (400) or too large (413)
     """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type == "multipart/form-data":
+        vision_data = await _vision_from_upload(request)
+    else:
+        try:
+            vision_data = VisionIngestion.model_validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
     # Ensure ID and timestamp are generated if not provided
     if not vision_data.id:
         vision_data.id = str(uuid.uuid4())
     if not vision_data.timestamp:
            vision_data.timestamp = datetime.utcnow()
-    ingested_vision_data.append(vision_data)
+    record = vision_log.append(vision_data.model_dump_json().encode())
+    _index("vision", vision_log, record, vision_data.model_dump(mode="json"))
     return vision_data
 
-@router.get("/text", response_model=List[TextIngestion], description="Get all ingested text data")
-async def get_text_ingestions():
+@router.get("/blobs/{reference}", response_class=FileResponse, description="Download an uploaded image")
+async def download_blob(reference: str):
     """
-    Returns all ingested text data.
+    Serves an uploaded image by its digest (or sha256:<digest> reference).
+
+    The file is sent by the server straight from disk (FileResponse), with
+    support for Range requests; blobs never change, so they can be cached
+    indefinitely.
+
+    Args:
+        reference: Blob digest
 
     Returns:
-        List[TextIngestion]: List of ingested text data
+        FileResponse: Image file
+
+    Raises:
+        HTTPException: If no blob has that digest
     """
-    return ingested_text_data
+    path = blob_store.locate(reference)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    return FileResponse(
+        path,
+        media_type=blob_store.content_type(path),
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
 
-@router.get("/vision", response_model=List[VisionIngestion], description="Get all ingested visual data")
-async def get_vision_ingestions():
+@router.get("/search", response_model=List[IngestionSearchHit],
+            description="Full-text search over ingested text and image captions, newest first")
+async def search_ingestions(
+    response: Response,
+    q: str = Query("", description='Words (all required), prefixes (hinchaz*) and "quoted phrases"; case and accents are ignored'),
+    kind: Optional[str] = Query(None, pattern="^(text|vision)$", description="Only ingestions of this kind"),
+    metadata: Optional[List[str]] = Query(None, description="Metadata filters as key=value (e.g. patient_id=p1)"),
+    from_: Optional[datetime] = Query(None, alias="from", description="Only records ingested at or after this time"),
+    to: Optional[datetime] = Query(None, description="Only records ingested before this time"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of results"),
+    cursor: Optional[str] = Query(None, description=f"Cursor from the {NEXT_CURSOR_HEADER} header of the previous page")
+):
     """
-    Returns all ingested visual data.
+    Searches the ingested text (content) and visual data (caption and
+    additional text) with the full-text index.
+
+    Results are the newest matching records first. When more follow, the
+    cursor of the next page is returned in the X-Next-Cursor response header.
+
+    Args:
+        response: Response (for the pagination header)
+        q: Search query
+        kind: Kind filter
+        metadata: Metadata filters
+        from_: Inclusive lower ingestion time bound
+        to: Exclusive upper ingestion time bound
+        limit: Maximum number of results
+        cursor: Cursor of the page to return
 
     Returns:
-        List[VisionIngestion]: List of ingested visual data
+        List[IngestionSearchHit]: Matching records
+
+    Raises:
+        HTTPException: If the query, a filter or the cursor is invalid
+    """
+    filters: Dict[str, str] = {}
+    for item in metadata or []:
+        key, sep, value = item.partition("=")
+        if not sep or not key:
+            raise HTTPException(status_code=400, detail=f"Invalid metadata filter '{item}' (expected key=value)")
+        filters[key] = value
+    before = _start_offset(cursor, None) if cursor else None
+    try:
+        page = search_index.search(q, kind, filters, from_, to, limit, before)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    results = []
+    for hit in page.hits:
+        log, model = (text_log, TextIngestion) if hit.kind == "text" else (vision_log, VisionIngestion)
+        records = log.read(hit.offset, 1).records
+        # The index forgets records deleted by the log retention; this only
+        # guards against a retention run between the search and the read
+        if not records or records[0].offset != hit.offset:
+            continue
+        results.append(IngestionSearchHit(kind=hit.kind, offset=hit.offset, **{hit.kind: model.model_validate_json(records[0].payload)}))
+    if page.next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(page.next_cursor)
+    return results
+
+@router.get("/text", response_model=List[TextIngestion],
+            description="Get ingested text data in ingestion order, paginated and optionally filtered by time")
+async def get_text_ingestions(
+    cursor: Optional[str] = Query(None, description=f"Cursor from the {NEXT_CURSOR_HEADER} header of the previous page"),
+    offset: Optional[int] = Query(None, ge=0, description="Log offset of the first record (ignored with a cursor)"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of records to return"),
+    from_: Optional[datetime] = Query(None, alias="from", description="Only records ingested at or after this time"),
+    to: Optional[datetime] = Query(None, description="Only records ingested before this time")
+):
+    """
+    Returns ingested text data, one page at a time.
+
+    Records are read from the text ingestion log starting at the cursor (or
+    offset); the time range applies to when the records were ingested. When
+    more records follow, the cursor of the next page is returned in the
+    X-Next-Cursor response header.
+
+    Args:
+        cursor: Cursor of the page to return
+        offset: Log offset to start at
+        limit: Maximum number of records to return
+        from_: Inclusive lower ingestion time bound
+        to: Exclusive upper ingestion time bound
+
+    Returns:
+        List[TextIngestion]: Page of ingested text data
+
+    Raises:
+        HTTPException: If the cursor is invalid
+    """
+    return _read_page(text_log, cursor, offset, limit, from_, to)
+
+@router.get("/vision", response_model=List[VisionIngestion],
+            description="Get ingested visual data in ingestion order, paginated and optionally filtered by time")
+async def get_vision_ingestions(
+    cursor: Optional[str] = Query(None, description=f"Cursor from the {NEXT_CURSOR_HEADER} header of the previous page"),
+    offset: Optional[int] = Query(None, ge=0, description="Log offset of the first record (ignored with a cursor)"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of records to return"),
+    from_: Optional[datetime] = Query(None, alias="from", description="Only records ingested at or after this time"),
+    to: Optional[datetime] = Query(None, description="Only records ingested before this time")
+):
+    """
+    Returns ingested visual data, one page at a time (see get_text_ingestions).
+
+    Args:
+        cursor: Cursor of the page to return
+        offset: Log offset to start at
+        limit: Maximum number of records to return
+        from_: Inclusive lower ingestion time bound
+        to: Exclusive upper ingestion time bound
+
+    Returns:
+        List[VisionIngestion]: Page of ingested visual data
+
+    Raises:
+        HTTPException: If the cursor is invalid
     """
-    return ingested_vision_data
+    return _read_page(vision_log, cursor, offset, limit, from_, to)
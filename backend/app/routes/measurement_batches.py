@@ -0,0 +1,86 @@
+import json
+from fastapi import APIRouter, HTTPException, Request
+from typing import List, Any
+
+from app.models import MeasurementBatchResult, MeasurementBatchError
+from app.routes.patients import patients_db, recommendation_refresher
+from app.routes.alerts import refresh_alert_state
+from app.services.batch_ingestion import MAX_BATCH_ROWS, parse_csv, parse_ndjson, ingest_rows
+
+router = APIRouter(prefix="/measurements", tags=["Measurements"])
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+CSV_TYPES = ("text/csv", "application/csv")
+
+def _parse_body(body: bytes, content_type: str, filename: str = "") -> tuple:
+    """
+    Parses an upload according to its content type (or file extension for multipart uploads).
+
+    Returns:
+        tuple: Raw rows and parse errors
+
+    Raises:
+        HTTPException: If the format is unsupported or the body cannot be parsed
+    """
+    errors: List[MeasurementBatchError] = []
+    if content_type in CSV_TYPES or filename.endswith(".csv"):
+        try:
+            rows: List[Any] = parse_csv(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid CSV: {e}")
+    elif content_type in NDJSON_TYPES or filename.endswith((".ndjson", ".jsonl")):
+        rows, errors = parse_ndjson(body)
+    elif content_type == "application/json" or filename.endswith(".json"):
+        try:
+            rows = json.loads(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of measurements")
+    else:
+        raise HTTPException(status_code=415, detail="Use application/json, application/x-ndjson, text/csv or a multipart file upload")
+    return rows, errors
+
+@router.post("/batch", response_model=MeasurementBatchResult,
+             description="Add measurements for many patients at once (JSON array, NDJSON, CSV or multipart file)")
+async def add_measurement_batch(request: Request):
+    """
+    Ingests a batch of measurements for any number of patients.
+
+    Each row is a measurement plus its "patient_id". The body may be a JSON array,
+    an NDJSON stream, a CSV file with a header row (sintomas separated by ";"),
+    or a multipart/form-data upload with the file in the "file" field. Rows are
+    validated together, grouped by patient and appended in one repository call,
+    after which each updated patient's alert state is refreshed once. Invalid
+    rows and rows for unknown patients are reported individually without
+    failing the rest of the batch.
+
+    Args:
+        request: Incoming request carrying the batch
+
+    Returns:
+        MeasurementBatchResult: Accepted/rejected counts and per-row errors
+
+    Raises:
+        HTTPException: If the body format is unsupported, unreadable or too large
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type == "multipart/form-data":
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Missing file upload in field 'file'")
+        body = await upload.read()
+        rows, errors = _parse_body(body, (upload.content_type or "").lower(), (upload.filename or "").lower())
+    else:
+        rows, errors = _parse_body(await request.body(), content_type)
+
+    if len(rows) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batches are limited to {MAX_BATCH_ROWS} rows")
+
+    result, updated_patients = ingest_rows(patients_db, rows, errors)
+    # Alerts are evaluated once per patient for the whole batch
+    for patient_id in updated_patients:
+        refresh_alert_state(patient_id)
+        recommendation_refresher.schedule(patient_id)
+    return result
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Response
 from typing import List, Dict, Optional
 from datetime import datetime
 
 from app.models import Patient, Measurement, Alert
-from app.routes.patients import patients_db
+from app.routes.patients import patients_db, recommendation_refresher
+from app.routes.alerts import refresh_alert_state
+from app.services.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/patients/{patient_id}/measurements", tags=["Measurements"])
 
@@ -22,32 +24,62 @@ async def add_measurement(patient_id: str, measurement: Measurement):
     Raises:
         HTTPException: If patient is not found
     """
-    patient = patients_db.get(patient_id)
-    if not patient:
+    if not patients_db.add_measurement(patient_id, measurement):
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    patient.measurements.append(measurement)
+    # Alerts are evaluated once here so that reads can reuse them
+    refresh_alert_state(patient_id)
+    # Recommendations are regenerated in the background, off the write path
+    recommendation_refresher.schedule(patient_id)
     return measurement
 
-@router.get("", response_model=List[Measurement], description="List a patient's recorded measurements")
-async def get_measurements(patient_id: str):
+@router.get("", response_model=List[Measurement],
+            description="List a patient's recorded measurements in timestamp order, optionally filtered and paginated")
+async def get_measurements(
+    patient_id: str,
+    response: Response,
+    from_: Optional[datetime] = Query(None, alias="from", description="Only measurements taken at or after this time"),
+    to: Optional[datetime] = Query(None, description="Only measurements taken before this time"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of measurements to return"),
+    cursor: Optional[str] = Query(None, description=f"Cursor from the {NEXT_CURSOR_HEADER} header of the previous page")
+):
     """
     Returns the measurement history for a specific patient.
 
+    The time range is resolved by binary search over the time-ordered history.
+    When more measurements follow, the cursor of the next page is returned in
+    the X-Next-Cursor response header.
+
     Args:
         patient_id: Patient identifier
+        response: Outgoing response (used to set the next-page cursor header)
+        from_: Inclusive lower timestamp bound
+        to: Exclusive upper timestamp bound
+        limit: Maximum number of measurements to return (all when omitted)
+        cursor: Cursor of the page to return
 
     Returns:
         List[Measurement]: List of Measurement objects
 
     Raises:
-        HTTPException: If patient is not found
+        HTTPException: If patient is not found or the cursor is invalid
     """
-    patient = patients_db.get(patient_id)
-    if not patient:
+    after = None
+    if cursor:
+        try:
+            after = tuple(decode_cursor(cursor))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if len(after) != 2 or not all(isinstance(part, int) for part in after):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    page = patients_db.get_measurements(patient_id, start=from_, end=to, after=after, limit=limit)
+    if page is None:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    return patient.measurements
+    if page.next_key is not None:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*page.next_key)
+    return page.items
 
 @router.get("/latest", response_model=Optional[Measurement], description="Get the most recent measurement for a patient")
 async def get_latest_measurement(patient_id: str):
@@ -63,7 +95,7 @@ async def get_latest_measurement(patient_id: str):
     Raises:
         HTTPException: If patient is not found
     """
-    patient = patients_db.get(patient_id)
+    patient = patients_db.get(patient_id, history=1)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
@@ -0,0 +1,29 @@
+import time
+from fastapi import APIRouter
+
+from app.models import NotificationStats
+from app.routes.alerts import ai_service, notification_outbox, notification_workers
+from app.services.notification_policy import notification_policy
+
+router = APIRouter(prefix="/notifications", tags=["Notifications"])
+
+@router.get("/stats", response_model=NotificationStats,
+            description="Get the state of the notification outbox and its workers")
+async def get_notification_stats():
+    """
+    Returns the number of outbox jobs per status, the circuit breaker state, the
+    number of running notification workers, the notification policy's sent and
+    suppressed counters, the alert message cache metrics and the number of
+    AI and WhatsApp calls coalesced by the single-flight layer.
+
+    Returns:
+        NotificationStats: Outbox and worker state
+    """
+    return NotificationStats(
+        jobs=notification_outbox.counts(),
+        circuit=notification_workers.breaker.state(time.time()),
+        workers=notification_workers.running,
+        decisions=notification_policy.counters(),
+        message_cache=ai_service.message_cache.stats(),
+        coalesced=ai_service.in_flight.stats()
+    )
@@ -1,18 +1,32 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Response
+from fastapi.responses import JSONResponse
 from typing import List, Dict, Optional
 from datetime import datetime
 
 from app.models import Patient, Measurement, Alert, GuidelineParameters
+from app.services.patient_repository import create_patient_repository
+from app.services.ai_service import ai_service
+from app.services.clinical_parameters import clear_patient
+from app.services.notification_policy import notification_policy
+from app.services.recommendation_refresher import RecommendationRefresher
+from app.services.recommendation_store import create_recommendation_store
+from app.services.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/patients", tags=["Patients"])
 
-# In-memory database simulation
-patients_db = {}
+# Patient storage shared by all routers (in-memory or SQLite, see PATIENTS_DB_BACKEND)
+patients_db = create_patient_repository()
+
+# Adherence recommendations generated ahead of reads, regenerated in the background
+# after writes and nightly (store in-memory or SQLite, see RECOMMENDATIONS_BACKEND)
+recommendation_refresher = RecommendationRefresher(
+    patients_db, create_recommendation_store(), ai_service.generate_adherence_recommendations
+)
 
 @router.post("", response_model=Patient, description="Register a new patient in the system")
 async def create_patient(patient: Patient):
     """
-    Creates a new patient and stores it in the in-memory database.
+    Creates a new patient and stores it in the patient repository.
 
     Args:
         patient: Patient data
@@ -20,18 +34,61 @@ async def create_patient(patient: Patient):
     Returns:
         Patient: Registered Patient object
     """
-    patients_db[patient.id] = patient
-    return patient
-
-@router.get("", response_model=List[Patient], description="Get all registered patients")
-async def get_all_patients():
+    return patients_db.save(patient)
+
+@router.get("", response_model=List[Patient],
+            description="Get registered patients ordered by id, optionally paginated and projected")
+async def get_all_patients(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of patients to return"),
+    cursor: Optional[str] = Query(None, description=f"Cursor from the {NEXT_CURSOR_HEADER} header of the previous page"),
+    fields: Optional[List[str]] = Query(None, description="Patient fields to include (default: all)")
+):
     """
-    Retrieves all patients from the database.
+    Retrieves patients from the database, one page at a time.
+
+    When more patients follow, the cursor of the next page is returned in the
+    X-Next-Cursor response header. Leaving "measurements" out of fields skips
+    loading measurement histories altogether.
+
+    Args:
+        response: Outgoing response (used to set the next-page cursor header)
+        limit: Maximum number of patients to return (all when omitted)
+        cursor: Cursor of the page to return
+        fields: Patient fields to include
 
     Returns:
-        List[Patient]: List of all registered patients
+        List[Patient]: Page of registered patients
+
+    Raises:
+        HTTPException: If the cursor or a requested field is invalid
     """
-    return list(patients_db.values())
+    after = None
+    if cursor:
+        try:
+            (after,) = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if not isinstance(after, str):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    if fields:
+        unknown = set(fields) - set(Patient.model_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    history = None if not fields or "measurements" in fields else 0
+    # Fetch one extra patient to know whether another page follows
+    patients = patients_db.list_patients(after=after, limit=None if limit is None else limit + 1, history=history)
+    headers = {}
+    if limit is not None and len(patients) > limit:
+        patients = patients[:limit]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(patients[-1].id)
+
+    if fields:
+        content = [p.model_dump(mode="json", include=set(fields)) for p in patients]
+        return JSONResponse(content=content, headers=headers)
+    response.headers.update(headers)
+    return patients
 
 @router.get("/{patient_id}", response_model=Patient, description="Get information for a specific patient")
 async def get_patient(patient_id: str):
@@ -47,7 +104,7 @@ async def get_patient(patient_id: str):
     Raises:
         HTTPException: If patient is not found
     """
-    patient = patients_db.get(patient_id)
+    patient = patients_db.get(patient_id, history=None)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     return patient
@@ -67,21 +124,14 @@ async def update_patient(patient_id: str, patient_update: Patient):
     Raises:
         HTTPException: If patient is not found
     """
-    if patient_id not in patients_db:
+    # Measurements and intervention history are preserved by the repository
+    patient = patients_db.update_profile(patient_id, patient_update)
+    if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    # Preserve measurements and intervention history
-    existing_measurements = patients_db[patient_id].measurements
-    existing_interventions = patients_db[patient_id].intervention_history
-    
-    # Update patient with new data
-    patients_db[patient_id] = patient_update
-    
-    # Restore measurements and interventions
-    patients_db[patient_id].measurements = existing_measurements
-    patients_db[patient_id].intervention_history = existing_interventions
-    
-    return patients_db[patient_id]
+    # The recommendations address the patient by name and age
+    recommendation_refresher.schedule(patient_id)
+    return patient
 
 @router.delete("/{patient_id}", description="Delete a patient from the system")
 async def delete_patient(patient_id: str):
@@ -97,8 +147,10 @@ async def delete_patient(patient_id: str):
     Raises:
         HTTPException: If patient is not found
     """
-    if patient_id not in patients_db:
+    if not patients_db.delete(patient_id):
         raise HTTPException(status_code=404, detail="Patient not found")
+    clear_patient(patient_id)
+    notification_policy.forget(patient_id)
+    recommendation_refresher.forget(patient_id)
     
-    del patients_db[patient_id]
     return {"message": "Patient deleted successfully"}
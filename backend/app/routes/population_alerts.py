@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Query
+from typing import List, Optional
+
+from app.models import PatientAlerts
+from app.routes.patients import patients_db
+from app.services.alert_rules import alert_plans
+from app.services.alert_sweep import sweep_alerts
+
+router = APIRouter(prefix="/alerts", tags=["Alerts"])
+
+@router.get("", response_model=List[PatientAlerts],
+            description="Evaluate the alerts of every patient in one pass")
+async def get_population_alerts(
+    nivel: Optional[str] = Query(None, pattern="^(red|yellow)$", description="Only return patients with an alert of this level"),
+    only_alerting: bool = Query(True, description="Leave out patients without alerts")
+):
+    """
+    Returns the alert status of all patients, ordered by patient id.
+
+    The latest two readings of every patient are read from the repository in one
+    pass and the installed alert rules are evaluated for all of them at once
+    as array operations, giving the same alerts as GET /patients/{id}/alerts
+    without one request (and one evaluation) per patient. No notifications are
+    sent.
+
+    Args:
+        nivel: Alert level filter
+        only_alerting: Whether patients without alerts are omitted
+
+    Returns:
+        List[PatientAlerts]: Alerts per patient
+    """
+    vitals = patients_db.recent_vitals()
+    results = sweep_alerts(vitals, alert_plans(vitals.patient_ids))
+    return [
+        PatientAlerts(patient_id=patient_id, alerts=alerts)
+        for patient_id, alerts in zip(vitals.patient_ids, results)
+        if (alerts or not only_alerting) and (nivel is None or any(a.nivel == nivel for a in alerts))
+    ]
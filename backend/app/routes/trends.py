@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException
+from typing import List
+
+from app.models import TrendWindow
+from app.routes.patients import patients_db
+
+router = APIRouter(prefix="/patients/{patient_id}/trends", tags=["Trends"])
+
+@router.get("", response_model=List[TrendWindow],
+            description="Get min/max/mean vitals over sliding windows ending at the latest reading")
+async def get_trends(patient_id: str):
+    """
+    Returns the patient's weight, blood pressure and heart rate aggregates over
+    each configured window (TREND_WINDOWS_DAYS), shortest first.
+
+    The aggregates are maintained as readings are written, so this endpoint
+    never rescans the measurement history.
+
+    Args:
+        patient_id: Patient identifier
+
+    Returns:
+        List[TrendWindow]: Aggregates per window (empty if the patient has no readings)
+
+    Raises:
+        HTTPException: If patient is not found
+    """
+    trends = patients_db.get_trends(patient_id)
+    if trends is None:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    return trends
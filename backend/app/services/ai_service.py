@@ -1,17 +1,43 @@
+import hashlib
 import os
-from typing import List, Dict, Optional
-import requests
-from litellm import completion
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from dotenv import load_dotenv
 
 from app.models import Patient, Alert
+from app.services.guideline_corpus import get_guideline_corpus
+from app.services.llm_client import (
+    PRIORITY_ALERT, PRIORITY_GUIDELINES, PRIORITY_RECOMMENDATIONS, create_llm_client
+)
+from app.services.message_cache import (
+    NAME_PLACEHOLDER, alert_message_context, context_key, create_message_cache, render
+)
+from app.services.semantic_cache import SemanticCache, normalize_query
+from app.services.single_flight import SingleFlight
+from app.services.whatsapp_service import whatsapp_client
 
 # Load environment variables
 load_dotenv()
 
+# Guideline version reported for a source the corpus does not know
+UNRECOGNIZED_SOURCE = "unrecognized"
+
+# Generic recommendations returned when the LLM fails or its answer cannot be parsed
+ADHERENCE_FALLBACK: Dict[str, str] = {
+    "medicamentos": "Tome sus medicamentos según lo prescrito por su médico.",
+    "dieta": "Siga una dieta baja en sodio y grasas saturadas.",
+    "actividad_fisica": "Realice actividad física moderada según las recomendaciones de su médico.",
+    "monitoreo": "Registre sus síntomas y mediciones regularmente en la aplicación Nexo+."
+}
+
 class AIService:
     """
     Service for AI-powered features using LiteLLM.
+
+    Every completion goes through the shared non-blocking LLM client (see
+    llm_client), which bounds concurrency and serves alert messages first.
+    Concurrent identical requests (e.g. the same patient opened on several
+    devices) are coalesced by a single-flight layer, so they share one
+    generation or one WhatsApp send.
     """
     
     def __init__(self):
@@ -20,12 +46,20 @@ class AIService:
         """
         self.api_key = os.environ.get("OPENAI_API_KEY")
         self.model = os.environ.get("LLM_MODEL", "gpt-3.5-turbo")
-        self.whatsapp_phone_id = os.environ.get("WHATSAPP_PHONE_ID")
-        self.whatsapp_token = os.environ.get("WHATSAPP_TOKEN")
+        self.llm = create_llm_client()
+        self.message_cache = create_message_cache()
+        self.guideline_cache = SemanticCache()
+        self.in_flight = SingleFlight()
     
     async def generate_alert_message(self, patient: Patient, alerts: List[Alert]) -> str:
         """
         Generate a personalized alert message for the patient based on their data and alerts.
+
+        The LLM writes a template for the patient's normalized clinical state
+        (normalized alerts, bucketed age and vitals, symptoms) that addresses the
+        patient through a name placeholder; templates are cached by that state
+        (see message_cache), so patients in the same state reuse one generation
+        and only the first name is substituted.
         
         Args:
             patient: Patient object
@@ -34,47 +68,56 @@ class AIService:
         Returns:
             str: Personalized alert message
         """
-        # Extract relevant patient information
-        patient_info = {
-            "name": patient.nombre,
-            "age": patient.edad,
-            "latest_measurement": patient.measurements[-1] if patient.measurements else None
+        context = alert_message_context(patient, alerts)
+        key = context_key(context)
+        template = self.message_cache.get(key)
+        if template is None:
+            # Patients in the same state at the same time share one generation
+            template = await self.in_flight.do(("alert_message", key), lambda: self._generate_alert_template(context, key))
+        if template is None:
+            # Fallback message if AI generation fails (not cached)
+            return f"ALERTA: {', '.join([a.mensaje for a in alerts])}. Por favor contacte a su médico lo antes posible."
+        return render(template, patient)
+
+    async def _generate_alert_template(self, context: Dict, key: str) -> Optional[str]:
+        """
+        Asks the LLM for the alert message template of a normalized clinical
+        state and caches it.
+
+        Args:
+            context: Normalized clinical state (see message_cache.alert_message_context)
+            key: Cache key of the state
+
+        Returns:
+            Optional[str]: Template, or None if the generation failed
+        """
+        # Format the bucketed measurement details for the prompt
+        labels = {
+            "presion_sistolica": "Systolic Blood Pressure: {} mmHg",
+            "presion_diastolica": "Diastolic Blood Pressure: {} mmHg",
+            "frecuencia_cardiaca": "Heart Rate: {} bpm",
+            "peso": "Weight: {} kg",
+            "saturacion_oxigeno": "Oxygen Saturation: {}%",
         }
-        
-        # Extract alert information
-        alert_info = [{"message": alert.mensaje, "level": alert.nivel} for alert in alerts]
-        
-        # Format latest measurement details for the prompt
+        details = [labels[field].format(value) for field, value in context["vitals"].items()]
+        if context["symptoms"]:
+            details.append(f"Reported Symptoms: {', '.join(context['symptoms'])}")
         measurement_details = "No recent measurement available."
-        if patient_info["latest_measurement"]:
-            lm = patient_info["latest_measurement"]
-            details = []
-            if lm.presion_sistolica is not None and lm.presion_diastolica is not None:
-                details.append(f"Blood Pressure: {lm.presion_sistolica}/{lm.presion_diastolica} mmHg")
-            if lm.frecuencia_cardiaca is not None:
-                details.append(f"Heart Rate: {lm.frecuencia_cardiaca} bpm")
-            if lm.peso is not None:
-                details.append(f"Weight: {lm.peso} kg")
-            if lm.saturacion_oxigeno is not None:
-                details.append(f"Oxygen Saturation: {lm.saturacion_oxigeno}%")
-            if lm.sintomas:
-                details.append(f"Reported Symptoms: {', '.join(lm.sintomas)}")
-            measurement_details = "\n    - ".join(details) if details else "Measurement data available but specific values not recorded."
-            if details: # Add prefix only if there are details
-                measurement_details = "Latest measurement details:\n    - " + measurement_details
+        if details:
+            measurement_details = "Latest measurement details (ranges):\n    - " + "\n    - ".join(details)
 
         # Create prompt for the LLM
         prompt = f"""
         You are a medical assistant for Nexo+, a platform that helps cardiac patients after discharge.
         
         Patient information:
-        - Name: {patient_info['name']}
-        - Age: {patient_info['age']}
+        - Name: write {NAME_PLACEHOLDER} wherever the patient's first name goes
+        - Age: {context['age']}
         
         {measurement_details}
 
         The following alerts have been detected based on recent data:
-        {', '.join([f"{a['message']} (Level: {a['level']})" for a in alert_info])}
+        {', '.join([f"{mensaje} (Level: {nivel})" for nivel, mensaje in context['alerts']])}
         
         Generate a personalized, empathetic WhatsApp message for this patient that:
         1. Clearly communicates the medical concern without causing panic
@@ -82,27 +125,26 @@ class AIService:
         3. Encourages the patient to contact their healthcare provider if needed
         4. Is written in a warm, supportive tone
         5. Is concise (maximum 3-4 sentences)
+        6. Does not quote exact readings, since only ranges are known
         
         The message should be in Spanish, as this is for patients in Chile.
         """
         
         try:
-            response = completion(
-                model=self.model,
-                messages=[{"role": "system", "content": prompt}],
-                max_tokens=300
-            )
-            
-            message = response.choices[0].message.content.strip()
-            return message
+            template = await self.llm.complete(prompt, max_tokens=300, priority=PRIORITY_ALERT)
         except Exception as e:
             print(f"Error generating alert message: {e}")
-            # Fallback message if AI generation fails
-            return f"ALERTA: {', '.join([a.mensaje for a in alerts])}. Por favor contacte a su médico lo antes posible."
+            return None
+        self.message_cache.put(key, template)
+        return template
     
     async def send_whatsapp_message(self, phone_number: str, message: str) -> bool:
         """
         Send a WhatsApp message using the WhatsApp Cloud API.
+
+        Delegates to the shared pooled client (see whatsapp_service), so the event
+        loop is never blocked by the request, which has a timeout and is retried
+        on transient failures.
         
         Args:
             phone_number: Recipient's phone number
@@ -111,62 +153,20 @@ class AIService:
         Returns:
             bool: True if message was sent successfully, False otherwise
         """
-        if not self.whatsapp_phone_id or not self.whatsapp_token:
-            print("Missing WhatsApp API configuration")
-            return False
-        
-        url = f"https://graph.facebook.com/v14.0/{self.whatsapp_phone_id}/messages"
-        headers = {
-            "Authorization": f"Bearer {self.whatsapp_token}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "messaging_product": "whatsapp",
-            "to": phone_number,
-            "type": "text",
-            "text": {
-                "body": message
-            }
-        }
-        
-        print(f"\n--- WhatsApp API Request ---      \n"            
-              f"URL: {url}\n"              
-              f"Headers: {headers}\n"          
-              f"Data: {data}\n"              
-              f"---------------------------\n")  
-
-        try:
-            response = requests.post(url, headers=headers, json=data)
-            if response.status_code in [200, 201]:
-                print(f"WhatsApp message sent to {phone_number}")
-                return True
-            else:
-                print(f"Error sending WhatsApp message: {response.status_code}, {response.text}")
-                return False
-        except Exception as e:
-            print(f"Exception during WhatsApp API call: {e}")
-            return False
+        # Concurrent sends of the same message to the same number go out once
+        return await self.in_flight.do(
+            ("whatsapp", phone_number, message), lambda: whatsapp_client.send_text(phone_number, message)
+        )
     
-    async def interpret_clinical_guidelines(self, source: str, query: str) -> str:
+    def _guidelines_prompt(self, source: str, guidelines: str, query: str) -> str:
         """
-        Interpret clinical guidelines based on a user query.
-        
-        Args:
-            source: Source of guidelines ('AHA' or 'GES')
-            query: User's question about the guidelines
-        
-        Returns:
-            str: AI-generated interpretation of the guidelines
+        Builds the prompt asking the LLM to answer a query from a guidelines text.
         """
-        # Get the appropriate guidelines based on source
-        guidelines = self._get_guidelines_content(source)
-        
-        # Create prompt for the LLM
-        prompt = f"""
+        return f"""
         You are a medical AI assistant specializing in cardiac care guidelines.
         
-        The following are the {source} guidelines for post-myocardial infarction care:
+        The following are the excerpts of the {source} guidelines for post-myocardial infarction care
+        most relevant to the question:
         
         {guidelines}
         
@@ -182,19 +182,95 @@ class AIService:
         3. Concise but comprehensive
         4. Include specific recommendations from the guidelines when applicable
         """
+
+    def _cached_interpretation(self, source: str, version: str, query: str) -> Optional[str]:
+        # Unknown sources are not cached, so arbitrary source names allocate nothing
+        if version == UNRECOGNIZED_SOURCE:
+            return None
+        return self.guideline_cache.lookup(source, version, query)
+
+    def _cache_interpretation(self, source: str, version: str, query: str, interpretation: str) -> None:
+        if version != UNRECOGNIZED_SOURCE:
+            self.guideline_cache.store(source, version, query, interpretation)
+
+    def _guidelines_fallback(self, source: str) -> str:
+        return f"Lo siento, no pude interpretar las guías clínicas de {source} en este momento. Por favor, consulte directamente las guías oficiales."
+
+    async def interpret_clinical_guidelines(self, source: str, query: str) -> str:
+        """
+        Interpret clinical guidelines based on a user query.
+
+        Answers are cached per source in a semantic cache, so a similarly worded
+        query is answered without calling the LLM until the guideline text changes.
+        
+        Args:
+            source: Source of guidelines ('AHA' or 'GES')
+            query: User's question about the guidelines
+        
+        Returns:
+            str: AI-generated interpretation of the guidelines
+        """
+        # Only the excerpts relevant to the query go into the prompt
+        guidelines, version = self._get_guidelines_content(source, query)
+        cached = self._cached_interpretation(source, version, query)
+        if cached is not None:
+            return cached
+
+        # Concurrent askers of the same (folded) question share one generation
+        key = ("guidelines", source.upper(), version, normalize_query(query))
+        return await self.in_flight.do(key, lambda: self._interpret(source, version, guidelines, query))
+
+    async def _interpret(self, source: str, version: str, guidelines: str, query: str) -> str:
+        prompt = self._guidelines_prompt(source, guidelines, query)
         
         try:
-            response = completion(
-                model=self.model,
-                messages=[{"role": "system", "content": prompt}],
-                max_tokens=500
-            )
-            
-            interpretation = response.choices[0].message.content.strip()
-            return interpretation
+            interpretation = await self.llm.complete(prompt, max_tokens=500, priority=PRIORITY_GUIDELINES)
         except Exception as e:
             print(f"Error interpreting clinical guidelines: {e}")
-            return f"Lo siento, no pude interpretar las guías clínicas de {source} en este momento. Por favor, consulte directamente las guías oficiales."
+            return self._guidelines_fallback(source)
+        self._cache_interpretation(source, version, query, interpretation)
+        return interpretation
+
+    async def stream_clinical_guidelines(self, source: str, query: str) -> AsyncIterator[str]:
+        """
+        Interpret clinical guidelines based on a user query, yielding the answer
+        as the LLM generates it.
+
+        A semantic cache hit is yielded at once; a completed generation is
+        cached. Closing the generator early stops the generation upstream. If
+        the LLM fails before producing anything, the fallback answer is yielded
+        instead; a failure midway ends the stream.
+
+        Args:
+            source: Source of guidelines ('AHA' or 'GES')
+            query: User's question about the guidelines
+
+        Yields:
+            str: Fragments of the AI-generated interpretation
+        """
+        # Only the excerpts relevant to the query go into the prompt
+        guidelines, version = self._get_guidelines_content(source, query)
+        cached = self._cached_interpretation(source, version, query)
+        if cached is not None:
+            yield cached
+            return
+
+        prompt = self._guidelines_prompt(source, guidelines, query)
+        tokens = self.llm.stream(prompt, max_tokens=500, priority=PRIORITY_GUIDELINES)
+        generated: List[str] = []
+        try:
+            async for token in tokens:
+                generated.append(token)
+                yield token
+        except Exception as e:
+            print(f"Error streaming clinical guidelines interpretation: {e}")
+            if not generated:
+                yield self._guidelines_fallback(source)
+            return
+        finally:
+            await tokens.aclose()
+        if generated:
+            self._cache_interpretation(source, version, query, "".join(generated).strip())
     
     async def generate_adherence_recommendations(self, patient: Patient) -> Dict[str, str]:
         """
@@ -255,14 +331,13 @@ class AIService:
         The recommendations should be in Spanish, as this is for patients in Chile.
         """
         
+        # Concurrent requests for the same patient state share one generation
+        key = ("recommendations", hashlib.blake2b(prompt.encode(), digest_size=16).hexdigest())
+        return dict(await self.in_flight.do(key, lambda: self._recommend(prompt)))
+
+    async def _recommend(self, prompt: str) -> Dict[str, str]:
         try:
-            response = completion(
-                model=self.model,
-                messages=[{"role": "system", "content": prompt}],
-                max_tokens=800
-            )
-            
-            recommendations_text = response.choices[0].message.content.strip()
+            recommendations_text = await self.llm.complete(prompt, max_tokens=800, priority=PRIORITY_RECOMMENDATIONS)
             
             # Parse the response into a dictionary
             # Note: In a production environment, you would want more robust parsing
@@ -279,69 +354,32 @@ class AIService:
             
             # Fallback if parsing fails
             if not recommendations:
-                recommendations = {
-                    "medicamentos": "Tome sus medicamentos según lo prescrito por su médico.",
-                    "dieta": "Siga una dieta baja en sodio y grasas saturadas.",
-                    "actividad_fisica": "Realice actividad física moderada según las recomendaciones de su médico.",
-                    "monitoreo": "Registre sus síntomas y mediciones regularmente en la aplicación Nexo+."
-                }
+                recommendations = dict(ADHERENCE_FALLBACK)
             
             return recommendations
         except Exception as e:
             print(f"Error generating adherence recommendations: {e}")
             # Fallback recommendations if AI generation fails
-            return {
-                "medicamentos": "Tome sus medicamentos según lo prescrito por su médico.",
-                "dieta": "Siga una dieta baja en sodio y grasas saturadas.",
-                "actividad_fisica": "Realice actividad física moderada según las recomendaciones de su médico.",
-                "monitoreo": "Registre sus síntomas y mediciones regularmente en la aplicación Nexo+."
-            }
+            return dict(ADHERENCE_FALLBACK)
     
-    def _get_guidelines_content(self, source: str) -> str:
+    def _get_guidelines_content(self, source: str, query: str) -> Tuple[str, str]:
         """
-        Get the content of clinical guidelines based on source.
+        Get the guideline excerpts relevant to a query from the guideline corpus.
         
         Args:
             source: Source of guidelines ('AHA' or 'GES')
+            query: User's question about the guidelines
         
         Returns:
-            str: Guidelines content
+            Tuple[str, str]: Top-k chunks of the source's documents (BM25) and the
+                version of those documents, used to invalidate cached answers
         """
-        if source.lower() == "aha":
-            return """
-            AHA: Post-AMI Recommendations:
-            • BP <130/80 mmHg (minimum <140/90).
-            • Beta-blockers: HR 50-70 bpm, prolonged use based on condition.
-            • LDL <70 mg/dL; consider additional therapies if 55–69 mg/dL.
-            • HbA1c ~7% in diabetics.
-            • Echocardiogram 6–12 weeks; consider ICD if LVEF ≤35%.
-            • Intensive initial follow-up.
-            • Dual antiplatelet therapy for at least 12 months.
-            • ACE inhibitors or ARBs for patients with LVEF <40%.
-            • Statins for all patients regardless of baseline LDL levels.
-            • Cardiac rehabilitation program enrollment.
-            • Smoking cessation counseling and support.
-            • Depression screening and treatment if needed.
-            • Regular follow-up visits: 2 weeks, 1 month, 3 months, 6 months, and 1 year.
-            """
-        elif source.lower() == "ges":
-            return """
-            GES (Chile): Post-AMI/HF Recommendations:
-            • First check-up in 7–14 days; initial monthly check-ups, spaced after stabilization.
-            • Early cardiac rehabilitation (minimum 15 sessions in 2 months).
-            • Focus on adherence, low-sodium diet, and moderate activity.
-            • Education in self-care and symptom awareness.
-            • Guaranteed access to medications through GES program.
-            • Echocardiogram within first month post-discharge.
-            • Stress test before 3 months if indicated.
-            • Psychological support for patients and families.
-            • Nutritional counseling with focus on Mediterranean diet.
-            • Smoking cessation program enrollment.
-            • Regular monitoring of blood pressure, heart rate, and weight.
-            • Alert system for early detection of decompensation signs.
-            """
-        else:
-            return "Unrecognized source. Use 'AHA' or 'GES'."
+        corpus = get_guideline_corpus()
+        chunks = corpus.search(source, query)
+        if not chunks:
+            known = "', '".join(sorted(corpus.sources))
+            return f"Unrecognized source. Use '{known}'.", UNRECOGNIZED_SOURCE
+        return "\n\n".join(chunk.text for chunk in chunks), corpus.version(source)
 
 # Create a singleton instance
 ai_service = AIService()
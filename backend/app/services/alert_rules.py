@@ -0,0 +1,300 @@
+import operator
+from typing import Callable, Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.models import Alert, AlertRule, GuidelineParameters, Patient, TrendWindow
+from app.services.clinical_parameters import clinical_params, customized_patients, parameters_version, resolve_parameters
+from app.services.vital_trends import TREND_FIELDS, TREND_STATS, TREND_WINDOWS_DAYS
+
+# Default rule set: the alerts the platform has always produced
+DEFAULT_RULES: Tuple[AlertRule, ...] = (
+    AlertRule(
+        id="weight_gain", nivel="yellow", metric="delta.peso", op=">", threshold="peso_delta",
+        mensaje="Recent weight increase of {value:.1f} kg detected (compared to last measurement). Check for fluid retention."
+    ),
+    AlertRule(
+        id="low_systolic", nivel="red", metric="presion_sistolica", op="<", threshold="pa_min",
+        mensaje="Low systolic pressure: {value} mmHg."
+    ),
+    AlertRule(
+        id="high_systolic", nivel="red", metric="presion_sistolica", op=">", threshold="pa_max",
+        unless="low_systolic", mensaje="Elevated systolic pressure: {value} mmHg."
+    ),
+    AlertRule(
+        id="high_heart_rate", nivel="red", metric="frecuencia_cardiaca", op=">", threshold="fc_max",
+        mensaje="Elevated heart rate: {value} bpm."
+    ),
+    AlertRule(
+        id="low_heart_rate", nivel="red", metric="frecuencia_cardiaca", op="<", threshold="fc_min",
+        unless="high_heart_rate", mensaje="Low heart rate: {value} bpm."
+    ),
+    AlertRule(
+        id="chest_pain", nivel="red", symptoms=["dolor torácico", "chest pain"],
+        mensaje="Chest pain detected. Evaluate possible ischemia."
+    ),
+    AlertRule(
+        id="dyspnea", nivel="yellow", symptoms=["disnea", "shortness of breath"],
+        mensaje="Dyspnea reported. Check for possible congestion signs."
+    ),
+    AlertRule(
+        id="weight_trend", nivel="yellow", metric="trend.peso.gain", op=">", threshold="peso_tendencia_delta",
+        window="any", mensaje="Weight gain of {value:.1f} kg over the last {days} days. Check for fluid retention."
+    ),
+    AlertRule(
+        id="sustained_high_systolic", nivel="yellow", metric="trend.presion_sistolica.mean", op=">", threshold="pa_max",
+        mensaje="Sustained elevated systolic pressure: average {value:.0f} mmHg over the last {days} days."
+    ),
+    AlertRule(
+        id="sustained_high_heart_rate", nivel="yellow", metric="trend.frecuencia_cardiaca.mean", op=">", threshold="fc_max",
+        mensaje="Sustained elevated heart rate: average {value:.0f} bpm over the last {days} days."
+    ),
+)
+
+# Kinds of compiled steps
+LATEST, DELTA, TREND, SYMPTOMS = range(4)
+
+# Numeric Measurement fields usable as metrics
+VITAL_FIELDS = ("peso", "presion_sistolica", "presion_diastolica", "frecuencia_cardiaca", "saturacion_oxigeno")
+
+# Trend statistic derived from the aggregates: last minus min
+TREND_GAIN = "gain"
+
+_OPERATORS: Dict[str, Callable] = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+class PlanStep(NamedTuple):
+    """
+    One compiled rule.
+
+    Everything that does not depend on the patient is resolved at compile time:
+    the metric is split into a kind and field, the threshold is a number, the
+    operator is a function (which also works element-wise on NumPy arrays) and
+    symptoms are a lower-cased frozenset.
+    """
+    rule_id: str
+    kind: int
+    field: str
+    stat: str
+    windows: Tuple[int, ...]  # trend windows to try, in order
+    min_count: int
+    compare: Callable
+    threshold: float
+    symptoms: FrozenSet[str]
+    unless: int  # index of an earlier step, -1 for none
+    nivel: str
+    mensaje: str
+
+class AlertPlan:
+    """
+    Flat evaluation plan compiled from a rule set and one set of clinical parameters.
+    """
+
+    __slots__ = ("steps", "uses_symptoms")
+
+    def __init__(self, steps: Sequence[PlanStep]):
+        self.steps = tuple(steps)
+        self.uses_symptoms = any(step.kind == SYMPTOMS for step in self.steps)
+
+    def evaluate(self, patient: Patient, trends: Optional[List[TrendWindow]] = None) -> List[Alert]:
+        """
+        Evaluates the plan against a patient's latest readings.
+
+        Args:
+            patient: Patient object with (at least) its two most recent measurements
+            trends: Sliding window aggregates of the patient's vitals; trend steps
+                never fire when not given
+
+        Returns:
+            List[Alert]: Alerts of the steps that fired, in rule order
+        """
+        measurements = patient.measurements
+        if not measurements:
+            return []
+        latest = measurements[-1]
+        previous = measurements[-2] if len(measurements) > 1 else None
+        reported: FrozenSet[str] = frozenset()
+        if self.uses_symptoms and latest.sintomas:
+            reported = frozenset(s.lower() for s in latest.sintomas)
+        windows = {w.days: w for w in trends} if trends else {}
+
+        fired = [False] * len(self.steps)
+        alerts = []
+        # Steps are unpacked rather than read by attribute: this loop is the alert hot path
+        for i, (_, kind, field, stat, step_windows, min_count, compare, threshold, symptoms, unless, nivel, mensaje) \
+                in enumerate(self.steps):
+            if unless >= 0 and fired[unless]:
+                continue
+            value = days = None
+            if kind == LATEST:
+                value = getattr(latest, field)
+                if value is None or not compare(value, threshold):
+                    continue
+            elif kind == SYMPTOMS:
+                if not reported or reported.isdisjoint(symptoms):
+                    continue
+            elif kind == DELTA:
+                if previous is None:
+                    continue
+                current, before = getattr(latest, field), getattr(previous, field)
+                if current is None or before is None:
+                    continue
+                value = current - before
+                if not compare(value, threshold):
+                    continue
+            else:
+                if not windows:
+                    continue
+                for window_days in step_windows:
+                    window = windows.get(window_days)
+                    if window is None or window.count < min_count:
+                        continue
+                    aggregate = getattr(window, field)
+                    candidate = aggregate.last - aggregate.min if stat == TREND_GAIN else getattr(aggregate, stat)
+                    if compare(candidate, threshold):
+                        value, days = candidate, window_days
+                        break
+                if days is None:
+                    continue
+            fired[i] = True
+            alerts.append(Alert(mensaje=mensaje.format(value=value, days=days), nivel=nivel))
+        return alerts
+
+def _resolve_threshold(rule: AlertRule, params: GuidelineParameters) -> float:
+    if rule.threshold is None:
+        raise ValueError(f"Rule '{rule.id}': a threshold is required")
+    if isinstance(rule.threshold, str):
+        if rule.threshold not in GuidelineParameters.model_fields:
+            raise ValueError(f"Rule '{rule.id}': unknown parameter '{rule.threshold}'")
+        value = getattr(params, rule.threshold)
+        if value is None:
+            raise ValueError(f"Rule '{rule.id}': parameter '{rule.threshold}' is not set")
+        return float(value)
+    return float(rule.threshold)
+
+def _trend_windows(rule: AlertRule) -> Tuple[int, ...]:
+    if rule.window == "any":
+        return TREND_WINDOWS_DAYS
+    if rule.window == "longest":
+        return TREND_WINDOWS_DAYS[-1:]
+    if rule.window not in TREND_WINDOWS_DAYS:
+        raise ValueError(f"Rule '{rule.id}': no {rule.window}-day trend window is configured")
+    return (rule.window,)
+
+def _check_message(rule: AlertRule, kind: str) -> None:
+    # Formatted with what evaluation passes for this kind: symptom rules have no
+    # value, and only trend rules have a window length
+    value = None if kind == SYMPTOMS else 0.0
+    days = 0 if kind == TREND else None
+    try:
+        rule.mensaje.format(value=value, days=days)
+    except (KeyError, IndexError, ValueError, TypeError) as e:
+        raise ValueError(
+            f"Rule '{rule.id}': invalid message template ({e}); symptom rules have no {{value}} "
+            "and only trend rules have {days}"
+        )
+
+def _compile_rule(rule: AlertRule, params: GuidelineParameters, positions: Dict[str, int]) -> PlanStep:
+    unless = -1
+    if rule.unless is not None:
+        if rule.unless not in positions:
+            raise ValueError(f"Rule '{rule.id}': 'unless' must name an earlier rule")
+        unless = positions[rule.unless]
+    if rule.symptoms is not None:
+        if rule.metric is not None:
+            raise ValueError(f"Rule '{rule.id}': use either symptoms or a metric")
+        symptoms = frozenset(s.strip().lower() for s in rule.symptoms if s.strip())
+        if not symptoms:
+            raise ValueError(f"Rule '{rule.id}': symptoms must not be empty")
+        _check_message(rule, SYMPTOMS)
+        return PlanStep(rule.id, SYMPTOMS, "", "", (), rule.min_count, operator.truth, 0.0, symptoms,
+                        unless, rule.nivel, rule.mensaje)
+
+    if rule.metric is None or rule.op is None:
+        raise ValueError(f"Rule '{rule.id}': a metric and an operator are required")
+    parts = rule.metric.split(".")
+    if len(parts) == 1 and parts[0] in VITAL_FIELDS:
+        kind, field, stat, windows = LATEST, parts[0], "", ()
+    elif len(parts) == 2 and parts[0] == "delta" and parts[1] in VITAL_FIELDS:
+        kind, field, stat, windows = DELTA, parts[1], "", ()
+    elif len(parts) == 3 and parts[0] == "trend" and parts[1] in TREND_FIELDS and parts[2] in TREND_STATS + (TREND_GAIN,):
+        kind, field, stat, windows = TREND, parts[1], parts[2], _trend_windows(rule)
+    else:
+        raise ValueError(f"Rule '{rule.id}': unknown metric '{rule.metric}'")
+    _check_message(rule, kind)
+    return PlanStep(rule.id, kind, field, stat, windows, rule.min_count, _OPERATORS[rule.op],
+                    _resolve_threshold(rule, params), frozenset(), unless, rule.nivel, rule.mensaje)
+
+def compile_rules(rules: Sequence[AlertRule], params: GuidelineParameters) -> AlertPlan:
+    """
+    Validates a rule set and compiles it into a flat evaluation plan.
+
+    Args:
+        rules: Rules in evaluation order
+        params: Clinical parameters that named thresholds are read from
+
+    Returns:
+        AlertPlan: Compiled plan
+
+    Raises:
+        ValueError: If a rule is invalid
+    """
+    steps = []
+    positions: Dict[str, int] = {}
+    for rule in rules:
+        if rule.id in positions:
+            raise ValueError(f"Rule '{rule.id}' is defined more than once")
+        steps.append(_compile_rule(rule, params, positions))
+        positions[rule.id] = len(steps) - 1
+    return AlertPlan(steps)
+
+# Installed rule set, and the plans compiled from it for the current global
+# parameters version, keyed by the effective parameter overrides
+_rules: Tuple[AlertRule, ...] = DEFAULT_RULES
+_plans: Dict[Tuple[Tuple[str, float], ...], AlertPlan] = {}
+_plans_version: Optional[int] = None
+
+def current_rules() -> List[AlertRule]:
+    """
+    Returns the installed rule set.
+    """
+    return list(_rules)
+
+def install_rules(rules: Sequence[AlertRule]) -> None:
+    """
+    Replaces the rule set.
+
+    Rules must already have been validated with compile_rules; callers then call
+    mark_parameters_changed() so the plans are recompiled and stored alert states
+    are re-evaluated.
+    """
+    global _rules
+    _rules = tuple(rules)
+
+def alert_plan(patient_id: Optional[str] = None) -> AlertPlan:
+    """
+    Returns the plan for the installed rules and the clinical parameters in
+    effect for a patient (the global ones when not given).
+
+    Plans are compiled once per set of parameter overrides and shared by every
+    patient resolving to it; all of them are dropped when the global parameters
+    (or the rules) change.
+    """
+    global _plans, _plans_version
+    version = parameters_version()
+    if _plans_version != version:
+        _plans, _plans_version = {}, version
+    resolved = resolve_parameters(patient_id) if patient_id is not None else None
+    key = resolved.key if resolved is not None else ()
+    plan = _plans.get(key)
+    if plan is None:
+        plan = compile_rules(_rules, resolved.params if resolved is not None else clinical_params)
+        _plans[key] = plan
+    return plan
+
+def alert_plans(patient_ids: Sequence[str]) -> List[AlertPlan]:
+    """
+    Returns the plan in effect for each patient, aligned with patient_ids.
+    """
+    default = alert_plan()
+    customized = customized_patients()
+    if not customized:
+        return [default] * len(patient_ids)
+    return [alert_plan(patient_id) if patient_id in customized else default for patient_id in patient_ids]
@@ -0,0 +1,135 @@
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple, Union
+import numpy as np
+
+from app.models import Alert
+from app.services.alert_rules import AlertPlan, DELTA, LATEST, TREND, TREND_GAIN, PlanStep
+from app.services.patient_repository import RecentVitals
+
+@lru_cache(maxsize=1024)
+def _normalized_symptoms(sintomas: Tuple[str, ...]) -> FrozenSet[str]:
+    return frozenset(s.lower() for s in sintomas)
+
+def _reported_symptoms(sintomas: List[Optional[List[str]]]) -> List[Tuple[int, FrozenSet[str]]]:
+    # (row, lower-cased symptoms) for the patients whose latest reading reports any
+    return [(i, _normalized_symptoms(tuple(reported))) for i, reported in enumerate(sintomas) if reported]
+
+def _trend_values(vitals: RecentVitals, step: PlanStep, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Walk the windows in reverse so the first one (in rule order) that fires wins
+    values = np.full(n, np.nan)
+    days = np.zeros(n, dtype=np.int64)
+    for window_days in reversed(step.windows):
+        window = vitals.trends.get(window_days)
+        if window is None:
+            continue
+        if step.stat == TREND_GAIN:
+            candidate = window[f"{step.field}_last"] - window[f"{step.field}_min"]
+        else:
+            candidate = window[f"{step.field}_{step.stat}"]
+        exceeded = (window["count"] >= step.min_count) & step.compare(candidate, step.threshold)
+        values = np.where(exceeded, candidate, values)
+        days = np.where(exceeded, window_days, days)
+    return values, days
+
+def _select(vitals: RecentVitals, rows: np.ndarray) -> RecentVitals:
+    # The vitals of a subset of the patients
+    return RecentVitals(
+        patient_ids=[vitals.patient_ids[i] for i in rows.tolist()],
+        latest={field: column[rows] for field, column in vitals.latest.items()},
+        previous={field: column[rows] for field, column in vitals.previous.items()},
+        sintomas=[vitals.sintomas[i] for i in rows.tolist()],
+        trends={days: {name: column[rows] for name, column in window.items()} for days, window in vitals.trends.items()},
+    )
+
+def _sweep(vitals: RecentVitals, plan: AlertPlan) -> List[List[Alert]]:
+    """
+    Evaluates one alert plan for every patient at once.
+
+    Each plan step runs as NumPy array operations over the vitals columns; Alert
+    objects are only built for the patients that have at least one alert, in the
+    same order and with the same messages as AlertPlan.evaluate (check_alerts).
+    Missing readings are NaN and never compare true, so patients without
+    measurements (or without a previous one, for delta rules) get no alerts for
+    them. Trend steps read the sliding window columns.
+
+    Args:
+        vitals: Latest and previous readings and trend windows of every patient
+        plan: Compiled alert rules, see alert_rules.alert_plan
+
+    Returns:
+        List[List[Alert]]: Alerts per patient, aligned with vitals.patient_ids
+    """
+    n = len(vitals.patient_ids)
+    reported = _reported_symptoms(vitals.sintomas) if plan.uses_symptoms else []
+
+    masks: List[np.ndarray] = []
+    values: List[Optional[np.ndarray]] = []
+    days: List[Optional[np.ndarray]] = []
+    for step in plan.steps:
+        step_days = None
+        if step.kind == LATEST:
+            step_values = vitals.latest[step.field]
+            mask = step.compare(step_values, step.threshold)
+        elif step.kind == DELTA:
+            step_values = vitals.latest[step.field] - vitals.previous[step.field]
+            mask = step.compare(step_values, step.threshold)
+        elif step.kind == TREND:
+            step_values, step_days = _trend_values(vitals, step, n)
+            mask = step_days > 0
+        else:
+            step_values = None
+            mask = np.zeros(n, dtype=bool)
+            for i, sintomas in reported:
+                if not sintomas.isdisjoint(step.symptoms):
+                    mask[i] = True
+        if step.unless >= 0:
+            mask = mask & ~masks[step.unless]
+        masks.append(mask)
+        values.append(step_values)
+        days.append(step_days)
+
+    results: List[List[Alert]] = [[] for _ in range(n)]
+    if not masks:
+        return results
+    alerting = np.flatnonzero(np.logical_or.reduce(masks))
+    rows = alerting.tolist()
+    # Gather the alerting rows into plain Python values before building messages
+    for step, mask, step_values, step_days in zip(plan.steps, masks, values, days):
+        fired = mask[alerting].tolist()
+        value_column = step_values[alerting].tolist() if step_values is not None else [None] * len(rows)
+        days_column = step_days[alerting].tolist() if step_days is not None else [None] * len(rows)
+        for i, hit, value, window_days in zip(rows, fired, value_column, days_column):
+            if hit:
+                results[i].append(Alert(mensaje=step.mensaje.format(value=value, days=window_days), nivel=step.nivel))
+    return results
+
+def sweep_alerts(vitals: RecentVitals, plan: Union[AlertPlan, Sequence[AlertPlan]]) -> List[List[Alert]]:
+    """
+    Evaluates alert plans for every patient at once.
+
+    Patients sharing a plan (all of them, unless cohort or patient parameter
+    overrides apply) are evaluated together.
+
+    Args:
+        vitals: Latest and previous readings and trend windows of every patient
+        plan: Compiled alert rules, see alert_rules.alert_plan; either one plan
+            for everyone or one per patient (see alert_rules.alert_plans)
+
+    Returns:
+        List[List[Alert]]: Alerts per patient, aligned with vitals.patient_ids
+    """
+    if isinstance(plan, AlertPlan):
+        return _sweep(vitals, plan)
+    groups: Dict[int, List[int]] = {}
+    plans: Dict[int, AlertPlan] = {}
+    for i, patient_plan in enumerate(plan):
+        groups.setdefault(id(patient_plan), []).append(i)
+        plans[id(patient_plan)] = patient_plan
+    if len(groups) <= 1:
+        return _sweep(vitals, plans.popitem()[1]) if plans else []
+
+    results: List[List[Alert]] = [[] for _ in vitals.patient_ids]
+    for key, rows in groups.items():
+        for i, alerts in zip(rows, _sweep(_select(vitals, np.array(rows)), plans[key])):
+            results[i] = alerts
+    return results
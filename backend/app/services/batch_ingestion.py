@@ -0,0 +1,155 @@
+import csv
+import io
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from pydantic import TypeAdapter, ValidationError
+
+from app.models import MeasurementBatchRow, MeasurementBatchError, MeasurementBatchResult, Measurement
+from app.services.patient_repository import PatientRepository
+
+# Largest number of rows accepted in one upload
+MAX_BATCH_ROWS = 50_000
+
+# Separator for the sintomas column in CSV uploads
+CSV_SYMPTOM_SEPARATOR = ";"
+
+_rows_adapter = TypeAdapter(List[MeasurementBatchRow])
+
+def _format_errors(errors: List[dict]) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc']) or 'row'}: {e['msg']}" for e in errors)
+
+def _patient_id_of(raw: Any) -> Optional[str]:
+    if isinstance(raw, dict) and isinstance(raw.get("patient_id"), str):
+        return raw["patient_id"]
+    return None
+
+def parse_ndjson(body: bytes) -> Tuple[List[Any], List[MeasurementBatchError]]:
+    """
+    Splits an NDJSON body into raw rows, reporting lines that are not valid JSON.
+
+    Args:
+        body: NDJSON bytes (blank lines are ignored)
+
+    Returns:
+        Tuple: Raw row objects and parse errors (invalid lines are kept as None placeholders)
+    """
+    rows: List[Any] = []
+    errors: List[MeasurementBatchError] = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError as e:
+            errors.append(MeasurementBatchError(row=len(rows), detail=f"Invalid JSON: {e}"))
+            rows.append(None)
+    return rows, errors
+
+def parse_csv(body: bytes) -> List[Dict[str, Any]]:
+    """
+    Reads a CSV body with a header row into raw rows.
+
+    Empty cells are dropped so model defaults apply, and the sintomas column is
+    split on CSV_SYMPTOM_SEPARATOR.
+
+    Args:
+        body: UTF-8 CSV bytes
+
+    Returns:
+        List[Dict[str, Any]]: Raw row objects
+
+    Raises:
+        ValueError: If the body is not UTF-8 or not valid CSV (for example a
+            field longer than csv.field_size_limit())
+    """
+    rows = []
+    try:
+        for record in csv.DictReader(io.StringIO(body.decode("utf-8-sig"))):
+            row = {k.strip(): v.strip() for k, v in record.items() if k and v is not None and v.strip()}
+            if "sintomas" in row:
+                row["sintomas"] = [s.strip() for s in row["sintomas"].split(CSV_SYMPTOM_SEPARATOR) if s.strip()]
+            rows.append(row)
+    except csv.Error as e:
+        raise ValueError(str(e)) from e
+    return rows
+
+def validate_rows(raw_rows: List[Any], skip: Optional[set] = None) -> Tuple[List[Optional[MeasurementBatchRow]], List[MeasurementBatchError]]:
+    """
+    Validates raw rows with one TypeAdapter pass over the whole batch.
+
+    If any row is invalid, the failing positions are read from the validation
+    error and only the remaining rows are validated again, so a bad row never
+    rejects the rest of the batch.
+
+    Args:
+        raw_rows: Rows to validate
+        skip: Positions already rejected (for example unparseable NDJSON lines)
+
+    Returns:
+        Tuple: Validated rows (None where rejected) and per-row errors
+    """
+    skip = skip or set()
+    positions = [i for i in range(len(raw_rows)) if i not in skip]
+    candidates = [raw_rows[i] for i in positions]
+    validated: List[Optional[MeasurementBatchRow]] = [None] * len(raw_rows)
+    errors: List[MeasurementBatchError] = []
+
+    try:
+        rows = _rows_adapter.validate_python(candidates)
+    except ValidationError as e:
+        by_row: Dict[int, List[dict]] = {}
+        for error in e.errors():
+            by_row.setdefault(error["loc"][0], []).append({**error, "loc": error["loc"][1:]})
+        for index, row_errors in by_row.items():
+            raw = candidates[index]
+            errors.append(MeasurementBatchError(
+                row=positions[index],
+                patient_id=_patient_id_of(raw),
+                detail=_format_errors(row_errors)
+            ))
+        positions = [p for i, p in enumerate(positions) if i not in by_row]
+        rows = _rows_adapter.validate_python([raw_rows[p] for p in positions])
+
+    for position, row in zip(positions, rows):
+        validated[position] = row
+    return validated, errors
+
+def ingest_rows(
+    repository: PatientRepository,
+    raw_rows: List[Any],
+    errors: Optional[List[MeasurementBatchError]] = None,
+) -> Tuple[MeasurementBatchResult, List[str]]:
+    """
+    Validates raw rows, groups them by patient and appends them in one repository call.
+
+    Args:
+        repository: Patient repository to append to
+        raw_rows: Rows to ingest
+        errors: Errors already found while parsing (their rows are skipped)
+
+    Returns:
+        Tuple: Accepted/rejected counts with per-row errors, and the identifiers
+        of the patients that received measurements
+    """
+    errors = list(errors or [])
+    validated, validation_errors = validate_rows(raw_rows, skip={e.row for e in errors})
+    errors.extend(validation_errors)
+
+    batches: Dict[str, List[Measurement]] = {}
+    positions: Dict[str, List[int]] = {}
+    for position, row in enumerate(validated):
+        if row is not None:
+            batches.setdefault(row.patient_id, []).append(row)
+            positions.setdefault(row.patient_id, []).append(position)
+
+    missing = repository.add_measurements(batches)
+    for patient_id in missing:
+        errors.extend(
+            MeasurementBatchError(row=p, patient_id=patient_id, detail="Patient not found")
+            for p in positions[patient_id]
+        )
+
+    errors.sort(key=lambda e: e.row)
+    updated = [pid for pid in batches if pid not in missing]
+    accepted = sum(len(batches[pid]) for pid in updated)
+    return MeasurementBatchResult(accepted=accepted, rejected=len(errors), errors=errors), updated
@@ -0,0 +1,144 @@
+import hashlib
+import os
+import re
+import tempfile
+from typing import NamedTuple, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+BLOB_STORE_DIR = os.environ.get("BLOB_STORE_DIR", "data/blobs")
+# Largest accepted upload
+BLOB_MAX_BYTES = int(os.environ.get("BLOB_MAX_BYTES", str(20 * 1024 * 1024)))
+
+BLOB_PREFIX = "sha256:"
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+# Leading bytes of the image formats phones and scanners produce
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+class BlobTooLarge(Exception):
+    """
+    Raised when an upload exceeds the store's maximum blob size.
+    """
+
+class BlobInfo(NamedTuple):
+    reference: str
+    size: int
+    content_type: str
+
+def sniff_content_type(head: bytes) -> str:
+    """
+    Returns the image type identified by a blob's first bytes (application/octet-stream if unknown).
+    """
+    for signature, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return "image/heic"
+    return "application/octet-stream"
+
+class BlobWriter:
+    """
+    Receives one blob chunk by chunk: each chunk is hashed and written to a
+    temporary file in the store, so memory stays bounded by the chunk size.
+    commit() moves the file to its content address; abort() removes it.
+    """
+
+    def __init__(self, store: "BlobStore"):
+        self.store = store
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._head = b""
+        os.makedirs(store.tmp_dir, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=store.tmp_dir)
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        """
+        Appends a chunk.
+
+        Raises:
+            BlobTooLarge: If the blob exceeds the store's maximum size
+        """
+        self.size += len(chunk)
+        if self.size > self.store.max_bytes:
+            raise BlobTooLarge(f"Uploads are limited to {self.store.max_bytes} bytes")
+        if len(self._head) < 16:
+            self._head += chunk[:16 - len(self._head)]
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    def commit(self) -> BlobInfo:
+        """
+        Stores the blob under its SHA-256 digest; an identical blob already
+        stored is kept and the upload discarded.
+
+        Returns:
+            BlobInfo: Reference, size and detected content type of the blob
+        """
+        self._file.close()
+        digest = self._hash.hexdigest()
+        path = self.store.path(digest)
+        if os.path.exists(path):
+            os.remove(self._tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self._tmp_path, path)
+        return BlobInfo(BLOB_PREFIX + digest, self.size, sniff_content_type(self._head))
+
+    def abort(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+class BlobStore:
+    """
+    Content-addressed file store for uploaded images.
+
+    A blob is stored once, at <root>/<d[:2]>/<d[2:4]>/<d> where d is the hex
+    SHA-256 of its bytes, and referenced as "sha256:<d>". Uploads are written
+    to a temporary file in the same file system first and renamed into place,
+    so a partial upload is never visible under a digest.
+    """
+
+    def __init__(self, root: str = BLOB_STORE_DIR, max_bytes: int = BLOB_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        # Created by the first upload, so constructing the store touches no files
+        self.tmp_dir = os.path.join(root, "tmp")
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def writer(self) -> BlobWriter:
+        return BlobWriter(self)
+
+    def locate(self, reference: str) -> Optional[str]:
+        """
+        Returns the file of a stored blob from its reference (or bare digest).
+
+        Args:
+            reference: "sha256:<hex digest>" or the hex digest
+
+        Returns:
+            Optional[str]: Path of the blob, or None if the reference is malformed or unknown
+        """
+        digest = reference[len(BLOB_PREFIX):] if reference.startswith(BLOB_PREFIX) else reference
+        if not _DIGEST.match(digest):
+            return None
+        path = self.path(digest)
+        return path if os.path.exists(path) else None
+
+    def content_type(self, path: str) -> str:
+        with open(path, "rb") as f:
+            return sniff_content_type(f.read(16))
@@ -1,4 +1,208 @@
+from typing import Dict, KeysView, NamedTuple, Optional, Set, Tuple
+
 from app.models import GuidelineParameters
 
 # Clinical parameters used for alert generation
 clinical_params = GuidelineParameters()
+
+# Incremented on every change to any parameter layer. Each layer remembers the
+# value at its last change, and a patient's parameters version is the newest of
+# its layers, so results computed with older values (such as cached alert
+# states) can be recognized as stale. The clock starts at 0 in every process;
+# resume_versions moves it past the versions persisted by earlier runs
+_clock = 0
+_parameters_version = 0
+
+# Override layers: values set per cohort and per patient replace the global ones
+_cohort_overrides: Dict[str, Dict[str, float]] = {}
+_cohort_versions: Dict[str, int] = {}
+_cohort_members: Dict[str, Set[str]] = {}
+_patient_cohorts: Dict[str, str] = {}
+_patient_overrides: Dict[str, Dict[str, float]] = {}
+# Patients whose cohort or overrides were ever set, with the version of that change
+_patient_versions: Dict[str, int] = {}
+
+class ResolvedParameters(NamedTuple):
+    """
+    Parameters in effect for one patient.
+    """
+    version: int
+    params: GuidelineParameters
+    # Effective overrides as sorted (name, value) pairs; patients resolving to the
+    # same values share a key (and the global parameters have the empty key)
+    key: Tuple[Tuple[str, float], ...]
+
+# Resolved parameters per customized patient, dropped when one of their layers changes
+_resolved: Dict[str, ResolvedParameters] = {}
+_global = ResolvedParameters(_parameters_version, clinical_params, ())
+
+def parameters_version(patient_id: Optional[str] = None) -> int:
+    """
+    Returns the current version of the clinical parameters.
+
+    Args:
+        patient_id: Patient whose parameters version (including cohort and patient
+            overrides) is returned; the global version when not given
+    """
+    if patient_id is None:
+        return _parameters_version
+    return resolve_parameters(patient_id).version
+
+def mark_parameters_changed() -> None:
+    """
+    Records a change to clinical_params, invalidating results computed with previous values.
+    """
+    global _clock, _parameters_version, _global
+    _clock += 1
+    _parameters_version = _clock
+    _global = ResolvedParameters(_parameters_version, clinical_params, ())
+    _resolved.clear()
+
+def resume_versions(stored_version: int) -> None:
+    """
+    Moves the version clock past a version stored by an earlier run, so results
+    persisted with it (such as alert states in SQLite) are stale from now on.
+
+    Args:
+        stored_version: Newest parameters version found in storage
+    """
+    global _clock
+    _clock = max(_clock, stored_version)
+    mark_parameters_changed()
+
+def resolve_parameters(patient_id: str) -> ResolvedParameters:
+    """
+    Returns the parameters in effect for a patient: the global values, replaced
+    by those of the patient's cohort, replaced by the patient's own.
+
+    Resolution is memoized per patient; patients without overrides share the
+    global entry.
+
+    Args:
+        patient_id: Patient identifier
+
+    Returns:
+        ResolvedParameters: Version, parameters and override key
+    """
+    resolved = _resolved.get(patient_id)
+    if resolved is not None:
+        return resolved
+    if patient_id not in _patient_versions:
+        return _global
+
+    cohort = _patient_cohorts.get(patient_id)
+    overrides: Dict[str, float] = {}
+    version = max(_parameters_version, _patient_versions[patient_id])
+    if cohort is not None:
+        overrides.update(_cohort_overrides.get(cohort, {}))
+        version = max(version, _cohort_versions.get(cohort, 0))
+    overrides.update(_patient_overrides.get(patient_id, {}))
+    params = clinical_params.model_copy(update=overrides) if overrides else clinical_params
+    resolved = ResolvedParameters(version, params, tuple(sorted(overrides.items())))
+    _resolved[patient_id] = resolved
+    return resolved
+
+def customized_patients() -> KeysView[str]:
+    """
+    Returns a read-only live view of the ids of the patients whose parameters may
+    differ from the global ones (not copied, so it is cheap to check per sweep).
+    """
+    return _patient_versions.keys()
+
+def get_cohort_overrides(cohort: str) -> Optional[Dict[str, float]]:
+    """
+    Returns a cohort's overrides, or None if the cohort does not exist.
+    """
+    overrides = _cohort_overrides.get(cohort)
+    return dict(overrides) if overrides is not None else None
+
+def list_cohorts() -> Dict[str, Dict[str, float]]:
+    """
+    Returns the overrides of every cohort.
+    """
+    return {cohort: dict(overrides) for cohort, overrides in _cohort_overrides.items()}
+
+def set_cohort_overrides(cohort: str, overrides: Dict[str, float]) -> None:
+    """
+    Replaces a cohort's overrides, invalidating the parameters of its members only.
+    """
+    global _clock
+    _clock += 1
+    _cohort_overrides[cohort] = dict(overrides)
+    _cohort_versions[cohort] = _clock
+    for patient_id in _cohort_members.get(cohort, ()):
+        _resolved.pop(patient_id, None)
+
+def delete_cohort(cohort: str) -> bool:
+    """
+    Removes a cohort and its overrides; its members fall back to the global values.
+
+    Returns:
+        bool: Whether the cohort existed
+    """
+    if cohort not in _cohort_overrides:
+        return False
+    for patient_id in list(_cohort_members.get(cohort, ())):
+        set_patient_cohort(patient_id, None)
+    del _cohort_overrides[cohort]
+    _cohort_versions.pop(cohort, None)
+    _cohort_members.pop(cohort, None)
+    return True
+
+def get_patient_cohort(patient_id: str) -> Optional[str]:
+    """
+    Returns the cohort a patient belongs to, if any.
+    """
+    return _patient_cohorts.get(patient_id)
+
+def get_patient_overrides(patient_id: str) -> Dict[str, float]:
+    """
+    Returns a patient's own overrides.
+    """
+    return dict(_patient_overrides.get(patient_id, {}))
+
+def _patient_changed(patient_id: str) -> None:
+    global _clock
+    _clock += 1
+    _patient_versions[patient_id] = _clock
+    _resolved.pop(patient_id, None)
+
+def set_patient_cohort(patient_id: str, cohort: Optional[str]) -> None:
+    """
+    Moves a patient into a cohort (None to leave it).
+
+    Raises:
+        ValueError: If the cohort does not exist
+    """
+    if cohort is not None and cohort not in _cohort_overrides:
+        raise ValueError(f"Cohort '{cohort}' does not exist")
+    previous = _patient_cohorts.pop(patient_id, None)
+    if previous is not None:
+        _cohort_members[previous].discard(patient_id)
+    if cohort is not None:
+        _patient_cohorts[patient_id] = cohort
+        _cohort_members.setdefault(cohort, set()).add(patient_id)
+    _patient_changed(patient_id)
+
+def set_patient_overrides(patient_id: str, overrides: Dict[str, float]) -> None:
+    """
+    Replaces a patient's own overrides.
+    """
+    if overrides:
+        _patient_overrides[patient_id] = dict(overrides)
+    else:
+        _patient_overrides.pop(patient_id, None)
+    _patient_changed(patient_id)
+
+def clear_patient(patient_id: str) -> None:
+    """
+    Forgets a deleted patient's cohort and overrides.
+    """
+    if patient_id not in _patient_versions:
+        return
+    cohort = _patient_cohorts.pop(patient_id, None)
+    if cohort is not None:
+        _cohort_members[cohort].discard(patient_id)
+    _patient_overrides.pop(patient_id, None)
+    _patient_versions.pop(patient_id, None)
+    _resolved.pop(patient_id, None)
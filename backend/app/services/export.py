@@ -0,0 +1,85 @@
+import json
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Optional
+
+from app.services.patient_repository import PatientRepository
+
+# Patients and measurements read from the repository per step; bounds memory use
+EXPORT_PAGE_SIZE = 500
+
+def _as_utc(timestamp: datetime) -> datetime:
+    # Naive timestamps are treated as UTC, as in the measurement store
+    return timestamp.replace(tzinfo=timezone.utc) if timestamp.tzinfo is None else timestamp
+
+def _intervention_since(entry: Dict[str, str], since: datetime) -> bool:
+    try:
+        return _as_utc(datetime.fromisoformat(entry["timestamp"])) >= since
+    except (KeyError, ValueError):
+        # Entries without a readable timestamp cannot be placed in time; always export them
+        return True
+
+def _row(record: dict) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode()
+
+async def iter_ndjson_export(
+    repository: PatientRepository,
+    since: Optional[datetime] = None,
+    page_size: int = EXPORT_PAGE_SIZE,
+) -> AsyncIterator[bytes]:
+    """
+    Yields the patient store as NDJSON, one row per patient, measurement and intervention.
+
+    Patients are walked in id order and measurements in timestamp order, one
+    page at a time, so memory use depends on page_size rather than on the
+    number of patients or the length of their histories. Every patient row is
+    emitted (profiles carry no modification time); measurements and
+    interventions are restricted to those at or after `since`.
+
+    This is an async generator so every page is read on the event loop, where
+    the repository is written, rather than in the threadpool a sync iterator
+    would be drained in: the in-memory repository has no lock, and a read
+    racing a write could fail or return a torn record.
+
+    Args:
+        repository: Patient repository to export
+        since: Only export measurements and interventions at or after this time
+        page_size: Patients or measurements read per repository call
+
+    Returns:
+        AsyncIterator[bytes]: Encoded NDJSON chunks
+    """
+    since = _as_utc(since) if since is not None else None
+    after_patient = None
+    while True:
+        patients = repository.list_patients(after=after_patient, limit=page_size, history=0)
+        for patient in patients:
+            yield _row({
+                "type": "patient",
+                **patient.model_dump(mode="json", exclude={"measurements", "intervention_history"}),
+            })
+
+            after_key = None
+            while True:
+                page = repository.get_measurements(patient.id, start=since, after=after_key, limit=page_size)
+                if page is None:  # deleted while exporting
+                    break
+                if page.items:
+                    yield b"".join(
+                        _row({"type": "measurement", "patient_id": patient.id, **m.model_dump(mode="json")})
+                        for m in page.items
+                    )
+                if page.next_key is None:
+                    break
+                after_key = page.next_key
+
+            interventions = [
+                _row({**entry, "type": "intervention", "patient_id": patient.id})
+                for entry in patient.intervention_history
+                if since is None or _intervention_since(entry, since)
+            ]
+            if interventions:
+                yield b"".join(interventions)
+
+        if len(patients) < page_size:
+            return
+        after_patient = patients[-1].id
@@ -0,0 +1,133 @@
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+from app.models import VitalsExtraction
+
+# Load environment variables
+load_dotenv()
+
+class ExtractionStore(ABC):
+    """
+    Outcome of the vitals extraction of every processed text ingestion, by
+    ingestion id: the provenance of the measurements recorded from text.
+    """
+
+    @abstractmethod
+    def get(self, ingestion_id: str) -> Optional[VitalsExtraction]:
+        """
+        Returns the extraction of an ingestion, if it was processed.
+        """
+
+    @abstractmethod
+    def put_many(self, entries: List[VitalsExtraction]) -> None:
+        """
+        Stores (replaces) extractions.
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Removes every entry.
+        """
+
+class InMemoryExtractionStore(ExtractionStore):
+    """
+    Store kept in process memory.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, VitalsExtraction] = {}
+        self._lock = threading.Lock()
+
+    def get(self, ingestion_id: str) -> Optional[VitalsExtraction]:
+        with self._lock:
+            entry = self._entries.get(ingestion_id)
+            return entry.model_copy() if entry else None
+
+    def put_many(self, entries: List[VitalsExtraction]) -> None:
+        with self._lock:
+            for entry in entries:
+                self._entries[entry.ingestion_id] = entry.model_copy()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+class SQLiteExtractionStore(ExtractionStore):
+    """
+    Durable store backed by a SQLite database in WAL mode.
+
+    Extractions are written a batch at a time by the pipeline, so a single
+    connection guarded by a lock is enough.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS vitals_extractions (
+        ingestion_id TEXT PRIMARY KEY,
+        patient_id TEXT NOT NULL,
+        entry TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_vitals_extractions_patient ON vitals_extractions(patient_id);
+    """
+
+    SELECT_ENTRY = "SELECT entry FROM vitals_extractions WHERE ingestion_id = ?"
+    UPSERT_ENTRY = (
+        "INSERT INTO vitals_extractions (ingestion_id, patient_id, entry) VALUES (?, ?, ?) "
+        "ON CONFLICT(ingestion_id) DO UPDATE SET patient_id = excluded.patient_id, entry = excluded.entry"
+    )
+    DELETE_ALL = "DELETE FROM vitals_extractions"
+
+    def __init__(self, path: str):
+        """
+        Opens (or creates) the extractions database.
+
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def get(self, ingestion_id: str) -> Optional[VitalsExtraction]:
+        with self._lock:
+            row = self._conn.execute(self.SELECT_ENTRY, (ingestion_id,)).fetchone()
+        return VitalsExtraction.model_validate_json(row[0]) if row else None
+
+    def put_many(self, entries: List[VitalsExtraction]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(self.UPSERT_ENTRY, [
+                (entry.ingestion_id, entry.patient_id, entry.model_dump_json()) for entry in entries
+            ])
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(self.DELETE_ALL)
+
+def create_extraction_store() -> ExtractionStore:
+    """
+    Creates the extraction store configured through environment variables.
+
+    VITALS_EXTRACTIONS_BACKEND selects 'memory' or 'sqlite' (by default the
+    same backend as PATIENTS_DB_BACKEND); the SQLite backend reads its file
+    from VITALS_EXTRACTIONS_PATH.
+
+    Returns:
+        ExtractionStore: Configured store
+    """
+    backend = os.environ.get("VITALS_EXTRACTIONS_BACKEND", os.environ.get("PATIENTS_DB_BACKEND", "memory")).lower()
+    if backend == "sqlite":
+        return SQLiteExtractionStore(os.environ.get("VITALS_EXTRACTIONS_PATH", "data/vitals_extractions.db"))
+    return InMemoryExtractionStore()
@@ -0,0 +1,330 @@
+import hashlib
+import heapq
+import json
+import math
+import os
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.services.semantic_cache import normalize_query
+
+# Load environment variables
+load_dotenv()
+
+# Directory with one subdirectory of .txt/.md documents per source (e.g. guidelines/AHA/)
+GUIDELINES_DIR = os.environ.get("GUIDELINES_DIR", "data/guidelines")
+# File the BM25 index is persisted to; empty disables persistence
+GUIDELINES_INDEX_PATH = os.environ.get("GUIDELINES_INDEX_PATH", "data/guidelines_index.json")
+GUIDELINE_CHUNK_WORDS = int(os.environ.get("GUIDELINE_CHUNK_WORDS", "120"))
+GUIDELINE_TOP_K = int(os.environ.get("GUIDELINE_TOP_K", "4"))
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+INDEX_FORMAT = 1
+DOCUMENT_EXTENSIONS = (".txt", ".md")
+
+# Built-in summaries, used for sources without documents in GUIDELINES_DIR
+BUILTIN_GUIDELINES: Dict[str, str] = {
+    "AHA": (
+        "AHA: Post-AMI Recommendations:\n"
+        "• BP <130/80 mmHg (minimum <140/90).\n"
+        "• Beta-blockers: HR 50-70 bpm, prolonged use based on condition.\n"
+        "• LDL <70 mg/dL; consider additional therapies if 55–69 mg/dL.\n"
+        "• HbA1c ~7% in diabetics.\n"
+        "• Echocardiogram 6–12 weeks; consider ICD if LVEF ≤35%.\n"
+        "• Intensive initial follow-up.\n"
+        "• Dual antiplatelet therapy for at least 12 months.\n"
+        "• ACE inhibitors or ARBs for patients with LVEF <40%.\n"
+        "• Statins for all patients regardless of baseline LDL levels.\n"
+        "• Cardiac rehabilitation program enrollment.\n"
+        "• Smoking cessation counseling and support.\n"
+        "• Depression screening and treatment if needed.\n"
+        "• Regular follow-up visits: 2 weeks, 1 month, 3 months, 6 months, and 1 year."
+    ),
+    "GES": (
+        "GES (Chile): Post-AMI/HF Recommendations:\n"
+        "• First check-up in 7–14 days; initial monthly check-ups, spaced after stabilization.\n"
+        "• Early cardiac rehabilitation (minimum 15 sessions in 2 months).\n"
+        "• Focus on adherence, low-sodium diet, and moderate activity.\n"
+        "• Education in self-care and symptom awareness.\n"
+        "• Guaranteed access to medications through GES program.\n"
+        "• Echocardiogram within first month post-discharge.\n"
+        "• Stress test before 3 months if indicated.\n"
+        "• Psychological support for patients and families.\n"
+        "• Nutritional counseling with focus on Mediterranean diet.\n"
+        "• Smoking cessation program enrollment.\n"
+        "• Regular monitoring of blood pressure, heart rate, and weight.\n"
+        "• Alert system for early detection of decompensation signs."
+    ),
+}
+
+class Chunk(NamedTuple):
+    source: str
+    document: str
+    text: str
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into case- and accent-folded terms.
+    """
+    return normalize_query(text).split()
+
+def chunk_document(text: str, max_words: int = GUIDELINE_CHUNK_WORDS) -> List[str]:
+    """
+    Splits a document into chunks of at most max_words words.
+
+    Lines (guideline bullets) are kept whole and packed into chunks in order;
+    a line longer than max_words is split on its own.
+
+    Args:
+        text: Document text
+        max_words: Maximum words per chunk
+
+    Returns:
+        List[str]: Chunk texts
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    words = 0
+    for line in (line.strip() for line in text.splitlines()):
+        if not line:
+            continue
+        line_words = line.split()
+        if words and words + len(line_words) > max_words:
+            chunks.append("\n".join(current))
+            current, words = [], 0
+        if len(line_words) > max_words:
+            for start in range(0, len(line_words), max_words):
+                chunks.append(" ".join(line_words[start:start + max_words]))
+            continue
+        current.append(line)
+        words += len(line_words)
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+class SourceIndex:
+    """
+    BM25 inverted index over the chunks of one guideline source.
+    """
+
+    def __init__(self, chunks: List[Chunk], postings: Dict[str, List[Tuple[int, int]]], lengths: List[int], version: str):
+        self.chunks = chunks
+        self.postings = postings
+        self.lengths = lengths
+        self.version = version
+        self.average_length = sum(lengths) / len(lengths) if lengths else 0.0
+
+    @classmethod
+    def build(cls, chunks: List[Chunk], version: str) -> "SourceIndex":
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = []
+        for chunk_id, chunk in enumerate(chunks):
+            terms = tokenize(chunk.text)
+            lengths.append(len(terms))
+            for term, count in Counter(terms).items():
+                postings.setdefault(term, []).append((chunk_id, count))
+        return cls(chunks, postings, lengths, version)
+
+    def search(self, query: str, k: int) -> List[Chunk]:
+        """
+        Returns the k chunks with the highest BM25 score for the query, in score
+        order (chunks sharing no term with the query are never returned).
+        """
+        n = len(self.chunks)
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[chunk_id] / self.average_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [self.chunks[chunk_id] for chunk_id, _ in best]
+
+class GuidelineCorpus:
+    """
+    Guideline documents per source, chunked and indexed with BM25.
+
+    Each source's documents are read from GUIDELINES_DIR/<SOURCE>/, falling
+    back to the built-in summary. The index is built once and persisted to
+    index_path together with a fingerprint of its inputs (file names, sizes and
+    modification times, built-in texts and chunk size), so a restart with
+    unchanged documents loads it instead of re-tokenizing the corpus.
+    """
+
+    def __init__(self, sources: Dict[str, SourceIndex]):
+        self.sources = sources
+
+    @staticmethod
+    def _documents(directory: str) -> Dict[str, List[Tuple[str, Optional[str]]]]:
+        # source -> [(document name, path or None for the built-in text)]
+        documents: Dict[str, List[Tuple[str, Optional[str]]]] = {}
+        if os.path.isdir(directory):
+            for entry in sorted(os.listdir(directory)):
+                source_dir = os.path.join(directory, entry)
+                if not os.path.isdir(source_dir):
+                    continue
+                files = sorted(
+                    name for name in os.listdir(source_dir) if name.lower().endswith(DOCUMENT_EXTENSIONS)
+                )
+                if files:
+                    documents[entry.upper()] = [(name, os.path.join(source_dir, name)) for name in files]
+        for source in BUILTIN_GUIDELINES:
+            documents.setdefault(source, [("builtin", None)])
+        return documents
+
+    @staticmethod
+    def _fingerprint(documents: Iterable[Tuple[str, Optional[str]]], chunk_words: int) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{INDEX_FORMAT}:{chunk_words}".encode())
+        for name, path in documents:
+            digest.update(name.encode())
+            if path is None:
+                continue
+            stat = os.stat(path)
+            digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+        return digest.hexdigest()
+
+    @classmethod
+    def load(
+        cls,
+        directory: str = GUIDELINES_DIR,
+        index_path: Optional[str] = GUIDELINES_INDEX_PATH,
+        chunk_words: int = GUIDELINE_CHUNK_WORDS,
+    ) -> "GuidelineCorpus":
+        """
+        Loads the corpus, reusing the persisted index of every source whose
+        documents did not change.
+
+        Args:
+            directory: Directory of source subdirectories
+            index_path: Persisted index file (None to disable persistence)
+            chunk_words: Maximum words per chunk
+
+        Returns:
+            GuidelineCorpus: Loaded corpus
+        """
+        documents = cls._documents(directory)
+        versions = {}
+        for source, docs in documents.items():
+            version = cls._fingerprint(docs, chunk_words)
+            if docs == [("builtin", None)]:
+                version = hashlib.blake2b(
+                    f"{version}:{BUILTIN_GUIDELINES[source]}".encode(), digest_size=16
+                ).hexdigest()
+            versions[source] = version
+
+        stored: Dict[str, dict] = {}
+        if index_path and os.path.exists(index_path):
+            try:
+                with open(index_path, encoding="utf-8") as f:
+                    stored = json.load(f).get("sources", {})
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable guideline index {index_path}: {e}")
+
+        sources: Dict[str, SourceIndex] = {}
+        rebuilt = False
+        for source, docs in documents.items():
+            entry = stored.get(source)
+            if entry is not None and entry.get("version") == versions[source]:
+                chunks = [Chunk(source, document, text) for document, text in entry["chunks"]]
+                postings = {term: [tuple(p) for p in plist] for term, plist in entry["postings"].items()}
+                sources[source] = SourceIndex(chunks, postings, entry["lengths"], versions[source])
+                continue
+            chunks = []
+            for name, path in docs:
+                if path is None:
+                    text = BUILTIN_GUIDELINES[source]
+                else:
+                    with open(path, encoding="utf-8") as f:
+                        text = f.read()
+                chunks.extend(Chunk(source, name, chunk) for chunk in chunk_document(text, chunk_words))
+            sources[source] = SourceIndex.build(chunks, versions[source])
+            rebuilt = True
+
+        corpus = cls(sources)
+        if index_path and (rebuilt or set(stored) != set(sources)):
+            try:
+                corpus.save(index_path)
+            except OSError as e:
+                # The index is only a startup shortcut; it is rebuilt next time
+                print(f"Could not persist guideline index {index_path}: {e}")
+        return corpus
+
+    def save(self, index_path: str) -> None:
+        """
+        Writes the index to index_path (atomically, through a temporary file).
+        """
+        directory = os.path.dirname(index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = {"format": INDEX_FORMAT, "sources": {
+            source: {
+                "version": index.version,
+                "chunks": [[chunk.document, chunk.text] for chunk in index.chunks],
+                "postings": index.postings,
+                "lengths": index.lengths,
+            }
+            for source, index in self.sources.items()
+        }}
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, index_path)
+
+    def has_source(self, source: str) -> bool:
+        return source.upper() in self.sources
+
+    def version(self, source: str) -> Optional[str]:
+        """
+        Returns the fingerprint of a source's documents (None for unknown sources).
+        """
+        index = self.sources.get(source.upper())
+        return index.version if index else None
+
+    def full_text(self, source: str) -> Optional[str]:
+        """
+        Returns all the chunks of a source joined back together.
+        """
+        index = self.sources.get(source.upper())
+        return "\n".join(chunk.text for chunk in index.chunks) if index else None
+
+    def search(self, source: str, query: str, k: int = GUIDELINE_TOP_K) -> List[Chunk]:
+        """
+        Returns the k chunks of a source most relevant to the query.
+
+        When no chunk shares a term with the query, the source's first k chunks
+        (the start of its documents) are returned instead.
+
+        Args:
+            source: Guideline source
+            query: User's question
+            k: Maximum number of chunks
+
+        Returns:
+            List[Chunk]: Relevant chunks (empty for unknown sources)
+        """
+        index = self.sources.get(source.upper())
+        if index is None:
+            return []
+        return index.search(query, k) or index.chunks[:k]
+
+# Singleton instance, loaded on first use (or at startup) so importing the app touches no files
+_guideline_corpus: Optional[GuidelineCorpus] = None
+_guideline_corpus_lock = threading.Lock()
+
+def get_guideline_corpus() -> GuidelineCorpus:
+    """
+    Returns the guideline corpus, loading it (and persisting its index) on the first call.
+    """
+    global _guideline_corpus
+    if _guideline_corpus is None:
+        with _guideline_corpus_lock:
+            if _guideline_corpus is None:
+                _guideline_corpus = GuidelineCorpus.load()
+    return _guideline_corpus
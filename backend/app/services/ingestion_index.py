@@ -0,0 +1,444 @@
+import bisect
+from array import array
+import heapq
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from dotenv import load_dotenv
+import numpy as np
+
+from app.services.segment_log import SegmentLog, to_micros
+from app.services.semantic_cache import normalize_query
+
+# Load environment variables
+load_dotenv()
+
+# Most vocabulary terms a prefix query (e.g. hinchaz*) expands to
+INGESTION_SEARCH_MAX_EXPANSIONS = int(os.environ.get("INGESTION_SEARCH_MAX_EXPANSIONS", "256"))
+
+# Ingestion kinds, stored per document as their position in this tuple
+KINDS = ("text", "vision")
+# Fields of each kind that are searchable
+SEARCH_FIELDS = {"text": ("content",), "vision": ("caption", "additional_text")}
+# Positions are stored as uint16: only the first MAX_POSITION terms of a document are indexed
+MAX_POSITION = 65535
+# Filter terms (kind, metadata) start with a character normalize_query never produces
+FILTER_MARK = "\x1f"
+
+_QUERY_PART = re.compile(r'"([^"]*)"|(\S+)')
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into case- and accent-folded terms ("Hinchazón" -> "hinchazon").
+    """
+    return normalize_query(text).split()
+
+def filter_term(key: str, value: str) -> str:
+    return f"{FILTER_MARK}{key}={value}"
+
+class ParsedQuery(NamedTuple):
+    terms: List[str]
+    prefixes: List[str]
+    phrases: List[List[str]]
+
+def parse_query(query: str) -> ParsedQuery:
+    """
+    Parses a search query.
+
+    Words are required terms, a word ending in * matches any term starting
+    with it, and text between double quotes must appear as a phrase (its terms
+    consecutive and in order).
+
+    Args:
+        query: Search query
+
+    Returns:
+        ParsedQuery: Required terms, prefixes and phrases, all folded
+    """
+    terms: List[str] = []
+    prefixes: List[str] = []
+    phrases: List[List[str]] = []
+    for phrase, word in _QUERY_PART.findall(query):
+        if phrase:
+            folded = tokenize(phrase)
+            if len(folded) > 1:
+                phrases.append(folded)
+            else:
+                terms.extend(folded)
+            continue
+        folded = tokenize(word)
+        if word.endswith("*") and folded:
+            prefixes.append(folded.pop())
+        terms.extend(folded)
+    return ParsedQuery(terms, prefixes, phrases)
+
+class _Column:
+    """
+    Growable NumPy array (capacity doubling); view() returns the filled part without copying.
+    """
+
+    __slots__ = ("data", "size")
+
+    def __init__(self, dtype, capacity: int = 4):
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def _reserve(self, extra: int) -> None:
+        if self.size + extra > len(self.data):
+            grown = np.empty(max(2 * len(self.data), self.size + extra), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+
+    def append(self, value) -> None:
+        if self.size == len(self.data):
+            self._reserve(1)
+        self.data[self.size] = value
+        self.size += 1
+
+    def view(self) -> np.ndarray:
+        return self.data[:self.size]
+
+    def retain(self, keep: np.ndarray) -> None:
+        values = self.view()[keep]
+        self.data = np.empty(max(4, len(values)), dtype=self.data.dtype)
+        self.data[:len(values)] = values
+        self.size = len(values)
+
+class _Postings:
+    """
+    Postings of one term: ascending document ids and, per document, the
+    positions of the term (positions[starts[i]:starts[i + 1]] for docs[i]).
+    Filter terms have no positions. Positions are only read a document at a
+    time, so they are kept in plain arrays, which are cheaper to append to.
+    """
+
+    __slots__ = ("docs", "starts", "positions")
+
+    def __init__(self, positional: bool = True):
+        self.docs = _Column(np.uint32)
+        self.starts: Optional[array] = array("I", [0]) if positional else None
+        self.positions: Optional[array] = array("H") if positional else None
+
+    def add(self, doc: int, positions: List[int]) -> None:
+        self.docs.append(doc)
+        if self.positions is not None:
+            self.positions.extend(positions)
+            self.starts.append(len(self.positions))
+
+    def retain(self, keep: np.ndarray, renumber: np.ndarray) -> None:
+        """
+        Drops the documents whose keep flag is False and renumbers the others.
+        """
+        docs = self.docs.view()
+        kept = keep[docs]
+        if self.positions is not None:
+            starts = np.frombuffer(self.starts, dtype=np.uint32)
+            positions = np.frombuffer(self.positions, dtype=np.uint16)
+            lengths = np.diff(starts)
+            self.positions = array("H", positions[np.repeat(kept, lengths)].tobytes())
+            self.starts = array("I", [0])
+            self.starts.frombytes(np.cumsum(lengths[kept], dtype=np.uint32).tobytes())
+        remaining = renumber[docs[kept]].astype(np.uint32)
+        self.docs = _Column(np.uint32, max(4, len(remaining)))
+        self.docs.data[:len(remaining)] = remaining
+        self.docs.size = len(remaining)
+
+    def positions_of(self, doc: int) -> array:
+        i = _find(self.docs.view(), doc)
+        return self.positions[self.starts[i]:self.starts[i + 1]]
+
+class SearchHit(NamedTuple):
+    kind: str
+    offset: int
+
+class SearchPage(NamedTuple):
+    hits: List[SearchHit]
+    # Document sequence number the next page continues below, None on the last page
+    next_cursor: Optional[int]
+
+def _find(docs: np.ndarray, doc: int) -> int:
+    # Searching with a Python int would make NumPy convert the whole array first
+    return int(np.searchsorted(docs, np.uint32(doc)))
+
+def _union(parts: List[np.ndarray]) -> np.ndarray:
+    if len(parts) == 1:
+        return parts[0]
+    return np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.uint32)
+
+def _window(arrays: List[np.ndarray], low: int, high: int) -> np.ndarray:
+    # Documents of any of the sorted arrays in [low, high)
+    return _union([docs[_find(docs, low):_find(docs, high)] for docs in arrays])
+
+def _tail_start(arrays: List[np.ndarray], low: int, high: int, k: int) -> int:
+    # Lowest of the k newest documents of the arrays in [low, high) (low if there are fewer)
+    tails = []
+    for docs in arrays:
+        end = _find(docs, high)
+        tails.append(docs[max(_find(docs, low), end - k):end])
+    tail = _union(tails)
+    return int(tail[-k]) if len(tail) >= k else low
+
+def _intersect(small: np.ndarray, large: np.ndarray) -> np.ndarray:
+    # Binary search of the smaller sorted array in the larger: O(small * log(large))
+    if not len(small) or not len(large):
+        return small[:0]
+    i = np.searchsorted(large, small)
+    i[i == len(large)] = 0
+    return small[large[i] == small]
+
+class IngestionIndex:
+    """
+    In-memory positional inverted index over the ingestion logs.
+
+    Every ingestion record is a document, numbered in ingestion order, and
+    its searchable fields are folded (case, accents) into terms. Each term
+    keeps the ascending ids of the documents it occurs in and its positions
+    within each one, in growable NumPy arrays, so adding a document only
+    appends to the postings of its terms. The kind and every metadata
+    key/value pair of a document are indexed as extra terms, so filters are
+    intersected like query terms.
+
+    A search walks back from the newest documents: it takes the newest
+    postings of its rarest term, intersects the other terms' postings in that
+    id range by binary search, checks phrases against the positions, and
+    widens the range until the page is full. Cost depends on the page size and
+    how rare the terms are, not on the number of documents. Documents store
+    their kind, log offset and append time; the records themselves stay in the
+    logs.
+
+    When the log retention deletes segments, forget_before drops their
+    documents and compacts the postings, so the index holds only what the logs
+    still hold. Cursors are document sequence numbers, which stay valid. The
+    index lives in memory and is rebuilt from the logs on start (catch_up),
+    which takes time proportional to the records the retention keeps.
+    """
+
+    def __init__(self, max_expansions: int = INGESTION_SEARCH_MAX_EXPANSIONS):
+        self.max_expansions = max_expansions
+        self.postings: Dict[str, _Postings] = {}
+        # Sorted vocabulary, for prefix queries
+        self.vocabulary: List[str] = []
+        self.kinds = _Column(np.uint8)
+        self.offsets = _Column(np.uint64)
+        self.timestamps = _Column(np.int64)
+        # Next log offset to index, per kind
+        self.indexed: Dict[str, int] = {kind: 0 for kind in KINDS}
+        # Lowest log offset still indexed, per kind
+        self.first: Dict[str, int] = {kind: 0 for kind in KINDS}
+        # Sequence number of every document, stable when older documents are
+        # dropped (search cursors refer to these)
+        self.sequence = _Column(np.uint64)
+        self._next_sequence = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.kinds.size
+
+    def _postings(self, term: str) -> _Postings:
+        postings = self.postings.get(term)
+        if postings is None:
+            positional = not term.startswith(FILTER_MARK)
+            postings = self.postings[term] = _Postings(positional)
+            if positional:
+                bisect.insort(self.vocabulary, term)
+        return postings
+
+    def add(self, kind: str, offset: int, timestamp: int, record: dict) -> None:
+        """
+        Indexes one ingestion record.
+
+        Args:
+            kind: 'text' or 'vision'
+            offset: Offset of the record in its log
+            timestamp: Append time of the record (microseconds since the epoch)
+            record: Deserialized ingestion record
+        """
+        positions: Dict[str, List[int]] = {}
+        position = 0
+        for field in SEARCH_FIELDS[kind]:
+            for term in tokenize(record.get(field) or ""):
+                if position > MAX_POSITION:
+                    break
+                positions.setdefault(term, []).append(position)
+                position += 1
+            # Phrases do not span fields
+            position += 1
+        positions[filter_term("kind", kind)] = []
+        for key, value in (record.get("metadata") or {}).items():
+            positions[filter_term(key, str(value))] = []
+
+        with self._lock:
+            if offset < self.indexed[kind]:
+                return
+            doc = self.kinds.size
+            self.sequence.append(self._next_sequence)
+            self._next_sequence += 1
+            self.kinds.append(KINDS.index(kind))
+            self.offsets.append(offset)
+            # Keeps append times non-decreasing across the two logs, so time ranges are id ranges
+            last = self.timestamps.data[self.timestamps.size - 1] if self.timestamps.size else timestamp
+            self.timestamps.append(max(timestamp, int(last)))
+            for term, term_positions in positions.items():
+                self._postings(term).add(doc, term_positions)
+            self.indexed[kind] = offset + 1
+
+    def forget_before(self, kind: str, first_offset: int) -> int:
+        """
+        Drops the documents of a kind below a log offset (records deleted by
+        the log retention) and compacts the postings.
+
+        Retention deletes whole segments, so this runs once per deleted
+        segment; it is a no-op while first_offset has not moved.
+
+        Args:
+            kind: 'text' or 'vision'
+            first_offset: First offset the log still holds
+
+        Returns:
+            int: Number of documents dropped
+        """
+        with self._lock:
+            if first_offset <= self.first[kind]:
+                return 0
+            self.first[kind] = first_offset
+            dropped = (self.kinds.view() == KINDS.index(kind)) & (self.offsets.view() < first_offset)
+            count = int(dropped.sum())
+            if not count:
+                return 0
+            keep = ~dropped
+            renumber = np.cumsum(keep) - 1
+            for term in list(self.postings):
+                postings = self.postings[term]
+                postings.retain(keep, renumber)
+                if not postings.docs.size:
+                    del self.postings[term]
+                    if not term.startswith(FILTER_MARK):
+                        del self.vocabulary[bisect.bisect_left(self.vocabulary, term)]
+            for column in (self.kinds, self.offsets, self.timestamps, self.sequence):
+                column.retain(keep)
+            return count
+
+    def catch_up(self, logs: Dict[str, SegmentLog], page_size: int = 1000) -> int:
+        """
+        Indexes the records of the logs that are not indexed yet, merged in
+        append-time order.
+
+        Args:
+            logs: Log of each kind
+            page_size: Records read from a log at a time
+
+        Returns:
+            int: Number of records indexed
+        """
+        def records(kind: str, log: SegmentLog) -> Iterator[Tuple[int, str, int, bytes]]:
+            start: Optional[int] = self.indexed[kind]
+            while start is not None:
+                page = log.read(start, page_size)
+                for record in page.records:
+                    yield record.timestamp, kind, record.offset, record.payload
+                start = page.next_offset
+
+        added = 0
+        for timestamp, kind, offset, payload in heapq.merge(*(records(kind, log) for kind, log in logs.items())):
+            self.add(kind, offset, timestamp, json.loads(payload))
+            added += 1
+        return added
+
+    def _docs(self, term: str) -> np.ndarray:
+        postings = self.postings.get(term)
+        return postings.docs.view() if postings is not None else np.empty(0, dtype=np.uint32)
+
+    def _expansions(self, prefix: str) -> List[np.ndarray]:
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + "\uffff", start)
+        return [self._docs(term) for term in self.vocabulary[start:min(end, start + self.max_expansions)]]
+
+    def _matches_phrase(self, doc: int, phrase: List[str]) -> bool:
+        starts = set(self.postings[phrase[0]].positions_of(doc))
+        for i, term in enumerate(phrase[1:], 1):
+            following = set(self.postings[term].positions_of(doc))
+            starts = {p for p in starts if p + i in following}
+            if not starts:
+                return False
+        return True
+
+    def search(
+        self,
+        query: str = "",
+        kind: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = 20,
+        cursor: Optional[int] = None,
+    ) -> SearchPage:
+        """
+        Returns the documents matching a query and filters, newest first.
+
+        Args:
+            query: Search query (see parse_query)
+            kind: Only documents of this kind
+            metadata: Only documents with these metadata values
+            start: Inclusive lower bound of the ingestion time
+            end: Exclusive upper bound of the ingestion time
+            limit: Maximum number of hits
+            cursor: Only documents older than this one (next_cursor of the previous page)
+
+        Returns:
+            SearchPage: Hits and the cursor of the next page
+
+        Raises:
+            ValueError: If neither a query term nor a filter is given
+        """
+        parsed = parse_query(query)
+        terms = set(parsed.terms)
+        for phrase in parsed.phrases:
+            terms.update(phrase)
+        if kind is not None:
+            terms.add(filter_term("kind", kind))
+        for key, value in (metadata or {}).items():
+            terms.add(filter_term(key, value))
+        if not terms and not parsed.prefixes:
+            raise ValueError("Search needs a query term or a filter")
+
+        with self._lock:
+            # Documents of each requirement: a term, or any expansion of a prefix
+            requirements = [[self._docs(term)] for term in terms]
+            requirements.extend(self._expansions(prefix) for prefix in parsed.prefixes)
+            requirements.sort(key=lambda arrays: sum(len(docs) for docs in arrays))
+
+            timestamps = self.timestamps.view()
+            low = int(np.searchsorted(timestamps, to_micros(start))) if start is not None else 0
+            high = int(np.searchsorted(timestamps, to_micros(end))) if end is not None else len(timestamps)
+            if cursor is not None:
+                high = min(high, int(np.searchsorted(self.sequence.view(), np.uint64(cursor))))
+
+            # Newest first, over a window holding the k newest documents of the
+            # rarest requirement, widened until the page is full
+            found: List[int] = []
+            k = 4 * (limit + 1)
+            while high > low and len(found) <= limit:
+                window_start = _tail_start(requirements[0], low, high, k)
+                candidates = _window(requirements[0], window_start, high)
+                for arrays in requirements[1:]:
+                    candidates = _intersect(candidates, _window(arrays, window_start, high))
+                for doc in candidates[::-1].tolist():
+                    if all(self._matches_phrase(doc, phrase) for phrase in parsed.phrases):
+                        found.append(doc)
+                        if len(found) > limit:
+                            break
+                high = window_start
+                k *= 2
+            hits = [SearchHit(KINDS[self.kinds.data[doc]], int(self.offsets.data[doc])) for doc in found[:limit]]
+            next_cursor = int(self.sequence.data[found[limit - 1]]) if len(found) > limit else None
+        return SearchPage(hits, next_cursor)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the number of indexed documents and terms.
+        """
+        with self._lock:
+            return {"documents": len(self), "terms": len(self.vocabulary)}
@@ -0,0 +1,257 @@
+import asyncio
+import heapq
+import itertools
+import os
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+from litellm import acompletion
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+# Slots only alert messages may use, so they never wait behind other traffic
+LLM_RESERVED_ALERT_SLOTS = int(os.environ.get("LLM_RESERVED_ALERT_SLOTS", "1"))
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", "30"))
+# 'litellm', or 'fake' for a local stand-in that answers after LLM_FAKE_LATENCY_SECONDS
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "litellm").lower()
+LLM_FAKE_LATENCY_SECONDS = float(os.environ.get("LLM_FAKE_LATENCY_SECONDS", "0.5"))
+
+# Priority classes, most urgent first
+PRIORITY_ALERT = 0
+PRIORITY_GUIDELINES = 1
+PRIORITY_RECOMMENDATIONS = 2
+
+class PriorityLimiter:
+    """
+    Concurrency limiter granting free slots to the most urgent waiter first.
+
+    At most limit holders run at once; waiters are served by priority (lower
+    value first) and then in arrival order. The reserved slots can only be
+    taken by PRIORITY_ALERT, so a burst of lower priority calls never occupies
+    every slot.
+    """
+
+    def __init__(self, limit: int, reserved: int = 0):
+        self.limit = limit
+        self.reserved = min(reserved, limit - 1) if limit > 1 else 0
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def _capacity(self, priority: int) -> int:
+        return self.limit if priority <= PRIORITY_ALERT else self.limit - self.reserved
+
+    def _dispatch(self) -> None:
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():  # cancelled while waiting
+                heapq.heappop(self._waiters)
+                continue
+            if self.active >= self._capacity(priority):
+                break
+            heapq.heappop(self._waiters)
+            self.active += 1
+            future.set_result(None)
+
+    async def acquire(self, priority: int) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was granted just before the cancellation
+                self.release()
+            raise
+
+    def release(self) -> None:
+        self.active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: int) -> AsyncIterator[None]:
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+class FakeLLM:
+    """
+    Local stand-in for litellm.acompletion: answers every prompt with a canned
+    reply after a fixed latency, without any network access. With stream=True
+    the reply is streamed word by word, token_delay apart. Counts the calls it
+    received and the streams abandoned before their end (tests and benchmarks).
+    """
+
+    def __init__(
+        self,
+        reply: str = "Respuesta simulada.",
+        latency: float = LLM_FAKE_LATENCY_SECONDS,
+        token_delay: float = 0.0,
+    ):
+        self.reply = reply
+        self.latency = latency
+        self.token_delay = token_delay
+        self.calls = 0
+        self.abandoned = 0
+
+    async def __call__(self, model: str, messages: List[dict], stream: bool = False, **kwargs: Any) -> Any:
+        self.calls += 1
+        if stream:
+            return self._stream()
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.reply))])
+
+    async def _stream(self) -> AsyncIterator[Any]:
+        finished = False
+        try:
+            await asyncio.sleep(self.latency)
+            for i, word in enumerate(self.reply.split(" ")):
+                if i:
+                    await asyncio.sleep(self.token_delay)
+                token = word if i == 0 else " " + word
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+            finished = True
+        finally:
+            if not finished:
+                self.abandoned += 1
+
+class LLMClient:
+    """
+    Non-blocking access to the language model shared by every AI feature.
+
+    Completions go through litellm's async API (never the blocking
+    completion()), each call has a timeout, and a PriorityLimiter caps the calls
+    in flight so alert messages are served before guideline and recommendation
+    traffic. As with the WhatsApp client, the limiter belongs to the event loop
+    that first used it and is recreated when the loop changes.
+    """
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        complete_fn: Optional[Callable[..., Awaitable[Any]]] = None,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        reserved_alert_slots: int = LLM_RESERVED_ALERT_SLOTS,
+        timeout: float = LLM_TIMEOUT_SECONDS,
+    ):
+        """
+        Args:
+            model: Model name (LLM_MODEL by default)
+            complete_fn: Async completion function with litellm.acompletion's signature
+            max_concurrency: Maximum number of calls in flight
+            reserved_alert_slots: Slots kept free for alert messages
+            timeout: Seconds allowed for a whole call, including the wait for a slot
+        """
+        self.model = model or os.environ.get("LLM_MODEL", "gpt-3.5-turbo")
+        self.complete_fn = complete_fn or acompletion
+        self.max_concurrency = max_concurrency
+        self.reserved_alert_slots = reserved_alert_slots
+        self.timeout = timeout
+        self._limiter: Optional[PriorityLimiter] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def limiter(self) -> PriorityLimiter:
+        loop = asyncio.get_running_loop()
+        if self._limiter is None or self._loop is not loop:
+            self._limiter = PriorityLimiter(self.max_concurrency, self.reserved_alert_slots)
+            self._loop = loop
+        return self._limiter
+
+    async def complete(self, prompt: str, max_tokens: int, priority: int) -> str:
+        """
+        Sends a prompt (as the system message) and returns the stripped reply.
+
+        Args:
+            prompt: Prompt text
+            max_tokens: Maximum tokens to generate
+            priority: Priority class (PRIORITY_*)
+
+        Returns:
+            str: Model reply
+
+        Raises:
+            asyncio.TimeoutError: If the call did not finish within the timeout
+            Exception: Any error raised by the completion function
+        """
+        async def call() -> str:
+            async with self.limiter.slot(priority):
+                response = await self.complete_fn(
+                    model=self.model,
+                    messages=[{"role": "system", "content": prompt}],
+                    max_tokens=max_tokens,
+                    timeout=self.timeout
+                )
+            return response.choices[0].message.content.strip()
+
+        return await asyncio.wait_for(call(), timeout=self.timeout)
+
+    async def stream(self, prompt: str, max_tokens: int, priority: int) -> AsyncIterator[str]:
+        """
+        Sends a prompt (as the system message) and yields the reply's tokens as
+        the model produces them.
+
+        The limiter slot is held until the stream ends. The timeout bounds the
+        wait for a slot and for each token; closing the generator early (e.g.
+        because the client went away) closes the upstream stream too.
+
+        Args:
+            prompt: Prompt text
+            max_tokens: Maximum tokens to generate
+            priority: Priority class (PRIORITY_*)
+
+        Yields:
+            str: Reply text fragments
+
+        Raises:
+            asyncio.TimeoutError: If no slot or no token arrived within the timeout
+            Exception: Any error raised by the completion function
+        """
+        limiter = self.limiter
+        await asyncio.wait_for(limiter.acquire(priority), timeout=self.timeout)
+        try:
+            response = await asyncio.wait_for(self.complete_fn(
+                model=self.model,
+                messages=[{"role": "system", "content": prompt}],
+                max_tokens=max_tokens,
+                timeout=self.timeout,
+                stream=True
+            ), timeout=self.timeout)
+            chunks = response.__aiter__()
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                    except StopAsyncIteration:
+                        break
+                    token = chunk.choices[0].delta.content if chunk.choices else None
+                    if token:
+                        yield token
+            finally:
+                close = getattr(chunks, "aclose", None)
+                if close is not None:
+                    await close()
+        finally:
+            limiter.release()
+
+def create_llm_client() -> LLMClient:
+    """
+    Creates the LLM client configured through environment variables
+    (LLM_BACKEND selects 'litellm' or the local 'fake').
+
+    Returns:
+        LLMClient: Configured client
+    """
+    if LLM_BACKEND == "fake":
+        return LLMClient(complete_fn=FakeLLM())
+    return LLMClient()
@@ -0,0 +1,265 @@
+import math
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Iterable, Sequence, Tuple
+
+from app.models import Measurement
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Flag bits stored per row
+_NAIVE_TIMESTAMP = 1
+_NO_SYMPTOMS = 2
+
+def to_epoch_micros(timestamp: datetime) -> int:
+    """
+    Converts a datetime to integer microseconds since the epoch (naive values are treated as UTC).
+    """
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return (timestamp - _EPOCH) // _MICROSECOND
+
+def from_epoch_micros(micros: int) -> datetime:
+    """
+    Converts integer microseconds since the epoch to an aware UTC datetime.
+    """
+    return _EPOCH + timedelta(microseconds=micros)
+
+class SymptomTable:
+    """
+    Interns symptom strings into small integer ids shared by every series.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+
+    def intern(self, name: str) -> int:
+        """
+        Returns the id for a symptom, registering it on first use.
+        """
+        symptom_id = self._ids.get(name)
+        if symptom_id is None:
+            symptom_id = len(self._names)
+            self._ids[name] = symptom_id
+            self._names.append(name)
+        return symptom_id
+
+    def name(self, symptom_id: int) -> str:
+        return self._names[symptom_id]
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+# Symptom vocabulary shared by all patients
+symptom_table = SymptomTable()
+
+class MeasurementSeries:
+    """
+    Columnar, array-backed measurement history for one patient.
+
+    Each Measurement field lives in a typed array, symptoms are stored as interned
+    ids in a flat array with per-row offsets, source ingestion ids (set on few
+    rows) in a dict by row, and Measurement objects are only
+    built when a reading is read back (at the API boundary). Rows keep their
+    append order, so index -1 is always the most recent reading.
+
+    Time-range reads are answered by binary search. While readings arrive in
+    timestamp order the rows themselves are searched; once an out-of-order
+    reading is appended, a permutation of row indices sorted by (timestamp, row)
+    is kept up to date instead.
+    """
+
+    __slots__ = (
+        "timestamps", "utc_offsets", "flags", "peso", "presion_sistolica",
+        "presion_diastolica", "frecuencia_cardiaca", "saturacion_oxigeno",
+        "symptom_offsets", "symptom_ids", "symptoms", "sources", "_time_order",
+    )
+
+    def __init__(self, measurements: Iterable[Measurement] = (), symptoms: SymptomTable = symptom_table):
+        self.timestamps = array("q")          # microseconds since the epoch (UTC)
+        self.utc_offsets = array("h")         # minutes east of UTC
+        self.flags = array("B")
+        self.peso = array("d")
+        self.presion_sistolica = array("d")
+        self.presion_diastolica = array("d")
+        self.frecuencia_cardiaca = array("d")
+        self.saturacion_oxigeno = array("d")  # NaN when not reported
+        self.symptom_offsets = array("I", [0])
+        self.symptom_ids = array("I")
+        self.symptoms = symptoms
+        # Source ingestion id by row, for the few readings extracted from a message
+        self.sources: Dict[int, str] = {}
+        self._time_order: Optional[array] = None
+        self.extend(measurements)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def append(self, measurement: Measurement) -> None:
+        """
+        Appends a measurement to the end of the series.
+        """
+        flags = 0
+        ts = measurement.timestamp
+        if ts.tzinfo is None:
+            flags |= _NAIVE_TIMESTAMP
+            offset = 0
+        else:
+            offset = int(ts.utcoffset().total_seconds() // 60)
+        micros = to_epoch_micros(ts)
+        row = len(self.timestamps)
+        self.timestamps.append(micros)
+        self.utc_offsets.append(offset)
+        self.peso.append(measurement.peso)
+        self.presion_sistolica.append(measurement.presion_sistolica)
+        self.presion_diastolica.append(measurement.presion_diastolica)
+        self.frecuencia_cardiaca.append(measurement.frecuencia_cardiaca)
+        self.saturacion_oxigeno.append(
+            math.nan if measurement.saturacion_oxigeno is None else measurement.saturacion_oxigeno
+        )
+        if measurement.sintomas is None:
+            flags |= _NO_SYMPTOMS
+        else:
+            self.symptom_ids.extend(self.symptoms.intern(s) for s in measurement.sintomas)
+        self.symptom_offsets.append(len(self.symptom_ids))
+        self.flags.append(flags)
+        if measurement.source_ingestion_id is not None:
+            self.sources[row] = measurement.source_ingestion_id
+
+        if self._time_order is not None:
+            insort(self._time_order, row, key=self._sort_key)
+        elif row and micros < self.timestamps[row - 1]:
+            self._time_order = array("I", sorted(range(row + 1), key=self._sort_key))
+
+    def _sort_key(self, row: int) -> Tuple[int, int]:
+        return self.timestamps[row], row
+
+    def _rows_by_time(self) -> Sequence[int]:
+        return range(len(self.timestamps)) if self._time_order is None else self._time_order
+
+    def range_rows(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        after: Optional[Tuple[int, int]] = None,
+        limit: Optional[int] = None,
+    ) -> List[int]:
+        """
+        Returns row indices in timestamp order, restricted by binary search.
+
+        Args:
+            start: Inclusive lower timestamp bound
+            end: Exclusive upper timestamp bound
+            after: (epoch microseconds, row) key of the last row already returned
+            limit: Maximum number of rows
+
+        Returns:
+            List[int]: Row indices ordered by (timestamp, row)
+        """
+        order = self._rows_by_time()
+        lo, hi = 0, len(order)
+        timestamp_of = self.timestamps.__getitem__
+        if start is not None:
+            lo = bisect_left(order, to_epoch_micros(start), key=timestamp_of)
+        if end is not None:
+            hi = bisect_left(order, to_epoch_micros(end), key=timestamp_of)
+        if after is not None:
+            lo = max(lo, bisect_right(order, tuple(after), key=self._sort_key))
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return list(order[lo:hi]) if lo < hi else []
+
+    def rows_after(self, micros: int) -> List[int]:
+        """
+        Returns the rows with timestamps strictly after the given epoch microseconds, in (timestamp, row) order.
+        """
+        order = self._rows_by_time()
+        lo = bisect_right(order, micros, key=self.timestamps.__getitem__)
+        return list(order[lo:])
+
+    def cursor_key(self, row: int) -> Tuple[int, int]:
+        """
+        Returns the stable (epoch microseconds, row) pagination key of a row.
+        """
+        return self._sort_key(row)
+
+    def extend(self, measurements: Iterable[Measurement]) -> None:
+        for measurement in measurements:
+            self.append(measurement)
+
+    def measurement(self, index: int) -> Measurement:
+        """
+        Builds the Measurement stored at the given (possibly negative) index.
+
+        Raises:
+            IndexError: If the index is out of range
+        """
+        n = len(self.timestamps)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("measurement index out of range")
+
+        flags = self.flags[index]
+        timestamp = _EPOCH + timedelta(microseconds=self.timestamps[index])
+        if flags & _NAIVE_TIMESTAMP:
+            timestamp = timestamp.replace(tzinfo=None)
+        else:
+            timestamp = timestamp.astimezone(timezone(timedelta(minutes=self.utc_offsets[index])))
+
+        saturacion = self.saturacion_oxigeno[index]
+        # Values were validated on the way in, so skip re-validation
+        return Measurement.model_construct(
+            timestamp=timestamp,
+            peso=self.peso[index],
+            presion_sistolica=self.presion_sistolica[index],
+            presion_diastolica=self.presion_diastolica[index],
+            frecuencia_cardiaca=self.frecuencia_cardiaca[index],
+            saturacion_oxigeno=None if math.isnan(saturacion) else saturacion,
+            sintomas=self._symptoms_at(index),
+            source_ingestion_id=self.sources.get(index),
+        )
+
+    def _symptoms_at(self, index: int) -> Optional[List[str]]:
+        if self.flags[index] & _NO_SYMPTOMS:
+            return None
+        start, end = self.symptom_offsets[index], self.symptom_offsets[index + 1]
+        return [self.symptoms.name(i) for i in self.symptom_ids[start:end]]
+
+    def latest_symptoms(self) -> Optional[List[str]]:
+        """
+        Returns the symptoms of the most recent reading (None if none were reported or the series is empty).
+        """
+        if not self.timestamps:
+            return None
+        return self._symptoms_at(len(self.timestamps) - 1)
+
+    def slice(self, start: int, stop: int) -> List[Measurement]:
+        """
+        Builds the measurements in the half-open index range [start, stop).
+        """
+        start, stop, _ = slice(start, stop).indices(len(self.timestamps))
+        return [self.measurement(i) for i in range(start, stop)]
+
+    def tail(self, n: Optional[int]) -> List[Measurement]:
+        """
+        Builds the last n measurements in append order (all of them if n is None).
+        """
+        if n is None:
+            return self.slice(0, len(self.timestamps))
+        return self.slice(max(len(self.timestamps) - n, 0), len(self.timestamps))
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate memory used by the column buffers.
+        """
+        columns = (
+            self.timestamps, self.utc_offsets, self.flags, self.peso, self.presion_sistolica,
+            self.presion_diastolica, self.frecuencia_cardiaca, self.saturacion_oxigeno,
+            self.symptom_offsets, self.symptom_ids,
+        )
+        return sum(c.buffer_info()[1] * c.itemsize for c in columns)
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.models import Alert, Patient
+
+# Load environment variables
+load_dotenv()
+
+ALERT_MESSAGE_CACHE_SIZE = int(os.environ.get("ALERT_MESSAGE_CACHE_SIZE", "1024"))
+ALERT_MESSAGE_CACHE_TTL_HOURS = float(os.environ.get("ALERT_MESSAGE_CACHE_TTL_HOURS", "24"))
+# SQLite file backing the cache; empty keeps it in memory only
+ALERT_MESSAGE_CACHE_PATH = os.environ.get("ALERT_MESSAGE_CACHE_PATH", "")
+
+# Placeholder the LLM is asked to write instead of the patient's name
+NAME_PLACEHOLDER = "{nombre}"
+
+# Bucket widths of the vitals in the cache key (and in the prompt built from it)
+VITAL_BUCKETS = (
+    ("presion_sistolica", 10.0),
+    ("presion_diastolica", 10.0),
+    ("frecuencia_cardiaca", 10.0),
+    ("peso", 5.0),
+    ("saturacion_oxigeno", 2.0),
+)
+AGE_BUCKET = 10.0
+
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+def bucket(value: float, width: float) -> str:
+    """
+    Returns the range of the given width containing value, e.g. '190-200'.
+    """
+    low = (value // width) * width
+    return f"{low:g}-{low + width:g}"
+
+def _bucket_number(match: re.Match) -> str:
+    value = float(match.group())
+    return bucket(value, 10.0 if value >= 20 else 1.0)
+
+def normalize_alert(alert: Alert) -> Tuple[str, str]:
+    """
+    Replaces the readings quoted in an alert message by their ranges, so alerts
+    of the same kind and magnitude normalize to the same text.
+
+    Args:
+        alert: Alert object
+
+    Returns:
+        Tuple[str, str]: Level and normalized message
+    """
+    return alert.nivel, _NUMBER.sub(_bucket_number, alert.mensaje)
+
+def alert_message_context(patient: Patient, alerts: List[Alert]) -> Dict[str, Any]:
+    """
+    Builds the normalized clinical state an alert message is generated from:
+    normalized alerts, bucketed age and vitals of the latest measurement and its
+    symptoms. The patient's name is deliberately left out.
+
+    Args:
+        patient: Patient object
+        alerts: Alerts to notify
+
+    Returns:
+        Dict[str, Any]: JSON-serializable context
+    """
+    latest = patient.measurements[-1] if patient.measurements else None
+    vitals: Dict[str, str] = {}
+    symptoms: List[str] = []
+    if latest is not None:
+        for field, width in VITAL_BUCKETS:
+            value = getattr(latest, field)
+            if value is not None:
+                vitals[field] = bucket(value, width)
+        symptoms = sorted({s.strip().lower() for s in latest.sintomas or [] if s.strip()})
+    return {
+        "alerts": sorted(normalize_alert(a) for a in alerts),
+        "age": bucket(patient.edad, AGE_BUCKET),
+        "vitals": vitals,
+        "symptoms": symptoms,
+    }
+
+def context_key(context: Dict[str, Any]) -> str:
+    """
+    Returns the cache key of a normalized context.
+    """
+    payload = json.dumps(context, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+def first_name(patient: Patient) -> str:
+    parts = patient.nombre.split()
+    return parts[0] if parts else patient.nombre
+
+def render(template: str, patient: Patient) -> str:
+    """
+    Substitutes the patient's first name into a cached message template.
+    """
+    return template.replace(NAME_PLACEHOLDER, first_name(patient))
+
+class MessageCache:
+    """
+    LRU cache of generated message templates with a time to live.
+
+    Entries are evicted least recently used first once max_entries is reached,
+    and expire ttl_seconds after they were stored. With a path, entries are
+    written through to a SQLite file and the unexpired ones are loaded back
+    when the cache is created, so templates survive restarts.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS message_cache (
+        key TEXT PRIMARY KEY,
+        template TEXT NOT NULL,
+        stored_at REAL NOT NULL
+    );
+    """
+    SELECT_ENTRIES = "SELECT key, template, stored_at FROM message_cache WHERE stored_at > ? ORDER BY stored_at DESC LIMIT ?"
+    DELETE_EXPIRED = "DELETE FROM message_cache WHERE stored_at <= ?"
+    UPSERT_ENTRY = "INSERT OR REPLACE INTO message_cache (key, template, stored_at) VALUES (?, ?, ?)"
+    DELETE_ENTRY = "DELETE FROM message_cache WHERE key = ?"
+
+    def __init__(
+        self,
+        max_entries: int = ALERT_MESSAGE_CACHE_SIZE,
+        ttl_seconds: float = ALERT_MESSAGE_CACHE_TTL_HOURS * 3600,
+        path: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            max_entries: Maximum number of templates kept
+            ttl_seconds: Lifetime of a template
+            path: SQLite file backing the cache (memory only when None)
+            clock: Time source (tests)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()  # key -> (template, stored at)
+        self._counters = dict.fromkeys(("hits", "misses", "evictions", "expirations"), 0)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(self.SCHEMA)
+            self._load()
+
+    def _load(self) -> None:
+        cutoff = self.clock() - self.ttl_seconds
+        with self._conn:
+            self._conn.execute(self.DELETE_EXPIRED, (cutoff,))
+            rows = self._conn.execute(self.SELECT_ENTRIES, (cutoff, self.max_entries)).fetchall()
+        # Oldest first, so the most recent entries end up most recently used
+        for key, template, stored_at in reversed(rows):
+            self._entries[key] = (template, stored_at)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the template stored under key, or None if missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() - entry[1] >= self.ttl_seconds:
+                self._remove(key)
+                self._counters["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[0]
+
+    def put(self, key: str, template: str) -> None:
+        """
+        Stores a template, evicting the least recently used entries over max_entries.
+        """
+        stored_at = self.clock()
+        with self._lock:
+            self._entries[key] = (template, stored_at)
+            self._entries.move_to_end(key)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(self.UPSERT_ENTRY, (key, template, stored_at))
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._counters["evictions"] += 1
+
+    def _remove(self, key: str) -> None:
+        del self._entries[key]
+        if self._conn is not None:
+            with self._conn:
+                self._conn.execute(self.DELETE_ENTRY, (key,))
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns hit, miss, eviction and expiration counts and the number of entries.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats["size"] = len(self._entries)
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM message_cache")
+            for counter in self._counters:
+                self._counters[counter] = 0
+
+def create_message_cache() -> MessageCache:
+    """
+    Creates the alert message cache configured through environment variables
+    (ALERT_MESSAGE_CACHE_SIZE, ALERT_MESSAGE_CACHE_TTL_HOURS and, for disk
+    backing, ALERT_MESSAGE_CACHE_PATH).
+
+    Returns:
+        MessageCache: Configured cache
+    """
+    return MessageCache(path=ALERT_MESSAGE_CACHE_PATH or None)
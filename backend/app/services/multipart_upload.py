@@ -0,0 +1,160 @@
+from typing import AsyncIterator, Callable, Dict, NamedTuple, Optional
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from app.services.blob_store import BlobInfo, BlobStore, BlobTooLarge, BlobWriter
+
+# Largest accepted text field of a multipart upload
+MAX_FIELD_BYTES = 64 * 1024
+
+class MultipartError(Exception):
+    """
+    Raised when a multipart body is malformed or not the expected upload.
+    """
+
+class MultipartUpload(NamedTuple):
+    fields: Dict[str, str]
+    blob: Optional[BlobInfo]
+    filename: Optional[str]
+    declared_type: Optional[str]
+
+class _UploadParser:
+    """
+    Callbacks of python-multipart's push parser: text fields are collected in
+    memory (up to MAX_FIELD_BYTES each), the bytes of the file field go
+    straight to a BlobWriter.
+    """
+
+    def __init__(self, store: BlobStore, file_field: str):
+        self.store = store
+        self.file_field = file_field
+        self.fields: Dict[str, str] = {}
+        self.writer: Optional[BlobWriter] = None
+        self.filename: Optional[str] = None
+        self.declared_type: Optional[str] = None
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_name = b""
+        self._header_value = b""
+        self._name: Optional[str] = None
+        self._data = bytearray()
+        self._is_file = False
+        self.complete = False
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+        self._name = None
+        self._data = bytearray()
+        self._is_file = False
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if b"name" not in options:
+            raise MultipartError('Every part needs a Content-Disposition "name"')
+        self._name = options[b"name"].decode("utf-8", "replace")
+        if b"filename" not in options:
+            return
+        if self._name != self.file_field or self.writer is not None:
+            raise MultipartError(f"Only one file is accepted, in field '{self.file_field}'")
+        self._is_file = True
+        self.filename = options[b"filename"].decode("utf-8", "replace")
+        declared = self._headers.get(b"content-type")
+        self.declared_type = declared.decode("latin-1").strip() if declared else None
+        self.writer = self.store.writer()
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._is_file:
+            self.writer.write(data[start:end])
+            return
+        if len(self._data) + end - start > MAX_FIELD_BYTES:
+            raise MultipartError(f"Field '{self._name}' exceeds {MAX_FIELD_BYTES} bytes")
+        self._data += data[start:end]
+
+    def on_part_end(self) -> None:
+        if not self._is_file:
+            self.fields[self._name] = self._data.decode("utf-8", "replace")
+
+    def on_end(self) -> None:
+        self.complete = True
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_end": self.on_end,
+        }
+
+async def receive_upload(
+    content_type: str,
+    chunks: AsyncIterator[bytes],
+    store: BlobStore,
+    file_field: str = "file",
+    check_fields: Optional[Callable[[Dict[str, str]], object]] = None,
+) -> MultipartUpload:
+    """
+    Parses a multipart/form-data body as it arrives, streaming the file field
+    into the blob store.
+
+    The body is fed to the parser chunk by chunk and the file's bytes are
+    hashed and written to disk as they are parsed, so memory stays bounded by
+    the chunk size whatever the size of the file. The blob is committed only
+    once the whole body was parsed and check_fields accepted the text fields
+    (which may follow the file in the body); on any error the partial file is
+    removed, so a rejected upload leaves nothing in the store.
+
+    Args:
+        content_type: Content-Type header of the request (with the boundary)
+        chunks: Request body chunks
+        store: Blob store receiving the file
+        file_field: Name of the file field
+        check_fields: Validates the text fields before the blob is committed;
+            whatever it raises is propagated unchanged
+
+    Returns:
+        MultipartUpload: Text fields, the stored blob (None if no file was sent),
+            its file name and declared content type
+
+    Raises:
+        MultipartError: If the body is malformed
+        BlobTooLarge: If the file exceeds the store's maximum size
+    """
+    _, params = parse_options_header(content_type)
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise MultipartError("Missing multipart boundary")
+    upload = _UploadParser(store, file_field)
+    parser = MultipartParser(boundary, upload.callbacks())
+    try:
+        async for chunk in chunks:
+            parser.write(chunk)
+        parser.finalize()
+        if not upload.complete:
+            raise MultipartError("Incomplete multipart body")
+    except Exception as e:
+        if upload.writer is not None:
+            upload.writer.abort()
+        if isinstance(e, (MultipartError, BlobTooLarge)):
+            raise
+        raise MultipartError(f"Malformed multipart body: {e}") from e
+    try:
+        if check_fields is not None:
+            check_fields(upload.fields)
+        blob = upload.writer.commit() if upload.writer is not None else None
+    except BaseException:
+        if upload.writer is not None:
+            upload.writer.abort()
+        raise
+    return MultipartUpload(upload.fields, blob, upload.filename, upload.declared_type)
@@ -0,0 +1,341 @@
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.models import Alert, NotificationJob
+
+# Load environment variables
+load_dotenv()
+
+PENDING, IN_FLIGHT, SENT, FAILED = "pending", "in_flight", "sent", "failed"
+
+class NotificationOutbox(ABC):
+    """
+    Queue of patient notifications waiting to be delivered.
+
+    Requests only enqueue jobs; the notification workers claim due jobs, deliver
+    them and record the outcome. A claimed job is in flight until it is finished
+    or rescheduled; jobs left in flight by a stopped process are returned to the
+    queue by recover().
+    """
+
+    @abstractmethod
+    def enqueue(self, patient_id: str, destination: str, alerts: List[Alert]) -> NotificationJob:
+        """
+        Adds a job, due immediately.
+        """
+
+    @abstractmethod
+    def claim(self, now: float, limit: int = 1) -> List[NotificationJob]:
+        """
+        Marks up to limit pending jobs due at now as in flight and returns them, oldest due first.
+        """
+
+    @abstractmethod
+    def next_due(self) -> Optional[float]:
+        """
+        Returns the earliest next_attempt_at of the pending jobs, or None if there are none.
+        """
+
+    @abstractmethod
+    def set_message(self, job_id: int, message: str) -> None:
+        """
+        Stores the generated message so retries resend it instead of generating a new one.
+        """
+
+    @abstractmethod
+    def reschedule(self, job_id: int, next_attempt_at: float, error: Optional[str] = None, attempted: bool = True) -> None:
+        """
+        Returns an in-flight job to the queue.
+
+        Args:
+            job_id: Job identifier
+            next_attempt_at: Earliest time (epoch seconds) of the next attempt
+            error: Error of the failed attempt, if any
+            attempted: Whether a delivery attempt was made (False when it was deferred)
+        """
+
+    @abstractmethod
+    def finish(self, job_id: int, status: str, error: Optional[str] = None) -> None:
+        """
+        Records the final outcome (SENT or FAILED) of an in-flight job.
+        """
+
+    @abstractmethod
+    def recover(self) -> int:
+        """
+        Returns jobs left in flight (by a previous process) to the queue.
+
+        Returns:
+            int: Number of recovered jobs
+        """
+
+    @abstractmethod
+    def get(self, job_id: int) -> Optional[NotificationJob]:
+        """
+        Returns a job by id.
+        """
+
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        """
+        Returns the number of jobs per status.
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Removes every job.
+        """
+
+class InMemoryNotificationOutbox(NotificationOutbox):
+    """
+    Outbox kept in process memory (jobs are lost on restart).
+
+    Pending jobs are also kept in a heap of (next_attempt_at, id); entries of
+    jobs that were claimed or rescheduled since are skipped when popped.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[int, NotificationJob] = {}
+        self._due: List[Tuple[float, int]] = []
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def enqueue(self, patient_id: str, destination: str, alerts: List[Alert]) -> NotificationJob:
+        with self._lock:
+            job = NotificationJob(
+                id=self._next_id, patient_id=patient_id, destination=destination,
+                alerts=alerts, next_attempt_at=time.time()
+            )
+            self._next_id += 1
+            self._jobs[job.id] = job
+            heapq.heappush(self._due, (job.next_attempt_at, job.id))
+            return job.model_copy()
+
+    def _live(self, entry: Tuple[float, int]) -> bool:
+        job = self._jobs.get(entry[1])
+        return job is not None and job.status == PENDING and job.next_attempt_at == entry[0]
+
+    def claim(self, now: float, limit: int = 1) -> List[NotificationJob]:
+        claimed = []
+        with self._lock:
+            while self._due and len(claimed) < limit:
+                if not self._live(self._due[0]):
+                    heapq.heappop(self._due)
+                    continue
+                if self._due[0][0] > now:
+                    break
+                job = self._jobs[heapq.heappop(self._due)[1]]
+                job.status = IN_FLIGHT
+                claimed.append(job.model_copy())
+        return claimed
+
+    def next_due(self) -> Optional[float]:
+        with self._lock:
+            while self._due and not self._live(self._due[0]):
+                heapq.heappop(self._due)
+            return self._due[0][0] if self._due else None
+
+    def set_message(self, job_id: int, message: str) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].message = message
+
+    def reschedule(self, job_id: int, next_attempt_at: float, error: Optional[str] = None, attempted: bool = True) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.status = PENDING
+            job.next_attempt_at = next_attempt_at
+            if attempted:
+                job.attempts += 1
+                job.last_error = error
+            heapq.heappush(self._due, (next_attempt_at, job_id))
+
+    def finish(self, job_id: int, status: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.status = status
+                job.attempts += 1
+                job.last_error = error
+
+    def recover(self) -> int:
+        with self._lock:
+            recovered = 0
+            for job in self._jobs.values():
+                if job.status == IN_FLIGHT:
+                    job.status = PENDING
+                    heapq.heappush(self._due, (job.next_attempt_at, job.id))
+                    recovered += 1
+            return recovered
+
+    def get(self, job_id: int) -> Optional[NotificationJob]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.model_copy() if job is not None else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+    def clear(self) -> None:
+        with self._lock:
+            self._jobs.clear()
+            self._due.clear()
+
+class SQLiteNotificationOutbox(NotificationOutbox):
+    """
+    Durable outbox backed by a SQLite database in WAL mode, so pending jobs
+    survive restarts.
+
+    The outbox sees a few writes per notification, so a single connection
+    guarded by a lock is enough.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS notification_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id TEXT NOT NULL,
+        destination TEXT NOT NULL,
+        alerts TEXT NOT NULL,
+        message TEXT,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL,
+        created_at TEXT NOT NULL,
+        last_error TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_notification_jobs_due ON notification_jobs(status, next_attempt_at, id);
+    """
+
+    JOB_COLUMNS = (
+        "SELECT id, patient_id, destination, alerts, message, status, attempts, "
+        "next_attempt_at, created_at, last_error FROM notification_jobs "
+    )
+    SELECT_JOB = JOB_COLUMNS + "WHERE id = ?"
+    SELECT_DUE = JOB_COLUMNS + "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT ?"
+    SELECT_NEXT_DUE = "SELECT MIN(next_attempt_at) FROM notification_jobs WHERE status = 'pending'"
+    INSERT_JOB = (
+        "INSERT INTO notification_jobs (patient_id, destination, alerts, status, next_attempt_at, created_at) "
+        "VALUES (?, ?, ?, 'pending', ?, ?)"
+    )
+    MARK_IN_FLIGHT = "UPDATE notification_jobs SET status = 'in_flight' WHERE id = ?"
+    UPDATE_MESSAGE = "UPDATE notification_jobs SET message = ? WHERE id = ?"
+    RESCHEDULE_ATTEMPTED = (
+        "UPDATE notification_jobs SET status = 'pending', next_attempt_at = ?, "
+        "attempts = attempts + 1, last_error = ? WHERE id = ?"
+    )
+    RESCHEDULE_DEFERRED = "UPDATE notification_jobs SET status = 'pending', next_attempt_at = ? WHERE id = ?"
+    FINISH_JOB = "UPDATE notification_jobs SET status = ?, attempts = attempts + 1, last_error = ? WHERE id = ?"
+    RECOVER_JOBS = "UPDATE notification_jobs SET status = 'pending' WHERE status = 'in_flight'"
+    COUNT_JOBS = "SELECT status, COUNT(*) FROM notification_jobs GROUP BY status"
+
+    def __init__(self, path: str):
+        """
+        Opens (or creates) the outbox database.
+
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    @staticmethod
+    def _job_from_row(row: tuple) -> NotificationJob:
+        return NotificationJob(
+            id=row[0], patient_id=row[1], destination=row[2], alerts=json.loads(row[3]), message=row[4],
+            status=row[5], attempts=row[6], next_attempt_at=row[7], created_at=datetime.fromisoformat(row[8]),
+            last_error=row[9]
+        )
+
+    def enqueue(self, patient_id: str, destination: str, alerts: List[Alert]) -> NotificationJob:
+        now = time.time()
+        created_at = datetime.now().astimezone()
+        params = (patient_id, destination, json.dumps([a.model_dump() for a in alerts]), now, created_at.isoformat())
+        with self._lock, self._conn:
+            job_id = self._conn.execute(self.INSERT_JOB, params).lastrowid
+        return NotificationJob(
+            id=job_id, patient_id=patient_id, destination=destination, alerts=alerts,
+            next_attempt_at=now, created_at=created_at
+        )
+
+    def claim(self, now: float, limit: int = 1) -> List[NotificationJob]:
+        with self._lock, self._conn:
+            rows = self._conn.execute(self.SELECT_DUE, (now, limit)).fetchall()
+            self._conn.executemany(self.MARK_IN_FLIGHT, [(row[0],) for row in rows])
+        return [self._job_from_row(row).model_copy(update={"status": IN_FLIGHT}) for row in rows]
+
+    def next_due(self) -> Optional[float]:
+        with self._lock:
+            return self._conn.execute(self.SELECT_NEXT_DUE).fetchone()[0]
+
+    def set_message(self, job_id: int, message: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(self.UPDATE_MESSAGE, (message, job_id))
+
+    def reschedule(self, job_id: int, next_attempt_at: float, error: Optional[str] = None, attempted: bool = True) -> None:
+        with self._lock, self._conn:
+            if attempted:
+                self._conn.execute(self.RESCHEDULE_ATTEMPTED, (next_attempt_at, error, job_id))
+            else:
+                self._conn.execute(self.RESCHEDULE_DEFERRED, (next_attempt_at, job_id))
+
+    def finish(self, job_id: int, status: str, error: Optional[str] = None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(self.FINISH_JOB, (status, error, job_id))
+
+    def recover(self) -> int:
+        with self._lock, self._conn:
+            return self._conn.execute(self.RECOVER_JOBS).rowcount
+
+    def get(self, job_id: int) -> Optional[NotificationJob]:
+        with self._lock:
+            row = self._conn.execute(self.SELECT_JOB, (job_id,)).fetchone()
+        return self._job_from_row(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute(self.COUNT_JOBS).fetchall())
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM notification_jobs")
+
+def create_notification_outbox() -> NotificationOutbox:
+    """
+    Creates the outbox configured through environment variables.
+
+    NOTIFICATION_OUTBOX_BACKEND selects 'memory' or 'sqlite' (by default the same
+    backend as PATIENTS_DB_BACKEND); the SQLite backend reads its file from
+    NOTIFICATION_OUTBOX_PATH.
+
+    Returns:
+        NotificationOutbox: Configured outbox
+    """
+    backend = os.environ.get("NOTIFICATION_OUTBOX_BACKEND", os.environ.get("PATIENTS_DB_BACKEND", "memory")).lower()
+    if backend == "sqlite":
+        return SQLiteNotificationOutbox(os.environ.get("NOTIFICATION_OUTBOX_PATH", "data/outbox.db"))
+    return InMemoryNotificationOutbox()
@@ -0,0 +1,215 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+from dotenv import load_dotenv
+
+from app.models import Alert, Measurement
+
+# Load environment variables
+load_dotenv()
+
+# Minimum time between two notifications to the same patient
+NOTIFICATION_COOLDOWN_MINUTES = float(os.environ.get("NOTIFICATION_COOLDOWN_MINUTES", "60"))
+# Minimum time between escalations (more red alerts than last notified), which bypass the cooldown
+NOTIFICATION_ESCALATION_COOLDOWN_MINUTES = float(os.environ.get("NOTIFICATION_ESCALATION_COOLDOWN_MINUTES", "10"))
+# Time after which an unchanged alert state is notified again, as a reminder
+NOTIFICATION_RENOTIFY_HOURS = float(os.environ.get("NOTIFICATION_RENOTIFY_HOURS", "24"))
+
+# Decision reasons, also used as counter names
+NEW, ESCALATION, REMINDER, DUPLICATE, COOLDOWN = "new", "escalation", "reminder", "duplicate", "cooldown"
+
+def alert_signature(alerts: List[Alert], measurement: Optional[Measurement]) -> str:
+    """
+    Hashes an alert set together with the measurement that triggered it.
+
+    The alerts are sorted, so the signature does not depend on rule order.
+
+    Args:
+        alerts: Alerts of the patient's current state
+        measurement: Latest measurement the alerts were computed from
+
+    Returns:
+        str: Hex digest identifying the state
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for nivel, mensaje in sorted((a.nivel, a.mensaje) for a in alerts):
+        digest.update(f"{nivel}\x1f{mensaje}\x1e".encode())
+    if measurement is not None:
+        digest.update(measurement.model_dump_json().encode())
+    return digest.hexdigest()
+
+class NotificationDecision(NamedTuple):
+    notify: bool
+    reason: str
+    signature: str
+
+class _Notified(NamedTuple):
+    signature: str
+    red_alerts: int
+    sent_at: float
+    escalated_at: float
+
+class NotificationPolicy:
+    """
+    Decides whether a patient's alert state is worth a notification.
+
+    The index keeps, per patient, the signature, red alert count and time of
+    the last notification:
+
+    - the same signature again (an unchanged state read repeatedly) is a
+      duplicate, until renotify_seconds after the last notification, when it
+      is sent again as a reminder;
+    - a new state within the cooldown is suppressed, unless it has more red alerts
+      than the last notification (an escalation), which is only limited by the
+      shorter escalation cooldown;
+    - anything else is notified.
+
+    Decisions are counted per reason. With a path, the index is written through
+    to a SQLite file and loaded back when the policy is created, so a restart
+    does not notify every standing alert again.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS notification_index (
+        patient_id TEXT PRIMARY KEY,
+        signature TEXT NOT NULL,
+        red_alerts INTEGER NOT NULL,
+        sent_at REAL NOT NULL,
+        escalated_at REAL
+    );
+    """
+    SELECT_ENTRIES = "SELECT patient_id, signature, red_alerts, sent_at, escalated_at FROM notification_index"
+    UPSERT_ENTRY = (
+        "INSERT OR REPLACE INTO notification_index (patient_id, signature, red_alerts, sent_at, escalated_at) "
+        "VALUES (?, ?, ?, ?, ?)"
+    )
+    DELETE_ENTRY = "DELETE FROM notification_index WHERE patient_id = ?"
+
+    def __init__(
+        self,
+        cooldown_seconds: float = NOTIFICATION_COOLDOWN_MINUTES * 60,
+        escalation_cooldown_seconds: float = NOTIFICATION_ESCALATION_COOLDOWN_MINUTES * 60,
+        renotify_seconds: float = NOTIFICATION_RENOTIFY_HOURS * 3600,
+        path: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            cooldown_seconds: Minimum time between two notifications to a patient
+            escalation_cooldown_seconds: Minimum time between escalations
+            renotify_seconds: Time after which an unchanged state is notified again
+            path: SQLite file backing the index (memory only when None)
+            clock: Time source (tests)
+        """
+        self.cooldown_seconds = cooldown_seconds
+        self.escalation_cooldown_seconds = escalation_cooldown_seconds
+        self.renotify_seconds = renotify_seconds
+        self.clock = clock
+        self._notified: Dict[str, _Notified] = {}
+        self._counters = dict.fromkeys((NEW, ESCALATION, REMINDER, DUPLICATE, COOLDOWN), 0)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(self.SCHEMA)
+            for patient_id, signature, red_alerts, sent_at, escalated_at in self._conn.execute(self.SELECT_ENTRIES):
+                escalated_at = float("-inf") if escalated_at is None else escalated_at
+                self._notified[patient_id] = _Notified(signature, red_alerts, sent_at, escalated_at)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+
+    def decide(self, patient_id: str, alerts: List[Alert], measurement: Optional[Measurement]) -> NotificationDecision:
+        """
+        Decides on a notification for the patient's current alerts, recording it
+        in the index when it is to be sent.
+
+        Args:
+            patient_id: Patient identifier
+            alerts: Current alerts
+            measurement: Latest measurement the alerts were computed from
+
+        Returns:
+            NotificationDecision: Whether to notify, why, and the state signature
+        """
+        signature = alert_signature(alerts, measurement)
+        red_alerts = sum(1 for a in alerts if a.nivel == "red")
+        now = self.clock()
+        with self._lock:
+            last = self._notified.get(patient_id)
+            if last is None:
+                reason = NEW
+            elif last.signature == signature:
+                reason = REMINDER if now - last.sent_at >= self.renotify_seconds else DUPLICATE
+            elif now - last.sent_at >= self.cooldown_seconds:
+                reason = NEW
+            elif red_alerts > last.red_alerts and now - last.escalated_at >= self.escalation_cooldown_seconds:
+                reason = ESCALATION
+            else:
+                reason = COOLDOWN
+            self._counters[reason] += 1
+            notify = reason in (NEW, ESCALATION, REMINDER)
+            if notify:
+                escalated_at = now if reason == ESCALATION else float("-inf")
+                self._notified[patient_id] = _Notified(signature, red_alerts, now, escalated_at)
+                if self._conn is not None:
+                    with self._conn:
+                        self._conn.execute(self.UPSERT_ENTRY, (
+                            patient_id, signature, red_alerts, now, now if reason == ESCALATION else None
+                        ))
+        return NotificationDecision(notify, reason, signature)
+
+    def forget(self, patient_id: str) -> None:
+        """
+        Drops a patient's entry, so its next alert state is notified again (e.g.
+        after a failed delivery or when the patient is deleted).
+        """
+        with self._lock:
+            self._notified.pop(patient_id, None)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(self.DELETE_ENTRY, (patient_id,))
+
+    def counters(self) -> Dict[str, int]:
+        """
+        Returns the number of decisions per reason, plus sent and suppressed totals.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+        counters["sent"] = counters[NEW] + counters[ESCALATION] + counters[REMINDER]
+        counters["suppressed"] = counters[DUPLICATE] + counters[COOLDOWN]
+        return counters
+
+    def clear(self) -> None:
+        with self._lock:
+            self._notified.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM notification_index")
+            for reason in self._counters:
+                self._counters[reason] = 0
+
+def create_notification_policy() -> NotificationPolicy:
+    """
+    Creates the policy configured through environment variables. When the
+    notification outbox uses SQLite (see create_notification_outbox), the index
+    is kept in the outbox database, NOTIFICATION_OUTBOX_PATH.
+
+    Returns:
+        NotificationPolicy: Configured policy
+    """
+    backend = os.environ.get("NOTIFICATION_OUTBOX_BACKEND", os.environ.get("PATIENTS_DB_BACKEND", "memory")).lower()
+    if backend == "sqlite":
+        return NotificationPolicy(path=os.environ.get("NOTIFICATION_OUTBOX_PATH", "data/outbox.db"))
+    return NotificationPolicy()
+
+# Create a singleton instance
+notification_policy = create_notification_policy()
@@ -0,0 +1,252 @@
+import asyncio
+import os
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.models import NotificationJob
+from app.services.notification_outbox import FAILED, SENT, NotificationOutbox
+
+# Load environment variables
+load_dotenv()
+
+NOTIFICATION_WORKERS = int(os.environ.get("NOTIFICATION_WORKERS", "4"))
+NOTIFICATION_MAX_ATTEMPTS = int(os.environ.get("NOTIFICATION_MAX_ATTEMPTS", "5"))
+NOTIFICATION_RETRY_SECONDS = float(os.environ.get("NOTIFICATION_RETRY_SECONDS", "30"))
+NOTIFICATION_MAX_RETRY_SECONDS = float(os.environ.get("NOTIFICATION_MAX_RETRY_SECONDS", "900"))
+NOTIFICATION_DELIVERY_TIMEOUT_SECONDS = float(os.environ.get("NOTIFICATION_DELIVERY_TIMEOUT_SECONDS", "60"))
+NOTIFICATION_DESTINATION_RATE_PER_MINUTE = float(os.environ.get("NOTIFICATION_DESTINATION_RATE_PER_MINUTE", "2"))
+NOTIFICATION_DESTINATION_BURST = int(os.environ.get("NOTIFICATION_DESTINATION_BURST", "2"))
+NOTIFICATION_CIRCUIT_FAILURES = int(os.environ.get("NOTIFICATION_CIRCUIT_FAILURES", "5"))
+NOTIFICATION_CIRCUIT_RESET_SECONDS = float(os.environ.get("NOTIFICATION_CIRCUIT_RESET_SECONDS", "60"))
+NOTIFICATION_POLL_SECONDS = float(os.environ.get("NOTIFICATION_POLL_SECONDS", "1"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class PermanentDeliveryError(Exception):
+    """
+    Raised by a deliver function when retrying cannot help (e.g. the patient was deleted).
+    """
+
+class DestinationRateLimiter:
+    """
+    Token bucket per destination: burst messages at once, refilled at rate per second.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # destination -> (tokens, updated at)
+
+    def reserve(self, destination: str, now: float) -> float:
+        """
+        Takes a token for the destination if one is available.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the seconds until one is available
+        """
+        tokens, updated = self._buckets.get(destination, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            self._buckets[destination] = (tokens - 1, now)
+            return 0.0
+        self._buckets[destination] = (tokens, now)
+        return (1 - tokens) / self.rate if self.rate > 0 else NOTIFICATION_MAX_RETRY_SECONDS
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+class CircuitBreaker:
+    """
+    Stops deliveries while the downstream API is failing.
+
+    After failure_threshold consecutive failures the circuit opens for
+    reset_seconds; then a single trial delivery is allowed (half open), which
+    closes the circuit on success and reopens it on failure.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+
+    def state(self, now: float) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        return OPEN if now < self.opened_at + self.reset_seconds else HALF_OPEN
+
+    def retry_at(self) -> float:
+        """
+        Returns when an open circuit lets a trial through.
+        """
+        return (self.opened_at or 0.0) + self.reset_seconds
+
+    def allow(self, now: float) -> bool:
+        """
+        Returns whether a delivery may start; in half-open state this takes the single trial slot.
+        """
+        state = self.state(now)
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def release(self) -> None:
+        """
+        Gives back a trial slot taken by allow() without attempting a delivery.
+        """
+        self._trial = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def record_failure(self, now: float) -> None:
+        self.failures += 1
+        if self._trial or self.failures >= self.failure_threshold:
+            self.opened_at = now
+        self._trial = False
+
+class NotificationWorkerPool:
+    """
+    Background tasks that drain the notification outbox.
+
+    Each worker claims one due job at a time. A job for a destination that is
+    over its rate is put back until a token is available; a failed delivery
+    (deliver returning False or raising) is retried with exponential backoff and
+    jitter until max_attempts, and counts towards the circuit breaker, which
+    pauses all claims while open. on_finished is called with the final outcome
+    once a job is sent or given up on.
+    """
+
+    def __init__(
+        self,
+        outbox: NotificationOutbox,
+        deliver: Callable[[NotificationJob], Awaitable[bool]],
+        on_finished: Callable[[NotificationJob, bool], None],
+        workers: int = NOTIFICATION_WORKERS,
+        max_attempts: int = NOTIFICATION_MAX_ATTEMPTS,
+        retry_seconds: float = NOTIFICATION_RETRY_SECONDS,
+        max_retry_seconds: float = NOTIFICATION_MAX_RETRY_SECONDS,
+        delivery_timeout: float = NOTIFICATION_DELIVERY_TIMEOUT_SECONDS,
+        rate_limiter: Optional[DestinationRateLimiter] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        poll_seconds: float = NOTIFICATION_POLL_SECONDS,
+    ):
+        self.outbox = outbox
+        self.deliver = deliver
+        self.on_finished = on_finished
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self.delivery_timeout = delivery_timeout
+        self.rate_limiter = rate_limiter or DestinationRateLimiter(
+            NOTIFICATION_DESTINATION_RATE_PER_MINUTE / 60, NOTIFICATION_DESTINATION_BURST
+        )
+        self.breaker = breaker or CircuitBreaker(NOTIFICATION_CIRCUIT_FAILURES, NOTIFICATION_CIRCUIT_RESET_SECONDS)
+        self.poll_seconds = poll_seconds
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> int:
+        return sum(1 for task in self._tasks if not task.done())
+
+    async def start(self) -> None:
+        """
+        Returns jobs left in flight by a previous run to the queue and starts the workers.
+        """
+        if self._tasks:
+            return
+        recovered = self.outbox.recover()
+        if recovered:
+            print(f"Recovered {recovered} in-flight notification jobs")
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """
+        Stops the workers; a delivery interrupted here stays in flight and is recovered by the next start().
+        """
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def wake(self) -> None:
+        """
+        Tells idle workers that a job was enqueued.
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _sleep(self, seconds: float) -> None:
+        wakeup = self._wakeup
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=max(0.0, min(seconds, self.poll_seconds)))
+        except asyncio.TimeoutError:
+            pass
+        wakeup.clear()
+
+    def _backoff(self, attempts: int) -> float:
+        return random.uniform(0.5, 1.0) * min(self.max_retry_seconds, self.retry_seconds * 2 ** (attempts - 1))
+
+    async def _run(self) -> None:
+        while True:
+            now = time.time()
+            if not self.breaker.allow(now):
+                await self._sleep(self.breaker.retry_at() - now)
+                continue
+            jobs = self.outbox.claim(now)
+            if not jobs:
+                self.breaker.release()
+                due = self.outbox.next_due()
+                await self._sleep(due - now if due is not None else self.poll_seconds)
+                continue
+            job = jobs[0]
+            wait = self.rate_limiter.reserve(job.destination, now)
+            if wait > 0:
+                self.breaker.release()
+                self.outbox.reschedule(job.id, now + wait, attempted=False)
+                continue
+            await self._attempt(job)
+
+    async def _attempt(self, job: NotificationJob) -> None:
+        error = None
+        try:
+            sent = await asyncio.wait_for(self.deliver(job), timeout=self.delivery_timeout)
+        except PermanentDeliveryError as e:
+            self.breaker.release()
+            self._finish(job, False, str(e))
+            return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            sent, error = False, f"{type(e).__name__}: {e}"
+        if sent:
+            self.breaker.record_success()
+            self._finish(job, True, None)
+            return
+
+        self.breaker.record_failure(time.time())
+        error = error or "delivery failed"
+        attempts = job.attempts + 1
+        if attempts >= self.max_attempts:
+            self._finish(job, False, error)
+        else:
+            self.outbox.reschedule(job.id, time.time() + self._backoff(attempts), error)
+
+    def _finish(self, job: NotificationJob, sent: bool, error: Optional[str]) -> None:
+        self.outbox.finish(job.id, SENT if sent else FAILED, error)
+        finished = self.outbox.get(job.id) or job
+        try:
+            self.on_finished(finished, sent)
+        except Exception as e:
+            print(f"Error recording notification outcome for job {job.id}: {e}")
@@ -0,0 +1,44 @@
+import json
+import base64
+from typing import Any, List
+
+# Largest page a client may request
+MAX_PAGE_SIZE = 1000
+
+# Response header carrying the cursor of the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(*parts: Any) -> str:
+    """
+    Encodes a pagination key as an opaque, URL-safe cursor string.
+
+    Args:
+        parts: JSON-serializable components of the key
+
+    Returns:
+        str: Opaque cursor
+    """
+    raw = json.dumps(list(parts), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """
+    Decodes a cursor produced by encode_cursor.
+
+    Args:
+        cursor: Opaque cursor
+
+    Returns:
+        List[Any]: Components of the pagination key
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        parts = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(parts, list):
+        raise ValueError("Invalid cursor")
+    return parts
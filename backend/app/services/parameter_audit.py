@@ -0,0 +1,409 @@
+import bisect
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.models import ParameterAuditEntry
+from app.services.measurement_series import from_epoch_micros, to_epoch_micros
+
+# Load environment variables
+load_dotenv()
+
+# A snapshot of the full parameter state is stored every this many entries
+PARAMETER_AUDIT_SNAPSHOT_INTERVAL = int(os.environ.get("PARAMETER_AUDIT_SNAPSHOT_INTERVAL", "64"))
+
+class ParameterState(NamedTuple):
+    # Last entry applied, None before the first logged update
+    entry_id: Optional[int]
+    # Parameter values (and "rules") in force
+    values: Dict[str, Any]
+
+class ParameterAuditLog(ABC):
+    """
+    Append-only log of the updates of the global clinical parameters and alert
+    rules, indexed by time and by author.
+
+    Entries get increasing ids and non-decreasing timestamps, so the entries up
+    to a time are a prefix of the log. Every snapshot_interval entries the full
+    state after the entry is stored as a snapshot: the parameters in force at a
+    time are rebuilt from the latest snapshot before it plus the few entries
+    that follow, instead of replaying the whole log.
+
+    Subclasses provide the storage primitives; the log logic lives here.
+    """
+
+    def __init__(self, snapshot_interval: int = PARAMETER_AUDIT_SNAPSHOT_INTERVAL):
+        """
+        Args:
+            snapshot_interval: Entries between two snapshots
+        """
+        self.snapshot_interval = max(1, snapshot_interval)
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _insert(self, timestamp: int, updated_by: str, previous_values: Dict[str, Any], new_values: Dict[str, Any]) -> int:
+        """
+        Stores an entry (timestamp in epoch microseconds) and returns its id.
+        """
+
+    @abstractmethod
+    def _last_timestamp(self) -> Optional[int]:
+        """
+        Returns the timestamp of the newest entry.
+        """
+
+    @abstractmethod
+    def _select(
+        self,
+        after_id: int,
+        start: Optional[int],
+        end: Optional[int],
+        updated_by: Optional[str],
+        limit: Optional[int],
+    ) -> List[ParameterAuditEntry]:
+        """
+        Returns entries with an id above after_id and start <= timestamp < end, ordered by id.
+        """
+
+    @abstractmethod
+    def _first_entry(self) -> Optional[ParameterAuditEntry]:
+        """
+        Returns the oldest entry.
+        """
+
+    @abstractmethod
+    def _put_snapshot(self, entry_id: int, timestamp: int, values: Dict[str, Any]) -> None:
+        """
+        Stores the state after an entry.
+        """
+
+    @abstractmethod
+    def _snapshot_at(self, timestamp: int) -> Optional[ParameterState]:
+        """
+        Returns the newest snapshot taken at or before a time.
+        """
+
+    @abstractmethod
+    def count(self) -> int:
+        """
+        Returns the number of entries.
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Removes every entry and snapshot.
+        """
+
+    def append(self, updated_by: str, previous_values: Dict[str, Any], new_values: Dict[str, Any]) -> ParameterAuditEntry:
+        """
+        Logs an update.
+
+        Args:
+            updated_by: Author of the update
+            previous_values: Full state (parameters and "rules") before the update
+            new_values: Values set by the update
+
+        Returns:
+            ParameterAuditEntry: Logged entry
+        """
+        with self._lock:
+            now = to_epoch_micros(datetime.now(timezone.utc))
+            last = self._last_timestamp()
+            # Timestamps never go backwards, so time ranges map to id ranges
+            timestamp = now if last is None else max(now, last)
+            entry_id = self._insert(timestamp, updated_by, previous_values, new_values)
+            if entry_id % self.snapshot_interval == 0:
+                state = self._replay(timestamp)
+                self._put_snapshot(entry_id, timestamp, state.values)
+        return ParameterAuditEntry(
+            id=entry_id,
+            timestamp=from_epoch_micros(timestamp),
+            updated_by=updated_by,
+            previous_values=previous_values,
+            new_values=new_values,
+        )
+
+    def entries(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        updated_by: Optional[str] = None,
+        after: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[ParameterAuditEntry]:
+        """
+        Returns logged entries, oldest first.
+
+        Args:
+            start: Only entries at or after this time
+            end: Only entries before this time
+            updated_by: Only entries by this author
+            after: Only entries with a greater id (keyset cursor)
+            limit: Maximum number of entries (all when None)
+
+        Returns:
+            List[ParameterAuditEntry]: Matching entries
+        """
+        with self._lock:
+            return self._select(
+                after or 0,
+                None if start is None else to_epoch_micros(start),
+                None if end is None else to_epoch_micros(end),
+                updated_by,
+                limit,
+            )
+
+    def state_at(self, when: datetime) -> Optional[ParameterState]:
+        """
+        Rebuilds the parameters and rules in force at a time.
+
+        Before the first logged update this is the state that update replaced
+        (entry_id None).
+
+        Args:
+            when: Point in time
+
+        Returns:
+            Optional[ParameterState]: State in force, None when nothing was ever logged
+        """
+        with self._lock:
+            return self._replay(to_epoch_micros(when))
+
+    def _replay(self, timestamp: int) -> Optional[ParameterState]:
+        snapshot = self._snapshot_at(timestamp)
+        if snapshot is not None:
+            entry_id, values = snapshot.entry_id, dict(snapshot.values)
+        else:
+            first = self._first_entry()
+            if first is None:
+                return None
+            entry_id, values = None, dict(first.previous_values)
+        # Entries after the snapshot, up to the time (fewer than snapshot_interval)
+        for entry in self._select(entry_id or 0, None, timestamp + 1, None, None):
+            values.update(entry.new_values)
+            entry_id = entry.id
+        return ParameterState(entry_id, values)
+
+class InMemoryParameterAuditLog(ParameterAuditLog):
+    """
+    Log kept in process memory.
+    """
+
+    def __init__(self, snapshot_interval: int = PARAMETER_AUDIT_SNAPSHOT_INTERVAL):
+        super().__init__(snapshot_interval)
+        self._entries: List[ParameterAuditEntry] = []
+        self._timestamps: List[int] = []
+        # Positions of the entries of each author
+        self._by_author: Dict[str, List[int]] = {}
+        self._snapshots: List[Tuple[int, int, Dict[str, Any]]] = []
+
+    def _insert(self, timestamp: int, updated_by: str, previous_values: Dict[str, Any], new_values: Dict[str, Any]) -> int:
+        entry_id = len(self._entries) + 1
+        self._entries.append(ParameterAuditEntry(
+            id=entry_id,
+            timestamp=from_epoch_micros(timestamp),
+            updated_by=updated_by,
+            previous_values=json.loads(json.dumps(previous_values)),
+            new_values=json.loads(json.dumps(new_values)),
+        ))
+        self._timestamps.append(timestamp)
+        self._by_author.setdefault(updated_by, []).append(entry_id - 1)
+        return entry_id
+
+    def _last_timestamp(self) -> Optional[int]:
+        return self._timestamps[-1] if self._timestamps else None
+
+    def _select(
+        self,
+        after_id: int,
+        start: Optional[int],
+        end: Optional[int],
+        updated_by: Optional[str],
+        limit: Optional[int],
+    ) -> List[ParameterAuditEntry]:
+        # Ids are positions + 1 and timestamps are sorted, so the range is a slice
+        low = max(after_id, 0 if start is None else bisect.bisect_left(self._timestamps, start))
+        high = len(self._entries) if end is None else bisect.bisect_left(self._timestamps, end)
+        if updated_by is None:
+            positions = range(low, high)
+        else:
+            own = self._by_author.get(updated_by, [])
+            positions = own[bisect.bisect_left(own, low):bisect.bisect_left(own, high)]
+        if limit is not None:
+            positions = positions[:limit]
+        return [self._entries[position].model_copy(deep=True) for position in positions]
+
+    def _first_entry(self) -> Optional[ParameterAuditEntry]:
+        return self._entries[0] if self._entries else None
+
+    def _put_snapshot(self, entry_id: int, timestamp: int, values: Dict[str, Any]) -> None:
+        self._snapshots.append((timestamp, entry_id, values))
+
+    def _snapshot_at(self, timestamp: int) -> Optional[ParameterState]:
+        index = bisect.bisect_right(self._snapshots, timestamp, key=lambda snapshot: snapshot[0])
+        if index == 0:
+            return None
+        _, entry_id, values = self._snapshots[index - 1]
+        return ParameterState(entry_id, values)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._timestamps.clear()
+            self._by_author.clear()
+            self._snapshots.clear()
+
+class SQLiteParameterAuditLog(ParameterAuditLog):
+    """
+    Durable log backed by a SQLite database in WAL mode.
+
+    Parameter updates are rare, so a single connection guarded by the log's
+    lock is enough; the indexes on the timestamp and on (author, id) keep range
+    queries and as-of lookups logarithmic in the size of the log. Timestamps
+    grow with ids, so entries are read in (ts, id) order and an id cursor is
+    turned into a timestamp bound, letting both indexes serve every query.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS parameter_audit (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts INTEGER NOT NULL,
+        updated_by TEXT NOT NULL,
+        previous_values TEXT NOT NULL,
+        new_values TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_parameter_audit_ts ON parameter_audit(ts);
+    CREATE INDEX IF NOT EXISTS idx_parameter_audit_author ON parameter_audit(updated_by, ts);
+    CREATE TABLE IF NOT EXISTS parameter_snapshots (
+        entry_id INTEGER PRIMARY KEY,
+        ts INTEGER NOT NULL,
+        state TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_parameter_snapshots_ts ON parameter_snapshots(ts);
+    """
+
+    INSERT_ENTRY = "INSERT INTO parameter_audit (ts, updated_by, previous_values, new_values) VALUES (?, ?, ?, ?)"
+    SELECT_LAST_TIMESTAMP = "SELECT ts FROM parameter_audit ORDER BY id DESC LIMIT 1"
+    SELECT_TIMESTAMP = "SELECT ts FROM parameter_audit WHERE id = ?"
+    SELECT_ENTRIES = "SELECT id, ts, updated_by, previous_values, new_values FROM parameter_audit"
+    SELECT_FIRST_ENTRY = SELECT_ENTRIES + " ORDER BY id LIMIT 1"
+    INSERT_SNAPSHOT = "INSERT OR REPLACE INTO parameter_snapshots (entry_id, ts, state) VALUES (?, ?, ?)"
+    SELECT_SNAPSHOT = "SELECT entry_id, state FROM parameter_snapshots WHERE ts <= ? ORDER BY ts DESC, entry_id DESC LIMIT 1"
+    COUNT_ENTRIES = "SELECT COUNT(*) FROM parameter_audit"
+    DELETE_ALL = "DELETE FROM parameter_audit; DELETE FROM parameter_snapshots; DELETE FROM sqlite_sequence WHERE name = 'parameter_audit';"
+
+    def __init__(self, path: str, snapshot_interval: int = PARAMETER_AUDIT_SNAPSHOT_INTERVAL):
+        """
+        Opens (or creates) the audit database.
+
+        Args:
+            path: Path to the SQLite database file
+            snapshot_interval: Entries between two snapshots
+        """
+        super().__init__(snapshot_interval)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    @staticmethod
+    def _entry(row: tuple) -> ParameterAuditEntry:
+        return ParameterAuditEntry(
+            id=row[0],
+            timestamp=from_epoch_micros(row[1]),
+            updated_by=row[2],
+            previous_values=json.loads(row[3]),
+            new_values=json.loads(row[4]),
+        )
+
+    def _insert(self, timestamp: int, updated_by: str, previous_values: Dict[str, Any], new_values: Dict[str, Any]) -> int:
+        with self._conn:
+            cursor = self._conn.execute(self.INSERT_ENTRY, (
+                timestamp, updated_by, json.dumps(previous_values), json.dumps(new_values)
+            ))
+        return cursor.lastrowid
+
+    def _last_timestamp(self) -> Optional[int]:
+        row = self._conn.execute(self.SELECT_LAST_TIMESTAMP).fetchone()
+        return row[0] if row else None
+
+    def _select(
+        self,
+        after_id: int,
+        start: Optional[int],
+        end: Optional[int],
+        updated_by: Optional[str],
+        limit: Optional[int],
+    ) -> List[ParameterAuditEntry]:
+        if after_id:
+            row = self._conn.execute(self.SELECT_TIMESTAMP, (after_id,)).fetchone()
+            if row and (start is None or row[0] > start):
+                start = row[0]
+        conditions, args = ["id > ?"], [after_id]
+        if start is not None:
+            conditions.append("ts >= ?")
+            args.append(start)
+        if end is not None:
+            conditions.append("ts < ?")
+            args.append(end)
+        if updated_by is not None:
+            conditions.append("updated_by = ?")
+            args.append(updated_by)
+        sql = f"{self.SELECT_ENTRIES} WHERE {' AND '.join(conditions)} ORDER BY ts, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return [self._entry(row) for row in self._conn.execute(sql, args)]
+
+    def _first_entry(self) -> Optional[ParameterAuditEntry]:
+        row = self._conn.execute(self.SELECT_FIRST_ENTRY).fetchone()
+        return self._entry(row) if row else None
+
+    def _put_snapshot(self, entry_id: int, timestamp: int, values: Dict[str, Any]) -> None:
+        with self._conn:
+            self._conn.execute(self.INSERT_SNAPSHOT, (entry_id, timestamp, json.dumps(values)))
+
+    def _snapshot_at(self, timestamp: int) -> Optional[ParameterState]:
+        row = self._conn.execute(self.SELECT_SNAPSHOT, (timestamp,)).fetchone()
+        return ParameterState(row[0], json.loads(row[1])) if row else None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute(self.COUNT_ENTRIES).fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.executescript(self.DELETE_ALL)
+
+def create_parameter_audit_log() -> ParameterAuditLog:
+    """
+    Creates the parameter audit log configured through environment variables.
+
+    PARAMETER_AUDIT_BACKEND selects 'memory' or 'sqlite' (by default the same
+    backend as PATIENTS_DB_BACKEND); the SQLite backend reads its file from
+    PARAMETER_AUDIT_PATH.
+
+    Returns:
+        ParameterAuditLog: Configured log
+    """
+    backend = os.environ.get("PARAMETER_AUDIT_BACKEND", os.environ.get("PATIENTS_DB_BACKEND", "memory")).lower()
+    if backend == "sqlite":
+        return SQLiteParameterAuditLog(os.environ.get("PARAMETER_AUDIT_PATH", "data/parameter_audit.db"))
+    return InMemoryParameterAuditLog()
@@ -0,0 +1,953 @@
+import os
+import json
+import math
+import queue
+import sqlite3
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Dict, Optional, Iterator, NamedTuple, Set, Tuple
+import numpy as np
+from dotenv import load_dotenv
+
+from app.models import Patient, Measurement, AlertState, TrendWindow, VitalAggregate
+from app.services.measurement_series import MeasurementSeries, from_epoch_micros, to_epoch_micros
+from app.services.vital_trends import (
+    MICROS_PER_DAY, TREND_COLUMNS, TREND_FIELDS, TREND_STATS, TREND_WINDOWS_DAYS, VitalTrends,
+)
+
+# Load environment variables
+load_dotenv()
+
+# Measurements attached by default when reading a patient: enough for check_alerts,
+# which compares the latest reading with the previous one
+RECENT_HISTORY = 2
+
+# Bounds used when a time-range filter is not given
+_MIN_MICROS = -(2 ** 63)
+_MAX_MICROS = 2 ** 63 - 1
+
+class MeasurementPage(NamedTuple):
+    """
+    One page of a patient's measurements in timestamp order.
+    """
+    items: List[Measurement]
+    next_key: Optional[Tuple[int, int]]  # pagination key to resume after, None on the last page
+
+# Vital sign columns carried by RecentVitals
+VITAL_FIELDS = ("peso", "presion_sistolica", "presion_diastolica", "frecuencia_cardiaca", "saturacion_oxigeno")
+
+class RecentVitals(NamedTuple):
+    """
+    Latest and previous reading and trend window aggregates of every patient in
+    columnar form, in patient id order.
+
+    Each column is a float64 array aligned with patient_ids. Patients without a
+    latest (or previous) reading, and unreported oxygen saturation, hold NaN;
+    trend columns are keyed by window length in days and then by TREND_COLUMNS,
+    with a count of 0 and NaN statistics for patients without readings.
+    """
+    patient_ids: List[str]
+    latest: Dict[str, np.ndarray]
+    previous: Dict[str, np.ndarray]
+    sintomas: List[Optional[List[str]]]  # symptoms of each patient's latest reading
+    trends: Dict[int, Dict[str, np.ndarray]]
+
+class ParameterOverrideSettings(NamedTuple):
+    """
+    Stored parameter override layers (see clinical_parameters).
+    """
+    cohorts: Dict[str, Dict[str, float]]
+    # Per patient with settings: (cohort or None, own overrides)
+    patients: Dict[str, Tuple[Optional[str], Dict[str, float]]]
+
+class PatientRepository(ABC):
+    """
+    Storage interface shared by every router that reads or writes patients.
+
+    Patients, their measurements and their intervention history are written
+    through dedicated methods so that backends can persist each change as a
+    single row instead of rewriting the whole Patient object.
+    """
+
+    @abstractmethod
+    def get(self, patient_id: str, history: Optional[int] = RECENT_HISTORY) -> Optional[Patient]:
+        """
+        Returns the patient identified by patient_id, or None if it does not exist.
+
+        Only the last `history` measurements are attached to the returned object
+        (the full history when history is None).
+        """
+
+    @abstractmethod
+    def exists(self, patient_id: str) -> bool:
+        """
+        Returns True if a patient with the given identifier is stored.
+        """
+
+    @abstractmethod
+    def list_patients(
+        self,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+        history: Optional[int] = None,
+    ) -> List[Patient]:
+        """
+        Returns stored patients ordered by id.
+
+        Args:
+            after: Only return patients whose id sorts after this one (keyset cursor)
+            limit: Maximum number of patients (all when None)
+            history: Measurements attached per patient (None = full history, 0 = none)
+        """
+
+    @abstractmethod
+    def get_measurements(
+        self,
+        patient_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        after: Optional[Tuple[int, int]] = None,
+        limit: Optional[int] = None,
+    ) -> Optional[MeasurementPage]:
+        """
+        Returns a page of a patient's measurements ordered by timestamp, or None if
+        the patient does not exist.
+
+        Args:
+            patient_id: Patient identifier
+            start: Inclusive lower timestamp bound
+            end: Exclusive upper timestamp bound
+            after: next_key of the previous page
+            limit: Maximum number of measurements (all when None)
+        """
+
+    @abstractmethod
+    def recent_vitals(self) -> RecentVitals:
+        """
+        Collects the two most recent readings and the trend window aggregates of
+        every patient in one pass, for population-wide alert evaluation.
+
+        "Most recent" follows the same append order as get(), and the trend columns
+        hold the same values as get_trends(), so the columns carry exactly what
+        check_alerts sees for each patient.
+        """
+
+    @abstractmethod
+    def get_trends(self, patient_id: str) -> Optional[List[TrendWindow]]:
+        """
+        Returns the patient's vital sign aggregates over each TREND_WINDOWS_DAYS
+        window ending at its most recent reading (shortest first; empty without
+        readings), or None if the patient does not exist.
+        """
+
+    @abstractmethod
+    def save(self, patient: Patient) -> Patient:
+        """
+        Inserts the patient, replacing any existing patient with the same id
+        (including its measurements and intervention history).
+        """
+
+    @abstractmethod
+    def update_profile(self, patient_id: str, patient: Patient) -> Optional[Patient]:
+        """
+        Updates the demographic fields of an existing patient while preserving its
+        measurements and intervention history. Returns None if the patient does not exist.
+        """
+
+    @abstractmethod
+    def delete(self, patient_id: str) -> bool:
+        """
+        Deletes a patient. Returns False if the patient does not exist.
+        """
+
+    @abstractmethod
+    def add_measurement(self, patient_id: str, measurement: Measurement) -> bool:
+        """
+        Appends a measurement to a patient's history. Returns False if the patient does not exist.
+        """
+
+    @abstractmethod
+    def add_measurements(self, batches: Dict[str, List[Measurement]]) -> Set[str]:
+        """
+        Appends measurements for several patients in one operation.
+
+        Args:
+            batches: Measurements to append, grouped by patient identifier
+
+        Returns:
+            Set[str]: Identifiers of patients that do not exist (their measurements are not stored)
+        """
+
+    @abstractmethod
+    def add_intervention(self, patient_id: str, entry: Dict[str, str]) -> bool:
+        """
+        Appends an entry to a patient's intervention history. Returns False if the patient does not exist.
+        """
+
+    @abstractmethod
+    def set_alert_state(self, patient_id: str, state: AlertState) -> bool:
+        """
+        Stores the alert set computed for a patient, returned with the patient by later reads.
+        Returns False if the patient does not exist.
+
+        Every measurement write increments the patient's measurement_version, so a
+        stored state is current only while its measurement_version still matches.
+        """
+
+    @abstractmethod
+    def latest_parameters_version(self) -> int:
+        """
+        Returns the newest parameters_version among the stored alert states (0 if none).
+
+        Parameter versions count changes within a process, so at startup the
+        clock is resumed past this value: states stored by an earlier run then
+        never look current (see clinical_parameters.resume_versions).
+        """
+
+    @abstractmethod
+    def save_cohort(self, cohort: str, overrides: Dict[str, float]) -> None:
+        """
+        Stores a cohort's parameter overrides, creating or replacing it.
+        """
+
+    @abstractmethod
+    def delete_cohort(self, cohort: str) -> bool:
+        """
+        Removes a cohort and takes its members out of it. Returns False if it did not exist.
+        """
+
+    @abstractmethod
+    def save_patient_parameters(self, patient_id: str, cohort: Optional[str], overrides: Dict[str, float]) -> bool:
+        """
+        Stores a patient's cohort and own parameter overrides (kept until the patient
+        is deleted). Returns False if the patient does not exist.
+        """
+
+    @abstractmethod
+    def parameter_overrides(self) -> ParameterOverrideSettings:
+        """
+        Returns every stored cohort and patient parameter setting, restored into
+        clinical_parameters at startup.
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Removes every stored patient.
+        """
+
+class _RecentVitalsTable:
+    """
+    Latest and previous reading of every in-memory patient, one slot per patient,
+    updated on each write so population reads only reorder whole columns.
+    """
+
+    def __init__(self):
+        self.slots: Dict[str, int] = {}
+        self.latest = {f: array("d") for f in VITAL_FIELDS}
+        self.previous = {f: array("d") for f in VITAL_FIELDS}
+        self.sintomas: List[Optional[List[str]]] = []
+        self.trends = {days: {c: array("d") for c in TREND_COLUMNS} for days in TREND_WINDOWS_DAYS}
+        self._free: List[int] = []
+
+    def _columns(self) -> Iterator[array]:
+        yield from self.latest.values()
+        yield from self.previous.values()
+        for columns in self.trends.values():
+            yield from columns.values()
+
+    def update(self, patient_id: str, series: MeasurementSeries, trends: VitalTrends) -> None:
+        slot = self.slots.get(patient_id)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot = len(self.sintomas)
+                for column in self._columns():
+                    column.append(math.nan)
+                self.sintomas.append(None)
+            self.slots[patient_id] = slot
+        n = len(series)
+        for field in VITAL_FIELDS:
+            values = getattr(series, field)
+            self.latest[field][slot] = values[-1] if n else math.nan
+            self.previous[field][slot] = values[-2] if n > 1 else math.nan
+        self.sintomas[slot] = series.latest_symptoms()
+        for days, row in zip(trends.days, trends.columns()):
+            for column, value in zip(self.trends[days].values(), row):
+                column[slot] = value
+
+    def remove(self, patient_id: str) -> None:
+        slot = self.slots.pop(patient_id)
+        self.sintomas[slot] = None
+        self._free.append(slot)
+
+    def snapshot(self, patient_ids: List[str]) -> RecentVitals:
+        order = np.fromiter(map(self.slots.__getitem__, patient_ids), dtype=np.intp, count=len(patient_ids))
+        return RecentVitals(
+            list(patient_ids),
+            {f: np.frombuffer(column, dtype=np.float64)[order] for f, column in self.latest.items()},
+            {f: np.frombuffer(column, dtype=np.float64)[order] for f, column in self.previous.items()},
+            list(map(self.sintomas.__getitem__, order.tolist())),
+            {
+                days: {c: np.frombuffer(column, dtype=np.float64)[order] for c, column in columns.items()}
+                for days, columns in self.trends.items()
+            },
+        )
+
+    def clear(self) -> None:
+        self.__init__()
+
+class InMemoryPatientRepository(PatientRepository):
+    """
+    Process-local repository (data is lost on restart).
+
+    Patient records are stored without their measurements; each patient's history
+    lives in a columnar MeasurementSeries and Measurement objects are only built
+    when a patient is read. Sliding trend windows are updated as readings are
+    appended, and the latest two readings and window aggregates of every patient
+    are also kept in population-wide columns for recent_vitals().
+    """
+
+    def __init__(self):
+        self._patients: Dict[str, Patient] = {}
+        self._series: Dict[str, MeasurementSeries] = {}
+        self._sorted_ids: List[str] = []
+        self._versions: Dict[str, int] = {}
+        self._alert_states: Dict[str, AlertState] = {}
+        self._trends: Dict[str, VitalTrends] = {}
+        self._recent = _RecentVitalsTable()
+        self._cohorts: Dict[str, Dict[str, float]] = {}
+        self._patient_parameters: Dict[str, Tuple[Optional[str], Dict[str, float]]] = {}
+
+    def _materialize(self, patient: Patient, history: Optional[int]) -> Patient:
+        materialized = patient.model_copy(update={
+            "measurements": self._series[patient.id].tail(history),
+            "intervention_history": list(patient.intervention_history),
+        })
+        return materialized.attach_storage_state(self._versions[patient.id], self._alert_states.get(patient.id))
+
+    def get(self, patient_id: str, history: Optional[int] = RECENT_HISTORY) -> Optional[Patient]:
+        patient = self._patients.get(patient_id)
+        if patient is None:
+            return None
+        return self._materialize(patient, history)
+
+    def exists(self, patient_id: str) -> bool:
+        return patient_id in self._patients
+
+    def list_patients(
+        self,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+        history: Optional[int] = None,
+    ) -> List[Patient]:
+        lo = 0 if after is None else bisect_right(self._sorted_ids, after)
+        hi = len(self._sorted_ids) if limit is None else lo + limit
+        return [self._materialize(self._patients[pid], history) for pid in self._sorted_ids[lo:hi]]
+
+    def get_measurements(
+        self,
+        patient_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        after: Optional[Tuple[int, int]] = None,
+        limit: Optional[int] = None,
+    ) -> Optional[MeasurementPage]:
+        series = self._series.get(patient_id)
+        if series is None:
+            return None
+        # Fetch one extra row to know whether another page follows
+        rows = series.range_rows(start, end, after, None if limit is None else limit + 1)
+        next_key = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_key = series.cursor_key(rows[-1])
+        return MeasurementPage([series.measurement(r) for r in rows], next_key)
+
+    def recent_vitals(self) -> RecentVitals:
+        return self._recent.snapshot(self._sorted_ids)
+
+    def get_trends(self, patient_id: str) -> Optional[List[TrendWindow]]:
+        trends = self._trends.get(patient_id)
+        return None if trends is None else trends.summary()
+
+    def save(self, patient: Patient) -> Patient:
+        if patient.id not in self._patients:
+            insort(self._sorted_ids, patient.id)
+        self._series[patient.id] = series = MeasurementSeries(patient.measurements)
+        self._trends[patient.id] = trends = VitalTrends(series)
+        self._recent.update(patient.id, series, trends)
+        self._patients[patient.id] = patient.model_copy(update={
+            "measurements": [],
+            "intervention_history": list(patient.intervention_history),
+        })
+        self._versions[patient.id] = self._versions.get(patient.id, 0) + 1
+        self._alert_states.pop(patient.id, None)
+        return patient
+
+    def update_profile(self, patient_id: str, patient: Patient) -> Optional[Patient]:
+        existing = self._patients.get(patient_id)
+        if existing is None:
+            return None
+        # Preserve measurements and intervention history
+        self._patients[patient_id] = patient.model_copy(update={
+            "measurements": [],
+            "intervention_history": existing.intervention_history,
+        })
+        return self.get(patient_id, history=None)
+
+    def delete(self, patient_id: str) -> bool:
+        if self._patients.pop(patient_id, None) is None:
+            return False
+        del self._series[patient_id]
+        del self._trends[patient_id]
+        self._recent.remove(patient_id)
+        del self._versions[patient_id]
+        self._alert_states.pop(patient_id, None)
+        self._patient_parameters.pop(patient_id, None)
+        del self._sorted_ids[bisect_left(self._sorted_ids, patient_id)]
+        return True
+
+    def add_measurement(self, patient_id: str, measurement: Measurement) -> bool:
+        series = self._series.get(patient_id)
+        if series is None:
+            return False
+        series.append(measurement)
+        trends = self._trends[patient_id]
+        trends.update(series, len(series) - 1)
+        self._recent.update(patient_id, series, trends)
+        self._versions[patient_id] += 1
+        return True
+
+    def add_measurements(self, batches: Dict[str, List[Measurement]]) -> Set[str]:
+        missing = set()
+        for patient_id, measurements in batches.items():
+            series = self._series.get(patient_id)
+            if series is None:
+                missing.add(patient_id)
+            else:
+                start = len(series)
+                series.extend(measurements)
+                trends = self._trends[patient_id]
+                trends.update(series, start)
+                self._recent.update(patient_id, series, trends)
+                self._versions[patient_id] += 1
+        return missing
+
+    def add_intervention(self, patient_id: str, entry: Dict[str, str]) -> bool:
+        patient = self._patients.get(patient_id)
+        if patient is None:
+            return False
+        patient.intervention_history.append(entry)
+        return True
+
+    def set_alert_state(self, patient_id: str, state: AlertState) -> bool:
+        if patient_id not in self._patients:
+            return False
+        self._alert_states[patient_id] = state
+        return True
+
+    def latest_parameters_version(self) -> int:
+        return max((state.parameters_version for state in self._alert_states.values()), default=0)
+
+    def save_cohort(self, cohort: str, overrides: Dict[str, float]) -> None:
+        self._cohorts[cohort] = dict(overrides)
+
+    def delete_cohort(self, cohort: str) -> bool:
+        if self._cohorts.pop(cohort, None) is None:
+            return False
+        for patient_id, (member_of, overrides) in list(self._patient_parameters.items()):
+            if member_of == cohort:
+                self._patient_parameters[patient_id] = (None, overrides)
+        return True
+
+    def save_patient_parameters(self, patient_id: str, cohort: Optional[str], overrides: Dict[str, float]) -> bool:
+        if patient_id not in self._patients:
+            return False
+        self._patient_parameters[patient_id] = (cohort, dict(overrides))
+        return True
+
+    def parameter_overrides(self) -> ParameterOverrideSettings:
+        return ParameterOverrideSettings(
+            {cohort: dict(overrides) for cohort, overrides in self._cohorts.items()},
+            {patient_id: (cohort, dict(overrides)) for patient_id, (cohort, overrides) in self._patient_parameters.items()},
+        )
+
+    def clear(self) -> None:
+        self._patients.clear()
+        self._series.clear()
+        self._sorted_ids.clear()
+        self._versions.clear()
+        self._alert_states.clear()
+        self._trends.clear()
+        self._recent.clear()
+        self._patient_parameters.clear()
+
+class SQLitePatientRepository(PatientRepository):
+    """
+    Durable repository backed by a SQLite database in WAL mode.
+
+    Connections are kept in a fixed-size pool and every statement is a constant,
+    parameterized SQL string, so sqlite3's per-connection statement cache reuses
+    the prepared statements across requests.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS patients (
+        id TEXT PRIMARY KEY,
+        nombre TEXT NOT NULL,
+        edad INTEGER NOT NULL,
+        telefono TEXT,
+        measurement_version INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS measurements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id TEXT NOT NULL REFERENCES patients(id) ON DELETE CASCADE,
+        ts INTEGER NOT NULL,
+        timestamp TEXT NOT NULL,
+        peso REAL NOT NULL,
+        presion_sistolica REAL NOT NULL,
+        presion_diastolica REAL NOT NULL,
+        frecuencia_cardiaca REAL NOT NULL,
+        saturacion_oxigeno REAL,
+        sintomas TEXT,
+        source_ingestion_id TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_measurements_patient_ts ON measurements(patient_id, ts);
+    CREATE TABLE IF NOT EXISTS interventions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id TEXT NOT NULL REFERENCES patients(id) ON DELETE CASCADE,
+        entry TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_interventions_patient ON interventions(patient_id);
+    CREATE TABLE IF NOT EXISTS alert_states (
+        patient_id TEXT PRIMARY KEY REFERENCES patients(id) ON DELETE CASCADE,
+        measurement_version INTEGER NOT NULL,
+        parameters_version INTEGER NOT NULL,
+        alerts TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS cohorts (
+        name TEXT PRIMARY KEY,
+        overrides TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS patient_parameters (
+        patient_id TEXT PRIMARY KEY REFERENCES patients(id) ON DELETE CASCADE,
+        cohort TEXT,
+        overrides TEXT NOT NULL
+    );
+    """
+
+    PATIENT_COLUMNS = (
+        "SELECT p.id, p.nombre, p.edad, p.telefono, p.measurement_version, "
+        "a.measurement_version, a.parameters_version, a.alerts "
+        "FROM patients p LEFT JOIN alert_states a ON a.patient_id = p.id "
+    )
+    SELECT_PATIENT = PATIENT_COLUMNS + "WHERE p.id = ?"
+    SELECT_PATIENTS = PATIENT_COLUMNS + "ORDER BY p.id LIMIT ?"
+    SELECT_PATIENTS_AFTER = PATIENT_COLUMNS + "WHERE p.id > ? ORDER BY p.id LIMIT ?"
+    SELECT_RECENT_MEASUREMENTS = (
+        "SELECT id, timestamp, peso, presion_sistolica, presion_diastolica, "
+        "frecuencia_cardiaca, saturacion_oxigeno, sintomas, source_ingestion_id FROM measurements "
+        "WHERE patient_id = ? ORDER BY id DESC LIMIT ?"
+    )
+    SELECT_MEASUREMENT_RANGE = (
+        "SELECT id, timestamp, peso, presion_sistolica, presion_diastolica, "
+        "frecuencia_cardiaca, saturacion_oxigeno, sintomas, source_ingestion_id, ts FROM measurements "
+        "WHERE patient_id = ? AND ts >= ? AND ts < ? AND (ts, id) > (?, ?) "
+        "ORDER BY ts, id LIMIT ?"
+    )
+    # Rows 1 and 2 (latest first) per patient, with NULLs for patients without measurements
+    SELECT_RECENT_VITALS = (
+        "SELECT p.id, r.rn, r.peso, r.presion_sistolica, r.presion_diastolica, "
+        "r.frecuencia_cardiaca, r.saturacion_oxigeno, r.sintomas FROM patients p LEFT JOIN ("
+        "SELECT patient_id, peso, presion_sistolica, presion_diastolica, frecuencia_cardiaca, "
+        "saturacion_oxigeno, sintomas, "
+        "ROW_NUMBER() OVER (PARTITION BY patient_id ORDER BY id DESC) AS rn FROM measurements"
+        ") r ON r.patient_id = p.id AND r.rn <= 2 ORDER BY p.id, r.rn"
+    )
+    # Trend windows: the most recent reading by time, then MIN/MAX/AVG of each field over
+    # an index range of the window, so no query reads the whole history
+    TREND_AGGREGATES = ", ".join(f"MIN({f}), MAX({f}), AVG({f})" for f in TREND_FIELDS)
+    SELECT_LAST_READING = (
+        "SELECT ts, " + ", ".join(TREND_FIELDS) + " FROM measurements "
+        "WHERE patient_id = ? ORDER BY ts DESC, id DESC LIMIT 1"
+    )
+    SELECT_WINDOW_AGGREGATES = (
+        "SELECT COUNT(*), " + TREND_AGGREGATES + " FROM measurements WHERE patient_id = ? AND ts > ?"
+    )
+    SELECT_LAST_READINGS = (
+        "SELECT patient_id, ts, " + ", ".join(TREND_FIELDS) + " FROM ("
+        "SELECT patient_id, ts, " + ", ".join(TREND_FIELDS) + ", "
+        "ROW_NUMBER() OVER (PARTITION BY patient_id ORDER BY ts DESC, id DESC) AS rn FROM measurements"
+        ") WHERE rn = 1"
+    )
+    SELECT_ALL_WINDOW_AGGREGATES = (
+        "SELECT m.patient_id, COUNT(*), " + TREND_AGGREGATES + " FROM measurements m JOIN ("
+        "SELECT patient_id, MAX(ts) AS end_ts FROM measurements GROUP BY patient_id"
+        ") e ON e.patient_id = m.patient_id WHERE m.ts > e.end_ts - ? GROUP BY m.patient_id"
+    )
+    SELECT_INTERVENTIONS = "SELECT entry FROM interventions WHERE patient_id = ? ORDER BY id"
+    UPSERT_PATIENT = (
+        "INSERT INTO patients (id, nombre, edad, telefono, measurement_version) VALUES (?, ?, ?, ?, 1) "
+        "ON CONFLICT(id) DO UPDATE SET nombre = excluded.nombre, edad = excluded.edad, "
+        "telefono = excluded.telefono, measurement_version = measurement_version + 1"
+    )
+    BUMP_MEASUREMENT_VERSION = "UPDATE patients SET measurement_version = measurement_version + 1 WHERE id = ?"
+    UPSERT_ALERT_STATE = (
+        "INSERT INTO alert_states (patient_id, measurement_version, parameters_version, alerts) "
+        "SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM patients WHERE id = ?) "
+        "ON CONFLICT(patient_id) DO UPDATE SET measurement_version = excluded.measurement_version, "
+        "parameters_version = excluded.parameters_version, alerts = excluded.alerts"
+    )
+    DELETE_ALERT_STATE = "DELETE FROM alert_states WHERE patient_id = ?"
+    UPDATE_PATIENT = "UPDATE patients SET nombre = ?, edad = ?, telefono = ? WHERE id = ?"
+    DELETE_PATIENT = "DELETE FROM patients WHERE id = ?"
+    EXISTS_PATIENT = "SELECT 1 FROM patients WHERE id = ?"
+    INSERT_MEASUREMENT = (
+        "INSERT INTO measurements (patient_id, ts, timestamp, peso, presion_sistolica, "
+        "presion_diastolica, frecuencia_cardiaca, saturacion_oxigeno, sintomas, source_ingestion_id) "
+        "SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM patients WHERE id = ?)"
+    )
+    DELETE_MEASUREMENTS = "DELETE FROM measurements WHERE patient_id = ?"
+    INSERT_INTERVENTION = (
+        "INSERT INTO interventions (patient_id, entry) "
+        "SELECT ?, ? WHERE EXISTS (SELECT 1 FROM patients WHERE id = ?)"
+    )
+    DELETE_INTERVENTIONS = "DELETE FROM interventions WHERE patient_id = ?"
+    UPSERT_COHORT = "INSERT OR REPLACE INTO cohorts (name, overrides) VALUES (?, ?)"
+    DELETE_COHORT = "DELETE FROM cohorts WHERE name = ?"
+    RELEASE_COHORT_MEMBERS = "UPDATE patient_parameters SET cohort = NULL WHERE cohort = ?"
+    UPSERT_PATIENT_PARAMETERS = (
+        "INSERT OR REPLACE INTO patient_parameters (patient_id, cohort, overrides) "
+        "SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM patients WHERE id = ?)"
+    )
+    SELECT_COHORTS = "SELECT name, overrides FROM cohorts"
+    SELECT_PATIENT_PARAMETERS = "SELECT patient_id, cohort, overrides FROM patient_parameters"
+
+    def __init__(self, path: str, pool_size: int = 4):
+        """
+        Opens (or creates) the database and fills the connection pool.
+
+        Args:
+            path: Path to the SQLite database file
+            pool_size: Number of pooled connections
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=pool_size)
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        with self._connection() as conn:
+            conn.executescript(self.SCHEMA)
+            # Databases created before measurements recorded their source ingestion
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(measurements)")}
+            if "source_ingestion_id" not in columns:
+                conn.execute("ALTER TABLE measurements ADD COLUMN source_ingestion_id TEXT")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, cached_statements=128)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrows a pooled connection for the duration of one transaction.
+        """
+        conn = self._pool.get()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._pool.put(conn)
+
+    def close(self) -> None:
+        """
+        Closes every pooled connection.
+        """
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+    def _measurement_params(self, patient_id: str, m: Measurement) -> tuple:
+        return (
+            patient_id,
+            to_epoch_micros(m.timestamp),
+            m.timestamp.isoformat(),
+            m.peso,
+            m.presion_sistolica,
+            m.presion_diastolica,
+            m.frecuencia_cardiaca,
+            m.saturacion_oxigeno,
+            json.dumps(m.sintomas) if m.sintomas is not None else None,
+            m.source_ingestion_id,
+            patient_id,
+        )
+
+    @staticmethod
+    def _measurement_from_row(row: tuple) -> Measurement:
+        return Measurement(
+            timestamp=row[1],
+            peso=row[2],
+            presion_sistolica=row[3],
+            presion_diastolica=row[4],
+            frecuencia_cardiaca=row[5],
+            saturacion_oxigeno=row[6],
+            sintomas=json.loads(row[7]) if row[7] is not None else None,
+            source_ingestion_id=row[8],
+        )
+
+    def _hydrate(self, conn: sqlite3.Connection, row: tuple, history: Optional[int]) -> Patient:
+        patient_id = row[0]
+        measurements = []
+        if history != 0:
+            # A negative LIMIT means no limit in SQLite
+            rows = conn.execute(self.SELECT_RECENT_MEASUREMENTS, (patient_id, -1 if history is None else history))
+            measurements = [self._measurement_from_row(r) for r in rows][::-1]
+        interventions = [json.loads(r[0]) for r in conn.execute(self.SELECT_INTERVENTIONS, (patient_id,))]
+        alert_state = None
+        if row[5] is not None:
+            alert_state = AlertState(alerts=json.loads(row[7]), measurement_version=row[5], parameters_version=row[6])
+        patient = Patient(
+            id=patient_id,
+            nombre=row[1],
+            edad=row[2],
+            telefono=row[3],
+            measurements=measurements,
+            intervention_history=interventions,
+        )
+        return patient.attach_storage_state(row[4], alert_state)
+
+    def get(self, patient_id: str, history: Optional[int] = RECENT_HISTORY) -> Optional[Patient]:
+        with self._connection() as conn:
+            row = conn.execute(self.SELECT_PATIENT, (patient_id,)).fetchone()
+            if row is None:
+                return None
+            return self._hydrate(conn, row, history)
+
+    def exists(self, patient_id: str) -> bool:
+        with self._connection() as conn:
+            return conn.execute(self.EXISTS_PATIENT, (patient_id,)).fetchone() is not None
+
+    def list_patients(
+        self,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+        history: Optional[int] = None,
+    ) -> List[Patient]:
+        sql_limit = -1 if limit is None else limit
+        with self._connection() as conn:
+            if after is None:
+                rows = conn.execute(self.SELECT_PATIENTS, (sql_limit,)).fetchall()
+            else:
+                rows = conn.execute(self.SELECT_PATIENTS_AFTER, (after, sql_limit)).fetchall()
+            return [self._hydrate(conn, row, history) for row in rows]
+
+    def get_measurements(
+        self,
+        patient_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        after: Optional[Tuple[int, int]] = None,
+        limit: Optional[int] = None,
+    ) -> Optional[MeasurementPage]:
+        after_ts, after_id = after if after is not None else (_MIN_MICROS, -1)
+        params = (
+            patient_id,
+            _MIN_MICROS if start is None else to_epoch_micros(start),
+            _MAX_MICROS if end is None else to_epoch_micros(end),
+            after_ts,
+            after_id,
+            # Fetch one extra row to know whether another page follows
+            -1 if limit is None else limit + 1,
+        )
+        with self._connection() as conn:
+            if conn.execute(self.EXISTS_PATIENT, (patient_id,)).fetchone() is None:
+                return None
+            rows = conn.execute(self.SELECT_MEASUREMENT_RANGE, params).fetchall()
+        next_key = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_key = (rows[-1][9], rows[-1][0])
+        return MeasurementPage([self._measurement_from_row(r) for r in rows], next_key)
+
+    def recent_vitals(self) -> RecentVitals:
+        nan = math.nan
+        patient_ids: List[str] = []
+        latest = {f: array("d") for f in VITAL_FIELDS}
+        previous = {f: array("d") for f in VITAL_FIELDS}
+        sintomas: List[Optional[List[str]]] = []
+        with self._connection() as conn:
+            for row in conn.execute(self.SELECT_RECENT_VITALS):
+                if row[1] == 2:
+                    # Previous reading of the patient appended just before
+                    for field, value in zip(VITAL_FIELDS, row[2:7]):
+                        previous[field][-1] = nan if value is None else value
+                    continue
+                for field, value in zip(VITAL_FIELDS, row[2:7]):
+                    latest[field].append(nan if value is None else value)
+                    previous[field].append(nan)
+                patient_ids.append(row[0])
+                sintomas.append(json.loads(row[7]) if row[7] is not None else None)
+
+            index = {pid: i for i, pid in enumerate(patient_ids)}
+            last_values = {row[0]: row[2:] for row in conn.execute(self.SELECT_LAST_READINGS)}
+            trends = {}
+            for days in TREND_WINDOWS_DAYS:
+                columns = np.full((len(TREND_COLUMNS), len(patient_ids)), nan)
+                columns[0] = 0.0
+                for row in conn.execute(self.SELECT_ALL_WINDOW_AGGREGATES, (days * MICROS_PER_DAY,)):
+                    columns[:, index[row[0]]] = self._trend_row(row[1], row[2:], last_values[row[0]])
+                trends[days] = dict(zip(TREND_COLUMNS, columns))
+        return RecentVitals(
+            patient_ids,
+            {f: np.frombuffer(column, dtype=np.float64) for f, column in latest.items()},
+            {f: np.frombuffer(column, dtype=np.float64) for f, column in previous.items()},
+            sintomas,
+            trends,
+        )
+
+    @staticmethod
+    def _trend_row(count: int, aggregates: tuple, last: tuple) -> Tuple[float, ...]:
+        # Interleaves MIN/MAX/AVG triples with the last value into TREND_COLUMNS order
+        row = [float(count)]
+        for i in range(len(TREND_FIELDS)):
+            row.extend(aggregates[3 * i:3 * i + 3])
+            row.append(last[i])
+        return tuple(row)
+
+    def get_trends(self, patient_id: str) -> Optional[List[TrendWindow]]:
+        with self._connection() as conn:
+            if conn.execute(self.EXISTS_PATIENT, (patient_id,)).fetchone() is None:
+                return None
+            last = conn.execute(self.SELECT_LAST_READING, (patient_id,)).fetchone()
+            if last is None:
+                return []
+            end = last[0]
+            windows = []
+            for days in TREND_WINDOWS_DAYS:
+                count, *aggregates = conn.execute(
+                    self.SELECT_WINDOW_AGGREGATES, (patient_id, end - days * MICROS_PER_DAY)
+                ).fetchone()
+                values = iter(self._trend_row(count, aggregates, last[1:])[1:])
+                windows.append(TrendWindow(
+                    days=days,
+                    end=from_epoch_micros(end),
+                    count=count,
+                    **{field: VitalAggregate(**{stat: next(values) for stat in TREND_STATS}) for field in TREND_FIELDS},
+                ))
+            return windows
+
+    def save(self, patient: Patient) -> Patient:
+        with self._connection() as conn:
+            conn.execute(self.UPSERT_PATIENT, (patient.id, patient.nombre, patient.edad, patient.telefono))
+            conn.execute(self.DELETE_MEASUREMENTS, (patient.id,))
+            conn.execute(self.DELETE_INTERVENTIONS, (patient.id,))
+            conn.execute(self.DELETE_ALERT_STATE, (patient.id,))
+            conn.executemany(
+                self.INSERT_MEASUREMENT,
+                [self._measurement_params(patient.id, m) for m in patient.measurements],
+            )
+            conn.executemany(
+                self.INSERT_INTERVENTION,
+                [(patient.id, json.dumps(entry), patient.id) for entry in patient.intervention_history],
+            )
+        return patient
+
+    def update_profile(self, patient_id: str, patient: Patient) -> Optional[Patient]:
+        with self._connection() as conn:
+            cursor = conn.execute(self.UPDATE_PATIENT, (patient.nombre, patient.edad, patient.telefono, patient_id))
+            if cursor.rowcount == 0:
+                return None
+        return self.get(patient_id, history=None)
+
+    def delete(self, patient_id: str) -> bool:
+        with self._connection() as conn:
+            return conn.execute(self.DELETE_PATIENT, (patient_id,)).rowcount > 0
+
+    def add_measurement(self, patient_id: str, measurement: Measurement) -> bool:
+        with self._connection() as conn:
+            cursor = conn.execute(self.INSERT_MEASUREMENT, self._measurement_params(patient_id, measurement))
+            if cursor.rowcount == 0:
+                return False
+            conn.execute(self.BUMP_MEASUREMENT_VERSION, (patient_id,))
+            return True
+
+    def add_measurements(self, batches: Dict[str, List[Measurement]]) -> Set[str]:
+        missing = set()
+        # One transaction for the whole batch
+        with self._connection() as conn:
+            for patient_id, measurements in batches.items():
+                if conn.execute(self.EXISTS_PATIENT, (patient_id,)).fetchone() is None:
+                    missing.add(patient_id)
+                    continue
+                conn.executemany(self.INSERT_MEASUREMENT, [self._measurement_params(patient_id, m) for m in measurements])
+                conn.execute(self.BUMP_MEASUREMENT_VERSION, (patient_id,))
+        return missing
+
+    def add_intervention(self, patient_id: str, entry: Dict[str, str]) -> bool:
+        with self._connection() as conn:
+            cursor = conn.execute(self.INSERT_INTERVENTION, (patient_id, json.dumps(entry), patient_id))
+            return cursor.rowcount > 0
+
+    def set_alert_state(self, patient_id: str, state: AlertState) -> bool:
+        alerts = json.dumps([a.model_dump() for a in state.alerts])
+        params = (patient_id, state.measurement_version, state.parameters_version, alerts, patient_id)
+        with self._connection() as conn:
+            return conn.execute(self.UPSERT_ALERT_STATE, params).rowcount > 0
+
+    def latest_parameters_version(self) -> int:
+        with self._connection() as conn:
+            return conn.execute("SELECT COALESCE(MAX(parameters_version), 0) FROM alert_states").fetchone()[0]
+
+    def save_cohort(self, cohort: str, overrides: Dict[str, float]) -> None:
+        with self._connection() as conn:
+            conn.execute(self.UPSERT_COHORT, (cohort, json.dumps(overrides)))
+
+    def delete_cohort(self, cohort: str) -> bool:
+        with self._connection() as conn:
+            conn.execute(self.RELEASE_COHORT_MEMBERS, (cohort,))
+            return conn.execute(self.DELETE_COHORT, (cohort,)).rowcount > 0
+
+    def save_patient_parameters(self, patient_id: str, cohort: Optional[str], overrides: Dict[str, float]) -> bool:
+        with self._connection() as conn:
+            params = (patient_id, cohort, json.dumps(overrides), patient_id)
+            return conn.execute(self.UPSERT_PATIENT_PARAMETERS, params).rowcount > 0
+
+    def parameter_overrides(self) -> ParameterOverrideSettings:
+        with self._connection() as conn:
+            cohorts = {name: json.loads(overrides) for name, overrides in conn.execute(self.SELECT_COHORTS)}
+            patients = {
+                patient_id: (cohort, json.loads(overrides))
+                for patient_id, cohort, overrides in conn.execute(self.SELECT_PATIENT_PARAMETERS)
+            }
+        return ParameterOverrideSettings(cohorts, patients)
+
+    def clear(self) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM patients")
+
+def create_patient_repository() -> PatientRepository:
+    """
+    Creates the repository configured through environment variables.
+
+    PATIENTS_DB_BACKEND selects 'memory' (default) or 'sqlite'; the SQLite backend
+    reads its file from PATIENTS_DB_PATH and its pool size from PATIENTS_DB_POOL_SIZE.
+
+    Returns:
+        PatientRepository: Configured repository
+    """
+    backend = os.environ.get("PATIENTS_DB_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        return SQLitePatientRepository(
+            os.environ.get("PATIENTS_DB_PATH", "data/nexo.db"),
+            pool_size=int(os.environ.get("PATIENTS_DB_POOL_SIZE", "4")),
+        )
+    return InMemoryPatientRepository()
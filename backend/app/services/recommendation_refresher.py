@@ -0,0 +1,262 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Set
+from dotenv import load_dotenv
+
+from app.models import AdherenceRecommendations, Patient
+from app.services.ai_service import ADHERENCE_FALLBACK
+from app.services.patient_repository import PatientRepository
+from app.services.recommendation_store import RecommendationStore, is_fresh, profile_version
+
+# Load environment variables
+load_dotenv()
+
+# Recommendation generations run at once by the refresher (background and nightly)
+RECOMMENDATIONS_CONCURRENCY = int(os.environ.get("RECOMMENDATIONS_CONCURRENCY", "4"))
+# UTC hour of the nightly refresh; empty disables it
+RECOMMENDATIONS_REFRESH_HOUR = os.environ.get("RECOMMENDATIONS_REFRESH_HOUR", "3")
+# Entries older than this are regenerated by the nightly refresh even if still fresh
+RECOMMENDATIONS_MAX_AGE_HOURS = float(os.environ.get("RECOMMENDATIONS_MAX_AGE_HOURS", "24"))
+
+PATIENT_PAGE_SIZE = 500
+
+def seconds_until(hour: int, now: datetime) -> float:
+    """
+    Returns the seconds from now until the next time the UTC clock shows hour:00.
+    """
+    target = now.astimezone(timezone.utc).replace(hour=hour, minute=0, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+class RecommendationRefresher:
+    """
+    Keeps every patient's adherence recommendations generated ahead of reads.
+
+    Recommendations are stored with the measurement and profile versions they
+    were generated from; GET .../alerts/recommendations serves the stored entry
+    while it is fresh. Writes schedule a background regeneration for the
+    patient (at most one per patient at a time: a write arriving during a
+    generation runs it once more afterwards), and a nightly job regenerates
+    missing, stale and old entries for the whole population with bounded
+    concurrency. Fallback recommendations (failed generations) are never stored.
+    """
+
+    def __init__(
+        self,
+        repository: PatientRepository,
+        store: RecommendationStore,
+        generate: Callable[[Patient], Awaitable[Dict[str, str]]],
+        concurrency: int = RECOMMENDATIONS_CONCURRENCY,
+        refresh_hour: Optional[int] = int(RECOMMENDATIONS_REFRESH_HOUR) if RECOMMENDATIONS_REFRESH_HOUR else None,
+        max_age_hours: float = RECOMMENDATIONS_MAX_AGE_HOURS,
+    ):
+        """
+        Args:
+            repository: Patient repository the patients are read from
+            store: Store of generated recommendations
+            generate: Async function generating a patient's recommendations
+            concurrency: Maximum number of generations in flight
+            refresh_hour: UTC hour of the nightly refresh (None to disable it)
+            max_age_hours: Age after which the nightly refresh regenerates an entry
+        """
+        self.repository = repository
+        self.store = store
+        self.generate = generate
+        self.concurrency = concurrency
+        self.refresh_hour = refresh_hour
+        self.max_age = timedelta(hours=max_age_hours)
+        self._running: Dict[str, asyncio.Task] = {}
+        self._dirty: Set[str] = set()
+        self._nightly: Optional[asyncio.Task] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    @property
+    def pending(self) -> int:
+        return sum(1 for task in self._running.values() if not task.done())
+
+    def get_fresh(self, patient: Patient) -> Optional[Dict[str, str]]:
+        """
+        Returns the patient's stored recommendations if they are fresh.
+        """
+        entry = self.store.get(patient.id)
+        return entry.recommendations if is_fresh(entry, patient) else None
+
+    def record(self, patient: Patient, recommendations: Dict[str, str]) -> Optional[AdherenceRecommendations]:
+        """
+        Stores recommendations generated from the given patient state.
+
+        Args:
+            patient: Patient as read from the repository before the generation
+            recommendations: Generated recommendations
+
+        Returns:
+            Optional[AdherenceRecommendations]: Stored entry, or None if nothing
+                was stored (fallback recommendations, or a patient not loaded from storage)
+        """
+        if patient.measurement_version is None or recommendations == ADHERENCE_FALLBACK:
+            return None
+        entry = AdherenceRecommendations(
+            recommendations=recommendations,
+            measurement_version=patient.measurement_version,
+            profile_version=profile_version(patient)
+        )
+        self.store.put(patient.id, entry)
+        return entry
+
+    async def refresh(self, patient_id: str) -> Optional[AdherenceRecommendations]:
+        """
+        Generates and stores a patient's recommendations.
+
+        Args:
+            patient_id: Patient identifier
+
+        Returns:
+            Optional[AdherenceRecommendations]: Stored entry, or None if the
+                patient does not exist or the generation failed
+        """
+        async with self.semaphore:
+            # Read inside the slot so the generation uses the latest state
+            patient = self.repository.get(patient_id)
+            if patient is None:
+                return None
+            return self.record(patient, await self.generate(patient))
+
+    def schedule(self, patient_id: str) -> bool:
+        """
+        Regenerates a patient's recommendations in the background after a write.
+
+        Must be called from the event loop (a request handler); does nothing otherwise.
+
+        Args:
+            patient_id: Patient identifier
+
+        Returns:
+            bool: True if a regeneration was scheduled or is already running
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        task = self._running.get(patient_id)
+        if task is not None and not task.done():
+            self._dirty.add(patient_id)
+            return True
+        self._running[patient_id] = loop.create_task(self._run(patient_id))
+        return True
+
+    async def _run(self, patient_id: str) -> None:
+        try:
+            while True:
+                self._dirty.discard(patient_id)
+                try:
+                    await self.refresh(patient_id)
+                except Exception as e:
+                    print(f"Error refreshing recommendations for {patient_id}: {e}")
+                if patient_id not in self._dirty:
+                    return
+        finally:
+            self._running.pop(patient_id, None)
+
+    async def drain(self) -> None:
+        """
+        Waits for the scheduled regenerations (including reruns) to finish.
+        """
+        while self._running:
+            await asyncio.gather(*list(self._running.values()), return_exceptions=True)
+
+    def forget(self, patient_id: str) -> None:
+        """
+        Drops a deleted patient's recommendations.
+        """
+        self.store.delete(patient_id)
+
+    def _patient_ids(self) -> Iterator[str]:
+        after = None
+        while True:
+            page = self.repository.list_patients(after=after, limit=PATIENT_PAGE_SIZE, history=0)
+            for patient in page:
+                yield patient.id
+            if len(page) < PATIENT_PAGE_SIZE:
+                return
+            after = page[-1].id
+
+    def _needs_refresh(self, patient_id: str, generated_at: Dict[str, datetime], now: datetime) -> bool:
+        stamp = generated_at.get(patient_id)
+        if stamp is None or now - stamp >= self.max_age:
+            return True
+        patient = self.repository.get(patient_id, history=0)
+        return patient is not None and not is_fresh(self.store.get(patient_id), patient)
+
+    async def refresh_all(self, patient_ids: Optional[List[str]] = None) -> int:
+        """
+        Regenerates the recommendations of every patient (or of the given ones)
+        whose entry is missing, stale or older than the maximum age.
+
+        At most `concurrency` generations run at once; patients are read page
+        by page as the workers need them, so memory does not grow with the
+        population.
+
+        Args:
+            patient_ids: Patients to consider (all stored patients when None)
+
+        Returns:
+            int: Number of entries regenerated
+        """
+        now = datetime.now(timezone.utc)
+        generated_at = self.store.generated_at()
+        candidates = iter(patient_ids) if patient_ids is not None else self._patient_ids()
+        refreshed = 0
+
+        async def worker() -> None:
+            nonlocal refreshed
+            for patient_id in candidates:
+                if not self._needs_refresh(patient_id, generated_at, now):
+                    continue
+                try:
+                    if await self.refresh(patient_id) is not None:
+                        refreshed += 1
+                except Exception as e:
+                    print(f"Error refreshing recommendations for {patient_id}: {e}")
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return refreshed
+
+    async def start(self) -> None:
+        """
+        Starts the nightly refresh (if a refresh hour is configured).
+        """
+        if self.refresh_hour is None or self._nightly is not None:
+            return
+        self._nightly = asyncio.create_task(self._run_nightly())
+
+    async def stop(self) -> None:
+        """
+        Stops the nightly refresh and cancels the scheduled regenerations.
+        """
+        tasks = list(self._running.values())
+        if self._nightly is not None:
+            tasks.append(self._nightly)
+            self._nightly = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run_nightly(self) -> None:
+        while True:
+            await asyncio.sleep(seconds_until(self.refresh_hour, datetime.now(timezone.utc)))
+            try:
+                refreshed = await self.refresh_all()
+                print(f"Nightly refresh regenerated {refreshed} adherence recommendations")
+            except Exception as e:
+                print(f"Error in nightly recommendations refresh: {e}")
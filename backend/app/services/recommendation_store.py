@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+from app.models import AdherenceRecommendations, Patient
+
+# Load environment variables
+load_dotenv()
+
+def profile_version(patient: Patient) -> str:
+    """
+    Returns a digest of the profile fields the recommendation prompt uses
+    (name and age), so a profile update makes stored recommendations stale.
+    """
+    return hashlib.blake2b(f"{patient.nombre}\0{patient.edad}".encode(), digest_size=8).hexdigest()
+
+def is_fresh(entry: Optional[AdherenceRecommendations], patient: Patient) -> bool:
+    """
+    Checks whether stored recommendations were generated from the patient's
+    current measurements and profile.
+    """
+    return (
+        entry is not None
+        and patient.measurement_version is not None
+        and entry.measurement_version == patient.measurement_version
+        and entry.profile_version == profile_version(patient)
+    )
+
+class RecommendationStore(ABC):
+    """
+    Latest generated adherence recommendations per patient, tagged with the
+    measurement and profile versions they were generated from.
+    """
+
+    @abstractmethod
+    def get(self, patient_id: str) -> Optional[AdherenceRecommendations]:
+        """
+        Returns the patient's stored recommendations, fresh or not.
+        """
+
+    @abstractmethod
+    def put(self, patient_id: str, entry: AdherenceRecommendations) -> None:
+        """
+        Stores (replaces) the patient's recommendations.
+        """
+
+    @abstractmethod
+    def delete(self, patient_id: str) -> bool:
+        """
+        Removes the patient's recommendations.
+        """
+
+    @abstractmethod
+    def generated_at(self) -> Dict[str, datetime]:
+        """
+        Returns the generation time of every stored entry, per patient.
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Removes every entry.
+        """
+
+class InMemoryRecommendationStore(RecommendationStore):
+    """
+    Store kept in process memory (regenerated after a restart).
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, AdherenceRecommendations] = {}
+        self._lock = threading.Lock()
+
+    def get(self, patient_id: str) -> Optional[AdherenceRecommendations]:
+        with self._lock:
+            entry = self._entries.get(patient_id)
+            return entry.model_copy() if entry else None
+
+    def put(self, patient_id: str, entry: AdherenceRecommendations) -> None:
+        with self._lock:
+            self._entries[patient_id] = entry.model_copy()
+
+    def delete(self, patient_id: str) -> bool:
+        with self._lock:
+            return self._entries.pop(patient_id, None) is not None
+
+    def generated_at(self) -> Dict[str, datetime]:
+        with self._lock:
+            return {patient_id: entry.generated_at for patient_id, entry in self._entries.items()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+class SQLiteRecommendationStore(RecommendationStore):
+    """
+    Durable store backed by a SQLite database in WAL mode, so recommendations
+    generated before a restart are still served.
+
+    Entries are written once per generation, so a single connection guarded by
+    a lock is enough.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS adherence_recommendations (
+        patient_id TEXT PRIMARY KEY,
+        recommendations TEXT NOT NULL,
+        measurement_version INTEGER NOT NULL,
+        profile_version TEXT NOT NULL,
+        generated_at TEXT NOT NULL
+    );
+    """
+
+    SELECT_ENTRY = (
+        "SELECT recommendations, measurement_version, profile_version, generated_at "
+        "FROM adherence_recommendations WHERE patient_id = ?"
+    )
+    SELECT_GENERATED_AT = "SELECT patient_id, generated_at FROM adherence_recommendations"
+    UPSERT_ENTRY = (
+        "INSERT INTO adherence_recommendations "
+        "(patient_id, recommendations, measurement_version, profile_version, generated_at) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(patient_id) DO UPDATE SET recommendations = excluded.recommendations, "
+        "measurement_version = excluded.measurement_version, profile_version = excluded.profile_version, "
+        "generated_at = excluded.generated_at"
+    )
+    DELETE_ENTRY = "DELETE FROM adherence_recommendations WHERE patient_id = ?"
+    DELETE_ALL = "DELETE FROM adherence_recommendations"
+
+    def __init__(self, path: str):
+        """
+        Opens (or creates) the recommendations database.
+
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def get(self, patient_id: str) -> Optional[AdherenceRecommendations]:
+        with self._lock:
+            row = self._conn.execute(self.SELECT_ENTRY, (patient_id,)).fetchone()
+        if row is None:
+            return None
+        return AdherenceRecommendations(
+            recommendations=json.loads(row[0]), measurement_version=row[1],
+            profile_version=row[2], generated_at=datetime.fromisoformat(row[3])
+        )
+
+    def put(self, patient_id: str, entry: AdherenceRecommendations) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(self.UPSERT_ENTRY, (
+                patient_id, json.dumps(entry.recommendations, ensure_ascii=False), entry.measurement_version,
+                entry.profile_version, entry.generated_at.isoformat()
+            ))
+
+    def delete(self, patient_id: str) -> bool:
+        with self._lock, self._conn:
+            return self._conn.execute(self.DELETE_ENTRY, (patient_id,)).rowcount > 0
+
+    def generated_at(self) -> Dict[str, datetime]:
+        with self._lock:
+            rows = self._conn.execute(self.SELECT_GENERATED_AT).fetchall()
+        return {patient_id: datetime.fromisoformat(value) for patient_id, value in rows}
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(self.DELETE_ALL)
+
+def create_recommendation_store() -> RecommendationStore:
+    """
+    Creates the recommendation store configured through environment variables.
+
+    RECOMMENDATIONS_BACKEND selects 'memory' or 'sqlite' (by default the same
+    backend as PATIENTS_DB_BACKEND); the SQLite backend reads its file from
+    RECOMMENDATIONS_PATH.
+
+    Returns:
+        RecommendationStore: Configured store
+    """
+    backend = os.environ.get("RECOMMENDATIONS_BACKEND", os.environ.get("PATIENTS_DB_BACKEND", "memory")).lower()
+    if backend == "sqlite":
+        return SQLiteRecommendationStore(os.environ.get("RECOMMENDATIONS_PATH", "data/recommendations.db"))
+    return InMemoryRecommendationStore()
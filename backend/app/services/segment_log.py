@@ -0,0 +1,382 @@
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Directory holding one log directory per ingestion kind (text/, vision/)
+INGESTION_LOG_DIR = os.environ.get("INGESTION_LOG_DIR", "data/ingestion")
+INGESTION_SEGMENT_BYTES = int(os.environ.get("INGESTION_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+# Bytes of records between two entries of a segment's sparse index
+INGESTION_INDEX_INTERVAL_BYTES = int(os.environ.get("INGESTION_INDEX_INTERVAL_BYTES", "4096"))
+# Sealed segments whose newest record is older than this are deleted; 0 keeps them
+INGESTION_RETENTION_HOURS = float(os.environ.get("INGESTION_RETENTION_HOURS", "720"))
+# Oldest sealed segments are deleted while the log is larger than this; 0 disables the limit
+INGESTION_RETENTION_BYTES = int(os.environ.get("INGESTION_RETENTION_BYTES", "0"))
+# Seconds between two retention runs of the server (rollovers also run it)
+INGESTION_RETENTION_INTERVAL_SECONDS = float(os.environ.get("INGESTION_RETENTION_INTERVAL_SECONDS", "600"))
+# fsync every append (durable against power loss, slower)
+INGESTION_LOG_FSYNC = os.environ.get("INGESTION_LOG_FSYNC", "false").lower() in ("1", "true", "yes")
+
+# Record header: payload length, CRC32 of the payload, append time (microseconds since the epoch)
+RECORD_HEADER = struct.Struct("<IIq")
+# Index entry: record offset, position of the record in the segment, its append time
+INDEX_ENTRY = struct.Struct("<QQq")
+LOG_SUFFIX = ".log"
+INDEX_SUFFIX = ".index"
+
+def to_micros(value: datetime) -> int:
+    """
+    Converts a datetime (naive values are taken as UTC) to microseconds since the epoch.
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    delta = value - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+class LogRecord(NamedTuple):
+    offset: int
+    timestamp: int
+    payload: bytes
+
+class LogPage(NamedTuple):
+    records: List[LogRecord]
+    # Offset of the first record of the next page, None on the last page
+    next_offset: Optional[int]
+
+class Segment:
+    """
+    One file of the log: records appended back to back, each a header
+    (RECORD_HEADER) followed by its payload, starting at record offset
+    base_offset. A sparse index (one entry per index interval of bytes, kept in
+    memory and in a side file) maps offsets and append times to positions;
+    reads map the file with mmap and only touch the records they return.
+    """
+
+    def __init__(self, directory: str, base_offset: int):
+        self.base_offset = base_offset
+        self.path = os.path.join(directory, f"{base_offset:020d}{LOG_SUFFIX}")
+        self.index_path = os.path.join(directory, f"{base_offset:020d}{INDEX_SUFFIX}")
+        self.index: List[Tuple[int, int, int]] = []
+        self.size = 0
+        self.next_offset = base_offset
+        self.last_timestamp = 0
+        self._file: Optional[BinaryIO] = None
+        self._index_file: Optional[BinaryIO] = None
+        self._map: Optional[mmap.mmap] = None
+
+    def _records(self, view, position: int, offset: int, end: int) -> Iterator[Tuple[int, int, int, int]]:
+        # (offset, position, timestamp, payload length) of the records in [position, end)
+        while position + RECORD_HEADER.size <= end:
+            length, _, timestamp = RECORD_HEADER.unpack_from(view, position)
+            yield offset, position, timestamp, length
+            position += RECORD_HEADER.size + length
+            offset += 1
+
+    def load(self, index_interval: int) -> None:
+        """
+        Reads the segment's index and validates the records after its last
+        entry, truncating a torn or corrupt tail left by a crash.
+        """
+        self.size = os.path.getsize(self.path)
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                data = f.read()
+            usable = len(data) - len(data) % INDEX_ENTRY.size
+            self.index = [entry for entry in INDEX_ENTRY.iter_unpack(data[:usable]) if entry[1] < self.size]
+        position, offset = (self.index[-1][1], self.index[-1][0]) if self.index else (0, self.base_offset)
+        if self.index:
+            self.index.pop()  # re-added by the scan below
+        last_indexed = -index_interval
+        valid = position
+        if self.size:
+            with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                while position + RECORD_HEADER.size <= self.size:
+                    length, crc, timestamp = RECORD_HEADER.unpack_from(view, position)
+                    start = position + RECORD_HEADER.size
+                    if start + length > self.size or zlib.crc32(view[start:start + length]) != crc:
+                        break
+                    if position - last_indexed >= index_interval:
+                        self.index.append((offset, position, timestamp))
+                        last_indexed = position
+                    self.last_timestamp = timestamp
+                    position = start + length
+                    offset += 1
+                    valid = position
+        if valid < self.size:
+            print(f"Truncating {self.size - valid} bytes of incomplete records from {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(valid)
+            self.size = valid
+        self.next_offset = offset
+        # Rewrite the index so it matches the validated records
+        with open(self.index_path, "wb") as f:
+            f.write(b"".join(INDEX_ENTRY.pack(*entry) for entry in self.index))
+
+    def open_for_append(self) -> None:
+        self._file = open(self.path, "ab")
+        self._index_file = open(self.index_path, "ab")
+
+    def append(self, payload: bytes, timestamp: int, index_interval: int, fsync: bool) -> int:
+        """
+        Writes one record with a single buffered write and returns its offset.
+        """
+        position = self.size
+        if not self.index or position - self.index[-1][1] >= index_interval:
+            entry = (self.next_offset, position, timestamp)
+            self.index.append(entry)
+            self._index_file.write(INDEX_ENTRY.pack(*entry))
+            self._index_file.flush()
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload), timestamp) + payload
+        self._file.write(record)
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+        offset = self.next_offset
+        self.next_offset += 1
+        self.size += len(record)
+        self.last_timestamp = timestamp
+        return offset
+
+    def seal(self) -> None:
+        """
+        Closes the append handles once the log rolled over to a new segment.
+        """
+        for handle in (self._file, self._index_file):
+            if handle is not None:
+                handle.close()
+        self._file = self._index_file = None
+
+    def _view(self) -> mmap.mmap:
+        # Remap when records were appended since the last mapping
+        if self._map is None or len(self._map) < self.size:
+            if self._map is not None:
+                self._map.close()
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def read(self, start_offset: int, start_time: Optional[int], end_time: Optional[int], limit: int) -> Tuple[List[LogRecord], bool]:
+        """
+        Returns up to limit records at or after start_offset whose append time is
+        in [start_time, end_time), and whether the scan stopped at end_time.
+        """
+        if self.size == 0 or start_offset >= self.next_offset:
+            return [], False
+        # Latest index entry at or before the first candidate record
+        i = bisect.bisect_right(self.index, start_offset, key=lambda entry: entry[0]) - 1
+        if start_time is not None:
+            i = max(i, bisect.bisect_left(self.index, start_time, key=lambda entry: entry[2]) - 1)
+        offset, position, _ = self.index[max(i, 0)]
+        view = self._view()
+        records: List[LogRecord] = []
+        for offset, position, timestamp, length in self._records(view, position, offset, self.size):
+            if end_time is not None and timestamp >= end_time:
+                return records, True
+            if offset < start_offset or (start_time is not None and timestamp < start_time):
+                continue
+            start = position + RECORD_HEADER.size
+            records.append(LogRecord(offset, timestamp, view[start:start + length]))
+            if len(records) == limit:
+                break
+        return records, False
+
+    def close(self) -> None:
+        self.seal()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def delete(self) -> None:
+        self.close()
+        for path in (self.path, self.index_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+class SegmentLog:
+    """
+    Append-only log of opaque records, stored on disk as a sequence of
+    segment files.
+
+    Every record gets a sequential offset and its append time (kept
+    non-decreasing), so both offset and time-range reads start from a binary
+    search over the segments and their sparse indexes. Ingest is a single
+    buffered write to the active segment, which is sealed once it reaches
+    segment_bytes; sealed segments are deleted by the retention policy (age of
+    their newest record, total size of the log). Reads go through mmap and only
+    copy the records they return, so neither memory use nor read cost grows
+    with the size of the log.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = INGESTION_SEGMENT_BYTES,
+        index_interval_bytes: int = INGESTION_INDEX_INTERVAL_BYTES,
+        retention_hours: float = INGESTION_RETENTION_HOURS,
+        retention_bytes: int = INGESTION_RETENTION_BYTES,
+        fsync: bool = INGESTION_LOG_FSYNC,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Opens (or creates) the log in directory, recovering from an interrupted append.
+
+        Args:
+            directory: Directory of the segment files
+            segment_bytes: Size at which the active segment is sealed
+            index_interval_bytes: Bytes of records between two sparse index entries
+            retention_hours: Age after which sealed segments are deleted (0 keeps them)
+            retention_bytes: Maximum total size of the log (0 for no limit)
+            fsync: Whether to fsync every append
+            clock: Time source (seconds since the epoch)
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.index_interval = index_interval_bytes
+        self.retention_us = int(retention_hours * 3600 * 1_000_000)
+        self.retention_bytes = retention_bytes
+        self.fsync = fsync
+        self.clock = clock
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        bases = sorted(int(name[:-len(LOG_SUFFIX)]) for name in os.listdir(directory) if name.endswith(LOG_SUFFIX))
+        self.segments: List[Segment] = []
+        for base in bases:
+            segment = Segment(directory, base)
+            segment.load(self.index_interval)
+            if self.segments:
+                # Keeps the append times non-decreasing across an empty active segment
+                segment.last_timestamp = max(segment.last_timestamp, self.segments[-1].last_timestamp)
+            self.segments.append(segment)
+        if not self.segments:
+            self.segments.append(Segment(directory, 0))
+        self._active.open_for_append()
+        self._enforce_retention()
+
+    @property
+    def _active(self) -> Segment:
+        return self.segments[-1]
+
+    @property
+    def next_offset(self) -> int:
+        return self._active.next_offset
+
+    @property
+    def first_offset(self) -> int:
+        return self.segments[0].base_offset
+
+    def append(self, payload: bytes) -> LogRecord:
+        """
+        Appends a record, rolling over to a new segment when the active one is full.
+
+        Args:
+            payload: Record bytes
+
+        Returns:
+            LogRecord: Offset and append time of the record
+        """
+        with self._lock:
+            timestamp = max(int(self.clock() * 1_000_000), self._active.last_timestamp)
+            active = self._active
+            if active.size and active.size + RECORD_HEADER.size + len(payload) > self.segment_bytes:
+                active.seal()
+                previous, active = active, Segment(self.directory, active.next_offset)
+                active.last_timestamp = previous.last_timestamp
+                active.open_for_append()
+                self.segments.append(active)
+                self._enforce_retention()
+            offset = active.append(payload, timestamp, self.index_interval, self.fsync)
+            return LogRecord(offset, timestamp, payload)
+
+    def _enforce_retention(self) -> None:
+        now = int(self.clock() * 1_000_000)
+        total = sum(segment.size for segment in self.segments)
+        while len(self.segments) > 1:
+            oldest = self.segments[0]
+            expired = self.retention_us and now - oldest.last_timestamp > self.retention_us
+            oversized = self.retention_bytes and total > self.retention_bytes
+            if not (expired or oversized):
+                break
+            total -= oldest.size
+            oldest.delete()
+            self.segments.pop(0)
+
+    def enforce_retention(self) -> None:
+        """
+        Deletes the sealed segments outside the retention policy (also done on every rollover).
+        """
+        with self._lock:
+            self._enforce_retention()
+
+    def read(
+        self,
+        start_offset: int = 0,
+        limit: int = 100,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> LogPage:
+        """
+        Returns the records from start_offset on, optionally limited to those
+        appended in [start, end).
+
+        Args:
+            start_offset: Offset of the first record to consider (records removed
+                by retention are skipped)
+            limit: Maximum number of records
+            start: Inclusive lower bound of the append time
+            end: Exclusive upper bound of the append time
+
+        Returns:
+            LogPage: Records in offset order and the offset the next page starts at
+        """
+        start_time = to_micros(start) if start is not None else None
+        end_time = to_micros(end) if end is not None else None
+        with self._lock:
+            i = max(0, bisect.bisect_right(self.segments, start_offset, key=lambda s: s.base_offset) - 1)
+            if start_time is not None:
+                # Skip the segments whose newest record is older than start
+                i = max(i, bisect.bisect_left(self.segments, start_time, key=lambda s: s.last_timestamp))
+            records: List[LogRecord] = []
+            # One extra record tells whether another page follows
+            for segment in self.segments[i:]:
+                found, ended = segment.read(start_offset, start_time, end_time, limit + 1 - len(records))
+                records.extend(found)
+                if ended or len(records) > limit:
+                    break
+        if len(records) > limit:
+            return LogPage(records[:limit], records[limit].offset)
+        return LogPage(records, None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the number of segments, their total size and the offset range.
+        """
+        with self._lock:
+            return {
+                "segments": len(self.segments),
+                "bytes": sum(segment.size for segment in self.segments),
+                "first_offset": self.first_offset,
+                "next_offset": self.next_offset,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            for segment in self.segments:
+                segment.close()
+
+def create_ingestion_log(kind: str) -> SegmentLog:
+    """
+    Creates the ingestion log of one kind ('text' or 'vision') under INGESTION_LOG_DIR.
+
+    Returns:
+        SegmentLog: Opened log
+    """
+    return SegmentLog(os.path.join(INGESTION_LOG_DIR, kind))
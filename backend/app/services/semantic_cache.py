@@ -0,0 +1,276 @@
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from typing import Dict, FrozenSet, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Minimum cosine similarity between two queries for a cached answer to be reused
+GUIDELINE_CACHE_THRESHOLD = float(os.environ.get("GUIDELINE_CACHE_THRESHOLD", "0.9"))
+# Cached answers per guideline source
+GUIDELINE_CACHE_SIZE = int(os.environ.get("GUIDELINE_CACHE_SIZE", "10000"))
+# Dimension of the hashed n-gram vectors
+GUIDELINE_CACHE_DIM = int(os.environ.get("GUIDELINE_CACHE_DIM", "256"))
+
+NGRAM = 3
+
+_NON_WORD = re.compile(r"[^\w]+")
+# Common accented lowercase letters, folded without Unicode decomposition
+_ACCENTS = str.maketrans("áàâäãéèêëíìîïóòôöõúùûüñç", "aaaaaeeeeiiiiooooouuuunc")
+
+# Words left out of the query vectors, so rewordings that only change them
+# ("cual es la meta" / "meta de la") embed alike; "presion" is always the
+# arterial pressure here. Negations and qualifiers (no, sin, con, mas, menos,
+# alto, bajo...) are deliberately absent.
+STOP_WORDS = frozenset("""
+a al algo algun alguna alguno cual cuales cuando cuanto cuanta cuantos cuantas como de del donde el ella
+en es esta estan este estos estas esto hay la las le les lo los me mi mis o para por porque que se ser
+son su sus un una unos unas y ya debe deben puede pueden tiene tienen
+an and are be can does for how in is it of on or should the to what when which
+arterial sanguinea
+""".split())
+
+# Words embedded as another one with the same meaning in a guideline question
+SYNONYMS = {
+    "objetivo": "meta",
+    "target": "meta",
+    "goal": "meta",
+    "tension": "presion",
+    "pressure": "presion",
+    "recomendado": "recomendada",
+}
+
+def _stem(word: str) -> str:
+    """
+    Strips a plural "s"/"es" and a final "e": "pacientes", "paciente" -> "pacient".
+    """
+    if len(word) > 3 and word.endswith("s"):
+        word = word[:-1]
+    if len(word) > 3 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+# Words that change the question: two queries differing in one of them never
+# share an answer, however close their vectors (numbers are discriminators too)
+DISCRIMINATORS = frozenset(_stem(word) for word in """
+no ni sin con nunca tampoco ningun ninguna ninguno not without with
+sistolica diastolica alto alta bajo baja mas menos mayor menor maximo maxima minimo minima
+hombre mujer nino nina adulto adulta
+""".split())
+
+def normalize_query(text: str) -> str:
+    """
+    Lowercases a query, strips accents and punctuation and collapses whitespace.
+    """
+    folded = text.lower().translate(_ACCENTS)
+    if not folded.isascii():
+        decomposed = unicodedata.normalize("NFKD", folded)
+        folded = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_WORD.sub(" ", folded).strip()
+
+def query_terms(text: str) -> List[str]:
+    """
+    Returns the words of a query that carry its meaning: folded (see
+    normalize_query), stop words dropped, synonyms mapped to one word and a
+    plural "s"/"es" stripped.
+    """
+    terms = []
+    for word in normalize_query(text).split():
+        if word in STOP_WORDS:
+            continue
+        terms.append(_stem(SYNONYMS.get(word, word)))
+    return terms
+
+def embed(text: str, dim: int = GUIDELINE_CACHE_DIM) -> np.ndarray:
+    """
+    Embeds a query as a unit vector of hashed character n-gram counts of its terms.
+
+    Each term (see query_terms) is padded with spaces and cut into overlapping
+    n-grams, which are hashed (crc32, stable across processes) into dim buckets
+    with a hash-derived sign, so collisions tend to cancel out instead of adding up.
+
+    Args:
+        text: Query text
+        dim: Vector dimension
+
+    Returns:
+        np.ndarray: float32 vector of unit length (all zeros for an empty query)
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for term in query_terms(text):
+        padded = f" {term} "
+        for i in range(max(1, len(padded) - NGRAM + 1)):
+            h = zlib.crc32(padded[i:i + NGRAM].encode())
+            vector[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+def discriminators(text: str) -> FrozenSet[str]:
+    """
+    Returns the terms of a query that change its answer: numbers, negations and
+    opposed qualifiers ("sistolica"/"diastolica", "con"/"sin", "alto"/"bajo").
+
+    Two queries whose n-gram vectors are close can still ask opposite things; a
+    cached answer is never reused for a query with different discriminators.
+    """
+    return frozenset(
+        term for term in query_terms(text)
+        if term in DISCRIMINATORS or any(c.isdigit() for c in term)
+    )
+
+def text_fingerprint(text: str) -> str:
+    """
+    Returns a short digest identifying a version of a guideline text.
+    """
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+INITIAL_CAPACITY = 64
+
+class _SourceCache:
+    """
+    Cached answers of one guideline source: the query vectors as the columns of
+    a dim x capacity matrix (grown by doubling), the answers, the
+    discriminators of the queries and a use counter per entry for LRU eviction.
+
+    Storing one row per dimension lets a lookup read only the rows of the
+    query's non-zero n-gram buckets (a short query has a few dozen), instead of
+    the whole matrix.
+    """
+
+    def __init__(self, fingerprint: str, dim: int):
+        self.fingerprint = fingerprint
+        self.vectors = np.zeros((dim, INITIAL_CAPACITY), dtype=np.float32)
+        self.last_used = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        self.answers: List[str] = []
+        self.discriminators: List[FrozenSet[str]] = []
+        self.size = 0
+
+    def append(self, vector: np.ndarray, discriminators: FrozenSet[str], answer: str, tick: int) -> None:
+        if self.size == self.vectors.shape[1]:
+            self.vectors = np.concatenate([self.vectors, np.zeros_like(self.vectors)], axis=1)
+            self.last_used = np.concatenate([self.last_used, np.zeros_like(self.last_used)])
+        self.vectors[:, self.size] = vector
+        self.last_used[self.size] = tick
+        self.answers.append(answer)
+        self.discriminators.append(discriminators)
+        self.size += 1
+
+class SemanticCache:
+    """
+    Reuses guideline answers across differently worded but similar queries.
+
+    Queries are embedded locally (hashed character n-grams of their terms, see
+    embed); a lookup computes the cosine similarity with every cached query of
+    the source as one product over the query's non-zero dimensions. The most
+    similar query whose similarity reaches the threshold is a hit, so a
+    rewording with other stop words or a synonym matches; a cached query with
+    other discriminators (a number, negation or opposed qualifier, see
+    discriminators) is vetoed however similar. Each source is tied to a
+    fingerprint of its guideline text: when the text changes, the source's
+    entries are dropped. Once a source holds max_entries answers, the least
+    recently used one is replaced.
+    """
+
+    def __init__(
+        self,
+        threshold: float = GUIDELINE_CACHE_THRESHOLD,
+        max_entries: int = GUIDELINE_CACHE_SIZE,
+        dim: int = GUIDELINE_CACHE_DIM,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.dim = dim
+        self._sources: Dict[str, _SourceCache] = {}
+        self._tick = 0
+        self._counters = dict.fromkeys(("hits", "misses", "evictions", "invalidations"), 0)
+        self._lock = threading.Lock()
+
+    def _source(self, source: str, fingerprint: str, create: bool) -> Optional[_SourceCache]:
+        key = source.lower()
+        cache = self._sources.get(key)
+        if cache is not None and cache.fingerprint != fingerprint:
+            self._counters["invalidations"] += 1
+            del self._sources[key]
+            cache = None
+        if cache is None and create:
+            cache = self._sources[key] = _SourceCache(fingerprint, self.dim)
+        return cache
+
+    def lookup(self, source: str, fingerprint: str, query: str) -> Optional[str]:
+        """
+        Returns the cached answer of the most similar query, if similar enough.
+
+        Args:
+            source: Guideline source
+            fingerprint: Fingerprint of the source's current guideline text
+            query: User's question
+
+        Returns:
+            Optional[str]: Cached answer, or None on a miss
+        """
+        vector = embed(query, self.dim)
+        with self._lock:
+            # Sources are only created by store, so lookups of unknown sources allocate nothing
+            cache = self._source(source, fingerprint, create=False)
+            nonzero = np.flatnonzero(vector)
+            if cache is not None and cache.size and len(nonzero):
+                similarities = vector[nonzero] @ cache.vectors[nonzero, :cache.size]
+                candidates = np.flatnonzero(similarities >= self.threshold)
+                if len(candidates):
+                    vetoes = discriminators(query)
+                    for best in candidates[np.argsort(-similarities[candidates], kind="stable")]:
+                        if cache.discriminators[best] == vetoes:
+                            self._tick += 1
+                            cache.last_used[best] = self._tick
+                            self._counters["hits"] += 1
+                            return cache.answers[best]
+            self._counters["misses"] += 1
+            return None
+
+    def store(self, source: str, fingerprint: str, query: str, answer: str) -> None:
+        """
+        Caches the answer to a query, replacing the least recently used entry when full.
+
+        Args:
+            source: Guideline source
+            fingerprint: Fingerprint of the guideline text the answer was based on
+            query: User's question
+            answer: Answer to cache
+        """
+        vector = embed(query, self.dim)
+        if not vector.any():
+            return
+        vetoes = discriminators(query)
+        with self._lock:
+            cache = self._source(source, fingerprint, create=True)
+            self._tick += 1
+            if cache.size < self.max_entries:
+                cache.append(vector, vetoes, answer, self._tick)
+                return
+            row = int(np.argmin(cache.last_used[:cache.size]))
+            cache.vectors[:, row] = vector
+            cache.last_used[row] = self._tick
+            cache.answers[row] = answer
+            cache.discriminators[row] = vetoes
+            self._counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns hit, miss, eviction and invalidation counts and the number of entries.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats["size"] = sum(cache.size for cache in self._sources.values())
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sources.clear()
+            for counter in self._counters:
+                self._counters[counter] = 0
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    The first caller for a key starts the call as a task; callers arriving
+    while it is in flight await the same task instead of starting their own,
+    and all of them get its result (or its exception). The key is released as
+    soon as the call finishes, so later callers start a new one: results are
+    shared, never cached.
+
+    A caller being cancelled does not cancel the shared call, which still
+    completes for the other callers. In-flight calls belong to the event loop
+    that started them; a caller on another loop starts its own.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Tuple[asyncio.AbstractEventLoop, asyncio.Task]] = {}
+        self._counters = dict.fromkeys(("calls", "shared"), 0)
+        self._lock = threading.Lock()
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Runs fn() unless a call with the same key is already in flight, and
+        returns the result of whichever call is.
+
+        Args:
+            key: Identity of the call (hashable)
+            fn: Function starting the call
+
+        Returns:
+            Result of the in-flight call
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._calls.get(key)
+            if entry is not None and entry[0] is loop and not entry[1].done():
+                task = entry[1]
+                self._counters["shared"] += 1
+            else:
+                task = loop.create_task(fn())
+                self._calls[key] = (loop, task)
+                self._counters["calls"] += 1
+                task.add_done_callback(lambda done, key=key: self._release(key, done))
+        return await asyncio.shield(task)
+
+    def _release(self, key: Hashable, task: asyncio.Task) -> None:
+        with self._lock:
+            entry = self._calls.get(key)
+            if entry is not None and entry[1] is task:
+                del self._calls[key]
+        if not task.cancelled():
+            # Retrieve the exception so an abandoned call does not log "never retrieved"
+            task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return sum(1 for _, task in self._calls.values() if not task.done())
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the number of calls started and of callers that joined one in flight.
+        """
+        with self._lock:
+            return dict(self._counters)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._calls.clear()
+            for counter in self._counters:
+                self._counters[counter] = 0
@@ -0,0 +1,175 @@
+import math
+import os
+from collections import deque
+from typing import Deque, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+
+from app.models import TrendWindow, VitalAggregate
+from app.services.measurement_series import MeasurementSeries, from_epoch_micros
+
+# Load environment variables
+load_dotenv()
+
+# Vital signs aggregated over each trend window
+TREND_FIELDS = ("peso", "presion_sistolica", "presion_diastolica", "frecuencia_cardiaca")
+
+# Statistics kept per field, in the order returned by SlidingWindow.stats
+TREND_STATS = ("min", "max", "mean", "last")
+
+# Population columns per window: reading count plus "<field>_<stat>" for every field and statistic
+TREND_COLUMNS = ("count",) + tuple(f"{field}_{stat}" for field in TREND_FIELDS for stat in TREND_STATS)
+
+# Sliding window lengths in days, shortest first (comma separated in TREND_WINDOWS_DAYS)
+TREND_WINDOWS_DAYS: Tuple[int, ...] = tuple(sorted({
+    int(days) for days in os.environ.get("TREND_WINDOWS_DAYS", "3,7").split(",") if days.strip()
+}))
+
+MICROS_PER_DAY = 86_400_000_000
+
+class SlidingWindow:
+    """
+    Min, max, mean and last value of each trend field over the readings whose
+    timestamps fall in (end - span, end], where end is the newest timestamp pushed.
+
+    Readings must be pushed in timestamp order. Minimums and maximums are kept in
+    monotonic deques of (sequence, value) pairs and means in running sums, so a
+    push (including the evictions it causes) costs O(1) amortized.
+    """
+
+    __slots__ = ("span", "end", "_timestamps", "_rows", "_first", "_sums", "_mins", "_maxs")
+
+    def __init__(self, span: int):
+        """
+        Args:
+            span: Window length in microseconds
+        """
+        self.span = span
+        self.end: Optional[int] = None
+        self._timestamps: Deque[int] = deque()
+        self._rows: Deque[Tuple[float, ...]] = deque()
+        self._first = 0  # sequence number of the oldest reading in the window
+        self._sums = [0.0] * len(TREND_FIELDS)
+        self._mins: List[Deque[Tuple[int, float]]] = [deque() for _ in TREND_FIELDS]
+        self._maxs: List[Deque[Tuple[int, float]]] = [deque() for _ in TREND_FIELDS]
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def push(self, timestamp: int, values: Tuple[float, ...]) -> None:
+        """
+        Adds a reading (one value per TREND_FIELDS entry) and evicts those that fell out of the window.
+        """
+        seq = self._first + len(self._rows)
+        self._timestamps.append(timestamp)
+        self._rows.append(values)
+        self.end = timestamp
+        for i, value in enumerate(values):
+            self._sums[i] += value
+            mins, maxs = self._mins[i], self._maxs[i]
+            while mins and mins[-1][1] >= value:
+                mins.pop()
+            mins.append((seq, value))
+            while maxs and maxs[-1][1] <= value:
+                maxs.pop()
+            maxs.append((seq, value))
+
+        cutoff = timestamp - self.span
+        while self._timestamps[0] <= cutoff:
+            self._timestamps.popleft()
+            evicted = self._rows.popleft()
+            for i, value in enumerate(evicted):
+                self._sums[i] -= value
+                if self._mins[i][0][0] == self._first:
+                    self._mins[i].popleft()
+                if self._maxs[i][0][0] == self._first:
+                    self._maxs[i].popleft()
+            self._first += 1
+        if len(self._rows) == 1:
+            # Restart the running sums so rounding errors do not accumulate
+            self._sums = list(self._rows[0])
+
+    def stats(self, field: int) -> Tuple[float, float, float, float]:
+        """
+        Returns (min, max, mean, last) of the field at the given TREND_FIELDS index.
+        """
+        return (
+            self._mins[field][0][1],
+            self._maxs[field][0][1],
+            self._sums[field] / len(self._rows),
+            self._rows[-1][field],
+        )
+
+class VitalTrends:
+    """
+    Sliding windows of one patient's readings, one per configured window length.
+
+    Kept next to the patient's MeasurementSeries and updated as readings are
+    appended. A reading older than the newest one already seen cannot be pushed
+    onto the deques, so the windows are then rebuilt from the series, reading
+    only the rows inside the longest window.
+    """
+
+    __slots__ = ("days", "windows")
+
+    def __init__(self, series: MeasurementSeries, days: Sequence[int] = TREND_WINDOWS_DAYS):
+        self.days = tuple(days)
+        self.windows: List[SlidingWindow] = []
+        self.rebuild(series)
+
+    def rebuild(self, series: MeasurementSeries) -> None:
+        self.windows = [SlidingWindow(d * MICROS_PER_DAY) for d in self.days]
+        if not len(series) or not self.windows:
+            return
+        end = max(series.timestamps)
+        for row in series.rows_after(end - max(w.span for w in self.windows)):
+            self._push(series, row)
+
+    def update(self, series: MeasurementSeries, start: int) -> None:
+        """
+        Adds the series rows from index start onwards (just appended).
+        """
+        end = self.windows[0].end if self.windows else None
+        for row in range(start, len(series)):
+            if end is not None and series.timestamps[row] < end:
+                self.rebuild(series)
+                return
+            self._push(series, row)
+            end = series.timestamps[row]
+
+    def _push(self, series: MeasurementSeries, row: int) -> None:
+        values = tuple(getattr(series, field)[row] for field in TREND_FIELDS)
+        for window in self.windows:
+            window.push(series.timestamps[row], values)
+
+    def columns(self) -> List[Tuple[float, ...]]:
+        """
+        Returns one row of TREND_COLUMNS values per window (NaN statistics for empty windows).
+        """
+        rows = []
+        for window in self.windows:
+            if not len(window):
+                rows.append((0.0,) + (math.nan,) * (len(TREND_COLUMNS) - 1))
+                continue
+            row = [float(len(window))]
+            for i in range(len(TREND_FIELDS)):
+                row.extend(window.stats(i))
+            rows.append(tuple(row))
+        return rows
+
+    def summary(self) -> List[TrendWindow]:
+        """
+        Returns the aggregates of every window, shortest first (empty without readings).
+        """
+        return [
+            TrendWindow(
+                days=days,
+                end=from_epoch_micros(window.end),
+                count=len(window),
+                **{
+                    field: VitalAggregate(**dict(zip(TREND_STATS, window.stats(i))))
+                    for i, field in enumerate(TREND_FIELDS)
+                },
+            )
+            for days, window in zip(self.days, self.windows)
+            if len(window)
+        ]
@@ -0,0 +1,127 @@
+import re
+import unicodedata
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Measurement fields extracted from text, with the range of plausible values
+VITAL_RANGES: Dict[str, Tuple[float, float]] = {
+    "presion_sistolica": (60, 260),
+    "presion_diastolica": (30, 160),
+    "frecuencia_cardiaca": (25, 250),
+    "peso": (20, 350),
+    "saturacion_oxigeno": (50, 100),
+}
+
+# Symptom keywords (accent-free, lower case), by the symptom name the alert rules use
+SYMPTOM_KEYWORDS: Dict[str, str] = {
+    "dolor torácico": r"dolor (?:en el |de |al )?pecho|dolor toracico|opresion (?:en el |de )?pecho|chest pain",
+    "disnea": r"falta (?:de |el )?aire|ahog\w*|disnea|(?:cuesta|dificultad para) respirar|shortness of breath",
+    "edema": r"hinchaz\w*|hinchad\w*|edema",
+    "mareo": r"mare\w*|vertigo",
+    "palpitaciones": r"palpitacion\w*",
+    "fatiga": r"cansancio|cansad\w*|fatiga",
+    "tos": r"\btos\b",
+    "síncope": r"desmay\w*|sincope",
+}
+
+# Words ending the scope of a negation ("no tengo fiebre pero me falta el aire")
+_SCOPE_BREAK = r"(?:pero|y|e|o|aunque|sino|ahora|hoy|ayer|que|porque|tengo|siento|tiene|hay)\b"
+# A keyword is negated when it follows "no" and up to two more words in the same
+# clause ("no tengo dolor de pecho", "no me falta el aire"), or directly follows
+# sin/ni/nada de/ningun, which only negate the next noun ("sin mareos"; but not
+# "sin medicamentos tengo dolor de pecho")
+_NEGATION = re.compile(
+    r"(?:\bno\s+(?:tengo\s+|siento\s+|hay\s+|tiene\s+)?(?:(?!" + _SCOPE_BREAK + r")\w+\s+){0,2}"
+    r"|\b(?:sin|ni|nada de|ningun\w*)\s+(?:(?:el|la|los|las|un|una)\s+)?)$"
+)
+# Characters before a symptom keyword searched for a negation
+NEGATION_WINDOW = 30
+
+_BP = re.compile(
+    r"(?:presion(?: arterial)?|tension(?: arterial)?|\bpa\b|\bta\b|p/a)\D{0,12}?"
+    r"(\d{2,3})\s*(?:/|sobre|-|x)\s*(\d{2,3})"
+)
+# Unlabelled "150/95"
+_BP_BARE = re.compile(r"(?<![\d/.,])(\d{2,3})\s*/\s*(\d{2,3})(?![\d/])")
+_HEART_RATE = re.compile(
+    r"(?:pulso|frecuencia cardiaca|frecuencia|\bfc\b|latidos)\D{0,12}?(\d{2,3})\b"
+    r"|\b(\d{2,3})\s*(?:lpm|ppm|bpm|latidos)"
+)
+_WEIGHT = re.compile(
+    r"(?:peso|pese|pesando)\D{0,12}?(\d{2,3}(?:[.,]\d{1,2})?)"
+    r"|\b(\d{2,3}(?:[.,]\d{1,2})?)\s*(?:kg|kgs|kilos)\b"
+)
+# A percentage is only a saturation next to a saturation keyword ("100% bien" is not)
+_SPO2 = re.compile(
+    r"(?:saturacion|saturando|\bsat\b|spo2|oxigeno|\bo2\b)\D{0,12}?(\d{2,3})\b"
+    r"|\b(\d{2,3})\s*%\s*(?:de\s+)?(?:saturacion|\bsat\b|spo2|oxigeno|\bo2\b)"
+)
+_SYMPTOMS = re.compile("|".join(f"(?P<s{i}>{pattern})" for i, pattern in enumerate(SYMPTOM_KEYWORDS.values())))
+_SYMPTOM_NAMES = {f"s{i}": name for i, name in enumerate(SYMPTOM_KEYWORDS)}
+
+class ExtractedVitals(NamedTuple):
+    values: Dict[str, float]
+    sintomas: List[str]
+
+def fold(text: str) -> str:
+    """
+    Lowercases text and strips accents, keeping digits and punctuation ("Presión 150/95" -> "presion 150/95").
+    """
+    folded = text.lower()
+    if folded.isascii():
+        return folded
+    return "".join(c for c in unicodedata.normalize("NFKD", folded) if not unicodedata.combining(c))
+
+def _number(match: re.Match) -> Optional[float]:
+    value = match.group(1) or match.group(2)
+    return float(value.replace(",", ".")) if value else None
+
+def _plausible(field: str, value: Optional[float]) -> bool:
+    low, high = VITAL_RANGES[field]
+    return value is not None and low <= value <= high
+
+def extract_vitals(text: str) -> ExtractedVitals:
+    """
+    Extracts vital signs and symptoms from a patient's free-text message.
+
+    Each vital is read from its first mention ("presión 150/95", "pulso 88",
+    "peso 81,2", "saturación 96%", or a unit such as "88 lpm" or "81 kg");
+    values outside the plausible range of the field are ignored. Symptoms are
+    matched by keyword and reported with the names the alert rules use, unless
+    negated ("sin mareos").
+
+    Args:
+        text: Message text
+
+    Returns:
+        ExtractedVitals: Measurement fields found and symptom names
+    """
+    folded = fold(text)
+    values: Dict[str, float] = {}
+
+    pressure = _BP.search(folded) or _BP_BARE.search(folded)
+    if pressure:
+        systolic, diastolic = float(pressure.group(1)), float(pressure.group(2))
+        if _plausible("presion_sistolica", systolic) and _plausible("presion_diastolica", diastolic) and systolic > diastolic:
+            values["presion_sistolica"] = systolic
+            values["presion_diastolica"] = diastolic
+
+    for field, pattern in (("frecuencia_cardiaca", _HEART_RATE), ("peso", _WEIGHT), ("saturacion_oxigeno", _SPO2)):
+        for match in pattern.finditer(folded):
+            value = _number(match)
+            if _plausible(field, value):
+                values[field] = value
+                break
+
+    sintomas: List[str] = []
+    for match in _SYMPTOMS.finditer(folded):
+        name = _SYMPTOM_NAMES[match.lastgroup]
+        if name in sintomas or _NEGATION.search(folded, max(0, match.start() - NEGATION_WINDOW), match.start()):
+            continue
+        sintomas.append(name)
+    return ExtractedVitals(values, sintomas)
+
+def extract_batch(texts: List[str]) -> List[ExtractedVitals]:
+    """
+    Extracts the vitals of a batch of messages (the unit of work of the extraction pool).
+    """
+    return [extract_vitals(text) for text in texts]
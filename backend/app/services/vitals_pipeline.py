@@ -0,0 +1,259 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Set
+from dotenv import load_dotenv
+
+from app.models import Measurement, TextIngestion, VitalsExtraction
+from app.services.extraction_store import ExtractionStore
+from app.services.patient_repository import PatientRepository
+from app.services.vitals_extraction import ExtractedVitals, extract_batch
+
+# Load environment variables
+load_dotenv()
+
+# Worker processes extracting vitals; 0 extracts in a thread of the server process
+VITALS_WORKERS = int(os.environ.get("VITALS_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Most messages sent to a worker at once
+VITALS_BATCH_SIZE = int(os.environ.get("VITALS_BATCH_SIZE", "256"))
+# How long a batch waits to fill up before it is sent
+VITALS_BATCH_WAIT_MS = float(os.environ.get("VITALS_BATCH_WAIT_MS", "50"))
+
+# Metadata key of a text ingestion naming its patient
+PATIENT_METADATA_KEY = "patient_id"
+
+# Measurement fields a reading must have to be recorded
+REQUIRED_FIELDS = tuple(
+    name for name, field in Measurement.model_fields.items() if field.is_required()
+)
+
+def _worker_context() -> multiprocessing.context.BaseContext:
+    # The server process runs threads (connection pools, executors), and forking
+    # it can deadlock the child; workers start from a clean forkserver (or spawn)
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+class VitalsTask(NamedTuple):
+    ingestion_id: str
+    patient_id: str
+    timestamp: datetime
+    content: str
+
+class VitalsPipeline:
+    """
+    Background pipeline turning vitals typed into text ingestions into measurements.
+
+    POST /ingestion/text submits every message with a patient_id in its
+    metadata. Messages are collected into batches (up to batch_size, or what
+    arrived within batch_wait_ms) and each batch is parsed by the precompiled
+    rules of vitals_extraction in a pool of worker processes, so parsing never
+    holds the event loop or the GIL of the server; up to one batch per worker
+    is in flight. Back in the event loop, the readings of a batch are appended
+    with one repository call, the callback refreshes the alerts of the patients
+    that got measurements, and every message's outcome is stored by ingestion
+    id; each measurement carries its ingestion id (source_ingestion_id) back.
+
+    A message with only some vitals or only symptoms ("me falta el aire") is
+    completed with the required values of the patient's previous measurement
+    (listed in the outcome's carried_forward), so its symptoms and values
+    still reach the alert rules; it stays 'incomplete' only for a patient
+    without measurements.
+    """
+
+    def __init__(
+        self,
+        repository: PatientRepository,
+        store: ExtractionStore,
+        on_recorded: Callable[[Set[str]], None],
+        workers: int = VITALS_WORKERS,
+        batch_size: int = VITALS_BATCH_SIZE,
+        batch_wait_ms: float = VITALS_BATCH_WAIT_MS,
+    ):
+        """
+        Args:
+            repository: Patient repository the measurements are appended to
+            store: Store of extraction outcomes
+            on_recorded: Called with the patients that got new measurements
+            workers: Worker processes (0 extracts in a thread instead)
+            batch_size: Most messages per batch
+            batch_wait_ms: Time a batch waits to fill up
+        """
+        self.repository = repository
+        self.store = store
+        self.on_recorded = on_recorded
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.counts = {"submitted": 0, "recorded": 0, "incomplete": 0, "no_vitals": 0, "unknown_patient": 0, "batches": 0}
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
+        self._batches: Set[asyncio.Task] = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pool: Optional[Executor] = None
+
+    def submit(self, ingestion: TextIngestion) -> bool:
+        """
+        Queues a text ingestion for extraction.
+
+        Args:
+            ingestion: Stored text ingestion
+
+        Returns:
+            bool: False if the pipeline is not running or the message names no patient
+        """
+        patient_id = (ingestion.metadata or {}).get(PATIENT_METADATA_KEY)
+        if self._queue is None or not patient_id:
+            return False
+        self._queue.put_nowait(VitalsTask(ingestion.id, patient_id, ingestion.timestamp, ingestion.content))
+        self.counts["submitted"] += 1
+        return True
+
+    def _previous(self, patient_id: str, readings: Dict[str, List[Measurement]],
+                  latest: Dict[str, Optional[Measurement]]) -> Optional[Measurement]:
+        # The patient's latest reading: one recorded earlier in the batch, or the stored one
+        if patient_id in readings:
+            return readings[patient_id][-1]
+        if patient_id not in latest:
+            patient = self.repository.get(patient_id, history=1)
+            latest[patient_id] = patient.measurements[-1] if patient is not None and patient.measurements else None
+        return latest[patient_id]
+
+    def record(self, batch: List[VitalsTask], results: List[ExtractedVitals]) -> List[VitalsExtraction]:
+        """
+        Appends the readings of a batch to the patients' measurements, completing
+        partial ones from the previous measurement, and stores the outcome of
+        every message.
+
+        Args:
+            batch: Messages of the batch
+            results: Extracted vitals, in batch order
+
+        Returns:
+            List[VitalsExtraction]: Stored outcomes, in batch order
+        """
+        readings: Dict[str, List[Measurement]] = {}
+        latest: Dict[str, Optional[Measurement]] = {}
+        gaps = []
+        for task, found in zip(batch, results):
+            values = dict(found.values)
+            missing = [field for field in REQUIRED_FIELDS if field not in values]
+            carried = []
+            if missing and (values or found.sintomas):
+                previous = self._previous(task.patient_id, readings, latest)
+                if previous is not None:
+                    values.update((field, getattr(previous, field)) for field in missing)
+                    missing, carried = [], missing
+            gaps.append((missing, carried))
+            if not missing:
+                readings.setdefault(task.patient_id, []).append(Measurement(
+                    timestamp=task.timestamp,
+                    sintomas=found.sintomas or None,
+                    source_ingestion_id=task.ingestion_id,
+                    **values,
+                ))
+        unknown = self.repository.add_measurements(readings) if readings else set()
+        updated = set(readings) - unknown
+
+        entries = []
+        for task, found, (missing, carried) in zip(batch, results, gaps):
+            known = task.patient_id in updated or (
+                task.patient_id not in unknown and self.repository.exists(task.patient_id)
+            )
+            if not known:
+                status = "unknown_patient"
+            elif not missing:
+                status = "recorded"
+            else:
+                status = "incomplete" if found.values or found.sintomas else "no_vitals"
+            self.counts[status] += 1
+            entries.append(VitalsExtraction(
+                ingestion_id=task.ingestion_id,
+                patient_id=task.patient_id,
+                status=status,
+                values=found.values,
+                sintomas=found.sintomas,
+                missing=missing,
+                carried_forward=carried if status == "recorded" else [],
+                measurement_timestamp=task.timestamp if status == "recorded" else None,
+            ))
+        self.store.put_many(entries)
+        if updated:
+            self.on_recorded(updated)
+        return entries
+
+    async def _process(self, batch: List[VitalsTask]) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(self._pool, extract_batch, [task.content for task in batch])
+            self.record(batch, results)
+            self.counts["batches"] += 1
+        except Exception as e:
+            print(f"Error extracting vitals from {len(batch)} ingestions: {e}")
+        finally:
+            self._slots.release()
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _collect(self) -> List[VitalsTask]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.batch_wait
+        while len(batch) < self.batch_size:
+            if self._queue.empty():
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            else:
+                batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            await self._slots.acquire()
+            task = asyncio.create_task(self._process(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def start(self) -> None:
+        """
+        Starts the worker pool and the batching task.
+        """
+        if self._consumer is not None:
+            return
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=_worker_context()) if self.workers > 0 else None
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(max(self.workers, 1))
+        self._consumer = asyncio.create_task(self._run())
+
+    async def drain(self) -> None:
+        """
+        Waits until every submitted message was processed.
+        """
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self) -> None:
+        """
+        Processes the queued messages, then stops the batching task and the workers.
+        """
+        if self._consumer is None:
+            return
+        await self.drain()
+        self._consumer.cancel()
+        await asyncio.gather(self._consumer, return_exceptions=True)
+        self._consumer = self._queue = None
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the number of submitted messages, outcomes per status, processed batches and queued messages.
+        """
+        return {**self.counts, "queued": self._queue.qsize() if self._queue is not None else 0}
@@ -0,0 +1,164 @@
+import asyncio
+import os
+import random
+from typing import Iterable, List, Optional, Tuple
+import httpx
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+WHATSAPP_API_URL = os.environ.get("WHATSAPP_API_URL", "https://graph.facebook.com/v14.0")
+WHATSAPP_TIMEOUT_SECONDS = float(os.environ.get("WHATSAPP_TIMEOUT_SECONDS", "10"))
+WHATSAPP_MAX_CONNECTIONS = int(os.environ.get("WHATSAPP_MAX_CONNECTIONS", "20"))
+WHATSAPP_MAX_CONCURRENT_SENDS = int(os.environ.get("WHATSAPP_MAX_CONCURRENT_SENDS", "10"))
+WHATSAPP_MAX_RETRIES = int(os.environ.get("WHATSAPP_MAX_RETRIES", "3"))
+WHATSAPP_BACKOFF_SECONDS = float(os.environ.get("WHATSAPP_BACKOFF_SECONDS", "0.5"))
+WHATSAPP_MAX_BACKOFF_SECONDS = float(os.environ.get("WHATSAPP_MAX_BACKOFF_SECONDS", "8"))
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+class WhatsAppClient:
+    """
+    Async WhatsApp Cloud API client.
+
+    One httpx.AsyncClient is shared by every send, so TLS connections to the Graph
+    API are kept alive and reused; requests have a timeout, retryable failures
+    are retried with exponential backoff and full jitter, and a semaphore bounds
+    the number of sends in flight. The HTTP client is created on first use in
+    each event loop (and recreated if the loop changes, as it does between test
+    clients).
+    """
+
+    def __init__(
+        self,
+        phone_id: Optional[str] = None,
+        token: Optional[str] = None,
+        base_url: str = WHATSAPP_API_URL,
+        timeout: float = WHATSAPP_TIMEOUT_SECONDS,
+        max_connections: int = WHATSAPP_MAX_CONNECTIONS,
+        max_concurrency: int = WHATSAPP_MAX_CONCURRENT_SENDS,
+        max_retries: int = WHATSAPP_MAX_RETRIES,
+        backoff: float = WHATSAPP_BACKOFF_SECONDS,
+        max_backoff: float = WHATSAPP_MAX_BACKOFF_SECONDS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Args:
+            phone_id: WhatsApp phone number id (WHATSAPP_PHONE_ID by default)
+            token: Graph API access token (WHATSAPP_TOKEN by default)
+            base_url: Graph API base URL, overridable to point at a stub server
+            timeout: Seconds allowed for connecting, writing and reading each attempt
+            max_connections: Size of the connection pool
+            max_concurrency: Maximum number of sends in flight
+            max_retries: Retries after the first attempt
+            backoff: Base delay in seconds, doubled on every retry
+            max_backoff: Upper bound of a single delay
+            transport: httpx transport to use instead of the network (tests)
+        """
+        self.phone_id = phone_id if phone_id is not None else os.environ.get("WHATSAPP_PHONE_ID")
+        self.token = token if token is not None else os.environ.get("WHATSAPP_TOKEN")
+        self.base_url = base_url.rstrip("/")
+        self.timeout = httpx.Timeout(timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.phone_id and self.token)
+
+    def _session(self) -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # Connections and the semaphore belong to the loop that created them
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self.transport,
+                headers={"Authorization": f"Bearer {self.token}"},
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client, self._semaphore
+
+    def _delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def send_text(self, phone_number: str, message: str) -> bool:
+        """
+        Sends a text message, retrying timeouts, connection errors and retryable statuses.
+
+        Args:
+            phone_number: Recipient's phone number
+            message: Message content
+
+        Returns:
+            bool: True if the API accepted the message, False otherwise
+        """
+        if not self.configured:
+            print("Missing WhatsApp API configuration")
+            return False
+
+        client, semaphore = self._session()
+        url = f"{self.base_url}/{self.phone_id}/messages"
+        data = {
+            "messaging_product": "whatsapp",
+            "to": phone_number,
+            "type": "text",
+            "text": {
+                "body": message
+            }
+        }
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                response = None
+                try:
+                    response = await client.post(url, json=data)
+                    if response.status_code in (200, 201):
+                        print(f"WhatsApp message sent to {phone_number}")
+                        return True
+                    if response.status_code not in RETRYABLE_STATUS:
+                        print(f"Error sending WhatsApp message: {response.status_code}, {response.text}")
+                        return False
+                    error = f"status {response.status_code}"
+                except httpx.TransportError as e:
+                    error = f"{type(e).__name__}: {e}"
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self._delay(attempt, response))
+        print(f"Giving up on WhatsApp message to {phone_number} after {self.max_retries + 1} attempts ({error})")
+        return False
+
+    async def send_many(self, messages: Iterable[Tuple[str, str]]) -> List[bool]:
+        """
+        Sends several messages concurrently (at most max_concurrency at a time).
+
+        Args:
+            messages: (phone number, message) pairs
+
+        Returns:
+            List[bool]: Result of each send, in order
+        """
+        return list(await asyncio.gather(*(self.send_text(phone, text) for phone, text in messages)))
+
+    async def aclose(self) -> None:
+        """
+        Closes the pooled connections.
+        """
+        client, self._client, self._loop = self._client, None, None
+        if client is not None:
+            await client.aclose()
+
+# Create a singleton instance
+whatsapp_client = WhatsAppClient()
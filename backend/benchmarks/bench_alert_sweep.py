@@ -0,0 +1,63 @@
+"""
+Population alert benchmark: check_alerts per patient vs. the vectorized sweep.
+
+Builds 100k patients with two readings each in the in-memory repository and
+evaluates everyone's alerts both ways, checking that the results are identical.
+Run from the backend directory:
+    uv run python -m benchmarks.bench_alert_sweep
+"""
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.models import Patient, Measurement
+from app.routes.alerts import check_alerts
+from app.services.alert_sweep import sweep_alerts
+from app.services.alert_rules import alert_plan
+from app.services.patient_repository import InMemoryPatientRepository
+
+PATIENTS = 100_000
+START = datetime(2024, 1, 1, 8, 0, 0, tzinfo=timezone.utc)
+
+def make_repository() -> InMemoryPatientRepository:
+    rng = random.Random(1)
+    repository = InMemoryPatientRepository()
+    for i in range(PATIENTS):
+        measurements = [
+            Measurement(
+                timestamp=START + timedelta(days=day),
+                # Roughly one patient in five ends up with an alert
+                peso=rng.gauss(70, 1.2),
+                presion_sistolica=rng.gauss(130, 20),
+                presion_diastolica=80.0,
+                frecuencia_cardiaca=rng.gauss(80, 15),
+                sintomas=["disnea"] if rng.random() < 0.05 else []
+            )
+            for day in range(2)
+        ]
+        repository.save(Patient(id=f"p{i:06d}", nombre=f"Patient {i}", edad=65, measurements=measurements))
+    return repository
+
+def main():
+    repository = make_repository()
+    patient_ids = repository.recent_vitals().patient_ids
+
+    start = time.perf_counter()
+    expected = [check_alerts(repository.get(pid), repository.get_trends(pid)) for pid in patient_ids]
+    per_patient = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vitals = repository.recent_vitals()
+    collected = time.perf_counter() - start
+    results = sweep_alerts(vitals, alert_plan())
+    sweep = time.perf_counter() - start
+
+    assert results == expected
+    alerting = sum(1 for alerts in results if alerts)
+    print(f"patients: {PATIENTS}, with alerts: {alerting}")
+    print(f"check_alerts per patient: {per_patient * 1000:8.0f} ms")
+    print(f"vectorized sweep:         {sweep * 1000:8.0f} ms ({collected * 1000:.0f} ms collecting vitals, "
+          f"{per_patient / sweep:.0f}x faster)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Throughput benchmark: one POST per reading vs. POST /measurements/batch.
+
+Both paths go through the full ASGI stack with FastAPI's TestClient. Run from
+the backend directory:
+    uv run python -m benchmarks.bench_batch_ingestion
+"""
+import json
+import time
+from fastapi.testclient import TestClient
+
+from app import app
+from app.routes.patients import patients_db
+
+PATIENTS = 100
+READINGS = 5_000
+
+def make_rows():
+    return [
+        {
+            "patient_id": f"p{i % PATIENTS}",
+            "timestamp": f"2024-01-01T{i % 24:02d}:00:00+00:00",
+            "peso": 70.0 + (i % 10) / 10,
+            "presion_sistolica": 120.0,
+            "presion_diastolica": 80.0,
+            "frecuencia_cardiaca": 70.0,
+            "sintomas": [],
+        }
+        for i in range(READINGS)
+    ]
+
+def reset(client: TestClient):
+    patients_db.clear()
+    for i in range(PATIENTS):
+        client.post("/patients", json={"id": f"p{i}", "nombre": f"Patient {i}", "edad": 65})
+
+def main():
+    rows = make_rows()
+    with TestClient(app) as client:
+        reset(client)
+        start = time.perf_counter()
+        for row in rows:
+            payload = dict(row)
+            client.post(f"/patients/{payload.pop('patient_id')}/measurements", json=payload)
+        single = READINGS / (time.perf_counter() - start)
+
+        reset(client)
+        body = json.dumps(rows)
+        start = time.perf_counter()
+        result = client.post("/measurements/batch", content=body, headers={"content-type": "application/json"}).json()
+        batch = READINGS / (time.perf_counter() - start)
+        assert result["accepted"] == READINGS
+
+        ndjson = "\n".join(json.dumps(r) for r in rows)
+        reset(client)
+        start = time.perf_counter()
+        client.post("/measurements/batch", content=ndjson, headers={"content-type": "application/x-ndjson"})
+        batch_ndjson = READINGS / (time.perf_counter() - start)
+
+    print(f"per-reading POST:   {single:10.0f} readings/s")
+    print(f"batch JSON array:   {batch:10.0f} readings/s ({batch / single:.0f}x)")
+    print(f"batch NDJSON:       {batch_ndjson:10.0f} readings/s ({batch_ndjson / single:.0f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Blob upload benchmark: throughput and memory of streaming multipart uploads.
+
+Streams a 256 MB image through the multipart parser into the blob store in
+64 KB chunks (as the ASGI server delivers a request body), uploads it a
+second time to exercise deduplication, and reports how much the peak memory
+of the process grew. Run from the backend directory:
+    uv run python -m benchmarks.bench_blob_upload
+"""
+import asyncio
+import os
+import resource
+import tempfile
+import time
+
+from app.services.blob_store import BlobStore
+from app.services.multipart_upload import receive_upload
+
+IMAGE_BYTES = 256 * 1024 * 1024
+CHUNK = 64 * 1024
+BOUNDARY = "bench-boundary"
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+async def body():
+    yield (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="caption"\r\n\r\nTensiómetro\r\n'
+           f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="big.jpg"\r\n\r\n').encode()
+    chunk = b"\xff\xd8\xff" + os.urandom(CHUNK - 3)
+    for _ in range(IMAGE_BYTES // CHUNK):
+        yield chunk
+    yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+async def main():
+    baseline = peak_rss_mb()
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BlobStore(tmp, max_bytes=IMAGE_BYTES)
+        for label in ("new", "duplicate"):
+            start = time.perf_counter()
+            upload = await receive_upload(f"multipart/form-data; boundary={BOUNDARY}", body(), store)
+            elapsed = time.perf_counter() - start
+            print(f"{label:9s} upload {upload.blob.size / 1e6:.0f} MB in {elapsed:.2f} s "
+                  f"({upload.blob.size / 1e6 / elapsed:,.0f} MB/s)")
+    print(f"peak RSS growth {peak_rss_mb() - baseline:.0f} MB")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,49 @@
+"""
+Memory benchmark for the streaming NDJSON export.
+
+Peak traced memory while consuming the export should stay flat as the number
+of patients grows. Run from the backend directory:
+    uv run python -m benchmarks.bench_export_memory
+"""
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from app.models import Measurement, Patient
+from app.services.export import iter_ndjson_export
+from app.services.patient_repository import InMemoryPatientRepository
+
+MEASUREMENTS_PER_PATIENT = 60
+
+def build_repository(patients: int) -> InMemoryPatientRepository:
+    repository = InMemoryPatientRepository()
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(patients):
+        repository.save(Patient(id=f"p{i:07d}", nombre=f"Patient {i}", edad=65))
+        for j in range(MEASUREMENTS_PER_PATIENT):
+            repository.add_measurement(f"p{i:07d}", Measurement(
+                timestamp=start + timedelta(hours=12 * j),
+                peso=70.0,
+                presion_sistolica=120.0,
+                presion_diastolica=80.0,
+                frecuencia_cardiaca=70.0,
+            ))
+    return repository
+
+def peak_export_memory(repository: InMemoryPatientRepository) -> tuple:
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    total = 0
+    for chunk in iter_ndjson_export(repository):
+        total += len(chunk)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return total, peak
+
+def main():
+    for patients in (1_000, 5_000, 20_000):
+        repository = build_repository(patients)
+        total, peak = peak_export_memory(repository)
+        print(f"{patients:>7} patients: {total / 2**20:8.1f} MiB exported, peak {peak / 2**20:6.2f} MiB")
+
+if __name__ == "__main__":
+    main()
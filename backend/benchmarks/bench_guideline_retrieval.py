@@ -0,0 +1,76 @@
+"""
+Guideline retrieval benchmark: BM25 over a chunked synthetic corpus.
+
+Generates 200 documents (~1M words) for one source, then reports the time to
+build the index, to load it back from the persisted file (a restart), the
+query latency and the size of the guideline part of the prompt (top-k chunks)
+compared with pasting the whole corpus. Run from the backend directory:
+    uv run python -m benchmarks.bench_guideline_retrieval
+"""
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app.services.guideline_corpus import GUIDELINE_TOP_K, GuidelineCorpus
+
+DOCUMENTS = 200
+LINES_PER_DOCUMENT = 400
+QUERIES = [
+    "¿Cuál es la meta de presión arterial?",
+    "duration of dual antiplatelet therapy",
+    "LDL goal with statins",
+    "cardiac rehabilitation sessions",
+    "when to consider an ICD",
+]
+
+def make_corpus(directory: str) -> int:
+    rng = random.Random(1)
+    vocabulary = [f"term{i}" for i in range(20000)]
+    topics = ["blood pressure target", "antiplatelet therapy", "LDL statins", "cardiac rehabilitation",
+              "ICD LVEF", "sodium diet", "smoking cessation", "beta-blockers heart rate"]
+    os.makedirs(os.path.join(directory, "AHA"))
+    words = 0
+    for d in range(DOCUMENTS):
+        lines = []
+        for _ in range(LINES_PER_DOCUMENT):
+            line = " ".join(rng.choice(vocabulary) for _ in range(10))
+            if rng.random() < 0.05:
+                line = f"{rng.choice(topics)} {line}"
+            lines.append(f"• {line}")
+            words += len(line.split()) + 1
+        with open(os.path.join(directory, "AHA", f"doc{d:03d}.md"), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+    return words
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        docs = os.path.join(tmp, "guidelines")
+        index_path = os.path.join(tmp, "index.json")
+        words = make_corpus(docs)
+
+        start = time.perf_counter()
+        GuidelineCorpus.load(docs, index_path)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        corpus = GuidelineCorpus.load(docs, index_path)
+        reload = time.perf_counter() - start
+
+        latencies = []
+        prompt_words = []
+        for _ in range(20):
+            for query in QUERIES:
+                start = time.perf_counter()
+                chunks = corpus.search("AHA", query)
+                latencies.append(time.perf_counter() - start)
+                prompt_words.append(sum(len(chunk.text.split()) for chunk in chunks))
+
+    print(f"{DOCUMENTS} documents, {words:,} words, {len(corpus.sources['AHA'].chunks):,} chunks")
+    print(f"build + persist {build:6.2f} s, load persisted index {reload:6.2f} s")
+    print(f"query p50 {statistics.median(latencies) * 1000:6.2f} ms, max {max(latencies) * 1000:6.2f} ms")
+    print(f"guideline words per prompt: top-{GUIDELINE_TOP_K} chunks {max(prompt_words):,} vs whole corpus {words:,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Ingestion log benchmark: append throughput and page read latency of the
+segmented log.
+
+Appends 500k text ingestion records (~150 MB) to a log with 16 MB segments,
+then reports the latency of reading a 100-record page at the start, middle
+and end of the log, by offset and by time, and how much the peak memory of
+the process grew while writing and reading. Run from the backend directory:
+    uv run python -m benchmarks.bench_ingestion_log
+"""
+import resource
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from app.models import TextIngestion
+from app.services.segment_log import SegmentLog
+
+RECORDS = 500_000
+PAGE = 100
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def main():
+    baseline = peak_rss_mb()
+    with tempfile.TemporaryDirectory() as tmp:
+        log = SegmentLog(tmp, segment_bytes=16 * 1024 * 1024, retention_hours=0)
+        payload = TextIngestion(content="Paciente refiere mareos leves por la mañana. " * 4,
+                                metadata={"patient_id": "p1"}).model_dump_json().encode()
+
+        start = time.perf_counter()
+        first = log.append(payload)
+        for _ in range(RECORDS - 1):
+            last = log.append(payload)
+        append = time.perf_counter() - start
+
+        stats = log.stats()
+        print(f"{RECORDS:,} records, {stats['bytes'] / 1e6:.0f} MB in {stats['segments']} segments")
+        print(f"append {RECORDS / append:,.0f} records/s")
+
+        span = last.timestamp - first.timestamp
+        for label, offset in (("start", 0), ("middle", RECORDS // 2), ("end", RECORDS - PAGE)):
+            by_offset, by_time = [], []
+            when = datetime.fromtimestamp((first.timestamp + span * offset // RECORDS) / 1e6, tz=timezone.utc)
+            for _ in range(50):
+                t = time.perf_counter()
+                assert len(log.read(offset, PAGE).records) == PAGE
+                by_offset.append(time.perf_counter() - t)
+                t = time.perf_counter()
+                log.read(0, PAGE, start=when)
+                by_time.append(time.perf_counter() - t)
+            print(f"page at {label:6s}: by offset {statistics.median(by_offset) * 1000:6.2f} ms, "
+                  f"by time {statistics.median(by_time) * 1000:6.2f} ms")
+        log.close()
+    print(f"peak RSS growth {peak_rss_mb() - baseline:.0f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Ingestion search benchmark: indexing throughput, memory and query latency of
+the full-text index at millions of documents.
+
+Indexes 2M synthetic patient messages (Spanish, ~12 words each, 5k patients)
+and reports the median latency of a 20-hit page for common and rare terms,
+phrases, prefixes and patient filters, and how much the peak memory of the
+process grew. Run from the backend directory:
+    uv run python -m benchmarks.bench_ingestion_search
+"""
+import random
+import resource
+import statistics
+import time
+
+from app.services.ingestion_index import IngestionIndex
+
+DOCUMENTS = 2_000_000
+PATIENTS = 5_000
+
+PHRASES = [
+    "me falta el aire al subir la escalera",
+    "tengo hinchazón en los tobillos desde ayer",
+    "presión 150/95 pulso 88 peso 81.2",
+    "me siento bien hoy caminé treinta minutos",
+    "olvidé tomar la pastilla de la mañana",
+    "dolor en el pecho al despertar",
+    "mareos leves después de almorzar",
+    "dormí mal y me desperté cansado",
+]
+WORDS = "hoy ayer noche mañana bastante poco muy algo siempre nunca casa trabajo control médico".split()
+
+QUERIES = [
+    ("common term", "me", {}),
+    ("two terms", "aire escalera", {}),
+    ("phrase", '"me falta el aire"', {}),
+    ("rare term", "palpitaciones", {}),
+    ("prefix", "hinch*", {}),
+    ("term + patient", "pecho", {"patient_id": "p42"}),
+    ("patient only", "", {"patient_id": "p42"}),
+]
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def main():
+    rng = random.Random(7)
+    baseline = peak_rss_mb()
+    index = IngestionIndex()
+    start = time.perf_counter()
+    timestamp = 1_700_000_000_000_000
+    for offset in range(DOCUMENTS):
+        content = f"{rng.choice(PHRASES)} {' '.join(rng.sample(WORDS, 3))}"
+        if offset % 10_000 == 0:
+            content += " palpitaciones"
+        timestamp += 1_000
+        index.add("text", offset, timestamp, {"content": content, "metadata": {"patient_id": f"p{offset % PATIENTS}"}})
+    elapsed = time.perf_counter() - start
+    print(f"indexed {DOCUMENTS:,} documents in {elapsed:.0f} s ({DOCUMENTS / elapsed:,.0f} docs/s), "
+          f"{index.stats()['terms']:,} terms")
+    print(f"peak RSS growth {peak_rss_mb() - baseline:.0f} MB")
+
+    for label, query, metadata in QUERIES:
+        timings = []
+        for _ in range(20):
+            t = time.perf_counter()
+            page = index.search(query, metadata=metadata, limit=20)
+            timings.append(time.perf_counter() - t)
+        print(f"{label:15s} {len(page.hits):3d} hits  {statistics.median(timings) * 1000:7.2f} ms")
+
+if __name__ == "__main__":
+    main()
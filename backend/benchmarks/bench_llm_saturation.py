@@ -0,0 +1,87 @@
+"""
+LLM saturation benchmark: latency of a cheap endpoint while guideline
+interpretations keep the language model busy.
+
+Drives the application in-process (ASGI transport) with a fake LLM that takes
+100 ms per completion. 8 concurrent clients keep calling
+GET /guidelines/interpret while a probe client reads GET /patients/{id} every
+30 ms; the run is done first with a fake that blocks like the previous
+synchronous completion() call, then with the async client and its priority
+limiter (4 slots, one reserved for alerts). Also reports how long an alert
+message takes while the interpretations saturate the limiter. Run from the backend directory:
+    uv run python -m benchmarks.bench_llm_saturation
+"""
+import asyncio
+import statistics
+import time
+from types import SimpleNamespace
+
+import httpx
+
+from app import app
+from app.models import Alert, Patient
+from app.routes.patients import patients_db
+from app.services.ai_service import ai_service
+from app.services.llm_client import FakeLLM, LLMClient
+
+LLM_LATENCY = 0.1
+INTERPRETERS = 8
+DURATION = 3.0
+PROBE_INTERVAL = 0.03
+
+async def blocking_completion(model, messages, **kwargs):
+    # The previous implementation: litellm.completion() inside a coroutine
+    time.sleep(LLM_LATENCY)
+    await asyncio.sleep(0)  # in-process requests never suspend otherwise
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Respuesta simulada."))])
+
+async def run(label: str, complete_fn):
+    ai_service.llm = LLMClient(complete_fn=complete_fn, max_concurrency=4, reserved_alert_slots=1, timeout=60)
+    transport = httpx.ASGITransport(app=app)
+    done = asyncio.Event()
+    latencies = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def interpreter():
+            while not done.is_set():
+                await client.get("/guidelines/interpret", params={"source": "AHA", "query": "¿meta de presión?"})
+
+        async def probe():
+            # Latency counted from when each read was due, so time spent waiting
+            # for a blocked event loop is included
+            due = time.perf_counter()
+            end = due + DURATION
+            while due < end:
+                await asyncio.sleep(max(0.0, due - time.perf_counter()))
+                response = await client.get("/patients/bench")
+                latencies.append(time.perf_counter() - due)
+                assert response.status_code == 200
+                due = max(due + PROBE_INTERVAL, time.perf_counter())
+            done.set()
+
+        async def alert_message():
+            await asyncio.sleep(DURATION / 2)
+            start = time.perf_counter()
+            patient = Patient(id="bench", nombre="Ana", edad=70)
+            await ai_service.generate_alert_message(patient, [Alert(nivel="red", mensaje="Elevated systolic pressure: 190.0 mmHg.")])
+            return time.perf_counter() - start
+
+        results = await asyncio.gather(probe(), *(interpreter() for _ in range(INTERPRETERS)), alert_message())
+
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    p99 = latencies_ms[max(0, int(len(latencies_ms) * 0.99) - 1)]
+    print(f"{label:24s} probe p50 {statistics.median(latencies_ms):7.1f} ms, p99 {p99:7.1f} ms "
+          f"({len(latencies_ms)} reads), alert message {results[-1] * 1000:6.0f} ms")
+
+async def main():
+    patients_db.clear()
+    patients_db.save(Patient(id="bench", nombre="Ana", edad=70))
+    print(f"{INTERPRETERS} concurrent interpreters, LLM latency {LLM_LATENCY * 1000:.0f} ms, "
+          f"probe read every {PROBE_INTERVAL * 1000:.0f} ms for {DURATION:.0f} s")
+    await run("blocking completion()", blocking_completion)
+    ai_service.message_cache.clear()
+    await run("async + priority limiter", FakeLLM(latency=LLM_LATENCY))
+    patients_db.clear()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,50 @@
+"""
+Memory benchmark: List[Measurement] vs columnar MeasurementSeries.
+
+Run from the backend directory:
+    uv run python -m benchmarks.bench_measurement_memory
+"""
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from app.models import Measurement
+from app.services.measurement_series import MeasurementSeries
+
+# One year of twice-daily vitals
+COUNT = 730
+
+def make_payload(count: int):
+    start = datetime(2024, 1, 1, 8, 0, 0, tzinfo=timezone.utc)
+    return [
+        {
+            "timestamp": start + timedelta(hours=12 * i),
+            "peso": 70.0 + (i % 10) / 10,
+            "presion_sistolica": 120.0 + i % 7,
+            "presion_diastolica": 80.0 + i % 3,
+            "frecuencia_cardiaca": 70.0 + i % 5,
+            "saturacion_oxigeno": 97.0,
+            "sintomas": ["disnea"] if i % 3 == 0 else [],
+        }
+        for i in range(count)
+    ]
+
+def traced(build):
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    result = build()
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return result, used
+
+def main():
+    payload = make_payload(COUNT)
+    measurements, list_bytes = traced(lambda: [Measurement(**p) for p in payload])
+    series, series_bytes = traced(lambda: MeasurementSeries(measurements))
+
+    print(f"measurements:           {COUNT}")
+    print(f"List[Measurement]:      {list_bytes / 1024:8.1f} KiB ({list_bytes / COUNT:6.0f} B/measurement)")
+    print(f"MeasurementSeries:      {series_bytes / 1024:8.1f} KiB ({series_bytes / COUNT:6.0f} B/measurement)")
+    print(f"reduction:              {list_bytes / series_bytes:8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Parameter audit benchmark: "parameters as of time T" lookups on a long audit
+log, with snapshots and with a full replay from the first entry.
+
+Appends 50k updates (mostly single thresholds, sometimes the whole rule set)
+to a SQLite log and reports the append rate, the time of as-of lookups at
+random points of the history and the time of a full replay. Run from the
+backend directory:
+    uv run python -m benchmarks.bench_parameter_audit
+"""
+import os
+import random
+import tempfile
+import time
+
+from app.services.alert_rules import DEFAULT_RULES
+from app.services.parameter_audit import SQLiteParameterAuditLog
+
+ENTRIES = 50_000
+LOOKUPS = 1_000
+
+def main() -> None:
+    rng = random.Random(7)
+    rules = [rule.model_dump(exclude_none=True) for rule in DEFAULT_RULES]
+    state = {"pa_min": 90, "pa_max": 180, "fc_min": 50, "fc_max": 120, "peso_delta": 2, "peso_tendencia_delta": 2, "rules": rules}
+
+    with tempfile.TemporaryDirectory() as directory:
+        log = SQLiteParameterAuditLog(os.path.join(directory, "audit.db"))
+
+        started = time.perf_counter()
+        for i in range(ENTRIES):
+            if rng.random() < 0.05:
+                new_values = {"rules": rng.sample(rules, k=rng.randint(1, len(rules)))}
+            else:
+                new_values = {"pa_max": rng.randint(150, 200)}
+            log.append(f"user{i % 20}", dict(state), new_values)
+            state.update(new_values)
+        elapsed = time.perf_counter() - started
+        print(f"appended {ENTRIES:,} entries in {elapsed:.1f} s ({ENTRIES / elapsed:,.0f}/s)")
+
+        entries = log.entries()
+        points = [rng.choice(entries).timestamp for _ in range(LOOKUPS)]
+        started = time.perf_counter()
+        for point in points:
+            log.state_at(point)
+        elapsed = time.perf_counter() - started
+        print(f"as-of lookup (snapshot every {log.snapshot_interval}): {elapsed / LOOKUPS * 1000:.2f} ms")
+
+        started = time.perf_counter()
+        replayed = dict(entries[0].previous_values)
+        for entry in log.entries(end=entries[-1].timestamp):
+            replayed.update(entry.new_values)
+        print(f"full replay:                            {(time.perf_counter() - started) * 1000:.2f} ms")
+
+        page_start = entries[ENTRIES // 2].timestamp
+        started = time.perf_counter()
+        page = log.entries(start=page_start, updated_by="user3", limit=100)
+        print(f"range page by author ({len(page)} entries):     {(time.perf_counter() - started) * 1000:.2f} ms")
+        log.close()
+
+if __name__ == "__main__":
+    main()
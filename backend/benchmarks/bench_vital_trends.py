@@ -0,0 +1,66 @@
+"""
+Trend window benchmark: incremental sliding windows vs. rescanning the history.
+
+Appends readings every 4 hours to one patient and, after each append, reads the
+3/7-day aggregates either from the incrementally maintained windows or by
+rescanning the whole history. Run from the backend directory:
+    uv run python -m benchmarks.bench_vital_trends
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.models import Measurement
+from app.services.measurement_series import MeasurementSeries
+from app.services.vital_trends import MICROS_PER_DAY, TREND_FIELDS, TREND_WINDOWS_DAYS, VitalTrends
+
+READINGS = 20_000
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+def make_measurements():
+    return [
+        Measurement(
+            timestamp=START + timedelta(hours=4 * i),
+            peso=70.0 + (i % 50) / 10,
+            presion_sistolica=120.0 + i % 30,
+            presion_diastolica=80.0,
+            frecuencia_cardiaca=70.0 + i % 20,
+        )
+        for i in range(READINGS)
+    ]
+
+def rescan(series: MeasurementSeries):
+    end = max(series.timestamps)
+    result = []
+    for days in TREND_WINDOWS_DAYS:
+        rows = [r for r in range(len(series)) if series.timestamps[r] > end - days * MICROS_PER_DAY]
+        for field in TREND_FIELDS:
+            values = [getattr(series, field)[r] for r in rows]
+            result.append((min(values), max(values), sum(values) / len(values), values[-1]))
+    return result
+
+def main():
+    measurements = make_measurements()
+
+    series = MeasurementSeries()
+    trends = VitalTrends(series)
+    start = time.perf_counter()
+    for m in measurements:
+        series.append(m)
+        trends.update(series, len(series) - 1)
+        trends.columns()
+    incremental = time.perf_counter() - start
+
+    series = MeasurementSeries()
+    start = time.perf_counter()
+    for m in measurements[:2_000]:
+        series.append(m)
+        rescan(series)
+    # Rescanning is quadratic; time a 2k-reading prefix and report per append
+    rescanned = (time.perf_counter() - start) / 2_000 * READINGS
+
+    print(f"{READINGS} appends, aggregates read after each one")
+    print(f"incremental windows: {incremental * 1e6 / READINGS:8.1f} us per append")
+    print(f"full rescan (first 2k readings only): {rescanned * 1e6 / READINGS:8.1f} us per append, growing with history")
+
+if __name__ == "__main__":
+    main()
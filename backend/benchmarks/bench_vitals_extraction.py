@@ -0,0 +1,83 @@
+"""
+Vitals extraction benchmark: throughput of the rule-based parsers and of the
+extraction pipeline on a synthetic corpus of patient messages.
+
+Generates 200k Spanish messages (full and partial readings, symptoms, small
+talk) and reports messages per second for the parsers in this process, for
+worker pools of increasing size and batch size, and for the whole pipeline
+(batching, workers, measurement writes for 2k patients). Run from the
+backend directory:
+    uv run python -m benchmarks.bench_vitals_extraction
+"""
+import asyncio
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.models import Patient, TextIngestion
+from app.services.extraction_store import InMemoryExtractionStore
+from app.services.patient_repository import InMemoryPatientRepository
+from app.services.vitals_extraction import extract_batch
+from app.services.vitals_pipeline import VitalsPipeline
+
+MESSAGES = 200_000
+PATIENTS = 2_000
+
+TEMPLATES = [
+    "presión {s}/{d}, pulso {hr}, peso {w}",
+    "Hoy me tomé la presión: {s}/{d} y {hr} lpm. Pesé {w} kg. Saturación {o2}%",
+    "PA {s} sobre {d}, FC {hr}, {w} kilos. Me falta el aire al caminar",
+    "tengo los tobillos hinchados y algo de mareo, presión {s}/{d}",
+    "Buenos días doctora, hoy me siento bien, salí a caminar media hora con mi hija",
+    "no tengo dolor de pecho pero dormí mal, pulso {hr}",
+]
+
+def corpus(rng: random.Random):
+    for _ in range(MESSAGES):
+        yield rng.choice(TEMPLATES).format(
+            s=rng.randint(100, 190), d=rng.randint(60, 110), hr=rng.randint(50, 120),
+            w=f"{rng.uniform(55, 110):.1f}", o2=rng.randint(88, 99),
+        )
+
+def rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:>10,.0f} msg/s"
+
+def batches(texts, size):
+    return [texts[i:i + size] for i in range(0, len(texts), size)]
+
+async def run_pipeline(texts, workers: int) -> float:
+    repository = InMemoryPatientRepository()
+    for i in range(PATIENTS):
+        repository.save(Patient(id=f"p{i}", nombre=f"Paciente {i}", edad=70))
+    pipeline = VitalsPipeline(repository, InMemoryExtractionStore(), lambda ids: None, workers=workers)
+    messages = [TextIngestion(content=text, metadata={"patient_id": f"p{i % PATIENTS}"}) for i, text in enumerate(texts)]
+    await pipeline.start()
+    start = time.perf_counter()
+    for m in messages:
+        pipeline.submit(m)
+    await pipeline.stop()
+    elapsed = time.perf_counter() - start
+    print(f"pipeline, {workers} workers:      {rate(len(messages), elapsed)}  {pipeline.stats()}")
+    return elapsed
+
+def main():
+    texts = list(corpus(random.Random(3)))
+
+    start = time.perf_counter()
+    extract_batch(texts)
+    print(f"in process:                {rate(len(texts), time.perf_counter() - start)}")
+
+    for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+        for size in (64, 256, 1024):
+            with ProcessPoolExecutor(workers) as pool:
+                list(pool.map(extract_batch, [texts[:workers]] * workers))  # start the workers
+                start = time.perf_counter()
+                for _ in pool.map(extract_batch, batches(texts, size)):
+                    pass
+                print(f"{workers} workers, batches of {size:4d}: {rate(len(texts), time.perf_counter() - start)}")
+
+    asyncio.run(run_pipeline(texts[:50_000], workers=min(4, os.cpu_count() or 1)))
+
+if __name__ == "__main__":
+    main()
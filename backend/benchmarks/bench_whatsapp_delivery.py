@@ -0,0 +1,92 @@
+"""
+WhatsApp delivery load test against a local stub of the Graph API.
+
+Starts a stub server (50 ms per request) in a background thread and sends 200
+messages from the event loop, first with blocking requests.post calls (the
+previous implementation) and then with the pooled async client, while a probe
+task measures how late the event loop wakes it up. With the async client the
+probe lag stays flat and the sends reuse a handful of connections. Run from the
+backend directory:
+    uv run python -m benchmarks.bench_whatsapp_delivery
+"""
+import asyncio
+import contextlib
+import io
+import socket
+import statistics
+import threading
+import time
+import requests
+import uvicorn
+from fastapi import FastAPI, Request
+
+from app.services.whatsapp_service import WhatsAppClient
+
+MESSAGES = 200
+STUB_LATENCY = 0.05
+PROBE_INTERVAL = 0.005
+
+stub = FastAPI()
+peers = set()
+
+@stub.post("/v14.0/{phone_id}/messages")
+async def stub_messages(phone_id: str, request: Request):
+    peers.add(request.client.port)
+    await asyncio.sleep(STUB_LATENCY)
+    return {"messages": [{"id": "wamid.stub"}]}
+
+def start_stub() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}/v14.0"
+
+async def probe(lags: list, stop: asyncio.Event):
+    # Records how much later than requested each sleep returns
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+async def blocking_send(base_url: str, phone: str, text: str) -> bool:
+    # The previous implementation: a synchronous request inside a coroutine
+    response = requests.post(f"{base_url}/123/messages", json={"to": phone, "text": {"body": text}})
+    return response.status_code in (200, 201)
+
+async def run(label: str, send_all):
+    peers.clear()
+    lags: list = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # per-message log lines
+        results = await send_all()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+    assert all(results)
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    p99 = lags_ms[int(len(lags_ms) * 0.99) - 1] if len(lags_ms) > 1 else lags_ms[-1]
+    print(f"{label:22s} {elapsed:6.2f} s total, loop lag p50 {statistics.median(lags_ms):7.1f} ms, "
+          f"p99 {p99:7.1f} ms, max {lags_ms[-1]:7.1f} ms, {len(peers)} connections")
+
+async def main():
+    base_url = start_stub()
+    messages = [(f"569{i:08d}", "Hola") for i in range(MESSAGES)]
+    print(f"{MESSAGES} messages, stub latency {STUB_LATENCY * 1000:.0f} ms")
+
+    async def blocking():
+        return [await blocking_send(base_url, phone, text) for phone, text in messages]
+    await run("blocking requests.post", blocking)
+
+    client = WhatsAppClient(phone_id="123", token="stub", base_url=base_url, max_concurrency=20)
+    await run("pooled async client", lambda: client.send_many(messages))
+    await client.aclose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,6 +1,20 @@
+import os
+import tempfile
+
 import pytest
 from fastapi.testclient import TestClient
 
+# The suite never calls a real LLM, even with an API key in .env: background
+# work started by the routes (e.g. recommendation refreshes) uses the local fake
+os.environ["LLM_BACKEND"] = "fake"
+os.environ.setdefault("LLM_FAKE_LATENCY_SECONDS", "0")
+# Nor does it write the guideline index into the working directory, and the
+# ingestion logs and blobs opened on startup go to a directory removed on exit
+os.environ["GUIDELINES_INDEX_PATH"] = ""
+_data_dir = tempfile.TemporaryDirectory(prefix="nexo-tests-")
+os.environ["INGESTION_LOG_DIR"] = os.path.join(_data_dir.name, "ingestion")
+os.environ["BLOB_STORE_DIR"] = os.path.join(_data_dir.name, "blobs")
+
 # Adjust the import path according to your project structure
 # Assuming your main FastAPI app instance is named 'app' in 'app/__init__.py'
 from app import app as fastapi_app 
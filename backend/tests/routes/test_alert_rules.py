@@ -0,0 +1,76 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.routes.patients import patients_db
+from app.services.alert_rules import DEFAULT_RULES, current_rules
+
+@pytest.fixture(autouse=True)
+def patient(client: TestClient):
+    """Create a patient with one normal reading and restore the default rules afterwards."""
+    patients_db.clear()
+    client.post("/patients", json={"id": "p1", "nombre": "Ana", "edad": 70})
+    client.post("/patients/p1/measurements", json={
+        "peso": 70.0,
+        "presion_sistolica": 135.0,
+        "presion_diastolica": 80.0,
+        "frecuencia_cardiaca": 70.0,
+        "saturacion_oxigeno": 91.0
+    })
+    yield
+    client.put("/parameters", json={
+        "rules": [rule.model_dump() for rule in DEFAULT_RULES], "updated_by": "test"
+    })
+    patients_db.clear()
+
+def test_get_rules_returns_installed_rules(client: TestClient):
+    response = client.get("/parameters/rules")
+
+    assert response.status_code == 200
+    assert [rule["id"] for rule in response.json()] == [rule.id for rule in DEFAULT_RULES]
+
+def test_rules_can_be_replaced_at_runtime(client: TestClient):
+    """New rules apply to the next alert evaluation without a restart."""
+    assert client.get("/patients/p1/alerts").json() == []
+
+    rules = client.get("/parameters/rules").json() + [{
+        "id": "low_saturation", "nivel": "yellow", "metric": "saturacion_oxigeno", "op": "<", "threshold": 92,
+        "mensaje": "Low oxygen saturation: {value:.0f}%."
+    }]
+    response = client.put("/parameters", json={"rules": rules, "updated_by": "test"})
+    assert response.status_code == 200
+
+    assert client.get("/patients/p1/alerts").json() == [
+        {"mensaje": "Low oxygen saturation: 91%.", "nivel": "yellow"}
+    ]
+    assert client.get("/alerts").json() == [
+        {"patient_id": "p1", "alerts": [{"mensaje": "Low oxygen saturation: 91%.", "nivel": "yellow"}]}
+    ]
+
+def test_invalid_rules_leave_parameters_unchanged(client: TestClient):
+    """A rejected update changes neither the rules nor the parameters sent with them."""
+    pa_max = client.get("/parameters").json()["pa_max"]
+    response = client.put("/parameters", json={
+        "pa_max": 130.0,
+        "rules": [{"id": "bad", "nivel": "red", "metric": "peso", "op": ">", "threshold": "unknown", "mensaje": "x"}],
+        "updated_by": "test"
+    })
+
+    assert response.status_code == 400
+    assert "unknown parameter" in response.json()["detail"]
+    assert client.get("/parameters").json()["pa_max"] == pa_max
+    assert current_rules() == list(DEFAULT_RULES)
+
+def test_symptom_rule_with_numeric_value_placeholder_is_rejected(client: TestClient):
+    """Symptom rules are evaluated with no value, so '{value:.0f}' would fail on every alert read."""
+    rules = client.get("/parameters/rules").json() + [{
+        "id": "dizzy", "nivel": "yellow", "symptoms": ["mareo"], "mensaje": "Mareo ({value:.0f})"
+    }]
+    response = client.put("/parameters", json={"rules": rules, "updated_by": "test"})
+
+    assert response.status_code == 400
+    assert "invalid message template" in response.json()["detail"]
+    client.post("/patients/p1/measurements", json={
+        "peso": 70.0, "presion_sistolica": 135.0, "presion_diastolica": 80.0, "frecuencia_cardiaca": 70.0,
+        "sintomas": ["mareo"]
+    })
+    assert client.get("/patients/p1/alerts").status_code == 200
@@ -0,0 +1,75 @@
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+from app.routes.alerts import check_alerts
+from app.models import AlertState
+from app.routes.patients import patients_db
+from app.services.clinical_parameters import clinical_params, parameters_version, resume_versions
+
+@pytest.fixture(autouse=True)
+def patient(client: TestClient):
+    """Create a patient without a phone number (so no notification is attempted)."""
+    patients_db.clear()
+    client.post("/patients", json={"id": "p1", "nombre": "Ana", "edad": 70})
+    yield
+    patients_db.clear()
+
+def add_reading(client: TestClient, sistolica: float):
+    response = client.post("/patients/p1/measurements", json={
+        "peso": 70.0,
+        "presion_sistolica": sistolica,
+        "presion_diastolica": 80.0,
+        "frecuencia_cardiaca": 70.0
+    })
+    assert response.status_code == 200
+
+def test_alerts_are_computed_on_write_and_reused_on_read(client: TestClient):
+    """Reads after a measurement write reuse the stored alert state."""
+    add_reading(client, 190.0)
+    state = patients_db.get("p1").alert_state
+    assert [a.nivel for a in state.alerts] == ["red"]
+
+    with patch("app.routes.alerts.check_alerts", wraps=check_alerts) as spy:
+        for _ in range(3):
+            assert [a["nivel"] for a in client.get("/patients/p1/alerts").json()] == ["red"]
+        assert "Urgent" in client.get("/guidelines/followup/p1").json()["followup_schedule"]
+        spy.assert_not_called()
+
+def test_new_measurement_replaces_alert_state(client: TestClient):
+    """Each write re-evaluates alerts for the latest reading."""
+    add_reading(client, 190.0)
+    add_reading(client, 120.0)
+
+    assert client.get("/patients/p1/alerts").json() == []
+
+def test_parameter_update_invalidates_alert_state(client: TestClient):
+    """Changing clinical parameters forces the next read to re-evaluate."""
+    add_reading(client, 170.0)
+    assert client.get("/patients/p1/alerts").json() == []
+
+    original = clinical_params.pa_max
+    try:
+        client.put("/parameters", json={"pa_max": 160.0, "updated_by": "test"})
+        assert [a["nivel"] for a in client.get("/patients/p1/alerts").json()] == ["red"]
+    finally:
+        client.put("/parameters", json={"pa_max": original, "updated_by": "test"})
+
+def test_alert_state_stored_by_an_earlier_run_is_not_reused(client: TestClient):
+    """Versions restart with the process, so startup resumes them past the stored ones."""
+    add_reading(client, 170.0)
+    patient = patients_db.get("p1")
+    # An earlier run got one parameter change further before storing this state
+    stale = AlertState(alerts=[], measurement_version=patient.measurement_version,
+                       parameters_version=parameters_version("p1") + 1)
+    patients_db.set_alert_state("p1", stale)
+
+    resume_versions(patients_db.latest_parameters_version())
+
+    original = clinical_params.pa_max
+    try:
+        client.put("/parameters", json={"pa_max": 160.0, "updated_by": "test"})
+        assert parameters_version("p1") > stale.parameters_version
+        assert [a["nivel"] for a in client.get("/patients/p1/alerts").json()] == ["red"]
+    finally:
+        client.put("/parameters", json={"pa_max": original, "updated_by": "test"})
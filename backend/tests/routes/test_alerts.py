@@ -1,16 +1,24 @@
 import pytest
 from httpx import AsyncClient
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from datetime import datetime, timezone
 
 from app.models import Patient, Measurement, Alert
+from app.services.notification_policy import notification_policy
+
+@pytest.fixture(autouse=True)
+def reset_notification_policy():
+    """Forget notifications decided by earlier tests (the same patient ids repeat per backend)."""
+    notification_policy.clear()
+    yield
+    notification_policy.clear()
 
 # --- Tests for GET /patients/{patient_id}/alerts --- #
 
 @pytest.mark.anyio
 @patch('app.routes.alerts.patients_db')
-@patch('app.routes.alerts.notify_via_whatsapp', new_callable=AsyncMock)
-async def test_get_alerts_no_alerts_generated(mock_notify: AsyncMock, mock_db: patch, client: AsyncClient):
+@patch('app.routes.alerts.enqueue_notification')
+async def test_get_alerts_no_alerts_generated(mock_notify: MagicMock, mock_db: patch, client: AsyncClient):
     """Test GET /patients/{patient_id}/alerts when measurements don't trigger alerts."""
     # 1. Setup: Create a patient in patients_db (or mock it) with non-alerting measurements.
     test_patient_id = "patient_normal"
@@ -32,8 +40,7 @@ async def test_get_alerts_no_alerts_generated(mock_notify: AsyncMock, mock_db: p
     )
     mock_db.get.return_value = test_patient
 
-    # 2. Mock: Patch ai_service.generate_alert_message and ai_service.send_whatsapp_message (optional, but good practice).
-    #    notify_via_whatsapp is already patched.
+    # 2. Mock: enqueue_notification is patched, so no job reaches the outbox workers.
 
     # 3. Action: Call GET /patients/{patient_id}/alerts.
     response = client.get(f"/patients/{test_patient_id}/alerts")
@@ -48,8 +55,8 @@ async def test_get_alerts_no_alerts_generated(mock_notify: AsyncMock, mock_db: p
 
 @pytest.mark.anyio
 @patch('app.routes.alerts.patients_db') # Mock the database dictionary
-@patch('app.routes.alerts.notify_via_whatsapp', new_callable=AsyncMock) # Mock the notification function
-async def test_get_alerts_yellow_alert_generated(mock_notify: AsyncMock, mock_db: patch, client: AsyncClient):
+@patch('app.routes.alerts.enqueue_notification') # Mock the notification outbox
+async def test_get_alerts_yellow_alert_generated(mock_notify: MagicMock, mock_db: patch, client: AsyncClient):
     """Test GET /patients/{patient_id}/alerts generates a yellow alert (no notification)."""
     # 1. Setup: Create patient with measurements triggering a yellow alert (e.g., weight gain).
     test_patient_id = "patient_yellow"
@@ -83,8 +90,7 @@ async def test_get_alerts_yellow_alert_generated(mock_notify: AsyncMock, mock_db
     )
     mock_db.get.return_value = test_patient
 
-    # 2. Mock: Patch notification methods.
-    #    notify_via_whatsapp is already patched.
+    # 2. Mock: enqueue_notification is patched, so no job reaches the outbox workers.
 
     # 3. Action: Call GET /patients/{patient_id}/alerts.
     response = client.get(f"/patients/{test_patient_id}/alerts")
@@ -107,8 +113,8 @@ async def test_get_alerts_yellow_alert_generated(mock_notify: AsyncMock, mock_db
 
 @pytest.mark.anyio
 @patch('app.routes.alerts.patients_db') # Mock the database dictionary
-@patch('app.routes.alerts.notify_via_whatsapp', new_callable=AsyncMock) # Mock the WhatsApp notification function
-async def test_get_alerts_red_alert_triggers_notification(mock_notify: AsyncMock, mock_db: patch, client: AsyncClient):
+@patch('app.routes.alerts.enqueue_notification') # Mock the notification outbox
+async def test_get_alerts_red_alert_triggers_notification(mock_notify: MagicMock, mock_db: patch, client: AsyncClient):
     """Test GET /patients/{patient_id}/alerts generates a red alert and triggers notification."""
     # 1. Setup: Create patient (with phone number) and measurements triggering a red alert (e.g., high BP).
     test_patient_id = "patient_red"
@@ -138,8 +144,7 @@ async def test_get_alerts_red_alert_triggers_notification(mock_notify: AsyncMock
         nivel="red"
     )
 
-    # 2. Mock: Patch ai_service.generate_alert_message and ai_service.send_whatsapp_message (optional, but good practice).
-    #    notify_via_whatsapp is already patched.
+    # 2. Mock: enqueue_notification is patched, so no job reaches the outbox workers.
 
     # 3. Action: Call GET /patients/{patient_id}/alerts.
     response = client.get(f"/patients/{test_patient_id}/alerts")
@@ -152,7 +157,7 @@ async def test_get_alerts_red_alert_triggers_notification(mock_notify: AsyncMock
     assert alerts_data[0]["mensaje"] == expected_alert.mensaje
     assert alerts_data[0]["nivel"] == expected_alert.nivel
 
-    # 5 & 6. Assert: Mocked notify_via_whatsapp was called correctly.
+    # 5 & 6. Assert: A notification job was enqueued for the patient and alerts.
     mock_db.get.assert_called_once_with(test_patient_id)
     # Need to compare the actual Alert object passed to the mock
     mock_notify.assert_called_once()
@@ -162,13 +167,8 @@ async def test_get_alerts_red_alert_triggers_notification(mock_notify: AsyncMock
     assert call_args[1][0].mensaje == expected_alert.mensaje # Check alert content
     assert call_args[1][0].nivel == expected_alert.nivel # Check alert level
 
-    # 7. Assert: Patient's intervention_history was updated in patients_db (or mock assertion).
-    # Access the patient object returned by the mock to check its state after the call
-    assert len(test_patient.intervention_history) == 1
-    history_entry = test_patient.intervention_history[0]
-    assert history_entry["action"] == "AI-generated WhatsApp notification sent"
-    assert history_entry["alerts"] == expected_alert.mensaje
-    # We might also want to assert the timestamp format/existence if needed
+    # 7. Assert: The intervention history is only updated once the job is delivered.
+    mock_db.add_intervention.assert_not_called()
 
 @pytest.mark.anyio
 @patch('app.routes.alerts.patients_db') # Mock the database dictionary
@@ -239,4 +239,69 @@ async def test_get_adherence_recommendations_patient_not_found(mock_db: patch, c
     assert response.json() == {"detail": "Patient not found"}
     mock_db.get.assert_called_once_with(non_existent_id)
 
+@pytest.mark.anyio
+@patch('app.routes.patients.recommendation_refresher.schedule')
+@patch('app.routes.alerts.ai_service', new_callable=AsyncMock)
+async def test_adherence_recommendations_are_reused_until_the_patient_changes(mock_ai_service: AsyncMock, mock_schedule: MagicMock, client: AsyncClient):
+    """Stored recommendations are served while the measurements and profile they were generated from are current."""
+    from app.routes.patients import patients_db, recommendation_refresher
+    patients_db.save(Patient(id="patient_rec_cached", nombre="Cached Carla", edad=58))
+    mock_ai_service.generate_adherence_recommendations = AsyncMock(return_value={"dieta": "Reduzca la sal."})
+
+    for _ in range(2):
+        response = client.get("/patients/patient_rec_cached/alerts/recommendations")
+        assert response.json() == {"dieta": "Reduzca la sal."}
+    assert mock_ai_service.generate_adherence_recommendations.await_count == 1
+
+    # Writes schedule a background regeneration; until it lands, a read regenerates
+    client.put("/patients/patient_rec_cached", json={"id": "patient_rec_cached", "nombre": "Carla", "edad": 58})
+    client.post("/patients/patient_rec_cached/measurements", json={
+        "peso": 70.0, "presion_sistolica": 120.0, "presion_diastolica": 80.0, "frecuencia_cardiaca": 70.0
+    })
+    assert [c.args for c in mock_schedule.call_args_list] == [("patient_rec_cached",)] * 2
+    client.get("/patients/patient_rec_cached/alerts/recommendations")
+    assert mock_ai_service.generate_adherence_recommendations.await_count == 2
+
+    client.delete("/patients/patient_rec_cached")
+    assert recommendation_refresher.store.get("patient_rec_cached") is None
+
+def test_concurrent_devices_opening_a_patient_share_one_generation_and_one_notification(client: AsyncClient):
+    """The same patient opened on several devices at once: one LLM call, one notification job."""
+    import asyncio
+    import httpx
+    from app import app
+    from app.routes.alerts import ai_service, notification_outbox
+    from app.routes.patients import patients_db
+    from app.services.llm_client import FakeLLM, LLMClient
+
+    patients_db.save(Patient(id="patient_devices", nombre="Dora", edad=71, telefono="56933333333", measurements=[
+        Measurement(peso=70.0, presion_sistolica=195.0, presion_diastolica=85.0, frecuencia_cardiaca=70.0)
+    ]))
+    notification_outbox.clear()
+    llm = FakeLLM('"dieta": "Reduzca la sal."', latency=0.1)
+
+    async def open_patient(http: httpx.AsyncClient):
+        alerts = await http.get("/patients/patient_devices/alerts")
+        recommendations = await http.get("/patients/patient_devices/alerts/recommendations")
+        return alerts.json(), recommendations.json()
+
+    async def three_devices():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            return await asyncio.gather(*(open_patient(http) for _ in range(3)))
+
+    original = ai_service.llm
+    ai_service.llm = LLMClient(complete_fn=llm)
+    try:
+        with patch.object(ai_service, "generate_alert_message", AsyncMock(return_value="Hola Dora")), \
+                patch.object(ai_service, "send_whatsapp_message", AsyncMock(return_value=True)):
+            results = asyncio.run(three_devices())
+            assert sum(notification_outbox.counts().values()) == 1
+    finally:
+        ai_service.llm = original
+        notification_outbox.clear()
+        patients_db.delete("patient_devices")
+
+    assert [recommendations for _, recommendations in results] == [{"dieta": "Reduzca la sal."}] * 3
+    assert llm.calls == 1
+
 # Add more tests as needed, e.g., specific alert conditions, AI service error handling
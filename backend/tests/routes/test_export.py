@@ -0,0 +1,68 @@
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+
+from app.routes.patients import patients_db
+from app.services.export import iter_ndjson_export
+
+START = datetime(2024, 1, 1, 8, 0, 0, tzinfo=timezone.utc)
+
+@pytest.fixture(autouse=True)
+def patients(client: TestClient):
+    """Create three patients with three daily measurements and one intervention each."""
+    patients_db.clear()
+    for i in range(3):
+        pid = f"p{i}"
+        client.post("/patients", json={"id": pid, "nombre": f"Patient {i}", "edad": 60})
+        for day in range(3):
+            client.post(f"/patients/{pid}/measurements", json={
+                "timestamp": (START + timedelta(days=day)).isoformat(),
+                "peso": 70.0 + day,
+                "presion_sistolica": 120.0,
+                "presion_diastolica": 80.0,
+                "frecuencia_cardiaca": 70.0
+            })
+        patients_db.add_intervention(pid, {
+            "timestamp": (START + timedelta(days=i)).isoformat(),
+            "action": "call"
+        })
+    yield
+    patients_db.clear()
+
+def read_rows(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def test_export_streams_every_row(client: TestClient):
+    """The export contains one row per patient, measurement and intervention."""
+    response = client.get("/export/patients.ndjson")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = read_rows(response)
+    assert [r["type"] for r in rows].count("patient") == 3
+    assert [r["type"] for r in rows].count("measurement") == 9
+    assert [r["type"] for r in rows].count("intervention") == 3
+    assert rows[0] == {"type": "patient", "id": "p0", "nombre": "Patient 0", "edad": 60, "telefono": None}
+    assert rows[1]["patient_id"] == "p0" and rows[1]["peso"] == 70.0
+
+def test_export_since_is_incremental(client: TestClient):
+    """Only measurements and interventions at or after `since` are exported."""
+    since = (START + timedelta(days=2)).isoformat()
+
+    rows = read_rows(client.get("/export/patients.ndjson", params={"since": since}))
+
+    assert [r["type"] for r in rows].count("patient") == 3
+    assert [r["peso"] for r in rows if r["type"] == "measurement"] == [72.0, 72.0, 72.0]
+    assert [r["patient_id"] for r in rows if r["type"] == "intervention"] == ["p2"]
+
+async def collect(page_size: int) -> bytes:
+    return b"".join([chunk async for chunk in iter_ndjson_export(patients_db, page_size=page_size)])
+
+@pytest.mark.anyio
+async def test_export_pages_do_not_change_output():
+    """Small pages produce exactly the same stream as one large page."""
+    small = await collect(page_size=1)
+    large = await collect(page_size=1000)
+
+    assert small == large
@@ -0,0 +1,82 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+
+from app.routes.guidelines import interpretation_events
+from app.services.ai_service import ai_service
+from app.services.llm_client import FakeLLM, LLMClient
+
+REPLY = "La meta es una presión menor a 130/80 mmHg."
+
+@pytest.fixture
+def llm():
+    original = ai_service.llm
+    fake = FakeLLM(REPLY, latency=0.01)
+    ai_service.llm = LLMClient(complete_fn=fake)
+    ai_service.guideline_cache.clear()
+    yield fake
+    ai_service.llm = original
+    ai_service.guideline_cache.clear()
+
+def parse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return events
+
+def test_interpretation_is_streamed_as_events(llm, client: TestClient):
+    with client.stream("GET", "/guidelines/interpret/stream", params={"source": "AHA", "query": "¿meta de presión?"}) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = "".join(response.iter_text())
+
+    events = parse_events(body)
+    assert events[-1] == ("done", {})
+    tokens = [data["token"] for event, data in events[:-1]]
+    assert len(tokens) == len(REPLY.split(" "))
+    assert "".join(tokens) == REPLY
+    assert llm.calls == 1
+
+def test_llm_failure_streams_fallback(client: TestClient):
+    async def failing(**kwargs):
+        raise RuntimeError("down")
+
+    original = ai_service.llm
+    ai_service.llm = LLMClient(complete_fn=failing)
+    try:
+        response = client.get("/guidelines/interpret/stream", params={"source": "GES", "query": "¿controles?"})
+    finally:
+        ai_service.llm = original
+    (message, done) = parse_events(response.text)
+    assert message[1]["token"].startswith("Lo siento")
+    assert done == ("done", {})
+
+class DisconnectingRequest:
+    """Reports the client as gone after the first event was sent."""
+
+    def __init__(self):
+        self.checks = 0
+
+    async def is_disconnected(self) -> bool:
+        self.checks += 1
+        return self.checks > 1
+
+@pytest.mark.anyio
+# The LLM client's limiter and stream are asyncio objects, as uvicorn runs the app on asyncio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_disconnect_stops_generation(llm):
+    events = [event async for event in interpretation_events(DisconnectingRequest(), "AHA", "¿meta?")]
+    assert len(events) == 1
+    assert llm.abandoned == 1
+    assert ai_service.llm.limiter.active == 0
+
+def test_similar_query_is_answered_from_cache(llm, client: TestClient):
+    params = {"source": "AHA", "query": "¿Cuál es la meta de presión?"}
+    assert "".join(d["token"] for e, d in parse_events(client.get("/guidelines/interpret/stream", params=params).text)[:-1]) == REPLY
+
+    params["query"] = "cual es la meta de presion"
+    events = parse_events(client.get("/guidelines/interpret/stream", params=params).text)
+    assert events == [("message", {"token": REPLY}), ("done", {})]
+    assert client.get("/guidelines/interpret", params=params).json()["interpretation"] == REPLY
+    assert llm.calls == 1
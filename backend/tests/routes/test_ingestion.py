@@ -0,0 +1,198 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.routes import ingestion
+from app.services.blob_store import BlobStore
+from app.services.ingestion_index import IngestionIndex
+from app.services.pagination import NEXT_CURSOR_HEADER
+from app.services.segment_log import SegmentLog
+
+@pytest.fixture(autouse=True)
+def logs(tmp_path, monkeypatch):
+    """Point the ingestion endpoints at empty logs in a temporary directory."""
+    text_log = SegmentLog(str(tmp_path / "text"), segment_bytes=2048)
+    vision_log = SegmentLog(str(tmp_path / "vision"), segment_bytes=2048)
+    monkeypatch.setattr(ingestion, "text_log", text_log)
+    monkeypatch.setattr(ingestion, "vision_log", vision_log)
+    monkeypatch.setattr(ingestion, "search_index", IngestionIndex())
+    monkeypatch.setattr(ingestion, "blob_store", BlobStore(str(tmp_path / "blobs"), max_bytes=64 * 1024))
+    yield
+    text_log.close()
+    vision_log.close()
+
+def test_text_ingestions_are_paginated_with_a_cursor(client: TestClient):
+    ids = []
+    for i in range(25):
+        response = client.post("/ingestion/text", json={"content": f"Nota {i}", "metadata": {"patient_id": "p1"}})
+        assert response.status_code == 200
+        ids.append(response.json()["id"])
+
+    seen = []
+    params = {"limit": 10}
+    while True:
+        response = client.get("/ingestion/text", params=params)
+        assert response.status_code == 200
+        seen.extend(item["id"] for item in response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+        params = {"limit": 10, "cursor": cursor}
+    assert seen == ids
+
+    page = client.get("/ingestion/text", params={"offset": 20}).json()
+    assert [item["content"] for item in page] == [f"Nota {i}" for i in range(20, 25)]
+    assert client.get("/ingestion/text", params={"cursor": "bad"}).status_code == 400
+
+def test_ingestions_can_be_read_by_time_range(client: TestClient):
+    client.post("/ingestion/vision", json={"caption": "ECG"})
+    response = client.get("/ingestion/vision", params={"from": "2000-01-01T00:00:00Z", "to": "2001-01-01T00:00:00Z"})
+    assert response.json() == []
+    (item,) = client.get("/ingestion/vision", params={"from": "2000-01-01T00:00:00Z"}).json()
+    assert item["caption"] == "ECG"
+
+def test_vision_upload_is_stored_by_content_and_downloadable(client: TestClient):
+    image = b"\xff\xd8\xff\xe0" + bytes(range(256)) * 40
+    references = []
+    for caption in ("Báscula", "Báscula de nuevo"):
+        response = client.post(
+            "/ingestion/vision",
+            data={"caption": caption, "metadata": '{"patient_id": "p1"}'},
+            files={"file": ("scale.jpg", image, "image/jpeg")},
+        )
+        assert response.status_code == 200
+        item = response.json()
+        assert item["caption"] == caption and item["metadata"] == {"patient_id": "p1"}
+        assert item["image_size"] == len(image) and item["image_content_type"] == "image/jpeg"
+        references.append(item["image_blob"])
+    assert references[0] == references[1]
+
+    download = client.get(item["image_url"])
+    assert download.status_code == 200
+    assert download.content == image
+    assert download.headers["content-type"] == "image/jpeg"
+    partial = client.get(item["image_url"], headers={"Range": "bytes=0-3"})
+    assert partial.status_code == 206 and partial.content == image[:4]
+    assert client.get("/ingestion/blobs/" + "0" * 64).status_code == 404
+
+    too_large = client.post("/ingestion/vision", files={"file": ("big.jpg", image * 10, "image/jpeg")})
+    assert too_large.status_code == 413
+    assert client.post("/ingestion/vision", data={"metadata": "[1"}, files={"file": ("a.jpg", image)}).status_code == 400
+    assert client.post("/ingestion/vision", json={"caption": 3}).status_code == 422
+
+def test_rejected_uploads_leave_no_blob(client: TestClient, tmp_path):
+    image = b"\xff\xd8\xff\xe0" + b"\x00" * 64
+    rejected = [
+        {"metadata": "[1"},
+        {"metadata": '{"patient_id": 1}'},
+        {"timestamp": "yesterday"},
+    ]
+    for fields in rejected:
+        response = client.post("/ingestion/vision", data=fields, files={"file": ("a.jpg", image, "image/jpeg")})
+        assert response.status_code in (400, 422)
+
+    blobs = tmp_path / "blobs"
+    assert not blobs.exists() or [path.name for path in blobs.rglob("*") if path.is_file()] == []
+    assert client.get("/ingestion/vision").json() == []
+
+def test_search_finds_text_and_captions_with_filters(client: TestClient):
+    client.post("/ingestion/text", json={"content": "Hoy me falta el aire", "metadata": {"patient_id": "p1"}})
+    client.post("/ingestion/text", json={"content": "Hinchazón en los pies", "metadata": {"patient_id": "p2"}})
+    client.post("/ingestion/vision", json={"caption": "Foto de los pies", "additional_text": "Hinchazon visible",
+                                            "metadata": {"patient_id": "p2"}})
+
+    hits = client.get("/ingestion/search", params={"q": "HINCHAZON"}).json()
+    assert [hit["kind"] for hit in hits] == ["vision", "text"]
+    assert hits[0]["vision"]["caption"] == "Foto de los pies"
+    assert hits[1]["text"]["content"] == "Hinchazón en los pies"
+
+    response = client.get("/ingestion/search", params={"q": "pies", "metadata": "patient_id=p2", "limit": 1})
+    assert [hit["kind"] for hit in response.json()] == ["vision"]
+    response = client.get("/ingestion/search", params={"q": "pies", "limit": 1,
+                                                       "cursor": response.headers[NEXT_CURSOR_HEADER]})
+    assert [hit["text"]["content"] for hit in response.json()] == ["Hinchazón en los pies"]
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+    hits = client.get("/ingestion/search", params={"q": '"me falta el aire"', "kind": "text"}).json()
+    assert [hit["text"]["metadata"] for hit in hits] == [{"patient_id": "p1"}]
+    assert client.get("/ingestion/search", params={"q": "aire", "metadata": "p1"}).status_code == 400
+    assert client.get("/ingestion/search").status_code == 400
+
+def test_search_forgets_records_deleted_by_retention(client: TestClient, tmp_path, monkeypatch):
+    text_log = SegmentLog(str(tmp_path / "retained"), segment_bytes=2048, retention_bytes=4096)
+    monkeypatch.setattr(ingestion, "text_log", text_log)
+    for i in range(60):
+        client.post("/ingestion/text", json={"content": f"Nota de control {i}", "metadata": {"patient_id": "p1"}})
+    assert text_log.first_offset > 0
+
+    assert ingestion.search_index.stats()["documents"] == 60 - text_log.first_offset
+    seen = []
+    cursor = None
+    while True:
+        params = {"q": "control", "limit": 10, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/ingestion/search", params=params)
+        page = [hit["offset"] for hit in response.json()]
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        # Pages are never short because of deleted records
+        assert len(page) == 10 or cursor is None
+        seen.extend(page)
+        if cursor is None:
+            break
+    assert seen == list(range(59, text_log.first_offset - 1, -1))
+    text_log.close()
+
+def test_periodic_retention_drops_expired_records(client: TestClient, tmp_path, monkeypatch):
+    now = [time.time()]
+    text_log = SegmentLog(str(tmp_path / "expiring"), segment_bytes=2048, retention_hours=1, clock=lambda: now[0])
+    monkeypatch.setattr(ingestion, "text_log", text_log)
+    for i in range(30):
+        client.post("/ingestion/text", json={"content": f"Nota de control {i}", "metadata": {"patient_id": "p1"}})
+    first_offset = text_log.first_offset
+
+    # No append rolls the log over: only the periodic run deletes the expired segments
+    now[0] += 7200
+    ingestion.enforce_retention()
+
+    assert text_log.first_offset > first_offset
+    assert ingestion.search_index.stats()["documents"] == 30 - text_log.first_offset
+    hits = client.get("/ingestion/search", params={"q": "control", "limit": 50}).json()
+    assert [hit["offset"] for hit in hits] == list(range(29, text_log.first_offset - 1, -1))
+    text_log.close()
+
+def send_vitals(client: TestClient, patient_id: str, content: str) -> dict:
+    """Ingest a text message and wait for the pipeline's outcome."""
+    response = client.post("/ingestion/text", json={"content": content, "metadata": {"patient_id": patient_id}})
+    ingestion_id = response.json()["id"]
+    deadline = time.monotonic() + 10
+    while (extraction := client.get(f"/ingestion/text/{ingestion_id}/vitals")).status_code == 404:
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+    return extraction.json()
+
+def test_vitals_typed_in_text_become_measurements(client: TestClient):
+    client.post("/patients", json={"id": "vitals-p1", "nombre": "Rosa", "edad": 68})
+    extraction = send_vitals(client, "vitals-p1", "Presión 185/95, pulso 88, peso 81,2. Me falta el aire")
+    assert extraction["status"] == "recorded"
+    assert extraction["values"]["presion_sistolica"] == 185 and extraction["sintomas"] == ["disnea"]
+
+    (measurement,) = client.get("/patients/vitals-p1/measurements").json()
+    assert measurement["timestamp"] == extraction["measurement_timestamp"]
+    assert measurement["peso"] == 81.2
+    assert measurement["source_ingestion_id"] == extraction["ingestion_id"]
+    alerts = client.get("/patients/vitals-p1/alerts").json()
+    assert any("185" in alert["mensaje"] for alert in alerts)
+    assert client.get("/ingestion/text/unknown/vitals").status_code == 404
+
+def test_symptom_only_message_reaches_the_alerts(client: TestClient):
+    client.post("/patients", json={"id": "vitals-p2", "nombre": "Rosa", "edad": 68})
+    assert send_vitals(client, "vitals-p2", "Presión 120/80, pulso 70, peso 70")["status"] == "recorded"
+    assert client.get("/patients/vitals-p2/alerts").json() == []
+
+    extraction = send_vitals(client, "vitals-p2", "hoy tengo dolor de pecho")
+
+    assert extraction["status"] == "recorded" and extraction["values"] == {}
+    assert extraction["carried_forward"] == ["peso", "presion_sistolica", "presion_diastolica", "frecuencia_cardiaca"]
+    latest = client.get("/patients/vitals-p2/measurements").json()[-1]
+    assert latest["sintomas"] == ["dolor torácico"] and latest["presion_sistolica"] == 120
+    assert [alert["nivel"] for alert in client.get("/patients/vitals-p2/alerts").json()] == ["red"]
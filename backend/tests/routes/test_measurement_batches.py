@@ -0,0 +1,85 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+
+from app.routes.patients import patients_db
+
+@pytest.fixture(autouse=True)
+def patients(client: TestClient):
+    """Create two patients to upload measurements for."""
+    patients_db.clear()
+    for pid in ["p1", "p2"]:
+        client.post("/patients", json={"id": pid, "nombre": pid, "edad": 70})
+    yield
+    patients_db.clear()
+
+def row(patient_id: str, peso: float = 70.0) -> dict:
+    return {
+        "patient_id": patient_id,
+        "timestamp": "2024-01-01T08:00:00+00:00",
+        "peso": peso,
+        "presion_sistolica": 120.0,
+        "presion_diastolica": 80.0,
+        "frecuencia_cardiaca": 70.0
+    }
+
+def stored_weights(patient_id: str):
+    return [m.peso for m in patients_db.get(patient_id, history=None).measurements]
+
+def test_batch_json_array_reports_per_row_errors(client: TestClient):
+    """Valid rows are stored even when other rows are invalid or target unknown patients."""
+    bad = row("p1")
+    bad["peso"] = "heavy"
+    rows = [row("p1", 70.0), bad, row("ghost"), row("p2", 80.0), row("p1", 71.0)]
+
+    response = client.post("/measurements/batch", json=rows)
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["accepted"] == 3
+    assert result["rejected"] == 2
+    assert [(e["row"], e["patient_id"]) for e in result["errors"]] == [(1, "p1"), (2, "ghost")]
+    assert "peso" in result["errors"][0]["detail"]
+    assert result["errors"][1]["detail"] == "Patient not found"
+    assert stored_weights("p1") == [70.0, 71.0]
+    assert stored_weights("p2") == [80.0]
+
+def test_batch_ndjson(client: TestClient):
+    """NDJSON bodies are accepted and unparseable lines are reported."""
+    body = "\n".join([json.dumps(row("p1", 70.0)), "{not json", json.dumps(row("p2", 80.0))]) + "\n"
+
+    response = client.post("/measurements/batch", content=body, headers={"content-type": "application/x-ndjson"})
+
+    result = response.json()
+    assert result["accepted"] == 2
+    assert [e["row"] for e in result["errors"]] == [1]
+    assert stored_weights("p2") == [80.0]
+
+def test_batch_csv_upload(client: TestClient):
+    """Multipart CSV uploads are parsed, including empty cells and symptom lists."""
+    csv_body = (
+        "patient_id,timestamp,peso,presion_sistolica,presion_diastolica,frecuencia_cardiaca,saturacion_oxigeno,sintomas\n"
+        "p1,2024-01-01T08:00:00+00:00,70.5,120,80,70,,disnea;fatiga\n"
+        "p2,2024-01-01T08:00:00+00:00,81,130,85,75,97,\n"
+    )
+
+    response = client.post("/measurements/batch", files={"file": ("readings.csv", csv_body, "text/csv")})
+
+    assert response.json() == {"accepted": 2, "rejected": 0, "errors": []}
+    latest = patients_db.get("p1", history=1).measurements[-1]
+    assert latest.peso == 70.5
+    assert latest.saturacion_oxigeno is None
+    assert latest.sintomas == ["disnea", "fatiga"]
+
+def test_batch_rejects_unsupported_bodies(client: TestClient):
+    """Unsupported content types and non-array JSON are rejected."""
+    assert client.post("/measurements/batch", content="x", headers={"content-type": "text/plain"}).status_code == 415
+    assert client.post("/measurements/batch", json={"patient_id": "p1"}).status_code == 400
+
+def test_batch_rejects_malformed_csv(client: TestClient):
+    """A field over csv.field_size_limit() or a non-UTF-8 body is a 400, not a server error."""
+    oversized = 'patient_id,peso\np1,"' + "x" * 200_000 + '"\n'
+    for body in (oversized.encode(), b"patient_id,peso\n\xff\xfe,80\n"):
+        response = client.post("/measurements/batch", content=body, headers={"content-type": "text/csv"})
+        assert response.status_code == 400
+        assert response.json()["detail"].startswith("Invalid CSV")
@@ -0,0 +1,59 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+
+from app.routes.patients import patients_db
+
+START = datetime(2024, 1, 1, 8, 0, 0, tzinfo=timezone.utc)
+
+@pytest.fixture(autouse=True)
+def patient_with_history(client: TestClient):
+    """Create a patient with ten daily measurements, the last two appended out of order."""
+    patients_db.clear()
+    client.post("/patients", json={"id": "p1", "nombre": "Ana", "edad": 70})
+    for day in [0, 1, 2, 3, 4, 5, 6, 7, 9, 8]:
+        measurement = {
+            "timestamp": (START + timedelta(days=day)).isoformat(),
+            "peso": 70.0 + day,
+            "presion_sistolica": 120.0,
+            "presion_diastolica": 80.0,
+            "frecuencia_cardiaca": 70.0
+        }
+        assert client.post("/patients/p1/measurements", json=measurement).status_code == 200
+    yield
+    patients_db.clear()
+
+def test_get_measurements_returns_time_ordered_history(client: TestClient):
+    """Without filters the full history is returned in timestamp order."""
+    response = client.get("/patients/p1/measurements")
+
+    assert response.status_code == 200
+    assert [m["peso"] for m in response.json()] == [70.0 + d for d in range(10)]
+
+def test_get_measurements_time_range(client: TestClient):
+    """from is inclusive and to is exclusive."""
+    params = {"from": (START + timedelta(days=2)).isoformat(), "to": (START + timedelta(days=5)).isoformat()}
+
+    response = client.get("/patients/p1/measurements", params=params)
+
+    assert [m["peso"] for m in response.json()] == [72.0, 73.0, 74.0]
+
+def test_get_measurements_cursor_pagination(client: TestClient):
+    """Pages follow each other without gaps or duplicates, across out-of-order appends."""
+    params = {"limit": 4, "from": (START + timedelta(days=1)).isoformat()}
+    seen = []
+    while True:
+        response = client.get("/patients/p1/measurements", params=params)
+        assert response.status_code == 200
+        seen.extend(m["peso"] for m in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        params["cursor"] = cursor
+
+    assert seen == [70.0 + d for d in range(1, 10)]
+
+def test_get_measurements_errors(client: TestClient):
+    """Unknown patients return 404 and malformed cursors 400."""
+    assert client.get("/patients/ghost/measurements").status_code == 404
+    assert client.get("/patients/p1/measurements", params={"cursor": "bad"}).status_code == 400
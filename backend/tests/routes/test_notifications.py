@@ -0,0 +1,97 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock, patch
+from fastapi.testclient import TestClient
+
+from app.routes.alerts import notification_outbox, notification_workers
+from app.routes.patients import patients_db
+from app.services.notification_policy import notification_policy
+
+@pytest.fixture(autouse=True)
+def patient(client: TestClient):
+    """A patient with a phone number and a red-alert reading."""
+    patients_db.clear()
+    notification_outbox.clear()
+    notification_policy.clear()
+    notification_workers.rate_limiter.clear()
+    client.post("/patients", json={"id": "p1", "nombre": "Ana", "edad": 70, "telefono": "56911111111"})
+    client.post("/patients/p1/measurements", json={
+        "peso": 70.0,
+        "presion_sistolica": 190.0,
+        "presion_diastolica": 80.0,
+        "frecuencia_cardiaca": 70.0
+    })
+    yield
+    notification_outbox.clear()
+    patients_db.clear()
+
+def wait_for_history(patient_id: str, timeout: float = 3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        history = patients_db.get(patient_id).intervention_history
+        if history:
+            return history
+        time.sleep(0.01)
+    raise AssertionError("notification was not delivered")
+
+@patch("app.routes.alerts.ai_service")
+def test_red_alert_is_delivered_in_background(mock_ai, client: TestClient):
+    mock_ai.generate_alert_message = AsyncMock(return_value="Hola Ana, su presión está alta.")
+    mock_ai.send_whatsapp_message = AsyncMock(return_value=True)
+
+    response = client.get("/patients/p1/alerts")
+    assert response.status_code == 200
+    assert [a["nivel"] for a in response.json()] == ["red"]
+
+    (entry,) = wait_for_history("p1")
+    assert entry["action"] == "AI-generated WhatsApp notification sent"
+    assert entry["alerts"] == "Elevated systolic pressure: 190.0 mmHg."
+    assert entry["attempts"] == "1"
+    mock_ai.send_whatsapp_message.assert_awaited_once_with("56911111111", "Hola Ana, su presión está alta.")
+    assert client.get("/notifications/stats").json()["jobs"] == {"sent": 1}
+
+@patch("app.routes.alerts.ai_service")
+def test_request_does_not_wait_for_delivery(mock_ai, client: TestClient):
+    async def slow_message(patient, alerts):
+        await asyncio.sleep(0.5)
+        return "Hola"
+
+    mock_ai.generate_alert_message = slow_message
+    mock_ai.send_whatsapp_message = AsyncMock(return_value=True)
+
+    start = time.monotonic()
+    assert client.get("/patients/p1/alerts").status_code == 200
+    assert time.monotonic() - start < 0.4
+    assert patients_db.get("p1").intervention_history == []
+
+    assert wait_for_history("p1")[0]["action"] == "AI-generated WhatsApp notification sent"
+
+@patch("app.routes.alerts.ai_service")
+def test_repeated_reads_notify_once(mock_ai, client: TestClient):
+    mock_ai.generate_alert_message = AsyncMock(return_value="Hola")
+    mock_ai.send_whatsapp_message = AsyncMock(return_value=True)
+
+    for _ in range(5):
+        assert client.get("/patients/p1/alerts").status_code == 200
+    wait_for_history("p1")
+
+    mock_ai.generate_alert_message.assert_awaited_once()
+    stats = client.get("/notifications/stats").json()
+    assert stats["jobs"] == {"sent": 1}
+    assert stats["decisions"]["sent"] == 1
+    assert stats["decisions"]["suppressed"] == 4
+    assert stats["decisions"]["duplicate"] == 4
+
+@patch("app.routes.alerts.ai_service")
+def test_failed_delivery_is_notified_again(mock_ai, client: TestClient):
+    mock_ai.generate_alert_message = AsyncMock(return_value="Hola")
+    mock_ai.send_whatsapp_message = AsyncMock(side_effect=Exception("down"))
+
+    with patch("app.routes.alerts.notification_workers.max_attempts", 1):
+        client.get("/patients/p1/alerts")
+        assert wait_for_history("p1")[0]["action"] == "WhatsApp notification failed"
+
+    mock_ai.send_whatsapp_message = AsyncMock(return_value=True)
+    client.get("/patients/p1/alerts")
+    assert client.get("/notifications/stats").json()["decisions"]["sent"] == 2
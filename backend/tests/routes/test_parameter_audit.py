@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.routes import guidelines
+from app.services.alert_rules import DEFAULT_RULES, install_rules
+from app.services.clinical_parameters import clinical_params, mark_parameters_changed
+from app.services.pagination import NEXT_CURSOR_HEADER
+from app.services.parameter_audit import InMemoryParameterAuditLog, SQLiteParameterAuditLog
+
+@pytest.fixture(autouse=True)
+def audit_log(client: TestClient, monkeypatch):
+    """An empty audit log; the default parameters and rules are restored afterwards."""
+    log = InMemoryParameterAuditLog(snapshot_interval=2)
+    monkeypatch.setattr(guidelines, "parameters_audit_log", log)
+    defaults = client.get("/parameters").json()
+    yield log
+    client.put("/parameters", json={
+        **defaults, "rules": [rule.model_dump() for rule in DEFAULT_RULES], "updated_by": "test"
+    })
+
+def test_audit_is_paginated_and_filtered_by_author(client: TestClient):
+    for i, author in enumerate(["ana", "luis", "ana", "ana"]):
+        client.put("/parameters", json={"pa_max": 170 + i, "updated_by": author})
+
+    first = client.get("/parameters/audit", params={"updated_by": "ana", "limit": 2})
+    assert first.status_code == 200
+    assert [entry["new_values"] for entry in first.json()] == [{"pa_max": 170}, {"pa_max": 172}]
+    assert first.json()[0]["previous_values"]["pa_max"] == 180
+    assert [rule["id"] for rule in first.json()[0]["previous_values"]["rules"]] == [rule.id for rule in DEFAULT_RULES]
+
+    second = client.get("/parameters/audit", params={
+        "updated_by": "ana", "limit": 2, "cursor": first.headers[NEXT_CURSOR_HEADER]
+    })
+    assert [entry["new_values"] for entry in second.json()] == [{"pa_max": 173}]
+    assert NEXT_CURSOR_HEADER not in second.headers
+
+    assert client.get("/parameters/audit", params={"cursor": "garbage"}).status_code == 400
+
+def test_parameters_as_of_rebuilds_past_state(client: TestClient):
+    assert client.get("/parameters/as-of", params={"at": "2020-01-01T00:00:00Z"}).json()["entry_id"] is None
+
+    client.put("/parameters", json={"pa_max": 170, "updated_by": "ana"})
+    rules = [rule.model_dump() for rule in DEFAULT_RULES[:1]]
+    client.put("/parameters", json={"rules": rules, "updated_by": "ana"})
+    client.put("/parameters", json={"pa_max": 160, "updated_by": "luis"})
+    entries = client.get("/parameters/audit").json()
+
+    before = client.get("/parameters/as-of", params={"at": "2020-01-01T00:00:00Z"}).json()
+    assert before["entry_id"] is None
+    assert before["parameters"]["pa_max"] == 180
+    assert len(before["rules"]) == len(DEFAULT_RULES)
+
+    middle = client.get("/parameters/as-of", params={"at": entries[1]["timestamp"]}).json()
+    assert middle["entry_id"] == entries[1]["id"]
+    assert middle["parameters"]["pa_max"] == 170
+    assert [rule["id"] for rule in middle["rules"]] == [DEFAULT_RULES[0].id]
+
+    latest = client.get("/parameters/as-of", params={"at": entries[2]["timestamp"]}).json()
+    assert latest["parameters"] == client.get("/parameters").json()
+
+def test_logged_parameters_are_restored_after_restart(client: TestClient, monkeypatch, tmp_path):
+    """After a restart the in-process defaults are replaced by what the SQLite log says is in force."""
+    path = str(tmp_path / "audit.db")
+    log = SQLiteParameterAuditLog(path)
+    monkeypatch.setattr(guidelines, "parameters_audit_log", log)
+    client.put("/parameters", json={"pa_max": 165, "updated_by": "ana"})
+    rules = [rule.model_dump() for rule in DEFAULT_RULES[:2]]
+    client.put("/parameters", json={"rules": rules, "updated_by": "ana"})
+    log.close()
+
+    # Simulate the restart: process state back to the defaults, log reopened
+    clinical_params.pa_max = 180
+    install_rules(DEFAULT_RULES)
+    mark_parameters_changed()
+    reopened = SQLiteParameterAuditLog(path)
+    monkeypatch.setattr(guidelines, "parameters_audit_log", reopened)
+    assert client.get("/parameters").json()["pa_max"] == 180
+
+    assert guidelines.restore_parameters()
+
+    assert client.get("/parameters").json()["pa_max"] == 165
+    assert [rule["id"] for rule in client.get("/parameters/rules").json()] == [rule.id for rule in DEFAULT_RULES[:2]]
+    now = client.get("/parameters/as-of", params={"at": datetime.now(timezone.utc).isoformat()}).json()
+    assert now["parameters"] == client.get("/parameters").json()
+
+def test_restore_with_empty_log_keeps_defaults():
+    assert not guidelines.restore_parameters()
@@ -0,0 +1,84 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.routes.patients import patients_db
+from app.routes.guidelines import restore_overrides
+from app.services.clinical_parameters import delete_cohort, list_cohorts, clear_patient, resolve_parameters
+
+@pytest.fixture(autouse=True)
+def patients(client: TestClient):
+    """Two patients with a heart rate of 45 bpm (below the global minimum of 50)."""
+    patients_db.clear()
+    for patient_id in ("p1", "p2"):
+        client.post("/patients", json={"id": patient_id, "nombre": "Ana", "edad": 70})
+        client.post(f"/patients/{patient_id}/measurements", json={
+            "peso": 70.0,
+            "presion_sistolica": 120.0,
+            "presion_diastolica": 80.0,
+            "frecuencia_cardiaca": 45.0
+        })
+    yield
+    for cohort in list_cohorts():
+        delete_cohort(cohort)
+        patients_db.delete_cohort(cohort)
+    for patient_id in ("p1", "p2"):
+        clear_patient(patient_id)
+    patients_db.clear()
+
+def alert_messages(client: TestClient, patient_id: str):
+    return [a["mensaje"] for a in client.get(f"/patients/{patient_id}/alerts").json()]
+
+def test_cohort_overrides_apply_to_members_only(client: TestClient):
+    assert alert_messages(client, "p1") == ["Low heart rate: 45.0 bpm."]
+
+    assert client.put("/parameters/cohorts/beta_blockers", json={"fc_min": 40.0}).json()["fc_min"] == 40.0
+    response = client.put("/patients/p1/parameters", json={"cohort": "beta_blockers"})
+    assert response.status_code == 200
+    assert response.json()["resolved"]["fc_min"] == 40.0
+
+    assert alert_messages(client, "p1") == []
+    assert alert_messages(client, "p2") == ["Low heart rate: 45.0 bpm."]
+    assert {entry["patient_id"] for entry in client.get("/alerts").json()} == {"p2"}
+
+    # Changing the cohort re-evaluates its members
+    client.put("/parameters/cohorts/beta_blockers", json={"fc_min": 48.0})
+    assert alert_messages(client, "p1") == ["Low heart rate: 45.0 bpm."]
+
+def test_patient_overrides_take_precedence(client: TestClient):
+    client.put("/parameters/cohorts/beta_blockers", json={"fc_min": 40.0})
+    client.put("/patients/p1/parameters", json={"cohort": "beta_blockers", "overrides": {"fc_min": 46.0}})
+
+    settings = client.get("/patients/p1/parameters").json()
+    assert settings["cohort"] == "beta_blockers"
+    assert settings["overrides"]["fc_min"] == 46.0
+    assert settings["resolved"]["fc_min"] == 46.0
+    assert alert_messages(client, "p1") == ["Low heart rate: 45.0 bpm."]
+    assert client.get("/alerts").json()[0]["alerts"][0]["mensaje"] == "Low heart rate: 45.0 bpm."
+
+def test_unknown_patient_or_cohort(client: TestClient):
+    assert client.get("/patients/missing/parameters").status_code == 404
+    assert client.put("/patients/p1/parameters", json={"cohort": "missing"}).status_code == 404
+    assert client.delete("/parameters/cohorts/missing").status_code == 404
+
+def test_overrides_are_restored_after_a_restart(client: TestClient):
+    client.put("/parameters/cohorts/beta_blockers", json={"fc_min": 40.0})
+    client.put("/parameters/cohorts/elderly", json={"fc_min": 42.0})
+    client.put("/patients/p1/parameters", json={"cohort": "beta_blockers", "overrides": {"fc_max": 110.0}})
+    client.put("/patients/p2/parameters", json={"cohort": "elderly"})
+    client.delete("/parameters/cohorts/elderly")
+
+    # A restart loses the in-process layers; only the repository keeps them
+    for cohort in list_cohorts():
+        delete_cohort(cohort)
+    for patient_id in ("p1", "p2"):
+        clear_patient(patient_id)
+    assert resolve_parameters("p1").params.fc_min == 50.0
+
+    restore_overrides()
+
+    assert list_cohorts() == {"beta_blockers": {"fc_min": 40.0}}
+    settings = client.get("/patients/p1/parameters").json()
+    assert settings["cohort"] == "beta_blockers"
+    assert settings["overrides"]["fc_max"] == 110.0
+    assert client.get("/patients/p2/parameters").json()["cohort"] is None
+    assert alert_messages(client, "p1") == []
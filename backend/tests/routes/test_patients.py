@@ -0,0 +1,63 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.routes.patients import patients_db
+
+@pytest.fixture(autouse=True)
+def empty_db():
+    """Start every test with an empty patient repository."""
+    patients_db.clear()
+    yield
+    patients_db.clear()
+
+def create_patients(client: TestClient, count: int):
+    for i in range(count):
+        patient = {"id": f"p{i:02d}", "nombre": f"Patient {i}", "edad": 60 + i}
+        assert client.post("/patients", json=patient).status_code == 200
+        measurement = {"peso": 70.0, "presion_sistolica": 120.0, "presion_diastolica": 80.0,
+                       "frecuencia_cardiaca": 70.0}
+        assert client.post(f"/patients/p{i:02d}/measurements", json=measurement).status_code == 200
+
+def test_get_all_patients_without_params_returns_everything(client: TestClient):
+    """GET /patients without pagination params returns every patient with measurements."""
+    create_patients(client, 3)
+
+    response = client.get("/patients")
+
+    assert response.status_code == 200
+    assert [p["id"] for p in response.json()] == ["p00", "p01", "p02"]
+    assert all(len(p["measurements"]) == 1 for p in response.json())
+    assert "X-Next-Cursor" not in response.headers
+
+def test_get_all_patients_cursor_pagination(client: TestClient):
+    """Following X-Next-Cursor visits every patient exactly once."""
+    create_patients(client, 5)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/patients", params=params)
+        assert response.status_code == 200
+        assert len(response.json()) <= 2
+        seen.extend(p["id"] for p in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert seen == ["p00", "p01", "p02", "p03", "p04"]
+
+def test_get_all_patients_field_projection(client: TestClient):
+    """Only the requested fields are returned."""
+    create_patients(client, 2)
+
+    response = client.get("/patients", params=[("fields", "id"), ("fields", "nombre")])
+
+    assert response.status_code == 200
+    assert response.json() == [{"id": "p00", "nombre": "Patient 0"}, {"id": "p01", "nombre": "Patient 1"}]
+
+def test_get_all_patients_rejects_bad_input(client: TestClient):
+    """Unknown fields and malformed cursors are rejected with 400."""
+    assert client.get("/patients", params={"fields": "password"}).status_code == 400
+    assert client.get("/patients", params={"cursor": "not-a-cursor"}).status_code == 400
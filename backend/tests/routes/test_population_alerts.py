@@ -0,0 +1,38 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.routes.patients import patients_db
+
+@pytest.fixture(autouse=True)
+def patients(client: TestClient):
+    """Create one patient with a red alert, one with a yellow alert and one without alerts."""
+    patients_db.clear()
+    readings = {
+        "red": [{"peso": 70.0, "presion_sistolica": 190.0}],
+        "yellow": [{"peso": 70.0, "presion_sistolica": 120.0}, {"peso": 73.0, "presion_sistolica": 120.0}],
+        "stable": [{"peso": 70.0, "presion_sistolica": 120.0}],
+    }
+    for pid, measurements in readings.items():
+        client.post("/patients", json={"id": pid, "nombre": pid, "edad": 70})
+        for m in measurements:
+            client.post(f"/patients/{pid}/measurements", json={**m, "presion_diastolica": 80.0, "frecuencia_cardiaca": 70.0})
+    yield
+    patients_db.clear()
+
+def test_population_alerts_match_patient_alerts(client: TestClient):
+    """Each entry equals the patient's own alerts endpoint; patients without alerts are omitted."""
+    response = client.get("/alerts")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [entry["patient_id"] for entry in body] == ["red", "yellow"]
+    for entry in body:
+        assert entry["alerts"] == client.get(f"/patients/{entry['patient_id']}/alerts").json()
+
+def test_population_alerts_filters(client: TestClient):
+    """Results can be restricted by level or include patients without alerts."""
+    assert [e["patient_id"] for e in client.get("/alerts", params={"nivel": "red"}).json()] == ["red"]
+    everyone = client.get("/alerts", params={"only_alerting": False}).json()
+    assert [e["patient_id"] for e in everyone] == ["red", "stable", "yellow"]
+    assert everyone[1]["alerts"] == []
+    assert client.get("/alerts", params={"nivel": "green"}).status_code == 422
@@ -0,0 +1,44 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+
+from app.routes.patients import patients_db
+
+START = datetime(2024, 1, 1, 8, 0, 0, tzinfo=timezone.utc)
+
+@pytest.fixture(autouse=True)
+def patient(client: TestClient):
+    """Create a patient gaining 0.8 kg a day for five days."""
+    patients_db.clear()
+    client.post("/patients", json={"id": "p1", "nombre": "Ana", "edad": 70})
+    for day in range(5):
+        client.post("/patients/p1/measurements", json={
+            "timestamp": (START + timedelta(days=day)).isoformat(),
+            "peso": 70.0 + 0.8 * day,
+            "presion_sistolica": 120.0,
+            "presion_diastolica": 80.0,
+            "frecuencia_cardiaca": 70.0
+        })
+    yield
+    patients_db.clear()
+
+def test_trends_endpoint(client: TestClient):
+    """Each window aggregates the readings of its last N days."""
+    response = client.get("/patients/p1/trends")
+
+    assert response.status_code == 200
+    short, long = response.json()
+    assert (short["days"], short["count"]) == (3, 3)
+    assert short["peso"]["min"] == pytest.approx(71.6)
+    assert (long["days"], long["count"]) == (7, 5)
+    assert long["peso"]["mean"] == pytest.approx(71.6)
+    assert long["peso"]["last"] == pytest.approx(73.2)
+    assert client.get("/patients/missing/trends").status_code == 404
+
+def test_gradual_weight_gain_raises_trend_alert(client: TestClient):
+    """A gain spread over several readings, invisible reading to reading, raises a trend alert."""
+    alerts = client.get("/patients/p1/alerts").json()
+
+    assert [a["mensaje"] for a in alerts] == [
+        "Weight gain of 3.2 kg over the last 7 days. Check for fluid retention."
+    ]
@@ -0,0 +1 @@
+# Makes tests/services a package
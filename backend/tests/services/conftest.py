@@ -0,0 +1,47 @@
+import pytest
+
+from app.models import Measurement, Patient
+from app.services.ai_service import AIService
+from app.services.llm_client import FakeLLM, LLMClient
+from app.services.message_cache import MessageCache
+from app.services.patient_repository import InMemoryPatientRepository, SQLitePatientRepository
+from app.services.semantic_cache import SemanticCache
+
+@pytest.fixture
+def anyio_backend():
+    # The services use asyncio primitives, as uvicorn runs the app on asyncio
+    return "asyncio"
+
+@pytest.fixture(params=["memory", "sqlite"])
+def repository(request, tmp_path):
+    """Yield each repository implementation with an empty store."""
+    if request.param == "memory":
+        yield InMemoryPatientRepository()
+    else:
+        repo = SQLitePatientRepository(str(tmp_path / "patients.db"), pool_size=2)
+        yield repo
+        repo.close()
+
+@pytest.fixture
+def make_service():
+    """Return a factory of AIService instances calling a fake LLM, with empty caches."""
+    def make(llm: FakeLLM) -> AIService:
+        service = AIService()
+        service.llm = LLMClient(complete_fn=llm)
+        service.message_cache = MessageCache(max_entries=10, ttl_seconds=60)
+        service.guideline_cache = SemanticCache()
+        return service
+    return make
+
+@pytest.fixture
+def make_patient():
+    """Return a factory of patients with one reading, high systolic pressure by default."""
+    def make(patient_id: str, nombre: str, sistolica: float = 192.0, edad: int = 72) -> Patient:
+        return Patient(id=patient_id, nombre=nombre, edad=edad, telefono="56911111111", measurements=[Measurement(
+            peso=81.0,
+            presion_sistolica=sistolica,
+            presion_diastolica=85.0,
+            frecuencia_cardiaca=72.0,
+            sintomas=["Mareos "]
+        )])
+    return make
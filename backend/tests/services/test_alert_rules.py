@@ -0,0 +1,97 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+
+from app.models import AlertRule, Measurement, Patient
+from app.services.alert_rules import DEFAULT_RULES, compile_rules
+from app.services.clinical_parameters import clinical_params
+from app.services.vital_trends import VitalTrends
+from app.services.measurement_series import MeasurementSeries
+
+START = datetime(2024, 1, 1, 8, 0, 0, tzinfo=timezone.utc)
+
+def reading(day: int, peso: float = 70.0, sistolica: float = 120.0, frecuencia: float = 70.0, sintomas=None) -> Measurement:
+    return Measurement(
+        timestamp=START + timedelta(days=day),
+        peso=peso,
+        presion_sistolica=sistolica,
+        presion_diastolica=80.0,
+        frecuencia_cardiaca=frecuencia,
+        sintomas=sintomas
+    )
+
+def patient(*measurements: Measurement) -> Patient:
+    return Patient(id="p1", nombre="Ana", edad=70, measurements=list(measurements))
+
+def test_default_rules_produce_the_standard_alerts():
+    """The default rule set yields the long-standing alert messages, in order."""
+    plan = compile_rules(DEFAULT_RULES, clinical_params)
+    alerts = plan.evaluate(patient(
+        reading(0, peso=70.0),
+        reading(1, peso=73.0, sistolica=80.0, frecuencia=130.0, sintomas=["Chest Pain", "disnea"])
+    ))
+
+    assert [(a.nivel, a.mensaje) for a in alerts] == [
+        ("yellow", "Recent weight increase of 3.0 kg detected (compared to last measurement). Check for fluid retention."),
+        ("red", "Low systolic pressure: 80.0 mmHg."),
+        ("red", "Elevated heart rate: 130.0 bpm."),
+        ("red", "Chest pain detected. Evaluate possible ischemia."),
+        ("yellow", "Dyspnea reported. Check for possible congestion signs."),
+    ]
+    assert plan.evaluate(patient()) == []
+
+def test_trend_rules_use_the_given_windows():
+    """Trend steps read the window aggregates and report the window length."""
+    measurements = [reading(day, peso=70.0 + day) for day in range(4)]
+    series = MeasurementSeries()
+    series.extend(measurements)
+    trends = VitalTrends(series, days=(3, 7)).summary()
+
+    rule = AlertRule(id="gain", nivel="yellow", metric="trend.peso.gain", op=">=", threshold=2.0, window="any",
+                     mensaje="Gained {value:.1f} kg in {days} days")
+    alerts = compile_rules([rule], clinical_params).evaluate(patient(*measurements), trends)
+
+    assert [a.mensaje for a in alerts] == ["Gained 2.0 kg in 3 days"]
+    assert compile_rules([rule], clinical_params).evaluate(patient(*measurements)) == []
+
+def test_unless_skips_rule_when_earlier_rule_fired():
+    rules = [
+        AlertRule(id="very_high", nivel="red", metric="presion_sistolica", op=">", threshold=200, mensaje="Very high"),
+        AlertRule(id="high", nivel="yellow", metric="presion_sistolica", op=">", threshold=150, unless="very_high",
+                  mensaje="High: {value:.0f}"),
+    ]
+    plan = compile_rules(rules, clinical_params)
+
+    assert [a.mensaje for a in plan.evaluate(patient(reading(0, sistolica=210.0)))] == ["Very high"]
+    assert [a.mensaje for a in plan.evaluate(patient(reading(0, sistolica=170.0)))] == ["High: 170"]
+
+def test_threshold_names_are_resolved_at_compile_time():
+    rule = AlertRule(id="high", nivel="red", metric="presion_sistolica", op=">", threshold="pa_max", mensaje="High")
+    low_limit = compile_rules([rule], clinical_params.model_copy(update={"pa_max": 100.0}))
+
+    assert low_limit.steps[0].threshold == 100.0
+    assert low_limit.evaluate(patient(reading(0, sistolica=120.0)))
+
+@pytest.mark.parametrize("rule, error", [
+    (dict(metric="presion_media", op=">", threshold=1), "unknown metric"),
+    (dict(metric="trend.saturacion_oxigeno.mean", op=">", threshold=1), "unknown metric"),
+    (dict(metric="peso", op=">", threshold="peso_maximo"), "unknown parameter"),
+    (dict(metric="peso", op=">"), "threshold is required"),
+    (dict(metric="peso", threshold=1), "operator are required"),
+    (dict(metric="peso", op=">", threshold=1, unless="missing"), "earlier rule"),
+    (dict(metric="trend.peso.mean", op=">", threshold=1, window=30), "30-day trend window"),
+    (dict(symptoms=["disnea"], metric="peso"), "either symptoms or a metric"),
+    (dict(symptoms=[" "]), "must not be empty"),
+    (dict(metric="peso", op=">", threshold=1, mensaje="{valor}"), "invalid message template"),
+    (dict(symptoms=["mareo"], mensaje="Mareo ({value:.0f})"), "invalid message template"),
+    (dict(metric="peso", op=">", threshold=1, mensaje="Peso {value:.1f} en {days:d} días"), "invalid message template"),
+    (dict(metric="delta.peso", op=">", threshold=1, mensaje="+{value:.1f} kg en {days:d} días"), "invalid message template"),
+])
+def test_invalid_rules_are_rejected(rule, error):
+    rule.setdefault("mensaje", "Alert")
+    with pytest.raises(ValueError, match=error):
+        compile_rules([AlertRule(id="r", nivel="red", **rule)], clinical_params)
+
+def test_duplicate_rule_ids_are_rejected():
+    rule = AlertRule(id="r", nivel="red", symptoms=["disnea"], mensaje="Alert")
+    with pytest.raises(ValueError, match="more than once"):
+        compile_rules([rule, rule], clinical_params)
@@ -0,0 +1,59 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from app.models import Patient, Measurement
+from app.routes.alerts import check_alerts
+from app.services.alert_sweep import sweep_alerts
+from app.services import clinical_parameters as cp
+from app.services.alert_rules import alert_plan, alert_plans
+
+START = datetime(2024, 1, 1, 8, 0, 0, tzinfo=timezone.utc)
+SYMPTOMS = [None, [], ["Disnea"], ["fatiga", "Chest Pain"], ["dolor torácico", "shortness of breath"], ["edema"]]
+
+def random_measurement(rng: random.Random, day: int) -> Measurement:
+    # Values straddle every threshold, including the exact boundaries
+    return Measurement(
+        timestamp=START + timedelta(days=day),
+        peso=rng.choice([70.0, 72.0, 72.05, 74.5, rng.uniform(60, 80)]),
+        presion_sistolica=rng.choice([85.0, 90.0, 120.0, 180.0, 180.5, rng.uniform(80, 200)]),
+        presion_diastolica=80.0,
+        frecuencia_cardiaca=rng.choice([45.0, 50.0, 70.0, 120.0, 121.0, rng.uniform(40, 130)]),
+        sintomas=rng.choice(SYMPTOMS)
+    )
+
+def test_sweep_matches_check_alerts(repository):
+    """The vectorized sweep returns exactly what check_alerts returns for each patient."""
+    rng = random.Random(7)
+    for i in range(300):
+        measurements = [random_measurement(rng, day) for day in range(rng.randint(0, 9))]
+        repository.save(Patient(id=f"p{i:03d}", nombre="Ana", edad=70, measurements=measurements))
+
+    vitals = repository.recent_vitals()
+    results = sweep_alerts(vitals, alert_plan())
+
+    assert any(results)
+    for patient_id, alerts in zip(vitals.patient_ids, results):
+        assert alerts == check_alerts(repository.get(patient_id), repository.get_trends(patient_id))
+
+def test_sweep_applies_parameter_overrides(repository):
+    """Patients with cohort or patient overrides are swept with their own thresholds."""
+    rng = random.Random(11)
+    for i in range(60):
+        measurements = [random_measurement(rng, day) for day in range(rng.randint(1, 4))]
+        repository.save(Patient(id=f"p{i:03d}", nombre="Ana", edad=70, measurements=measurements))
+    cp.set_cohort_overrides("beta_blockers", {"fc_min": 40.0, "fc_max": 100.0})
+    try:
+        for i in range(0, 60, 3):
+            cp.set_patient_cohort(f"p{i:03d}", "beta_blockers")
+        for i in range(0, 60, 4):
+            cp.set_patient_overrides(f"p{i:03d}", {"pa_max": 150.0})
+
+        vitals = repository.recent_vitals()
+        results = sweep_alerts(vitals, alert_plans(vitals.patient_ids))
+
+        for patient_id, alerts in zip(vitals.patient_ids, results):
+            assert alerts == check_alerts(repository.get(patient_id), repository.get_trends(patient_id))
+    finally:
+        cp.delete_cohort("beta_blockers")
+        for i in range(60):
+            cp.clear_patient(f"p{i:03d}")
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from app.services.blob_store import BlobStore, BlobTooLarge
+from app.services.multipart_upload import MultipartError, receive_upload
+
+pytestmark = pytest.mark.anyio
+
+BOUNDARY = "test-boundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 64
+
+def multipart_body(fields, image: bytes, filename: str = "monitor.png") -> bytes:
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: image/png\r\n\r\n".encode() + image + b"\r\n"
+    )
+    parts.append(f"--{BOUNDARY}--\r\n".encode())
+    return b"".join(parts)
+
+async def chunked(body: bytes, size: int = 1000):
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+def stored_files(store: BlobStore):
+    return [
+        os.path.join(directory, name)
+        for directory, _, names in os.walk(store.root)
+        for name in names
+    ]
+
+async def test_identical_uploads_are_stored_once(tmp_path):
+    store = BlobStore(str(tmp_path))
+    body = multipart_body({"caption": "Tensiómetro"}, PNG)
+    first = await receive_upload(CONTENT_TYPE, chunked(body), store)
+    second = await receive_upload(CONTENT_TYPE, chunked(body, 7), store)
+
+    assert first.fields == {"caption": "Tensiómetro"}
+    assert first.blob == second.blob
+    assert first.blob.size == len(PNG) and first.blob.content_type == "image/png"
+    assert first.filename == "monitor.png"
+    (path,) = stored_files(store)
+    assert store.locate(first.blob.reference) == path
+    with open(path, "rb") as f:
+        assert f.read() == PNG
+
+async def test_oversized_and_truncated_uploads_leave_nothing_behind(tmp_path):
+    store = BlobStore(str(tmp_path), max_bytes=1024)
+    with pytest.raises(BlobTooLarge):
+        await receive_upload(CONTENT_TYPE, chunked(multipart_body({}, PNG)), store)
+
+    store = BlobStore(str(tmp_path), max_bytes=len(PNG))
+    body = multipart_body({}, PNG)
+    with pytest.raises(MultipartError):
+        await receive_upload(CONTENT_TYPE, chunked(body[:len(body) // 2]), store)
+    assert stored_files(store) == []
+    assert store.locate("0" * 64) is None and store.locate("../../etc/passwd") is None
@@ -0,0 +1,82 @@
+import pytest
+
+from app.services import clinical_parameters as cp
+
+@pytest.fixture(autouse=True)
+def reset_overrides():
+    yield
+    for cohort in cp.list_cohorts():
+        cp.delete_cohort(cohort)
+    for patient_id in ("a", "b", "c"):
+        cp.clear_patient(patient_id)
+
+def test_layers_resolve_patient_over_cohort_over_global():
+    cp.set_cohort_overrides("beta_blockers", {"fc_min": 40.0, "fc_max": 100.0})
+    cp.set_patient_cohort("a", "beta_blockers")
+    cp.set_patient_overrides("a", {"fc_max": 90.0})
+    cp.set_patient_cohort("b", "beta_blockers")
+
+    a, b, c = (cp.resolve_parameters(pid) for pid in ("a", "b", "c"))
+
+    assert (a.params.fc_min, a.params.fc_max, a.params.pa_max) == (40.0, 90.0, cp.clinical_params.pa_max)
+    assert (b.params.fc_min, b.params.fc_max) == (40.0, 100.0)
+    assert c.params is cp.clinical_params and c.key == ()
+    assert a.key == (("fc_max", 90.0), ("fc_min", 40.0))
+
+def test_resolution_is_memoized_until_a_layer_changes():
+    cp.set_cohort_overrides("ckd", {"pa_max": 150.0})
+    cp.set_patient_cohort("a", "ckd")
+    cp.set_patient_overrides("b", {"pa_min": 100.0})
+    a, b = cp.resolve_parameters("a"), cp.resolve_parameters("b")
+    assert cp.resolve_parameters("a") is a
+
+    # A cohort change only affects its members
+    cp.set_cohort_overrides("ckd", {"pa_max": 140.0})
+    assert cp.resolve_parameters("b") is b
+    a_after = cp.resolve_parameters("a")
+    assert a_after.params.pa_max == 140.0 and a_after.version > a.version
+
+    # A patient change only affects that patient
+    cp.set_patient_overrides("b", {"pa_min": 95.0})
+    assert cp.resolve_parameters("a") is a_after
+    assert cp.resolve_parameters("b").version > b.version
+
+    # A global change affects everyone
+    cp.mark_parameters_changed()
+    assert cp.resolve_parameters("a").version > a_after.version
+    assert cp.resolve_parameters("c").version == cp.parameters_version()
+
+def test_removing_overrides_still_changes_the_version():
+    """Results computed with the overrides are stale once they are removed."""
+    cp.set_patient_overrides("a", {"fc_max": 90.0})
+    cp.mark_parameters_changed()
+    with_override = cp.resolve_parameters("a")
+
+    cp.set_patient_overrides("a", {})
+    without = cp.resolve_parameters("a")
+
+    assert without.key == () and without.version > with_override.version
+
+def test_deleting_a_cohort_releases_its_members():
+    cp.set_cohort_overrides("ckd", {"pa_max": 150.0})
+    cp.set_patient_cohort("a", "ckd")
+
+    assert cp.delete_cohort("ckd")
+    assert cp.get_patient_cohort("a") is None
+    assert cp.resolve_parameters("a").params.pa_max == cp.clinical_params.pa_max
+    assert not cp.delete_cohort("ckd")
+    with pytest.raises(ValueError):
+        cp.set_patient_cohort("a", "ckd")
+
+def test_resumed_versions_are_newer_than_the_stored_ones():
+    cp.set_patient_overrides("a", {"fc_max": 90.0})
+    stored = cp.parameters_version("a") + 100
+
+    cp.resume_versions(stored)
+    assert cp.parameters_version() > stored
+    assert cp.resolve_parameters("a").version > stored
+
+    # Resuming after an older version never moves the clock back
+    current = cp.parameters_version()
+    cp.resume_versions(0)
+    assert cp.parameters_version() > current
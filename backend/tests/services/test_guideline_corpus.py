@@ -0,0 +1,74 @@
+import os
+
+from app.services.guideline_corpus import BUILTIN_GUIDELINES, GuidelineCorpus, chunk_document
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+DOCUMENT = "\n".join([
+    "Hypertension",
+    "Blood pressure target below 130/80 mmHg for most patients after myocardial infarction.",
+    "Lifestyle",
+    "Reduce dietary sodium and follow a Mediterranean diet.",
+    "Antiplatelet therapy",
+    "Dual antiplatelet therapy with aspirin and a P2Y12 inhibitor for twelve months.",
+    "Lipids",
+    "High intensity statins; LDL goal below 70 mg/dL.",
+] * 5)
+
+def test_chunks_keep_lines_whole_and_bounded():
+    chunks = chunk_document(DOCUMENT, max_words=30)
+    assert len(chunks) > 1
+    assert all(len(chunk.split()) <= 30 for chunk in chunks)
+    lines = set(DOCUMENT.splitlines())
+    assert all(line in lines for chunk in chunks for line in chunk.split("\n"))
+
+def test_long_line_is_split():
+    chunks = chunk_document("palabra " * 25, max_words=10)
+    assert [len(c.split()) for c in chunks] == [10, 10, 5]
+
+def test_search_ranks_relevant_chunks(tmp_path):
+    write(str(tmp_path / "docs" / "aha" / "secondary_prevention.md"), DOCUMENT)
+    corpus = GuidelineCorpus.load(str(tmp_path / "docs"), None, chunk_words=20)
+    top = corpus.search("AHA", "¿Cuál es la meta de LDL con estatinas?", k=2)
+    assert len(top) == 2
+    assert "LDL goal" in top[0].text
+    assert top[0].document == "secondary_prevention.md"
+    # Sources without documents fall back to the built-in text
+    assert corpus.full_text("GES") == BUILTIN_GUIDELINES["GES"]
+    assert corpus.search("unknown", "ldl") == []
+
+def test_query_without_matching_terms_returns_leading_chunks(tmp_path):
+    corpus = GuidelineCorpus.load(str(tmp_path / "missing"), None, chunk_words=20)
+    assert corpus.search("AHA", "zzz", k=1)[0].text.startswith("AHA: Post-AMI Recommendations")
+
+def test_index_is_persisted_and_reused(tmp_path):
+    docs = str(tmp_path / "docs")
+    index_path = str(tmp_path / "index.json")
+    write(os.path.join(docs, "AHA", "a.txt"), DOCUMENT)
+    first = GuidelineCorpus.load(docs, index_path, chunk_words=20)
+    assert os.path.exists(index_path)
+    mtime = os.stat(index_path).st_mtime_ns
+
+    second = GuidelineCorpus.load(docs, index_path, chunk_words=20)
+    assert os.stat(index_path).st_mtime_ns == mtime  # nothing rebuilt
+    assert second.version("AHA") == first.version("AHA")
+    assert second.search("AHA", "sodium diet", 1) == first.search("AHA", "sodium diet", 1)
+
+    write(os.path.join(docs, "AHA", "b.txt"), "Smoking cessation counseling at every visit.")
+    third = GuidelineCorpus.load(docs, index_path, chunk_words=20)
+    assert third.version("AHA") != first.version("AHA")
+    assert "Smoking" in third.search("AHA", "smoking cessation", 1)[0].text
+
+def test_unwritable_index_path_only_warns(tmp_path, capsys):
+    docs = str(tmp_path / "docs")
+    write(os.path.join(docs, "AHA", "a.txt"), DOCUMENT)
+    # A regular file where the index directory should be (as on a read-only filesystem, writing fails)
+    write(str(tmp_path / "blocked"), "")
+
+    corpus = GuidelineCorpus.load(docs, str(tmp_path / "blocked" / "index.json"), chunk_words=20)
+
+    assert corpus.search("AHA", "sodium diet", 1)
+    assert "Could not persist guideline index" in capsys.readouterr().out
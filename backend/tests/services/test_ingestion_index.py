@@ -0,0 +1,88 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.services.ingestion_index import IngestionIndex, parse_query
+from app.services.segment_log import SegmentLog
+
+T0 = 1_700_000_000_000_000
+
+def build(texts):
+    index = IngestionIndex()
+    for offset, (content, metadata) in enumerate(texts):
+        index.add("text", offset, T0 + offset * 1_000_000, {"content": content, "metadata": metadata})
+    return index
+
+def offsets(page):
+    return [hit.offset for hit in page.hits]
+
+def test_parse_query_folds_terms_prefixes_and_phrases():
+    parsed = parse_query('Hinchazón "me falta el AIRE" pies* 150/95')
+    assert parsed.terms == ["hinchazon", "150", "95"]
+    assert parsed.prefixes == ["pies"]
+    assert parsed.phrases == [["me", "falta", "el", "aire"]]
+
+def test_search_matches_folded_terms_phrases_and_prefixes_newest_first():
+    index = build([
+        ("Me falta el aire al caminar", {"patient_id": "p1"}),
+        ("El aire me falta de noche", {"patient_id": "p1"}),
+        ("Tengo HINCHAZÓN en los tobillos", {"patient_id": "p2"}),
+        ("Hinchado y me falta el aire", {"patient_id": "p2"}),
+    ])
+    assert offsets(index.search("aire falta")) == [3, 1, 0]
+    assert offsets(index.search('"me falta el aire"')) == [3, 0]
+    assert offsets(index.search("hinchazon")) == [2]
+    assert offsets(index.search("hinch*")) == [3, 2]
+    assert offsets(index.search("aire", metadata={"patient_id": "p1"})) == [1, 0]
+    assert offsets(index.search("aire", kind="vision")) == []
+    assert offsets(index.search("", metadata={"patient_id": "p2"})) == [3, 2]
+    assert offsets(index.search("inexistente")) == []
+    with pytest.raises(ValueError):
+        index.search("")
+
+def test_search_pages_and_time_ranges():
+    index = build([(f"nota {i}", None) for i in range(10)])
+    page = index.search("nota", limit=4)
+    assert offsets(page) == [9, 8, 7, 6]
+    page = index.search("nota", limit=4, cursor=page.next_cursor)
+    assert offsets(page) == [5, 4, 3, 2]
+    page = index.search("nota", limit=4, cursor=page.next_cursor)
+    assert offsets(page) == [1, 0] and page.next_cursor is None
+
+    start = datetime.fromtimestamp((T0 + 3_000_000) / 1e6, tz=timezone.utc)
+    end = datetime.fromtimestamp((T0 + 6_000_000) / 1e6, tz=timezone.utc)
+    assert offsets(index.search("nota", start=start, end=end)) == [5, 4, 3]
+
+def test_catch_up_indexes_logs_in_append_order_once(tmp_path):
+    logs = {kind: SegmentLog(str(tmp_path / kind), segment_bytes=512) for kind in ("text", "vision")}
+    for i in range(20):
+        logs["text"].append(f'{{"content": "presion alta {i}"}}'.encode())
+        logs["vision"].append(f'{{"caption": "tensiometro {i}", "additional_text": "presion {i}"}}'.encode())
+    index = IngestionIndex()
+    assert index.catch_up(logs, page_size=7) == 40
+    assert index.catch_up(logs) == 0
+    hits = index.search("presion", limit=3).hits
+    assert [(hit.kind, hit.offset) for hit in hits] == [("vision", 19), ("text", 19), ("vision", 18)]
+
+def test_forget_before_drops_deleted_records_and_keeps_cursors_valid():
+    index = IngestionIndex()
+    for i in range(10):
+        kind = "text" if i % 2 == 0 else "vision"
+        field = "content" if kind == "text" else "caption"
+        words = "aire tobillos" if i < 6 else "aire"
+        index.add(kind, i // 2, T0 + i * 1_000_000, {field: f"{words} nota{i}", "metadata": {"patient_id": "p1"}})
+    first = index.search('"aire"', limit=3)
+    assert [(h.kind, h.offset) for h in first.hits] == [("vision", 4), ("text", 4), ("vision", 3)]
+
+    # Text offsets 0-2 were deleted by the retention
+    assert index.forget_before("text", 3) == 3
+    assert index.forget_before("text", 3) == 0
+    assert len(index) == 7
+    assert "nota0" not in index.vocabulary and "nota2" not in index.vocabulary
+    assert [(h.kind, h.offset) for h in index.search("tobillos").hits] == [("vision", 2), ("vision", 1), ("vision", 0)]
+    assert offsets(index.search('"aire tobillos"', kind="text")) == []
+
+    second = index.search("aire", limit=3, cursor=first.next_cursor)
+    assert [(h.kind, h.offset) for h in second.hits] == [("text", 3), ("vision", 2), ("vision", 1)]
+    index.add("text", 5, T0 + 20_000_000, {"content": "aire nuevo"})
+    assert offsets(index.search("nuevo")) == [5]
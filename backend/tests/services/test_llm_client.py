@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+
+from app.models import Patient
+from app.services.ai_service import AIService
+from app.services.llm_client import (
+    PRIORITY_ALERT, PRIORITY_GUIDELINES, PRIORITY_RECOMMENDATIONS, FakeLLM, LLMClient, PriorityLimiter
+)
+
+@pytest.mark.anyio
+async def test_limiter_serves_waiters_by_priority():
+    limiter = PriorityLimiter(1)
+    order = []
+
+    async def worker(name: str, priority: int):
+        async with limiter.slot(priority):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    await limiter.acquire(PRIORITY_RECOMMENDATIONS)  # occupy the only slot
+    tasks = [
+        asyncio.create_task(worker("recommendations", PRIORITY_RECOMMENDATIONS)),
+        asyncio.create_task(worker("guidelines", PRIORITY_GUIDELINES)),
+        asyncio.create_task(worker("alert", PRIORITY_ALERT)),
+    ]
+    await asyncio.sleep(0.01)
+    assert limiter.waiting == 3
+    limiter.release()
+    await asyncio.gather(*tasks)
+    assert order == ["alert", "guidelines", "recommendations"]
+    assert limiter.active == 0
+
+@pytest.mark.anyio
+async def test_reserved_slot_is_kept_for_alerts():
+    limiter = PriorityLimiter(2, reserved=1)
+    await limiter.acquire(PRIORITY_GUIDELINES)
+    blocked = asyncio.create_task(limiter.acquire(PRIORITY_RECOMMENDATIONS))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+
+    await asyncio.wait_for(limiter.acquire(PRIORITY_ALERT), timeout=1)
+    assert limiter.active == 2
+    limiter.release()
+    limiter.release()
+    await asyncio.wait_for(blocked, timeout=1)
+
+@pytest.mark.anyio
+async def test_cancelled_waiter_does_not_leak_a_slot():
+    limiter = PriorityLimiter(1)
+    await limiter.acquire(PRIORITY_ALERT)
+    waiter = asyncio.create_task(limiter.acquire(PRIORITY_ALERT))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+    limiter.release()
+    assert limiter.active == 0
+    await asyncio.wait_for(limiter.acquire(PRIORITY_GUIDELINES), timeout=1)
+
+@pytest.mark.anyio
+async def test_calls_do_not_block_the_event_loop():
+    llm = FakeLLM(latency=0.2)
+    client = LLMClient(complete_fn=llm, max_concurrency=4)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticking = asyncio.create_task(ticker())
+    replies = await asyncio.gather(*(client.complete("hola", 10, PRIORITY_GUIDELINES) for _ in range(8)))
+    ticking.cancel()
+    assert replies == ["Respuesta simulada."] * 8
+    assert llm.calls == 8
+    assert ticks >= 20  # two rounds of 0.2 s with the loop free throughout
+
+@pytest.mark.anyio
+async def test_timeout_falls_back_in_ai_service():
+    service = AIService()
+    service.llm = LLMClient(complete_fn=FakeLLM(latency=1.0), timeout=0.05)
+    answer = await service.interpret_clinical_guidelines("AHA", "¿meta de presión?")
+    assert answer.startswith("Lo siento")
+
+    patient = Patient(id="p1", nombre="Ana", edad=70)
+    recommendations = await service.generate_adherence_recommendations(patient)
+    assert set(recommendations) == {"medicamentos", "dieta", "actividad_fisica", "monitoreo"}
@@ -0,0 +1,76 @@
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from app.models import Measurement
+from app.services.measurement_series import MeasurementSeries, SymptomTable
+
+def make_measurements(count: int):
+    start = datetime(2024, 1, 1, 8, 0, 0, tzinfo=timezone.utc)
+    return [
+        Measurement(
+            timestamp=start + timedelta(hours=12 * i),
+            peso=70.0 + (i % 10) / 10,
+            presion_sistolica=120.0 + i % 7,
+            presion_diastolica=80.0,
+            frecuencia_cardiaca=70.0 + i % 5,
+            saturacion_oxigeno=97.0 if i % 2 else None,
+            sintomas=["disnea"] if i % 3 == 0 else []
+        )
+        for i in range(count)
+    ]
+
+def test_roundtrip_preserves_measurements():
+    """Measurements read back from the series equal the ones appended."""
+    measurements = make_measurements(20)
+    series = MeasurementSeries(measurements)
+
+    assert len(series) == 20
+    assert series.tail(None) == measurements
+    assert series.tail(2) == measurements[-2:]
+    assert series.measurement(-1) == measurements[-1]
+    assert series.slice(5, 8) == measurements[5:8]
+
+def test_roundtrip_preserves_timezone_and_missing_values():
+    """Naive timestamps, UTC offsets and None vs empty symptoms survive storage."""
+    chile = timezone(timedelta(hours=-3))
+    measurements = [
+        Measurement(timestamp=datetime(2024, 1, 1, 10, 0, 0), peso=70.0, presion_sistolica=120.0,
+                    presion_diastolica=80.0, frecuencia_cardiaca=70.0),
+        Measurement(timestamp=datetime(2024, 1, 2, 10, 0, 0, 123456, tzinfo=chile), peso=70.5,
+                    presion_sistolica=121.0, presion_diastolica=81.0, frecuencia_cardiaca=71.0,
+                    sintomas=[]),
+    ]
+    series = MeasurementSeries(measurements)
+
+    first, second = series.tail(None)
+    assert first.timestamp.tzinfo is None
+    assert first.sintomas is None
+    assert first.model_dump_json() == measurements[0].model_dump_json()
+    assert second.model_dump_json() == measurements[1].model_dump_json()
+
+def test_symptoms_are_interned():
+    """Repeated symptom strings are stored once in the symptom table."""
+    table = SymptomTable()
+    series = MeasurementSeries(make_measurements(30), symptoms=table)
+
+    assert len(table) == 1
+    assert series.measurement(0).sintomas == ["disnea"]
+
+def test_memory_per_measurement_is_an_order_of_magnitude_smaller():
+    """The columnar series uses at least 10x less memory than a list of Measurement objects."""
+    measurements = make_measurements(2000)
+    payload = [m.model_dump() for m in measurements]
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    objects = [Measurement(**p) for p in payload]
+    object_bytes = tracemalloc.get_traced_memory()[0] - baseline
+    del objects
+
+    baseline = tracemalloc.get_traced_memory()[0]
+    series = MeasurementSeries(measurements)
+    series_bytes = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    assert len(series) == 2000
+    assert object_bytes / series_bytes >= 10
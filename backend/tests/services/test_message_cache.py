@@ -0,0 +1,105 @@
+import pytest
+
+from app.models import Alert
+from app.services.llm_client import FakeLLM
+from app.services.message_cache import (
+    NAME_PLACEHOLDER, MessageCache, alert_message_context, context_key, normalize_alert
+)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def bp_alert(sistolica: float) -> Alert:
+    return Alert(nivel="red", mensaje=f"Elevated systolic pressure: {sistolica} mmHg.")
+
+def test_normalize_alert_buckets_readings():
+    assert normalize_alert(bp_alert(191.0)) == ("red", "Elevated systolic pressure: 190-200 mmHg.")
+    assert normalize_alert(Alert(nivel="yellow", mensaje="Weight increase of 1.5 kg.")) == (
+        "yellow", "Weight increase of 1-2 kg."
+    )
+
+def test_key_ignores_name_and_small_differences(make_patient):
+    ana = make_patient("p1", "Ana María", 191.0)
+    luis = make_patient("p2", "Luis", 197.0, edad=75)
+    key = context_key(alert_message_context(ana, [bp_alert(191.0)]))
+    assert key == context_key(alert_message_context(luis, [bp_alert(197.0)]))
+    other = make_patient("p3", "Ana", 205.0)
+    assert key != context_key(alert_message_context(other, [bp_alert(205.0)]))
+
+def test_lru_eviction():
+    cache = MessageCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"  # b becomes least recently used
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.stats() == {"hits": 2, "misses": 1, "evictions": 1, "expirations": 0, "size": 2}
+
+def test_ttl_expiry():
+    clock = FakeClock()
+    cache = MessageCache(max_entries=10, ttl_seconds=60, clock=clock)
+    cache.put("a", "A")
+    clock.now += 59
+    assert cache.get("a") == "A"
+    clock.now += 1
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["size"] == 0
+
+def test_disk_backing_survives_restart(tmp_path):
+    clock = FakeClock()
+    path = str(tmp_path / "cache.db")
+    cache = MessageCache(max_entries=10, ttl_seconds=60, path=path, clock=clock)
+    cache.put("a", "A")
+    cache.put("old", "O")
+    cache.close()
+
+    clock.now += 30
+    reopened = MessageCache(max_entries=10, ttl_seconds=60, path=path, clock=clock)
+    assert reopened.get("a") == "A"
+    reopened.put("b", "B")
+    reopened.close()
+
+    clock.now += 40  # a and old expired, b still fresh
+    reopened = MessageCache(max_entries=10, ttl_seconds=60, path=path, clock=clock)
+    assert reopened.stats()["size"] == 1
+    assert reopened.get("b") == "B"
+    reopened.close()
+
+class RecordingLLM(FakeLLM):
+    def __init__(self, reply: str = "", fail: bool = False):
+        super().__init__(reply, latency=0)
+        self.fail = fail
+        self.prompts = []
+
+    async def __call__(self, model, messages, **kwargs):
+        self.prompts.append(messages[0]["content"])
+        if self.fail:
+            raise RuntimeError("down")
+        return await super().__call__(model, messages, **kwargs)
+
+@pytest.mark.anyio
+async def test_alert_message_generated_once_per_state(make_service, make_patient):
+    llm = RecordingLLM(f"Hola {NAME_PLACEHOLDER}, su presión está alta. Contacte a su médico.")
+    service = make_service(llm)
+    first = await service.generate_alert_message(make_patient("p1", "Ana María", 191.0), [bp_alert(191.0)])
+    second = await service.generate_alert_message(make_patient("p2", "Luis", 197.0), [bp_alert(197.0)])
+
+    assert first == "Hola Ana, su presión está alta. Contacte a su médico."
+    assert second == "Hola Luis, su presión está alta. Contacte a su médico."
+    assert llm.calls == 1
+    (prompt,) = llm.prompts
+    assert "Ana" not in prompt and "191" not in prompt
+    assert service.message_cache.stats()["hits"] == 1
+
+@pytest.mark.anyio
+async def test_fallback_message_is_not_cached(make_service, make_patient):
+    service = make_service(RecordingLLM(fail=True))
+    message = await service.generate_alert_message(make_patient("p1", "Ana", 191.0), [bp_alert(191.0)])
+    assert message.startswith("ALERTA:")
+    assert service.message_cache.stats()["size"] == 0
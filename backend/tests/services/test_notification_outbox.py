@@ -0,0 +1,74 @@
+import pytest
+
+from app.models import Alert
+from app.services.notification_outbox import (
+    FAILED, IN_FLIGHT, PENDING, SENT, InMemoryNotificationOutbox, SQLiteNotificationOutbox,
+)
+
+ALERTS = [Alert(mensaje="Elevated systolic pressure: 190.0 mmHg.", nivel="red")]
+
+@pytest.fixture(params=["memory", "sqlite"])
+def outbox(request, tmp_path):
+    """Yield each outbox implementation, empty."""
+    if request.param == "memory":
+        yield InMemoryNotificationOutbox()
+    else:
+        box = SQLiteNotificationOutbox(str(tmp_path / "outbox.db"))
+        yield box
+        box.close()
+
+def test_claim_returns_due_jobs_once(outbox):
+    first = outbox.enqueue("p1", "5551", ALERTS)
+    second = outbox.enqueue("p2", "5552", ALERTS)
+
+    claimed = outbox.claim(now=first.next_attempt_at + 1, limit=5)
+
+    assert [job.id for job in claimed] == [first.id, second.id]
+    assert all(job.status == IN_FLIGHT for job in claimed)
+    assert claimed[0].alerts == ALERTS
+    assert outbox.claim(now=first.next_attempt_at + 1) == []
+    assert outbox.counts() == {IN_FLIGHT: 2}
+
+def test_rescheduled_jobs_wait_until_due(outbox):
+    job = outbox.enqueue("p1", "5551", ALERTS)
+    now = job.next_attempt_at + 1
+    outbox.claim(now)
+    outbox.set_message(job.id, "Hola")
+    outbox.reschedule(job.id, now + 30, "status 503")
+
+    assert outbox.next_due() == now + 30
+    assert outbox.claim(now + 29) == []
+    (retry,) = outbox.claim(now + 30)
+    assert (retry.attempts, retry.message, retry.last_error) == (1, "Hola", "status 503")
+
+    # Deferring (rate limiting) does not count as an attempt
+    outbox.reschedule(job.id, now + 40, attempted=False)
+    (deferred,) = outbox.claim(now + 40)
+    assert deferred.attempts == 1
+
+def test_finish_and_recover(outbox):
+    sent = outbox.enqueue("p1", "5551", ALERTS)
+    failed = outbox.enqueue("p2", "5552", ALERTS)
+    stuck = outbox.enqueue("p3", "5553", ALERTS)
+    outbox.claim(now=stuck.next_attempt_at + 1, limit=3)
+
+    outbox.finish(sent.id, SENT)
+    outbox.finish(failed.id, FAILED, "status 400")
+
+    assert outbox.recover() == 1
+    assert outbox.counts() == {SENT: 1, FAILED: 1, PENDING: 1}
+    assert outbox.get(failed.id).last_error == "status 400"
+    assert [job.id for job in outbox.claim(now=stuck.next_attempt_at + 1)] == [stuck.id]
+
+def test_sqlite_outbox_survives_restart(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    outbox = SQLiteNotificationOutbox(path)
+    job = outbox.enqueue("p1", "5551", ALERTS)
+    outbox.claim(now=job.next_attempt_at + 1)
+    outbox.close()
+
+    reopened = SQLiteNotificationOutbox(path)
+    assert reopened.recover() == 1
+    (recovered,) = reopened.claim(now=job.next_attempt_at + 1)
+    assert (recovered.id, recovered.patient_id, recovered.alerts) == (job.id, "p1", ALERTS)
+    reopened.close()
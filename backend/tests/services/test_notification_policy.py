@@ -0,0 +1,106 @@
+from datetime import datetime
+
+from app.models import Alert, Measurement
+from app.services.notification_policy import (
+    COOLDOWN, DUPLICATE, ESCALATION, NEW, REMINDER, NotificationPolicy, alert_signature
+)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def reading(sistolica: float) -> Measurement:
+    return Measurement(
+        timestamp=datetime(2024, 1, 1, 8, 0),
+        peso=70.0,
+        presion_sistolica=sistolica,
+        presion_diastolica=80.0,
+        frecuencia_cardiaca=70.0
+    )
+
+RED_BP = Alert(nivel="red", mensaje="Elevated systolic pressure: 190.0 mmHg.")
+RED_HR = Alert(nivel="red", mensaje="Abnormal heart rate: 130.0 bpm.")
+YELLOW = Alert(nivel="yellow", mensaje="Recent weight increase of 1.5 kg detected.")
+
+def make_policy(**kwargs):
+    clock = FakeClock()
+    return NotificationPolicy(
+        cooldown_seconds=3600, escalation_cooldown_seconds=600, renotify_seconds=86400, clock=clock, **kwargs
+    ), clock
+
+def test_signature_ignores_alert_order_but_not_measurement():
+    m = reading(190.0)
+    assert alert_signature([RED_BP, YELLOW], m) == alert_signature([YELLOW, RED_BP], m)
+    assert alert_signature([RED_BP], m) != alert_signature([RED_BP, YELLOW], m)
+    assert alert_signature([RED_BP], m) != alert_signature([RED_BP], reading(191.0))
+
+def test_unchanged_state_is_duplicate_until_the_reminder():
+    policy, clock = make_policy()
+    assert policy.decide("p1", [RED_BP], reading(190.0)).reason == NEW
+    clock.now += 7200  # even after the cooldown
+    decision = policy.decide("p1", [RED_BP], reading(190.0))
+    assert not decision.notify
+    assert decision.reason == DUPLICATE
+
+    clock.now += 86400 - 7200
+    reminder = policy.decide("p1", [RED_BP], reading(190.0))
+    assert reminder.notify and reminder.reason == REMINDER
+    # The reminder restarts the interval
+    clock.now += 60
+    assert policy.decide("p1", [RED_BP], reading(190.0)).reason == DUPLICATE
+
+def test_new_state_waits_for_cooldown():
+    policy, clock = make_policy()
+    policy.decide("p1", [RED_BP], reading(190.0))
+    clock.now += 1800
+    assert policy.decide("p1", [RED_BP], reading(195.0)).reason == COOLDOWN
+    clock.now += 1800
+    assert policy.decide("p1", [RED_BP], reading(195.0)).reason == NEW
+
+def test_escalation_bypasses_cooldown_at_most_once_per_window():
+    policy, clock = make_policy()
+    policy.decide("p1", [RED_BP], reading(190.0))
+    clock.now += 60
+    assert policy.decide("p1", [RED_BP, RED_HR], reading(192.0)).reason == ESCALATION
+    # A further escalation within the escalation cooldown is held back
+    clock.now += 60
+    third = Alert(nivel="red", mensaje="Low oxygen saturation: 88.0%.")
+    assert policy.decide("p1", [RED_BP, RED_HR, third], reading(193.0)).reason == COOLDOWN
+    clock.now += 600
+    assert policy.decide("p1", [RED_BP, RED_HR, third], reading(193.0)).reason == ESCALATION
+
+def test_patients_are_independent_and_forget_resets():
+    policy, _ = make_policy()
+    assert policy.decide("p1", [RED_BP], reading(190.0)).notify
+    assert policy.decide("p2", [RED_BP], reading(190.0)).notify
+    policy.forget("p1")
+    assert policy.decide("p1", [RED_BP], reading(190.0)).notify
+
+def test_counters():
+    policy, clock = make_policy()
+    policy.decide("p1", [RED_BP], reading(190.0))
+    policy.decide("p1", [RED_BP], reading(190.0))
+    policy.decide("p1", [RED_BP], reading(191.0))
+    counters = policy.counters()
+    assert counters == {NEW: 1, ESCALATION: 0, REMINDER: 0, DUPLICATE: 1, COOLDOWN: 1, "sent": 1, "suppressed": 2}
+    policy.clear()
+    assert policy.counters()["suppressed"] == 0
+
+def test_sqlite_index_survives_restart(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    policy, clock = make_policy(path=path)
+    assert policy.decide("p1", [RED_BP], reading(190.0)).notify
+    clock.now += 60
+    assert policy.decide("p2", [RED_BP], reading(190.0)).notify
+    assert policy.decide("p2", [RED_BP], reading(195.0)).reason == COOLDOWN
+    policy.forget("p2")
+    policy.close()
+
+    reopened, clock = make_policy(path=path)
+    clock.now += 120
+    assert reopened.decide("p1", [RED_BP], reading(190.0)).reason == DUPLICATE
+    assert reopened.decide("p2", [RED_BP], reading(190.0)).reason == NEW
+    reopened.close()
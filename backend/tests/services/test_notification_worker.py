@@ -0,0 +1,138 @@
+import asyncio
+import time
+import pytest
+
+from app.models import Alert
+from app.services.notification_outbox import FAILED, PENDING, SENT, InMemoryNotificationOutbox
+from app.services.notification_worker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, DestinationRateLimiter, NotificationWorkerPool, PermanentDeliveryError,
+)
+
+ALERTS = [Alert(mensaje="Low heart rate: 40.0 bpm.", nivel="red")]
+
+def make_pool(deliver, finished, **kwargs) -> NotificationWorkerPool:
+    kwargs.setdefault("rate_limiter", DestinationRateLimiter(rate=1000.0, burst=1000))
+    kwargs.setdefault("breaker", CircuitBreaker(failure_threshold=100, reset_seconds=60))
+    return NotificationWorkerPool(
+        InMemoryNotificationOutbox(), deliver, lambda job, sent: finished.append((job, sent)),
+        workers=2, retry_seconds=0.01, max_retry_seconds=0.02, poll_seconds=0.01, **kwargs
+    )
+
+async def wait_for(condition, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.005)
+
+@pytest.mark.anyio
+async def test_failed_deliveries_are_retried_until_sent():
+    attempts, finished = [], []
+
+    async def deliver(job):
+        attempts.append(job.id)
+        if len(attempts) < 3:
+            raise ConnectionError("graph api unavailable")
+        return True
+
+    pool = make_pool(deliver, finished, max_attempts=5)
+    await pool.start()
+    job = pool.outbox.enqueue("p1", "5551", ALERTS)
+    pool.wake()
+    await wait_for(lambda: finished)
+    await pool.stop()
+
+    ((done, sent),) = finished
+    assert sent and done.status == SENT and done.attempts == 3
+    assert attempts == [job.id] * 3
+
+@pytest.mark.anyio
+async def test_jobs_fail_after_max_attempts_or_permanent_errors():
+    finished = []
+
+    async def deliver(job):
+        if job.patient_id == "gone":
+            raise PermanentDeliveryError("Patient not found")
+        return False
+
+    pool = make_pool(deliver, finished, max_attempts=3)
+    await pool.start()
+    pool.outbox.enqueue("p1", "5551", ALERTS)
+    pool.outbox.enqueue("gone", "5552", ALERTS)
+    pool.wake()
+    await wait_for(lambda: len(finished) == 2)
+    await pool.stop()
+
+    outcomes = {job.patient_id: (sent, job.status, job.attempts, job.last_error) for job, sent in finished}
+    assert outcomes == {
+        "p1": (False, FAILED, 3, "delivery failed"),
+        "gone": (False, FAILED, 1, "Patient not found"),
+    }
+
+@pytest.mark.anyio
+async def test_open_circuit_stops_deliveries():
+    attempts, finished = [], []
+
+    async def deliver(job):
+        attempts.append(job.id)
+        return False
+
+    pool = make_pool(deliver, finished, breaker=CircuitBreaker(failure_threshold=2, reset_seconds=60))
+    await pool.start()
+    for i in range(5):
+        pool.outbox.enqueue(f"p{i}", f"555{i}", ALERTS)
+    pool.wake()
+    await wait_for(lambda: len(attempts) >= 2)
+    await asyncio.sleep(0.1)
+    await pool.stop()
+
+    assert len(attempts) == 2
+    assert pool.breaker.state(time.time()) == OPEN
+    assert finished == []
+    assert pool.outbox.counts() == {PENDING: 5}
+
+@pytest.mark.anyio
+async def test_destination_rate_limit_defers_jobs():
+    finished = []
+
+    async def deliver(job):
+        return True
+
+    pool = make_pool(deliver, finished, rate_limiter=DestinationRateLimiter(rate=0.001, burst=1))
+    await pool.start()
+    for _ in range(3):
+        pool.outbox.enqueue("p1", "5551", ALERTS)
+    pool.outbox.enqueue("p2", "5552", ALERTS)
+    pool.wake()
+    await wait_for(lambda: len(finished) == 2)
+    await asyncio.sleep(0.05)
+    await pool.stop()
+
+    assert sorted(job.destination for job, _ in finished) == ["5551", "5552"]
+    assert pool.outbox.counts() == {SENT: 2, PENDING: 2}
+    assert [job.attempts for job in pool.outbox.claim(now=float("inf"), limit=5)] == [0, 0]
+
+def test_circuit_breaker_half_open_allows_one_trial():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10)
+    breaker.record_failure(now=0)
+    assert breaker.state(0) == CLOSED
+    breaker.record_failure(now=1)
+    assert breaker.state(5) == OPEN and not breaker.allow(5)
+
+    assert breaker.state(11) == HALF_OPEN
+    assert breaker.allow(11) and not breaker.allow(11)
+    breaker.release()
+    assert breaker.allow(11) and not breaker.allow(11)
+    breaker.record_failure(now=12)
+    assert breaker.state(13) == OPEN
+
+    assert breaker.state(22) == HALF_OPEN and breaker.allow(22)
+    breaker.record_success()
+    assert breaker.state(22) == CLOSED and breaker.allow(22) and breaker.allow(22)
+
+def test_rate_limiter_refills_tokens():
+    limiter = DestinationRateLimiter(rate=0.5, burst=2)
+    assert limiter.reserve("a", now=0) == 0
+    assert limiter.reserve("a", now=0) == 0
+    assert limiter.reserve("a", now=0) == pytest.approx(2.0)
+    assert limiter.reserve("b", now=0) == 0
+    assert limiter.reserve("a", now=2) == 0
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.parameter_audit import InMemoryParameterAuditLog, SQLiteParameterAuditLog
+
+INITIAL = {"pa_min": 90, "pa_max": 180, "rules": [{"id": "high_bp"}]}
+
+@pytest.fixture(params=["memory", "sqlite"])
+def audit_log(request, tmp_path):
+    """Yield each log implementation, empty, with a snapshot every 3 entries."""
+    if request.param == "memory":
+        yield InMemoryParameterAuditLog(snapshot_interval=3)
+    else:
+        log = SQLiteParameterAuditLog(str(tmp_path / "audit.db"), snapshot_interval=3)
+        yield log
+        log.close()
+
+def _fill(audit_log, count):
+    state = dict(INITIAL)
+    entries = []
+    for i in range(count):
+        new_values = {"pa_max": 180 + i} if i % 4 else {"rules": [{"id": f"rule_{i}"}]}
+        entries.append(audit_log.append("ana" if i % 2 else "luis", dict(state), new_values))
+        state.update(new_values)
+    return entries
+
+def test_entries_filter_by_time_and_author(audit_log):
+    entries = _fill(audit_log, 10)
+
+    assert [e.id for e in audit_log.entries()] == list(range(1, 11))
+    assert [e.id for e in audit_log.entries(updated_by="ana")] == [2, 4, 6, 8, 10]
+    assert [e.id for e in audit_log.entries(updated_by="ana", after=4, limit=2)] == [6, 8]
+    assert audit_log.entries(updated_by="nobody") == []
+
+    start, end = entries[3].timestamp, entries[7].timestamp
+    in_range = [e.id for e in audit_log.entries(start=start, end=end)]
+    assert in_range == [e.id for e in entries if start <= e.timestamp < end]
+    assert audit_log.entries()[4].new_values == entries[4].new_values
+    assert audit_log.count() == 10
+
+def test_timestamps_never_go_backwards(audit_log):
+    entries = _fill(audit_log, 5)
+
+    assert all(a.timestamp <= b.timestamp for a, b in zip(entries, entries[1:]))
+
+def test_state_at_matches_full_replay(audit_log):
+    entries = _fill(audit_log, 11)
+
+    for entry in entries:
+        expected = dict(INITIAL)
+        for other in entries:
+            if other.timestamp <= entry.timestamp:
+                expected.update(other.new_values)
+        state = audit_log.state_at(entry.timestamp)
+        assert state.values == expected
+        assert state.entry_id == max(e.id for e in entries if e.timestamp <= entry.timestamp)
+
+def test_state_before_first_update_is_the_replaced_state(audit_log):
+    entries = _fill(audit_log, 2)
+
+    state = audit_log.state_at(entries[0].timestamp - timedelta(seconds=1))
+
+    assert state.entry_id is None
+    assert state.values == INITIAL
+
+def test_empty_log_has_no_state(audit_log):
+    assert audit_log.state_at(datetime.now(timezone.utc)) is None
+
+def test_sqlite_log_persists_across_reopen(tmp_path):
+    path = str(tmp_path / "audit.db")
+    log = SQLiteParameterAuditLog(path, snapshot_interval=3)
+    entries = _fill(log, 7)
+    log.close()
+
+    reopened = SQLiteParameterAuditLog(path, snapshot_interval=3)
+    try:
+        assert [e.id for e in reopened.entries()] == [e.id for e in entries]
+        assert reopened.state_at(entries[-1].timestamp).values["pa_max"] == 186
+        assert reopened.append("ana", {}, {"pa_min": 80}).id == 8
+    finally:
+        reopened.close()
+
+def test_clear_removes_entries_and_snapshots(audit_log):
+    _fill(audit_log, 6)
+
+    audit_log.clear()
+
+    assert audit_log.count() == 0
+    assert audit_log.entries() == []
+    assert audit_log.append("ana", dict(INITIAL), {"pa_min": 80}).id == 1
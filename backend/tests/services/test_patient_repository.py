@@ -0,0 +1,226 @@
+import math
+import sqlite3
+from datetime import datetime, timezone
+
+from app.models import Patient, Measurement, Alert, AlertState
+from app.services.patient_repository import SQLitePatientRepository
+
+def make_measurement(peso: float, day: int = 1) -> Measurement:
+    return Measurement(
+        timestamp=datetime(2024, 1, day, 8, 0, 0, tzinfo=timezone.utc),
+        peso=peso,
+        presion_sistolica=120.0,
+        presion_diastolica=80.0,
+        frecuencia_cardiaca=70.0,
+        sintomas=["disnea"]
+    )
+
+def test_save_and_get_roundtrip(repository):
+    """A saved patient is returned with its measurements and interventions."""
+    patient = Patient(
+        id="p1",
+        nombre="Ana",
+        edad=70,
+        telefono="123",
+        measurements=[make_measurement(70.0)],
+        intervention_history=[{"action": "call"}]
+    )
+    repository.save(patient)
+
+    stored = repository.get("p1")
+    assert stored.model_dump() == patient.model_dump()
+    assert repository.exists("p1")
+    assert repository.get("missing") is None
+
+def test_add_measurement_and_intervention(repository):
+    """Appends are visible on the next read and rejected for unknown patients."""
+    repository.save(Patient(id="p1", nombre="Ana", edad=70))
+
+    assert repository.add_measurement("p1", make_measurement(70.0, day=1))
+    assert repository.add_measurement("p1", make_measurement(71.0, day=2))
+    assert repository.add_intervention("p1", {"action": "call"})
+    assert not repository.add_measurement("missing", make_measurement(70.0))
+    assert not repository.add_intervention("missing", {"action": "call"})
+
+    stored = repository.get("p1", history=None)
+    assert [m.peso for m in stored.measurements] == [70.0, 71.0]
+    assert stored.intervention_history == [{"action": "call"}]
+
+def test_get_attaches_recent_history_window(repository):
+    """By default only the most recent readings are attached to the patient."""
+    repository.save(Patient(id="p1", nombre="Ana", edad=70))
+    for day, peso in enumerate([70.0, 71.0, 72.0, 73.0], start=1):
+        repository.add_measurement("p1", make_measurement(peso, day=day))
+
+    assert [m.peso for m in repository.get("p1").measurements] == [72.0, 73.0]
+    assert [m.peso for m in repository.get("p1", history=1).measurements] == [73.0]
+    assert len(repository.get("p1", history=None).measurements) == 4
+
+def test_update_profile_preserves_history(repository):
+    """Updating demographics keeps measurements and interventions."""
+    repository.save(Patient(id="p1", nombre="Ana", edad=70, measurements=[make_measurement(70.0)]))
+
+    updated = repository.update_profile("p1", Patient(id="p1", nombre="Ana María", edad=71))
+
+    assert updated.nombre == "Ana María"
+    assert [m.peso for m in updated.measurements] == [70.0]
+    assert repository.update_profile("missing", Patient(id="missing", nombre="X", edad=1)) is None
+
+def test_delete_and_list(repository):
+    """Deleted patients disappear from listings."""
+    repository.save(Patient(id="p1", nombre="Ana", edad=70))
+    repository.save(Patient(id="p2", nombre="Luis", edad=65, measurements=[make_measurement(80.0)]))
+
+    assert [p.id for p in repository.list_patients()] == ["p1", "p2"]
+    assert repository.delete("p1")
+    assert not repository.delete("p1")
+    assert [p.id for p in repository.list_patients()] == ["p2"]
+
+def test_sqlite_survives_reopen(tmp_path):
+    """Data written to the SQLite repository is available after reopening the file."""
+    path = str(tmp_path / "patients.db")
+    repo = SQLitePatientRepository(path, pool_size=1)
+    repo.save(Patient(id="p1", nombre="Ana", edad=70))
+    repo.add_measurement("p1", make_measurement(70.0))
+    repo.close()
+
+    reopened = SQLitePatientRepository(path, pool_size=1)
+    assert [m.peso for m in reopened.get("p1", history=None).measurements] == [70.0]
+    reopened.close()
+
+def test_measurement_source_ingestion_round_trip(repository):
+    repository.save(Patient(id="p1", nombre="Ana", edad=70))
+    repository.add_measurement("p1", make_measurement(70.0).model_copy(update={"source_ingestion_id": "i1"}))
+    repository.add_measurement("p1", make_measurement(71.0, day=2))
+
+    assert [m.source_ingestion_id for m in repository.get("p1").measurements] == ["i1", None]
+    assert [m.source_ingestion_id for m in repository.get_measurements("p1", limit=1).items] == ["i1"]
+
+def test_sqlite_adds_the_source_column_to_older_databases(tmp_path):
+    path = str(tmp_path / "patients.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE measurements (id INTEGER PRIMARY KEY AUTOINCREMENT, patient_id TEXT NOT NULL, "
+        "ts INTEGER NOT NULL, timestamp TEXT NOT NULL, peso REAL NOT NULL, presion_sistolica REAL NOT NULL, "
+        "presion_diastolica REAL NOT NULL, frecuencia_cardiaca REAL NOT NULL, saturacion_oxigeno REAL, sintomas TEXT);"
+    )
+    conn.close()
+
+    repo = SQLitePatientRepository(path, pool_size=1)
+    repo.save(Patient(id="p1", nombre="Ana", edad=70))
+    repo.add_measurement("p1", make_measurement(70.0).model_copy(update={"source_ingestion_id": "i1"}))
+    assert repo.get("p1").measurements[0].source_ingestion_id == "i1"
+    repo.close()
+
+def test_get_measurements_range_and_pages(repository):
+    """Range filters and keyset pages behave the same on every backend."""
+    repository.save(Patient(id="p1", nombre="Ana", edad=70))
+    for day in [1, 2, 3, 5, 4, 6]:
+        repository.add_measurement("p1", make_measurement(70.0 + day, day=day))
+
+    page = repository.get_measurements(
+        "p1",
+        start=datetime(2024, 1, 2, tzinfo=timezone.utc),
+        end=datetime(2024, 1, 6, tzinfo=timezone.utc),
+        limit=2
+    )
+    assert [m.peso for m in page.items] == [72.0, 73.0]
+    page = repository.get_measurements("p1", after=page.next_key, end=datetime(2024, 1, 6, tzinfo=timezone.utc))
+    assert [m.peso for m in page.items] == [74.0, 75.0]
+    assert page.next_key is None
+    assert repository.get_measurements("missing") is None
+
+def test_list_patients_pages_by_id(repository):
+    """Patients are listed by id with keyset pagination and optional measurements."""
+    for pid in ["c", "a", "b"]:
+        repository.save(Patient(id=pid, nombre=pid, edad=70, measurements=[make_measurement(70.0)]))
+
+    assert [p.id for p in repository.list_patients(limit=2)] == ["a", "b"]
+    assert [p.id for p in repository.list_patients(after="b")] == ["c"]
+    assert all(p.measurements == [] for p in repository.list_patients(history=0))
+
+def test_alert_state_is_kept_until_the_next_measurement_write(repository):
+    """A stored alert state is returned with the patient and outdated by measurement writes."""
+    repository.save(Patient(id="p1", nombre="Ana", edad=70))
+    repository.add_measurement("p1", make_measurement(70.0))
+    version = repository.get("p1").measurement_version
+    state = AlertState(alerts=[Alert(mensaje="m", nivel="red")], measurement_version=version, parameters_version=3)
+
+    assert repository.set_alert_state("p1", state)
+    assert not repository.set_alert_state("missing", state)
+    assert repository.get("p1").alert_state == state
+
+    repository.add_measurement("p1", make_measurement(71.0, day=2))
+    patient = repository.get("p1")
+    assert patient.measurement_version > version
+    assert patient.alert_state.measurement_version == version
+
+def test_latest_parameters_version_survives_reopen(tmp_path):
+    """The newest stored parameters version is what a restart must resume after."""
+    path = str(tmp_path / "patients.db")
+    repo = SQLitePatientRepository(path, pool_size=1)
+    assert repo.latest_parameters_version() == 0
+    for pid, version in [("p1", 7), ("p2", 12)]:
+        repo.save(Patient(id=pid, nombre=pid, edad=70))
+        repo.set_alert_state(pid, AlertState(alerts=[], measurement_version=0, parameters_version=version))
+    repo.close()
+
+    reopened = SQLitePatientRepository(path, pool_size=1)
+    assert reopened.latest_parameters_version() == 12
+    reopened.close()
+
+def test_parameter_overrides_round_trip(repository):
+    """Cohort and patient settings are stored; deletions release members and drop patients."""
+    repository.save(Patient(id="p1", nombre="Ana", edad=70))
+    repository.save(Patient(id="p2", nombre="Beto", edad=60))
+    repository.save_cohort("beta_blockers", {"fc_min": 40.0})
+    repository.save_cohort("elderly", {"fc_min": 42.0})
+    assert repository.save_patient_parameters("p1", "beta_blockers", {"fc_max": 110.0})
+    assert repository.save_patient_parameters("p2", "elderly", {})
+    assert not repository.save_patient_parameters("missing", None, {"fc_min": 30.0})
+
+    assert repository.delete_cohort("elderly")
+    assert not repository.delete_cohort("elderly")
+    repository.delete("p1")
+
+    settings = repository.parameter_overrides()
+    assert settings.cohorts == {"beta_blockers": {"fc_min": 40.0}}
+    assert settings.patients == {"p2": (None, {})}
+
+def test_parameter_overrides_survive_reopen(tmp_path):
+    path = str(tmp_path / "patients.db")
+    repo = SQLitePatientRepository(path, pool_size=1)
+    repo.save(Patient(id="p1", nombre="Ana", edad=70))
+    repo.save_cohort("beta_blockers", {"fc_min": 40.0})
+    repo.save_patient_parameters("p1", "beta_blockers", {"fc_max": 110.0})
+    repo.close()
+
+    reopened = SQLitePatientRepository(path, pool_size=1)
+    settings = reopened.parameter_overrides()
+    assert settings.cohorts == {"beta_blockers": {"fc_min": 40.0}}
+    assert settings.patients == {"p1": ("beta_blockers", {"fc_max": 110.0})}
+    reopened.close()
+
+def test_recent_vitals_holds_latest_two_readings(repository):
+    """Columns hold each patient's latest and previous reading, NaN where missing."""
+    repository.save(Patient(id="b", nombre="Beto", edad=60))
+    repository.save(Patient(id="a", nombre="Ana", edad=70, measurements=[make_measurement(70.0)]))
+    repository.save(Patient(id="c", nombre="Carla", edad=80))
+    for day, peso in enumerate([80.0, 81.0, 83.5], start=1):
+        repository.add_measurement("c", make_measurement(peso, day=day))
+
+    vitals = repository.recent_vitals()
+
+    assert vitals.patient_ids == ["a", "b", "c"]
+    assert list(vitals.latest["peso"])[::2] == [70.0, 83.5]
+    assert math.isnan(vitals.latest["peso"][1])
+    assert math.isnan(vitals.previous["peso"][0])
+    assert vitals.previous["peso"][2] == 81.0
+    assert math.isnan(vitals.latest["saturacion_oxigeno"][2])
+    assert vitals.sintomas == [["disnea"], None, ["disnea"]]
+
+    repository.delete("a")
+    repository.save(Patient(id="d", nombre="Dora", edad=50, measurements=[make_measurement(60.0)]))
+    vitals = repository.recent_vitals()
+    assert vitals.patient_ids == ["b", "c", "d"]
+    assert list(vitals.latest["peso"])[1:] == [83.5, 60.0]
@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models import AdherenceRecommendations, Measurement, Patient
+from app.services.ai_service import ADHERENCE_FALLBACK
+from app.services.recommendation_refresher import RecommendationRefresher, seconds_until
+from app.services.recommendation_store import (
+    InMemoryRecommendationStore, SQLiteRecommendationStore, is_fresh, profile_version
+)
+
+class FakeGenerator:
+    """
+    Stands in for AIService.generate_adherence_recommendations, recording the
+    measurement version of every patient it was called with.
+    """
+
+    def __init__(self, delay: float = 0.0, reply=None):
+        self.delay = delay
+        self.reply = reply
+        self.versions = []
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self, patient: Patient):
+        self.versions.append(patient.measurement_version)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return self.reply or {"dieta": f"Plan para {patient.nombre}"}
+
+def reading(peso: float = 70.0) -> Measurement:
+    return Measurement(peso=peso, presion_sistolica=120.0, presion_diastolica=80.0, frecuencia_cardiaca=70.0)
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryRecommendationStore()
+    else:
+        store = SQLiteRecommendationStore(str(tmp_path / "recommendations.db"))
+        yield store
+        store.close()
+
+def test_store_round_trip_and_freshness(store, repository):
+    repository.save(Patient(id="p1", nombre="Ana", edad=70, measurements=[reading()]))
+    patient = repository.get("p1")
+    entry = AdherenceRecommendations(
+        recommendations={"dieta": "Menos sal, más verduras"},
+        measurement_version=patient.measurement_version,
+        profile_version=profile_version(patient)
+    )
+    store.put("p1", entry)
+    assert store.get("p1") == entry
+    assert is_fresh(store.get("p1"), patient)
+
+    repository.add_measurement("p1", reading(71.0))
+    assert not is_fresh(store.get("p1"), repository.get("p1"))
+    # A profile change makes the entry stale even without new measurements
+    renamed = repository.update_profile("p1", Patient(id="p1", nombre="Ana María", edad=70))
+    assert not is_fresh(entry, renamed)
+    assert set(store.generated_at()) == {"p1"}
+    assert store.delete("p1")
+    assert store.get("p1") is None
+
+@pytest.mark.anyio
+async def test_writes_during_a_generation_rerun_it_once(repository):
+    repository.save(Patient(id="p1", nombre="Ana", edad=70))
+    generate = FakeGenerator(delay=0.05)
+    refresher = RecommendationRefresher(repository, InMemoryRecommendationStore(), generate)
+
+    assert refresher.schedule("p1")
+    await asyncio.sleep(0.01)
+    for weight in (71.0, 72.0, 73.0):
+        repository.add_measurement("p1", reading(weight))
+        refresher.schedule("p1")
+    await refresher.drain()
+
+    # One generation for the first state, one more for the three later writes
+    assert len(generate.versions) == 2
+    patient = repository.get("p1")
+    assert generate.versions[-1] == patient.measurement_version
+    assert refresher.get_fresh(patient) == {"dieta": "Plan para Ana"}
+    assert refresher.pending == 0
+
+@pytest.mark.anyio
+async def test_fallback_recommendations_are_not_stored(repository):
+    repository.save(Patient(id="p1", nombre="Ana", edad=70))
+    refresher = RecommendationRefresher(repository, InMemoryRecommendationStore(), FakeGenerator(reply=ADHERENCE_FALLBACK))
+    assert await refresher.refresh("p1") is None
+    assert refresher.store.get("p1") is None
+    # Patients not read from the repository carry no version to tag an entry with
+    assert refresher.record(Patient(id="p2", nombre="Luis", edad=60), {"dieta": "x"}) is None
+
+@pytest.mark.anyio
+async def test_refresh_all_regenerates_missing_stale_and_old_entries_with_bounded_concurrency(repository):
+    for i in range(12):
+        repository.save(Patient(id=f"p{i:02d}", nombre=f"Paciente {i}", edad=60 + i))
+    generate = FakeGenerator(delay=0.01)
+    store = InMemoryRecommendationStore()
+    refresher = RecommendationRefresher(repository, store, generate, concurrency=3, max_age_hours=24)
+
+    assert await refresher.refresh_all() == 12
+    assert generate.max_active == 3
+    assert await refresher.refresh_all() == 0
+
+    repository.add_measurement("p03", reading())
+    old = store.get("p07")
+    store.put("p07", old.model_copy(update={"generated_at": old.generated_at - timedelta(hours=25)}))
+    assert await refresher.refresh_all() == 2
+    assert len(generate.versions) == 14
+
+def test_seconds_until_next_refresh_hour():
+    now = datetime(2024, 1, 1, 2, 30, tzinfo=timezone.utc)
+    assert seconds_until(3, now) == 1800
+    assert seconds_until(2, now) == 23.5 * 3600
@@ -0,0 +1,85 @@
+import os
+from datetime import datetime, timezone
+
+from app.services.segment_log import LOG_SUFFIX, SegmentLog
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def at(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+def make_log(path, clock=None, **kwargs) -> SegmentLog:
+    options = dict(segment_bytes=1024, index_interval_bytes=128, retention_hours=0, retention_bytes=0)
+    options.update(kwargs)
+    return SegmentLog(str(path), clock=clock or FakeClock(), **options)
+
+def payloads(page):
+    return [record.payload for record in page.records]
+
+def test_offset_pagination_across_rotated_segments(tmp_path):
+    log = make_log(tmp_path)
+    for i in range(100):
+        assert log.append(f"record-{i:03d}".encode()).offset == i
+    assert log.stats()["segments"] == 3
+
+    seen = []
+    start = 0
+    while start is not None:
+        page = log.read(start, limit=7)
+        seen.extend(payloads(page))
+        start = page.next_offset
+    assert seen == [f"record-{i:03d}".encode() for i in range(100)]
+    assert payloads(log.read(95, limit=10)) == [f"record-{i:03d}".encode() for i in range(95, 100)]
+    assert log.read(100).records == []
+
+def test_time_range_reads_use_append_time(tmp_path):
+    clock = FakeClock()
+    log = make_log(tmp_path, clock)
+    start = clock.now
+    for i in range(60):
+        log.append(f"r{i}".encode())
+        clock.now += 60
+    # Records appended in minutes [10, 20)
+    page = log.read(0, limit=100, start=at(start + 600), end=at(start + 1200))
+    assert [record.offset for record in page.records] == list(range(10, 20))
+    page = log.read(0, limit=4, start=at(start + 600), end=at(start + 1200))
+    assert page.next_offset == 14
+    # A clock going backwards does not reorder append times
+    clock.now = start
+    assert log.append(b"late").timestamp == log.read(59).records[0].timestamp
+
+def test_reopen_recovers_a_torn_record(tmp_path):
+    log = make_log(tmp_path)
+    for i in range(30):
+        log.append(f"record-{i}".encode())
+    log.close()
+    last = sorted(name for name in os.listdir(tmp_path) if name.endswith(LOG_SUFFIX))[-1]
+    with open(tmp_path / last, "ab") as f:
+        f.write(b"\x40\x00\x00\x00partial")
+
+    reopened = make_log(tmp_path)
+    assert reopened.next_offset == 30
+    assert reopened.append(b"after").offset == 30
+    assert payloads(reopened.read(28)) == [b"record-28", b"record-29", b"after"]
+
+def test_retention_deletes_old_and_excess_segments(tmp_path):
+    clock = FakeClock()
+    log = make_log(tmp_path / "age", clock, retention_hours=1)
+    for _ in range(40):
+        log.append(b"x" * 100)
+    clock.now += 7200
+    log.enforce_retention()
+    assert log.stats()["segments"] == 1
+    assert log.read(0).records[0].offset == log.first_offset
+
+    sized = make_log(tmp_path / "size", retention_bytes=2048)
+    for _ in range(100):
+        sized.append(b"x" * 100)
+    stats = sized.stats()
+    assert stats["bytes"] <= 2048 + 1024
+    assert stats["next_offset"] == 100 and stats["first_offset"] > 0
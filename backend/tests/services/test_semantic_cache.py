@@ -0,0 +1,101 @@
+import time
+import numpy as np
+
+from app.services.semantic_cache import SemanticCache, embed, normalize_query, text_fingerprint
+
+AHA = text_fingerprint("AHA: BP <130/80 mmHg.")
+
+def test_normalize_query_folds_case_accents_and_punctuation():
+    assert normalize_query("¿Cuál es la META de presión?") == "cual es la meta de presion"
+
+def test_embedding_is_unit_length_and_stable():
+    vector = embed("meta de presión")
+    assert vector.dtype == np.float32
+    assert abs(float(np.linalg.norm(vector)) - 1.0) < 1e-6
+    assert np.array_equal(vector, embed("META de presion"))
+    assert not embed("¿?").any()
+
+def test_similar_query_hits_and_unrelated_misses():
+    cache = SemanticCache(threshold=0.85)
+    cache.store("AHA", AHA, "¿Cuál es la meta de presión arterial?", "Menor a 130/80 mmHg.")
+    assert cache.lookup("aha", AHA, "cual es la meta de presion arterial") == "Menor a 130/80 mmHg."
+    assert cache.lookup("AHA", AHA, "¿Cuándo es el primer control?") is None
+    assert cache.lookup("GES", text_fingerprint("GES"), "¿Cuál es la meta de presión arterial?") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+def test_changed_guideline_text_invalidates_source():
+    cache = SemanticCache()
+    cache.store("AHA", AHA, "meta de presión", "130/80")
+    assert cache.lookup("AHA", text_fingerprint("AHA: BP <120/80 mmHg."), "meta de presión") is None
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["size"] == 0
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticCache(max_entries=2)
+    cache.store("AHA", AHA, "meta de presión", "A")
+    cache.store("AHA", AHA, "frecuencia cardiaca objetivo", "B")
+    assert cache.lookup("AHA", AHA, "meta de presión") == "A"
+    cache.store("AHA", AHA, "duración de la doble antiagregación", "C")
+    assert cache.lookup("AHA", AHA, "frecuencia cardiaca objetivo") is None
+    assert cache.lookup("AHA", AHA, "meta de presión") == "A"
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size"] == 2
+
+def test_lookup_stays_fast_with_many_entries():
+    cache = SemanticCache(max_entries=20000)
+    vocabulary = ["presión", "meta", "control", "dieta", "sodio", "ejercicio", "estatinas", "ldl", "eco", "rehabilitación"]
+    rng = np.random.default_rng(0)
+    for i in range(20000):
+        words = rng.choice(vocabulary, size=4)
+        cache.store("AHA", AHA, f"{' '.join(words)} {i}", str(i))
+    assert cache.stats()["size"] == 20000
+
+    start = time.perf_counter()
+    for _ in range(100):
+        cache.lookup("AHA", AHA, "¿cuál es la meta de presión?")
+    elapsed = (time.perf_counter() - start) / 100
+    assert elapsed < 0.005  # sub-millisecond in practice; loose bound for slow CI machines
+
+def test_queries_with_opposite_meaning_do_not_hit():
+    """Close n-gram vectors, different question: a number, negation or qualifier differs."""
+    pairs = [
+        ("¿Cuál es la meta de presión sistólica?", "¿Cuál es la meta de presión diastólica?"),
+        ("Meta de presión en pacientes con diabetes", "Meta de presión en pacientes sin diabetes"),
+        ("Tratamiento en pacientes de alto riesgo", "Tratamiento en pacientes de bajo riesgo"),
+        ("¿Se recomienda aspirina?", "¿No se recomienda aspirina?"),
+        ("Meta de LDL menor a 70", "Meta de LDL menor a 55"),
+    ]
+    for stored, asked in pairs:
+        cache = SemanticCache()
+        cache.store("AHA", AHA, stored, "answer")
+        assert cache.lookup("AHA", AHA, asked) is None, (stored, asked)
+        assert cache.lookup("AHA", AHA, stored) == "answer"
+
+def test_rewordings_hit():
+    """Other stop words, a synonym or a dropped redundant word: the cosine decides."""
+    cache = SemanticCache()
+    cache.store("AHA", AHA, "¿Cuál es la meta de presión arterial?", "130/80")
+    for asked in [
+        "meta de presion arterial",
+        "¿meta de presión?",
+        "¿cuál es el objetivo de presión arterial?",
+        "¿Cuál es la meta de tensión arterial?",
+    ]:
+        assert cache.lookup("AHA", AHA, asked) == "130/80", asked
+
+    cache.store("AHA", AHA, "¿Cuál es la meta de presión en pacientes con diabetes?", "130/80 con diabetes")
+    assert cache.lookup("AHA", AHA, "meta de la presion para los pacientes con diabetes") == "130/80 con diabetes"
+
+def test_discriminators_veto_close_queries():
+    cache = SemanticCache(threshold=0.5)
+    cache.store("AHA", AHA, "meta de presión sistólica en mujeres", "answer")
+    assert cache.lookup("AHA", AHA, "meta de presión diastólica en mujeres") is None
+    assert cache.lookup("AHA", AHA, "meta de presión sistólica en hombres") is None
+    assert cache.lookup("AHA", AHA, "objetivo de presion sistolica para mujeres") == "answer"
+
+def test_lookup_of_unknown_source_allocates_nothing():
+    cache = SemanticCache()
+    for i in range(100):
+        assert cache.lookup(f"source-{i}", "unrecognized", "meta de presión") is None
+    assert cache._sources == {}
@@ -0,0 +1,98 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from app.models import Alert
+from app.services.llm_client import FakeLLM
+from app.services.message_cache import NAME_PLACEHOLDER
+from app.services.single_flight import SingleFlight
+
+RED_BP = Alert(nivel="red", mensaje="Elevated systolic pressure: 192.0 mmHg.")
+
+@pytest.mark.anyio
+async def test_concurrent_callers_share_one_call_and_later_callers_start_another():
+    flight = SingleFlight()
+    started = []
+
+    async def call():
+        started.append(1)
+        await asyncio.sleep(0.02)
+        return len(started)
+
+    results = await asyncio.gather(*(flight.do("k", call) for _ in range(5)))
+    assert results == [1] * 5
+    assert await flight.do("k", call) == 2
+    assert flight.stats() == {"calls": 2, "shared": 4}
+    assert flight.in_flight == 0
+
+@pytest.mark.anyio
+async def test_errors_are_shared_and_cancelled_callers_do_not_cancel_the_call():
+    flight = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("down")
+
+    results = await asyncio.gather(flight.do("k", failing), flight.do("k", failing), return_exceptions=True)
+    assert [type(r) for r in results] == [RuntimeError, RuntimeError]
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    first = asyncio.create_task(flight.do("s", slow))
+    second = asyncio.create_task(flight.do("s", slow))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    assert await second == "done"
+
+@pytest.mark.anyio
+async def test_concurrent_alert_messages_for_one_state_make_one_llm_call(make_service, make_patient):
+    llm = FakeLLM(f"Hola {NAME_PLACEHOLDER}, contacte a su médico.", latency=0.05)
+    service = make_service(llm)
+    messages = await asyncio.gather(
+        service.generate_alert_message(make_patient("p1", "Ana María"), [RED_BP]),
+        service.generate_alert_message(make_patient("p2", "Luis"), [RED_BP]),
+        service.generate_alert_message(make_patient("p1", "Ana María"), [RED_BP]),
+    )
+    assert messages == ["Hola Ana, contacte a su médico.", "Hola Luis, contacte a su médico.", "Hola Ana, contacte a su médico."]
+    assert llm.calls == 1
+
+@pytest.mark.anyio
+async def test_concurrent_guideline_and_recommendation_requests_make_one_llm_call_each(make_service, make_patient):
+    llm = FakeLLM('"dieta": "Reduzca la sal."', latency=0.05)
+    service = make_service(llm)
+    answers = await asyncio.gather(
+        service.interpret_clinical_guidelines("AHA", "¿Cuál es la meta de presión?"),
+        service.interpret_clinical_guidelines("AHA", "cual es la meta de presion"),
+    )
+    assert answers[0] == answers[1]
+    assert llm.calls == 1
+
+    patient = make_patient("p1", "Ana")
+    recommendations = await asyncio.gather(*(service.generate_adherence_recommendations(patient) for _ in range(3)))
+    assert recommendations == [{"dieta": "Reduzca la sal."}] * 3
+    assert llm.calls == 2
+    # Callers get their own copy of the shared result
+    recommendations[0]["dieta"] = "x"
+    assert recommendations[1]["dieta"] == "Reduzca la sal."
+
+@pytest.mark.anyio
+async def test_concurrent_identical_whatsapp_messages_are_sent_once(make_service):
+    service = make_service(FakeLLM())
+    sent = []
+
+    async def send_text(phone_number, message):
+        sent.append((phone_number, message))
+        await asyncio.sleep(0.05)
+        return True
+
+    with patch("app.services.ai_service.whatsapp_client.send_text", side_effect=send_text):
+        results = await asyncio.gather(
+            service.send_whatsapp_message("56911111111", "Hola"),
+            service.send_whatsapp_message("56911111111", "Hola"),
+            service.send_whatsapp_message("56922222222", "Hola"),
+        )
+    assert results == [True, True, True]
+    assert sent == [("56911111111", "Hola"), ("56922222222", "Hola")]
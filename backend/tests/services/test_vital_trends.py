@@ -0,0 +1,64 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models import Patient, Measurement
+from app.services.vital_trends import TREND_FIELDS, TREND_WINDOWS_DAYS
+
+START = datetime(2024, 1, 1, 8, 0, 0, tzinfo=timezone.utc)
+
+def make_measurement(rng: random.Random, hours: int) -> Measurement:
+    return Measurement(
+        timestamp=START + timedelta(hours=hours),
+        peso=round(rng.uniform(65, 75), 1),
+        presion_sistolica=rng.choice([110.0, 120.0, 150.0]),
+        presion_diastolica=80.0,
+        frecuencia_cardiaca=round(rng.uniform(50, 110)),
+    )
+
+def expected_windows(measurements):
+    # Brute force over the full history: readings in (end - days, end], last by time then by write order
+    ordered = sorted(enumerate(measurements), key=lambda item: (item[1].timestamp, item[0]))
+    end = ordered[-1][1].timestamp
+    windows = []
+    for days in TREND_WINDOWS_DAYS:
+        inside = [m for _, m in ordered if m.timestamp > end - timedelta(days=days)]
+        window = {"days": days, "count": len(inside)}
+        for field in TREND_FIELDS:
+            values = [getattr(m, field) for m in inside]
+            window[field] = {"min": min(values), "max": max(values), "mean": sum(values) / len(values), "last": values[-1]}
+        windows.append(window)
+    return windows
+
+def flatten(windows):
+    return [(w["days"], w["count"], *(w[f][s] for f in TREND_FIELDS for s in ("min", "max", "mean", "last"))) for w in windows]
+
+def test_trend_windows_match_a_full_rescan(repository):
+    """Windows updated reading by reading (including out-of-order and batched writes) equal a full rescan."""
+    rng = random.Random(3)
+    repository.save(Patient(id="p1", nombre="Ana", edad=70))
+    written = []
+    hours = 0
+    for step in range(120):
+        hours += rng.choice([2, 6, 12, 30])
+        # Every so often a reading arrives late
+        offset = -rng.randint(1, 100) if step % 17 == 5 else 0
+        batch = [make_measurement(rng, hours + offset)]
+        if step % 10 == 0:
+            batch.append(make_measurement(rng, hours + 1))
+            repository.add_measurements({"p1": batch})
+        else:
+            repository.add_measurement("p1", batch[0])
+        written.extend(batch)
+
+        windows = [w.model_dump() for w in repository.get_trends("p1")]
+        for actual, expected in zip(flatten(windows), flatten(expected_windows(written)), strict=True):
+            assert actual == pytest.approx(expected)
+
+def test_trends_for_patients_without_readings(repository):
+    """Patients without readings have no windows and unknown patients have no trends."""
+    repository.save(Patient(id="p1", nombre="Ana", edad=70))
+
+    assert repository.get_trends("p1") == []
+    assert repository.get_trends("missing") is None
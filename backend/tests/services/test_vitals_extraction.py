@@ -0,0 +1,28 @@
+import pytest
+
+from app.services.vitals_extraction import extract_vitals
+
+@pytest.mark.parametrize("text, values, sintomas", [
+    ("presión 150/95, pulso 88, peso 81.2",
+     {"presion_sistolica": 150, "presion_diastolica": 95, "frecuencia_cardiaca": 88, "peso": 81.2}, []),
+    ("Hoy 130/80 y 72 lpm, pesé 79,5 kg. Saturación 96%",
+     {"presion_sistolica": 130, "presion_diastolica": 80, "frecuencia_cardiaca": 72, "peso": 79.5,
+      "saturacion_oxigeno": 96}, []),
+    ("PA: 120 sobre 70, FC 65, SpO2 98", 
+     {"presion_sistolica": 120, "presion_diastolica": 70, "frecuencia_cardiaca": 65, "saturacion_oxigeno": 98}, []),
+    ("No tengo dolor de pecho, pero me falta el aire y tengo los pies hinchados", {}, ["disnea", "edema"]),
+    ("Me duele el pecho. Dolor en el pecho desde anoche, sin mareos", {}, ["dolor torácico"]),
+    # "sin" only negates the next noun, and a conjunction ends the scope of "no"
+    ("sin medicamentos tengo dolor de pecho", {}, ["dolor torácico"]),
+    ("no tomé la pastilla y tengo mareos", {}, ["mareo"]),
+    ("no tengo mareos ni dolor de pecho, no me falta el aire", {}, []),
+    # Dates, implausible values and percentages without a saturation keyword are not readings
+    ("el 12/05 fui al médico, pulso 400", {}, []),
+    ("hoy 100% bien", {}, []),
+    ("me siento al 60%", {}, []),
+    ("93% de saturación", {"saturacion_oxigeno": 93}, []),
+])
+def test_extract_vitals(text, values, sintomas):
+    found = extract_vitals(text)
+    assert found.values == values
+    assert found.sintomas == sintomas
@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.models import Patient, TextIngestion, VitalsExtraction
+from app.services.extraction_store import InMemoryExtractionStore, SQLiteExtractionStore
+from app.services.vitals_pipeline import VitalsPipeline
+
+pytestmark = pytest.mark.anyio
+
+def message(content: str, patient_id: str = "p1", **kwargs) -> TextIngestion:
+    return TextIngestion(content=content, metadata={"patient_id": patient_id}, **kwargs)
+
+@pytest.mark.parametrize("workers", [0, 2])
+async def test_pipeline_records_complete_readings_with_provenance(repository, workers):
+    repository.save(Patient(id="p1", nombre="Ana", edad=70))
+    repository.save(Patient(id="p2", nombre="Luis", edad=75))
+    recorded = []
+    pipeline = VitalsPipeline(repository, InMemoryExtractionStore(), recorded.append, workers=workers, batch_wait_ms=5)
+    when = datetime(2025, 3, 1, 8, 30, tzinfo=timezone.utc)
+    messages = [
+        message("presión 150/95, pulso 88, peso 81.2, me falta el aire", timestamp=when),
+        # Nothing to complete it from: p2 has no measurements
+        message("presión 130/85", patient_id="p2"),
+        message("todo bien hoy"),
+        message("presión 120/80, pulso 70, peso 80", patient_id="ghost"),
+    ]
+    await pipeline.start()
+    assert all(pipeline.submit(m) for m in messages)
+    assert not pipeline.submit(TextIngestion(content="sin paciente"))
+    await pipeline.stop()
+
+    statuses = [pipeline.store.get(m.id).status for m in messages]
+    assert statuses == ["recorded", "incomplete", "no_vitals", "unknown_patient"]
+    extraction = pipeline.store.get(messages[0].id)
+    assert extraction.measurement_timestamp == when and extraction.sintomas == ["disnea"]
+    assert pipeline.store.get(messages[1].id).missing == ["peso", "frecuencia_cardiaca"]
+    assert recorded == [{"p1"}]
+
+    (measurement,) = repository.get("p1").measurements
+    assert measurement.timestamp == when
+    assert (measurement.presion_sistolica, measurement.frecuencia_cardiaca, measurement.peso) == (150, 88, 81.2)
+    assert measurement.sintomas == ["disnea"]
+    assert measurement.source_ingestion_id == messages[0].id
+    assert pipeline.stats()["recorded"] == 1
+
+async def test_partial_and_symptom_only_messages_carry_the_previous_values_forward(repository):
+    repository.save(Patient(id="p1", nombre="Ana", edad=70))
+    recorded = []
+    pipeline = VitalsPipeline(repository, InMemoryExtractionStore(), recorded.append, workers=0)
+    messages = [message("presión 150/95, pulso 88, peso 81.2"), message("me falta el aire"), message("peso 83")]
+    await pipeline.start()
+    for m in messages:
+        pipeline.submit(m)
+    await pipeline.stop()
+
+    assert [pipeline.store.get(m.id).status for m in messages] == ["recorded"] * 3
+    symptoms = pipeline.store.get(messages[1].id)
+    assert symptoms.carried_forward == ["peso", "presion_sistolica", "presion_diastolica", "frecuencia_cardiaca"]
+    assert symptoms.missing == [] and symptoms.values == {}
+    assert pipeline.store.get(messages[2].id).carried_forward == [
+        "presion_sistolica", "presion_diastolica", "frecuencia_cardiaca"
+    ]
+
+    first, breathless, weighed = repository.get("p1", history=None).measurements
+    assert (breathless.sintomas, breathless.peso, breathless.presion_sistolica) == (["disnea"], 81.2, 150)
+    assert (weighed.peso, weighed.frecuencia_cardiaca, weighed.sintomas) == (83, 88, None)
+    assert [m.source_ingestion_id for m in (first, breathless, weighed)] == [m.id for m in messages]
+    assert {"p1"} in recorded
+
+async def test_pipeline_batches_messages(repository):
+    repository.save(Patient(id="p1", nombre="Ana", edad=70))
+    pipeline = VitalsPipeline(repository, InMemoryExtractionStore(), lambda ids: None, workers=0, batch_size=10)
+    await pipeline.start()
+    for i in range(25):
+        pipeline.submit(message(f"presión 1{i + 10}/80, pulso 70, peso 80"))
+    await pipeline.stop()
+    assert pipeline.stats()["batches"] == 3
+    assert len(repository.get("p1", history=None).measurements) == 25
+
+def test_sqlite_extraction_store_round_trip(tmp_path):
+    store = SQLiteExtractionStore(str(tmp_path / "extractions.db"))
+    store.put_many([VitalsExtraction(ingestion_id="i1", patient_id="p1", status="incomplete",
+                                     values={"peso": 80.5}, missing=["presion_sistolica"])])
+    assert store.get("i1").values == {"peso": 80.5}
+    assert store.get("i2") is None
+    store.clear()
+    assert store.get("i1") is None
+    store.close()
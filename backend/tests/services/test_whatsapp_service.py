@@ -0,0 +1,88 @@
+import asyncio
+import json
+import httpx
+import pytest
+
+from app.services.whatsapp_service import WhatsAppClient
+
+def make_client(handler, **kwargs) -> WhatsAppClient:
+    kwargs.setdefault("backoff", 0.001)
+    return WhatsAppClient(
+        phone_id="123", token="secret", base_url="https://graph.test/v14.0",
+        transport=httpx.MockTransport(handler), **kwargs
+    )
+
+@pytest.mark.anyio
+async def test_send_text_posts_message():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"messages": [{"id": "wamid.1"}]})
+
+    client = make_client(handler)
+    assert await client.send_text("56911111111", "Hola")
+    await client.aclose()
+
+    (request,) = requests
+    assert str(request.url) == "https://graph.test/v14.0/123/messages"
+    assert request.headers["Authorization"] == "Bearer secret"
+    assert json.loads(request.content) == {
+        "messaging_product": "whatsapp", "to": "56911111111", "type": "text", "text": {"body": "Hola"}
+    }
+
+@pytest.mark.anyio
+async def test_retryable_failures_are_retried():
+    responses = iter([httpx.Response(503), httpx.Response(429, headers={"Retry-After": "0"}), httpx.Response(201)])
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(request)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("connection refused", request=request)
+        return next(responses)
+
+    client = make_client(handler)
+    assert await client.send_text("56911111111", "Hola")
+    assert len(attempts) == 4
+
+@pytest.mark.anyio
+async def test_client_errors_and_exhausted_retries_fail():
+    attempts = []
+
+    def rejected(request: httpx.Request) -> httpx.Response:
+        attempts.append(request)
+        return httpx.Response(400, json={"error": "invalid number"})
+
+    assert not await make_client(rejected).send_text("bad", "Hola")
+    assert len(attempts) == 1
+
+    def timing_out(request: httpx.Request) -> httpx.Response:
+        attempts.append(request)
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    assert not await make_client(timing_out, max_retries=2).send_text("56911111111", "Hola")
+    assert len(attempts) == 4
+
+@pytest.mark.anyio
+async def test_unconfigured_client_does_not_send():
+    client = WhatsAppClient(phone_id="", token="")
+    assert not await client.send_text("56911111111", "Hola")
+
+@pytest.mark.anyio
+async def test_send_many_bounds_concurrency():
+    in_flight = peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200)
+
+    client = make_client(handler, max_concurrency=3)
+    results = await client.send_many([(f"569{i:08d}", "Hola") for i in range(12)])
+
+    assert results == [True] * 12
+    assert peak == 3